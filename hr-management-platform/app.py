@@ -12,7 +12,7 @@ BASE_DIR = Path(__file__).parent
 sys.path.insert(0, str(BASE_DIR))
 
 import config
-from services.excel_handler import ExcelHandler
+from services.excel_handler import ExcelHandler, excel_sheet_names
 from services.validator import DataValidator
 from services.merger import DBTNSMerger
 from services.database import DatabaseHandler
@@ -59,6 +59,10 @@ if 'show_manual_snapshot_dialog' in query_params:
 if 'show_clear_db_confirm' in query_params:
     st.session_state.show_clear_db_confirm = query_params['show_clear_db_confirm'] == 'true'
 
+# Pagina Performance (nascosta): abilitata per la sessione con ?perf=1
+if query_params.get('perf') == '1':
+    st.session_state.show_perf_panel = True
+
 # Inizializza session state per UI
 if 'sidebar_collapsed' not in st.session_state:
     st.session_state.sidebar_collapsed = False
@@ -128,8 +132,7 @@ def load_excel_to_staging(uploaded_file):
             tmp_path = Path(tmp.name)
 
         # === RILEVA FORMATO FILE ===
-        xls = pd.ExcelFile(tmp_path)
-        available_sheets = xls.sheet_names
+        available_sheets = excel_sheet_names(tmp_path)
 
         # Controlla se è formato DB_ORG (nuovo)
         if 'DB_ORG' in available_sheets:
@@ -172,9 +175,19 @@ def load_excel_to_staging(uploaded_file):
         # Valida dati
         validator = DataValidator()
 
-        # Valida personale
-        personale_result = validator.validate_personale(personale)
+        # Valida personale (a blocchi in parallelo per file grandi, con barra di avanzamento)
+        progress_bar = st.progress(0.0, text="Validazione Personale...")
+
+        def show_progress(label):
+            def callback(done, total):
+                progress_bar.progress(done / max(total, 1), text=f"Validazione {label}: {done}/{total} righe")
+            return callback
+
+        personale_result = validator.validate_parallel(
+            personale, 'personale', progress_callback=show_progress("Personale")
+        )
         if not personale_result.is_valid():
+            progress_bar.empty()
             error_summary = personale_result.get_summary()
             # Mostra primi 10 errori dettagliati
             first_errors = personale_result.errors[:10]
@@ -197,7 +210,10 @@ def load_excel_to_staging(uploaded_file):
 """
 
         # Valida strutture
-        strutture_result = validator.validate_strutture(strutture)
+        strutture_result = validator.validate_parallel(
+            strutture, 'strutture', progress_callback=show_progress("Strutture")
+        )
+        progress_bar.empty()
         if not strutture_result.is_valid():
             error_summary = strutture_result.get_summary()
             # Mostra primi 10 errori dettagliati
@@ -407,71 +423,57 @@ def confirm_import_from_staging(user_note: str = ""):
         return False, f"✗ Errore import: {str(e)}"
 
 
-def confirm_import_with_version(preview_data: dict, user_note: str = ""):
+def confirm_import_with_version(preview_data: dict, user_note: str = "") -> str:
     """
     Step 2: Conferma import dopo preview utente.
 
+    L'import (versione + snapshot) gira in background: il risultato si
+    raccoglie con complete_confirm_import quando il job è terminato.
+
     Args:
         preview_data: Dati preview salvati in session state
         user_note: Nota opzionale utente
-    """
-    try:
-        import json
-        from services.version_manager import VersionManager
 
-        db_handler = st.session_state.database_handler
-
-        # Begin import version
-        version_id = db_handler.begin_import_version(
-            source_filename=preview_data['filename'],
-            user_note=user_note or None
-        )
-
-        # Import data with version tracking
-        # Nota: import_version_id viene gestito internamente da _log_audit
-        personale = preview_data['personale_df']
-        strutture = preview_data['strutture_df']
+    Returns:
+        job_id del job di import
+    """
+    from services.background_jobs import confirm_import_job
+    from services.job_runner import get_job_runner
 
-        p_count, s_count = db_handler.import_from_dataframe(personale, strutture)
+    return get_job_runner().submit(
+        'confirm_import',
+        confirm_import_job,
+        st.session_state.database_handler,
+        preview_data,
+        user_note,
+        label=f"Import {preview_data['filename']}"
+    )
 
-        # Generate summary for version completion
-        changes_summary = json.dumps({
-            'type': 'upload_import',
-            'personale_imported': p_count,
-            'strutture_imported': s_count
-        })
 
-        # Complete import version
-        db_handler.complete_import_version(version_id, p_count, s_count, changes_summary)
+def complete_confirm_import(result: dict):
+    """
+    Ricarica i dati in sessione dopo il job di import confermato.
 
-        # **NEW: Create snapshot for version recovery**
-        try:
-            vm = VersionManager(db_handler, config.SNAPSHOTS_DIR)
-            snapshot_path = vm.create_snapshot(
-                import_version_id=version_id,
-                source_filename=preview_data['filename'],
-                user_note=user_note
-            )
-            snapshot_msg = f"\n📦 Snapshot creato per recovery: {Path(snapshot_path).name}"
-            print(f"✓ Snapshot creato: {snapshot_path}")
-        except Exception as e:
-            print(f"! Errore creazione snapshot: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            snapshot_msg = f"\n! Warning: Snapshot non creato - {str(e)}"
+    Returns:
+        Tuple (success, message)
+    """
+    if result.get('snapshot_path'):
+        snapshot_msg = f"\n📦 Snapshot creato per recovery: {Path(result['snapshot_path']).name}"
+    else:
+        snapshot_msg = f"\n! Warning: Snapshot non creato - {result.get('snapshot_error')}"
 
-        # Reload to session state
-        success, msg = load_data_from_db()
+    # Reload to session state
+    success, msg = load_data_from_db()
 
-        # Cleanup preview data
-        if 'import_preview' in st.session_state:
-            del st.session_state.import_preview
+    # Cleanup preview data
+    if 'import_preview' in st.session_state:
+        del st.session_state.import_preview
 
-        return success, f"""✓ **Dati caricati con successo nel database!**
+    return success, f"""✓ **Dati caricati con successo nel database!**
 
 • Importati:
-- {p_count} dipendenti (Personale)
-- {s_count} strutture organizzative
+- {result['personale_imported']} dipendenti (Personale)
+- {result['strutture_imported']} strutture organizzative
 
 📦 Snapshot creato automaticamente per recovery
 {snapshot_msg}
@@ -479,9 +481,6 @@ def confirm_import_with_version(preview_data: dict, user_note: str = ""):
 • Puoi ora lavorare con i dati. Usa "Crea Snapshot" per salvare modifiche importanti.
 """
 
-    except Exception as e:
-        return False, f"Errore conferma import: {str(e)}"
-
 
 def show_top_toolbar():
     """
@@ -730,6 +729,20 @@ def main():
             s_count = len(sdf) if sdf is not None else 0
             st.metric("🏗️ Strutture", s_count)
 
+        # Snapshot in corso/terminato in background
+        snapshot_job_id = st.session_state.get('manual_snapshot_job')
+        if snapshot_job_id:
+            from ui.job_status_view import render_job_status
+            from services.job_runner import SUCCEEDED, get_job_runner
+
+            job = render_job_status(snapshot_job_id, key="manual_snapshot")
+            del st.session_state.manual_snapshot_job
+            if job is not None and job.status == SUCCEEDED:
+                snapshot_path = get_job_runner().get_result(snapshot_job_id)['snapshot_path']
+                st.success(f"✓ Snapshot creato con successo!\n📦 {Path(snapshot_path).name}")
+                st.session_state.show_manual_snapshot_dialog = False
+                st.stop()
+
         # Input nota
         snapshot_note = st.text_input(
             "💬 Nota snapshot (obbligatoria)",
@@ -741,44 +754,22 @@ def main():
 
         with col1:
             if st.button("Crea Snapshot", type="primary", use_container_width=True, disabled=not snapshot_note):
-                with st.spinner("Creazione snapshot in corso..."):
-                    try:
-                        from services.version_manager import VersionManager
-                        import json
-
-                        db = st.session_state.database_handler
-
-                        # Crea import_version entry per snapshot manuale
-                        version_id = db.begin_import_version(
-                            source_filename="MANUAL_SNAPSHOT",
-                            user_note=snapshot_note
-                        )
-
-                        # Complete version (no actual import, just snapshot)
-                        pdf = st.session_state.get('personale_df')
-                        sdf = st.session_state.get('strutture_df')
-                        p_count = len(pdf) if pdf is not None else 0
-                        s_count = len(sdf) if sdf is not None else 0
-
-                        db.complete_import_version(
-                            version_id, p_count, s_count,
-                            json.dumps({'type': 'manual_snapshot'})
-                        )
-
-                        # Crea snapshot
-                        vm = VersionManager(db, config.SNAPSHOTS_DIR)
-                        snapshot_path = vm.create_snapshot(
-                            import_version_id=version_id,
-                            source_filename="MANUAL_SNAPSHOT",
-                            user_note=snapshot_note
-                        )
-
-                        st.success(f"✓ Snapshot creato con successo!\n📦 {Path(snapshot_path).name}")
-                        st.session_state.show_manual_snapshot_dialog = False
-                        st.rerun()
+                try:
+                    from services.background_jobs import snapshot_job
+                    from services.job_runner import get_job_runner
+
+                    st.session_state.manual_snapshot_job = get_job_runner().submit(
+                        'snapshot',
+                        snapshot_job,
+                        st.session_state.database_handler,
+                        "MANUAL_SNAPSHOT",
+                        snapshot_note,
+                        label="Snapshot manuale"
+                    )
+                    st.rerun()
 
-                    except Exception as e:
-                        st.error(f"✗ Errore creazione snapshot: {str(e)}")
+                except Exception as e:
+                    st.error(f"✗ Errore creazione snapshot: {str(e)}")
 
         with col2:
             if st.button("Annulla", use_container_width=True):
@@ -1102,6 +1093,11 @@ def main():
 
         st.stop()  # Blocca rendering resto pagina mentre in staging mode
 
+    # Esito dell'import confermato (job in background terminato)
+    if st.session_state.get('confirm_import_message'):
+        st.success(st.session_state.pop('confirm_import_message'))
+        st.balloons()
+
     # === PREVIEW MODAL (se in attesa di conferma) ===
     if st.session_state.get('import_preview'):
         preview = st.session_state.import_preview
@@ -1180,18 +1176,30 @@ def main():
             help="Nota per identificare questa versione nell'archivio"
         )
 
+        # Import confermato in corso/terminato in background
+        import_job_id = st.session_state.get('confirm_import_job')
+        if import_job_id:
+            from ui.job_status_view import render_job_status
+            from services.job_runner import SUCCEEDED, get_job_runner
+
+            job = render_job_status(import_job_id, key="confirm_import")
+            del st.session_state.confirm_import_job
+            if job is not None and job.status == SUCCEEDED:
+                success, msg = complete_confirm_import(get_job_runner().get_result(import_job_id))
+                if success:
+                    st.session_state.confirm_import_message = msg
+                    st.rerun()
+                st.error(msg)
+
         col1, col2 = st.columns(2)
 
         with col1:
             if st.button("✓ Carica nel Database", type="primary", use_container_width=True):
-                with st.spinner("Caricamento in corso..."):
-                    success, msg = confirm_import_with_version(preview, user_note)
-                    if success:
-                        st.success(msg)
-                        st.balloons()
-                        st.rerun()
-                    else:
-                        st.error(msg)
+                try:
+                    st.session_state.confirm_import_job = confirm_import_with_version(preview, user_note)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Errore conferma import: {str(e)}")
 
         with col2:
             if st.button("Annulla", use_container_width=True):
@@ -1426,6 +1434,17 @@ def main():
             from ui.settings_view import show_settings_view
             show_settings_view()
 
+        elif page == "Performance":
+            from ui.performance_view import show_performance_view
+            show_performance_view()
+
 
 if __name__ == "__main__":
-    main()
+    # Tempo di rendering e span dei servizi attribuiti alla pagina del rerun
+    from services.perf_trace import get_perf_tracer
+    perf_tracer = get_perf_tracer()
+    perf_tracer.begin_rerun(st.session_state.current_page)
+    try:
+        main()
+    finally:
+        perf_tracer.end_rerun()
@@ -0,0 +1,7 @@
+"""
+Benchmark dei percorsi critici (import, diff, merge, snapshot, organigrammi,
+validazione) su dati sintetici riproducibili.
+
+    python benchmarks/run_benchmarks.py --scales 1000 10000
+    python benchmarks/synthetic_data.py --scale 10000 --output data/input/synthetic
+"""
@@ -0,0 +1,443 @@
+"""
+Benchmark dei percorsi critici su dati sintetici (benchmarks/synthetic_data.py)
+
+Per ogni scala genera il dataset con seed fisso, prepara un database
+temporaneo (init_db + migrations) e misura:
+- DatabaseHandler.import_from_dataframe
+- DBOrgImportService.import_db_org_file (DB nuovo a ogni ripetizione)
+- FileDiffer.compare_full_files (versione base vs versione modificata)
+- MergeEngine.match_records (salary review vs employees)
+- VersionManager.create_snapshot / compare_versions
+- OrgChartDataService: costruzione alberi a cache vuota
+- DataValidator: validate_personale / validate_strutture / validate_parallel
+
+I risultati (min/mediana per caso) sono salvati in JSON in
+config.BENCHMARK_DIR; con --baseline si confrontano le mediane con un
+risultato precedente e si segnalano le regressioni.
+
+Usage:
+    python benchmarks/run_benchmarks.py                         # scale config.BENCHMARK_SCALES
+    python benchmarks/run_benchmarks.py --scales 1000 10000 --repeats 5
+    python benchmarks/run_benchmarks.py --only tree validate   # solo i casi che contengono...
+    python benchmarks/run_benchmarks.py --baseline data/benchmarks/baseline.json
+
+Exit code:
+    0  completato
+    1  almeno un caso fallito
+    3  regressioni rispetto al baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import config
+from benchmarks.synthetic_data import SyntheticDataset, generate_dataset, perturb_tns, salary_review
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_REGRESSION = 3
+
+TREE_BUILDERS = [
+    'get_hr_hierarchy_tree',
+    'get_tns_hierarchy_tree',
+    'get_tns_structures_tree',
+    'get_org_units_tree',
+    'get_positions_tree',
+    'get_org_hierarchy_tree',
+]
+
+
+@dataclass
+class BenchmarkCase:
+    """Caso di benchmark: setup (non misurato) e run (misurato) per ripetizione."""
+    name: str
+    run: Callable[[Any], Any]
+    rows: int
+    setup: Optional[Callable[[int], Any]] = None
+
+
+def _progress(message: str):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+@contextlib.contextmanager
+def _quiet(verbose: bool):
+    """I servizi stampano log a ogni riga/passo: fuori dal tempo misurato."""
+    if verbose:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _prepare_template(path: Path):
+    """Database vuoto con lo schema completo (come all'avvio dell'app)."""
+    from migrations import migration_003_add_hierarchy_fields
+    from migrations.run_migrations import MIGRATIONS
+    from services.database import DatabaseHandler
+
+    handler = DatabaseHandler(path)
+    handler.init_db()
+    handler.close()
+    for _, _, module in MIGRATIONS:
+        module.migrate(path)
+    migration_003_add_hierarchy_fields.migrate(path)
+
+
+def _load_salaries(db_path: Path, salaries: pd.DataFrame):
+    """Carica i record retributivi collegandoli agli employees importati."""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        ids = pd.read_sql_query("SELECT employee_id, tx_cod_fiscale FROM employees", conn)
+        records = salaries.merge(ids, on='tx_cod_fiscale', how='inner')
+        records.to_sql('salary_records', conn, if_exists='append', index=False)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _time_case(case: BenchmarkCase, repeats: int, verbose: bool) -> Dict[str, Any]:
+    """Esegue il caso `repeats` volte e restituisce le statistiche dei tempi."""
+    timings = []
+    for i in range(repeats):
+        with _quiet(verbose):
+            state = case.setup(i) if case.setup else None
+            start = time.perf_counter()
+            case.run(state)
+            timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    return {
+        'rows': case.rows,
+        'repeats': repeats,
+        'min_s': round(min(timings), 6),
+        'median_s': round(median, 6),
+        'max_s': round(max(timings), 6),
+        'rows_per_s': round(case.rows / median, 1) if median > 0 else None,
+    }
+
+
+def build_cases(dataset: SyntheticDataset, workdir: Path, template: Path,
+                db_org_path: Path, workers: Optional[int]) -> List[BenchmarkCase]:
+    """Casi di benchmark per un dataset; workdir contiene DB e snapshot."""
+    from models.merge_models import ImportType
+    from services.database import DatabaseHandler
+    from services.db_org_import_service import DBOrgImportService
+    from services.file_differ import FileDiffer
+    from services.merge_engine import MergeEngine
+    from services.orgchart_data_service import OrgChartDataService
+    from services.validator import DataValidator
+    from services.version_manager import VersionManager
+
+    personale, strutture = dataset.personale, dataset.strutture
+    personale_new, strutture_new = perturb_tns(personale, strutture, seed=dataset.seed)
+    db = DatabaseHandler(config.DB_PATH)
+    vm = VersionManager(db, config.SNAPSHOTS_DIR)
+
+    def db_org_setup(i: int) -> Path:
+        run_db = workdir / f'db_org_run_{i}.db'
+        shutil.copyfile(template, run_db)
+        return run_db
+
+    def db_org_run(run_db: Path):
+        result = DBOrgImportService(db_path=run_db).import_db_org_file(db_org_path)
+        if not result['success']:
+            raise RuntimeError(result['message'])
+        run_db.unlink()
+
+    versions = {}
+
+    def snapshot_versions(i: int) -> None:
+        """Snapshot della versione base e di quella modificata (per il confronto)."""
+        if versions:
+            return
+        for label, (p, s) in (('base', (personale, strutture)), ('new', (personale_new, strutture_new))):
+            db.import_from_dataframe(p, s)
+            version_id = db.begin_import_version(source_filename=f'benchmark_{label}')
+            db.complete_import_version(version_id, len(p), len(s), '{}')
+            vm.create_snapshot(version_id, f'benchmark_{label}')
+            versions[label] = version_id
+        db.import_from_dataframe(personale, strutture)
+
+    employees_df = None
+
+    def match_setup(i: int) -> pd.DataFrame:
+        nonlocal employees_df
+        if employees_df is None:
+            employees_df = pd.read_sql_query("SELECT * FROM employees", db.get_connection())
+        return employees_df
+
+    review = salary_review(dataset, seed=dataset.seed)
+    orgchart = OrgChartDataService()
+
+    def tree_case(builder: str) -> BenchmarkCase:
+        return BenchmarkCase(
+            name=f'tree.{builder}',
+            setup=lambda i: orgchart.clear_cache(),
+            run=lambda state: getattr(orgchart, builder)(),
+            rows=len(dataset.db_org),
+        )
+
+    cases = [
+        BenchmarkCase(
+            'import_from_dataframe',
+            run=lambda state: db.import_from_dataframe(personale, strutture),
+            rows=len(personale) + len(strutture),
+        ),
+        BenchmarkCase(
+            'db_org_import',
+            setup=db_org_setup,
+            run=db_org_run,
+            rows=len(dataset.db_org),
+        ),
+        BenchmarkCase(
+            'file_differ.compare_full_files',
+            run=lambda state: FileDiffer.compare_full_files(personale, strutture, personale_new, strutture_new),
+            rows=len(personale) + len(strutture),
+        ),
+        BenchmarkCase(
+            'merge.match_records',
+            setup=match_setup,
+            run=lambda employees: MergeEngine(db).match_records(
+                review, employees, key_column='tx_cod_fiscale', import_type=ImportType.SALARY_REVIEW
+            ),
+            rows=len(review),
+        ),
+        BenchmarkCase(
+            'version.create_snapshot',
+            run=lambda state: vm.create_snapshot(0, 'benchmark'),
+            rows=len(personale) + len(strutture),
+        ),
+        BenchmarkCase(
+            'version.compare_versions',
+            setup=snapshot_versions,
+            run=lambda state: vm.compare_versions(versions['base'], versions['new']),
+            rows=len(personale) + len(strutture),
+        ),
+        *[tree_case(builder) for builder in TREE_BUILDERS],
+        BenchmarkCase(
+            'validate.personale',
+            run=lambda state: DataValidator.validate_personale(personale),
+            rows=len(personale),
+        ),
+        BenchmarkCase(
+            'validate.strutture',
+            run=lambda state: DataValidator.validate_strutture(strutture),
+            rows=len(strutture),
+        ),
+        BenchmarkCase(
+            'validate.parallel_personale',
+            run=lambda state: DataValidator.validate_parallel(personale, 'personale', max_workers=workers),
+            rows=len(personale),
+        ),
+    ]
+    return cases
+
+
+def run_scale(scale: int, args) -> Dict[str, Any]:
+    """Genera il dataset, prepara i database temporanei ed esegue i casi."""
+    from services.database import DatabaseHandler
+    from services.db_org_import_service import DBOrgImportService
+    from services.tabular_io import write_table
+
+    started = time.perf_counter()
+    dataset = generate_dataset(scale, seed=args.seed)
+    _progress(f"📊 Dataset {dataset.summary()} in {time.perf_counter() - started:.1f}s")
+
+    workdir = Path(tempfile.mkdtemp(prefix=f'hr_bench_{scale}_'))
+    config.DB_PATH = workdir / 'app.db'
+    config.SNAPSHOTS_DIR = workdir / 'snapshots'
+    config.EXCEL_CACHE_DIR = workdir / 'cache'
+
+    results: Dict[str, Any] = {}
+    try:
+        template = workdir / 'template.db'
+        with _quiet(args.verbose):
+            _prepare_template(template)
+            shutil.copyfile(template, config.DB_PATH)
+
+            # CSV: misura il servizio, non il parsing openpyxl (coperto dalla cache Excel)
+            db_org_path = workdir / 'db_org.csv'
+            write_table(dataset.db_org, db_org_path, 'csv')
+
+            # Stato di partenza: legacy (import TNS) + DB_ORG + retribuzioni
+            db = DatabaseHandler(config.DB_PATH)
+            db.import_from_dataframe(dataset.personale, dataset.strutture)
+            db.close()
+            DBOrgImportService(db_path=config.DB_PATH).import_db_org_file(db_org_path)
+            _load_salaries(config.DB_PATH, dataset.salaries)
+
+        for case in build_cases(dataset, workdir, template, db_org_path, args.workers):
+            if args.only and not any(token in case.name for token in args.only):
+                continue
+            _progress(f"▶️ {scale}: {case.name}")
+            try:
+                results[case.name] = _time_case(case, args.repeats, args.verbose)
+                _progress(f"   median {results[case.name]['median_s']:.3f}s")
+            except Exception as e:
+                results[case.name] = {'error': f"{type(e).__name__}: {e}"}
+                _progress(f"❌ {case.name}: {e}")
+                if args.verbose:
+                    traceback.print_exc(file=sys.stderr)
+    finally:
+        # Connessioni thread-local e singleton legati al DB temporaneo
+        from services.orgchart_data_service import OrgChartDataService
+        OrgChartDataService._instance = None
+        if args.keep_workdir:
+            _progress(f"📁 Workdir: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {'dataset': dataset.summary(), 'results': results}
+
+
+def compare_with_baseline(current: Dict[str, Any], baseline: Dict[str, Any],
+                          threshold: float, min_delta: float) -> List[Dict[str, Any]]:
+    """
+    Confronta le mediane per (scala, caso) presenti in entrambi i risultati.
+
+    Returns:
+        Lista di confronti; 'regression' True se la mediana è peggiorata di
+        oltre threshold (relativa) e min_delta secondi (rumore di misura)
+    """
+    comparisons = []
+    for scale, scale_data in current['scales'].items():
+        base_results = baseline.get('scales', {}).get(scale, {}).get('results', {})
+        for name, stats in scale_data['results'].items():
+            base = base_results.get(name)
+            if not base or 'median_s' not in base or 'median_s' not in stats:
+                continue
+            delta = stats['median_s'] - base['median_s']
+            ratio = stats['median_s'] / base['median_s'] if base['median_s'] > 0 else None
+            comparisons.append({
+                'scale': scale,
+                'case': name,
+                'baseline_s': base['median_s'],
+                'current_s': stats['median_s'],
+                'ratio': round(ratio, 3) if ratio is not None else None,
+                'regression': ratio is not None and ratio > 1 + threshold and delta > min_delta,
+            })
+    return comparisons
+
+
+def _print_report(report: Dict[str, Any]):
+    for scale, scale_data in report['scales'].items():
+        print(f"\n📊 Scala {scale} ({scale_data['dataset']['strutture']} strutture, "
+              f"profondità {scale_data['dataset']['max_depth']})")
+        for name, stats in scale_data['results'].items():
+            if 'error' in stats:
+                print(f"  ❌ {name:<36} {stats['error']}")
+            else:
+                print(f"  {name:<38} median {stats['median_s']:>9.4f}s  min {stats['min_s']:>9.4f}s  "
+                      f"{stats['rows_per_s'] or 0:>12,.0f} righe/s")
+
+    comparisons = report.get('baseline_comparison')
+    if comparisons is not None:
+        regressions = [c for c in comparisons if c['regression']]
+        print(f"\n🔍 Baseline {report['baseline']}: {len(comparisons)} casi confrontati, "
+              f"{len(regressions)} regressioni")
+        for c in regressions:
+            print(f"  ⚠️ {c['scale']} {c['case']}: {c['baseline_s']:.4f}s → {c['current_s']:.4f}s (x{c['ratio']})")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark percorsi critici su dati sintetici")
+    parser.add_argument('--scales', type=int, nargs='+', default=config.BENCHMARK_SCALES,
+                        help="Numero di dipendenti per dataset")
+    parser.add_argument('--repeats', type=int, default=config.BENCHMARK_REPEATS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='+', help="Esegue solo i casi il cui nome contiene uno dei testi")
+    parser.add_argument('--workers', type=int, help="Processi per validate_parallel (default: config)")
+    parser.add_argument('--output', help="File JSON risultati (default: config.BENCHMARK_DIR/benchmark_<timestamp>.json)")
+    parser.add_argument('--baseline', help="JSON di un run precedente da confrontare")
+    parser.add_argument('--threshold', type=float, default=config.BENCHMARK_REGRESSION_THRESHOLD,
+                        help="Peggioramento relativo della mediana considerato regressione")
+    parser.add_argument('--keep-workdir', action='store_true', help="Non cancella DB e snapshot temporanei")
+    parser.add_argument('--verbose', action='store_true', help="Mostra i log dei servizi (su stderr)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    # I path vengono ridiretti su directory temporanee per ogni scala
+    output = Path(args.output) if args.output else (
+        config.BENCHMARK_DIR / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    original_paths = (config.DB_PATH, config.SNAPSHOTS_DIR, config.EXCEL_CACHE_DIR)
+
+    report: Dict[str, Any] = {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'repeats': args.repeats,
+        },
+        'scales': {}
+    }
+    try:
+        for scale in args.scales:
+            report['scales'][str(scale)] = run_scale(scale, args)
+    finally:
+        config.DB_PATH, config.SNAPSHOTS_DIR, config.EXCEL_CACHE_DIR = original_paths
+
+    exit_code = EXIT_OK
+    if any('error' in stats for s in report['scales'].values() for stats in s['results'].values()):
+        exit_code = EXIT_FAILED
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['baseline'] = args.baseline
+        report['baseline_comparison'] = compare_with_baseline(
+            report, baseline, args.threshold, config.BENCHMARK_MIN_DELTA_S
+        )
+        if exit_code == EXIT_OK and any(c['regression'] for c in report['baseline_comparison']):
+            exit_code = EXIT_REGRESSION
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+    _print_report(report)
+    print(f"\n✅ Risultati salvati: {output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,478 @@
+"""
+Generatore di dati sintetici per benchmark e prove di carico
+
+Con lo stesso seed produce sempre lo stesso dataset:
+- TNS Personale / TNS Strutture (colonne config.EXCEL_COLUMNS)
+- foglio DB_ORG (nomi colonna di DBOrgImportService)
+- record retributivi mensili (tabella salary_records)
+
+La struttura è un albero profondo (il padre dell'unità i è scelto tra le
+unità [i/2, i): ~35 livelli a 100k dipendenti), i ruoli TNS hanno frequenze
+realistiche (Viaggiatore diffuso, Approvatore sui responsabili, Cassiere
+raro) e una piccola quota di righe Personale non supera la validazione.
+
+Usage:
+    python benchmarks/synthetic_data.py --scale 10000 --output data/input/synthetic
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import config
+
+# Una struttura ogni UNITS_PER_EMPLOYEE dipendenti
+UNITS_PER_EMPLOYEE = 1 / 8
+
+COGNOMI = [
+    'Rossi', 'Russo', 'Ferrari', 'Esposito', 'Bianchi', 'Romano', 'Colombo', 'Ricci',
+    'Marino', 'Greco', 'Bruno', 'Gallo', 'Conti', 'De Luca', 'Mancini', 'Costa',
+    'Giordano', 'Rizzo', 'Lombardi', 'Moretti', 'Barbieri', 'Fontana', 'Santoro',
+    'Mariani', 'Rinaldi', 'Caruso', 'Ferrara', 'Galli', 'Martini', 'Leone'
+]
+NOMI_M = ['Marco', 'Luca', 'Andrea', 'Giuseppe', 'Francesco', 'Alessandro', 'Matteo',
+          'Lorenzo', 'Davide', 'Stefano', 'Paolo', 'Roberto', 'Simone', 'Federico']
+NOMI_F = ['Giulia', 'Francesca', 'Chiara', 'Sara', 'Valentina', 'Laura', 'Elena',
+          'Silvia', 'Alessandra', 'Martina', 'Federica', 'Paola', 'Serena', 'Cinzia']
+
+SOCIETA = ['Il Sole 24 Ore S.p.A.', '24 Ore Cultura S.r.l.', 'Il Sole 24 Ore Eventi S.r.l.',
+           'Il Sole 24 Ore Formazione S.p.A.']
+AREE = ['Corporate', 'Editoriale', 'Digital', 'Amministrazione Finanza e Controllo',
+        'Risorse Umane', 'Sistemi Informativi', 'Commerciale', 'Marketing', 'Radio 24', 'Eventi']
+TIPI_UNITA = ['Direzione', 'Servizio', 'Ufficio', 'Redazione', 'Team']
+SEDI = ['Milano', 'Roma', 'Torino', 'Genova', 'Londra', 'Domicilio del collaboratore']
+SEDI_PESI = [0.62, 0.22, 0.06, 0.04, 0.01, 0.05]
+GRUPPI_SIND = ['SLC-CGIL', 'FISTEL-CISL', 'UILCOM', 'FNSI', None]
+
+# qualifica: (frequenza, contratto, livello, RAL mediana)
+QUALIFICHE = {
+    'Impiegato': (0.55, '21_IND.GRAFICI EDIT.090 G011', 'IMPIEGATO', 36000),
+    'Giornalista': (0.25, '50_GIORNALISTI FNSI', 'REDATTORE', 55000),
+    'Quadro': (0.10, '21_IND.GRAFICI EDIT.090 G011', 'QUADRO', 65000),
+    'Dirigente': (0.03, '90_DIR.INDUSTRIA    063 V012', 'DIRIGENTE INDUSTRIA', 140000),
+    'Collaboratore': (0.07, '83_COLLABORAT./SOCI CD', 'COLLABORATORE', 22000),
+}
+
+# Frequenza dei ruoli TNS (gli Approvatore includono sempre i responsabili)
+ROLE_RATES = {
+    'Viaggiatore': 0.60,
+    'Approvatore': 0.02,
+    'Controllore': 0.02,
+    'Cassiere': 0.01,
+    'Segretario': 0.03,
+    'Visualizzatori': 0.04,
+    'Amministrazione': 0.02,
+    'RuoliAFC': 0.01,
+    'RuoliHR': 0.01,
+}
+
+# Mesi e caratteri di controllo del codice fiscale
+_CF_MESI = 'ABCDEHLMPRST'
+_CF_LETTERE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+DB_ORG_SHEET = 'DB_ORG'
+
+
+@dataclass
+class SyntheticDataset:
+    """Dataset sintetico coerente tra formato TNS, DB_ORG e retribuzioni."""
+    scale: int
+    seed: int
+    personale: pd.DataFrame
+    strutture: pd.DataFrame
+    db_org: pd.DataFrame
+    salaries: pd.DataFrame
+    max_depth: int
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'scale': self.scale,
+            'seed': self.seed,
+            'personale': len(self.personale),
+            'strutture': len(self.strutture),
+            'db_org': len(self.db_org),
+            'salary_records': len(self.salaries),
+            'max_depth': self.max_depth,
+        }
+
+
+def _cf_prefix(text: str) -> str:
+    """Tre lettere dal cognome/nome (consonanti, poi vocali, poi X)."""
+    letters = [c for c in text.upper() if c.isalpha()]
+    consonants = [c for c in letters if c not in 'AEIOU']
+    vowels = [c for c in letters if c in 'AEIOU']
+    return ''.join(consonants + vowels + ['X', 'X', 'X'])[:3]
+
+
+def _codici_fiscali(rng: np.random.Generator, cognomi: List[str], nomi: List[str]) -> List[str]:
+    """
+    Codici fiscali a 16 caratteri nel formato reale, unici: le 7 cifre
+    (anno, giorno, comune) codificano la posizione della riga.
+    """
+    n = len(cognomi)
+    mesi = rng.integers(0, len(_CF_MESI), n)
+    comuni = rng.integers(0, len(_CF_LETTERE), n)
+    controllo = rng.integers(0, len(_CF_LETTERE), n)
+    return [
+        f"{_cf_prefix(cognomi[i])}{_cf_prefix(nomi[i])}"
+        f"{(i // 100000) % 100:02d}{_CF_MESI[mesi[i]]}{(i // 1000) % 100:02d}"
+        f"{_CF_LETTERE[comuni[i]]}{i % 1000:03d}{_CF_LETTERE[controllo[i]]}"
+        for i in range(n)
+    ]
+
+
+def _random_dates(rng: np.random.Generator, n: int, start: str, end: str) -> np.ndarray:
+    """Date casuali 'YYYY-MM-DD' tra start ed end."""
+    first = np.datetime64(start, 'D').astype(np.int64)
+    last = np.datetime64(end, 'D').astype(np.int64)
+    days = rng.integers(first, last, n)
+    return days.astype('datetime64[D]').astype(str)
+
+
+def _build_tree(rng: np.random.Generator, n_units: int):
+    """
+    Albero delle strutture: padre, profondità e ramo di primo livello
+    (la radice è l'unità 0; i padri hanno sempre indice minore).
+    """
+    idx = np.arange(n_units)
+    low = idx // 2
+    parent = np.full(n_units, -1)
+    parent[1:] = low[1:] + (rng.random(n_units - 1) * (idx[1:] - low[1:])).astype(int)
+
+    depth = np.zeros(n_units, dtype=int)
+    branch = np.zeros(n_units, dtype=int)
+    for i in range(1, n_units):
+        p = parent[i]
+        depth[i] = depth[p] + 1
+        branch[i] = i if p == 0 else branch[p]
+    return parent, depth, branch
+
+
+def _managers(unit_of: np.ndarray, parent: np.ndarray) -> np.ndarray:
+    """
+    Responsabile diretto di ogni dipendente (indice, -1 per il vertice):
+    il primo dipendente di ogni unità la guida; le unità senza personale
+    ereditano il responsabile dell'unità padre.
+    """
+    n_units = len(parent)
+    head = np.full(n_units, -1)
+    units, first = np.unique(unit_of, return_index=True)
+    head[units] = first
+
+    effective = head.copy()
+    for i in range(1, n_units):
+        if effective[i] < 0:
+            effective[i] = effective[parent[i]]
+
+    parent_head = np.where(parent >= 0, effective[np.maximum(parent, 0)], -1)
+    boss = effective[unit_of]
+    is_head = boss == np.arange(len(unit_of))
+    boss[is_head] = parent_head[unit_of[is_head]]
+    return boss
+
+
+def generate_dataset(
+    scale: int,
+    seed: int = 42,
+    salary_months: int = 3,
+    invalid_rate: float = 0.005
+) -> SyntheticDataset:
+    """
+    Genera un dataset sintetico con `scale` dipendenti.
+
+    Args:
+        scale: Numero di dipendenti (righe TNS Personale)
+        seed: Seed del generatore (stesso seed → stesso dataset)
+        salary_months: Mesi di retribuzione per dipendente
+        invalid_rate: Quota di righe Personale con codice fiscale non valido
+
+    Returns:
+        SyntheticDataset
+    """
+    rng = np.random.default_rng(seed)
+    n = scale
+    n_units = max(10, int(scale * UNITS_PER_EMPLOYEE))
+
+    # === STRUTTURE ===
+    parent, depth, branch = _build_tree(rng, n_units)
+    unit_codes = np.array([f"U{i:06d}" for i in range(n_units)])
+    unit_area = np.array(AREE)[branch % len(AREE)]
+    unit_area[0] = 'Gruppo Il Sole 24 Ore'
+    unit_type = np.array(TIPI_UNITA)[np.minimum(depth, len(TIPI_UNITA) - 1)]
+    unit_descr = np.array([f"{unit_type[i]} {unit_area[i]} {i}" for i in range(n_units)])
+    unit_cdc = np.array([f"{11000 + (b % 90) * 100 + i % 100}" for i, b in enumerate(branch)])
+    unit_company = np.array(SOCIETA)[np.minimum(branch % 7, len(SOCIETA) - 1)]
+
+    # === DIPENDENTI ===
+    unit_of = rng.integers(0, n_units, n)
+    unit_of[0] = 0  # il vertice guida la radice
+    boss = _managers(unit_of, parent)
+
+    sesso = np.where(rng.random(n) < 0.45, 'F', 'M')
+    cognomi = [COGNOMI[i] for i in rng.integers(0, len(COGNOMI), n)]
+    nomi_m = rng.integers(0, len(NOMI_M), n)
+    nomi_f = rng.integers(0, len(NOMI_F), n)
+    nomi = [NOMI_F[nomi_f[i]] if sesso[i] == 'F' else NOMI_M[nomi_m[i]] for i in range(n)]
+    cf = np.array(_codici_fiscali(rng, cognomi, nomi))
+    titolare = np.array([f"{c} {nm}" for c, nm in zip(cognomi, nomi)])
+
+    qual_names = list(QUALIFICHE)
+    qual_idx = rng.choice(len(qual_names), n, p=[q[0] for q in QUALIFICHE.values()])
+    qualifica = np.array(qual_names)[qual_idx]
+    contratto = np.array([q[1] for q in QUALIFICHE.values()])[qual_idx]
+    livello = np.array([q[2] for q in QUALIFICHE.values()])[qual_idx]
+    ral_median = np.array([q[3] for q in QUALIFICHE.values()])[qual_idx]
+    ral = np.round(ral_median * rng.lognormal(0.0, 0.2, n), -2)
+
+    is_head = np.zeros(n, dtype=bool)
+    is_head[np.unique(unit_of, return_index=True)[1]] = True
+
+    roles = {}
+    for role, rate in ROLE_RATES.items():
+        flag = rng.random(n) < rate
+        if role == 'Approvatore':
+            flag |= is_head
+        roles[role] = np.where(flag, 'SI', None)
+
+    sede = rng.choice(SEDI, n, p=SEDI_PESI)
+    gruppo_sind = np.array(GRUPPI_SIND, dtype=object)[rng.integers(0, len(GRUPPI_SIND), n)]
+    data_nascita = _random_dates(rng, n, '1960-01-01', '2001-12-31')
+    data_assunzione = _random_dates(rng, n, '1990-01-01', '2025-12-31')
+    data_cessazione = np.where(rng.random(n) < 0.03, _random_dates(rng, n, '2026-01-01', '2026-12-31'), None)
+    boss_cf = np.where(boss >= 0, cf[np.maximum(boss, 0)], None)
+    positions = np.array([f"P{i:07d}" for i in range(n)])
+
+    # === TNS ===
+    personale = pd.DataFrame({col: None for col in config.EXCEL_COLUMNS}, index=range(n))
+    personale['Unità Organizzativa'] = unit_area[unit_of]
+    personale['CDCCOSTO'] = unit_cdc[unit_of]
+    personale['TxCodFiscale'] = cf
+    personale['DESCRIZIONE'] = unit_descr[unit_of]
+    personale['Titolare'] = titolare
+    personale['LIVELLO'] = livello
+    personale['Codice'] = positions
+    personale[config.PARENT_FIELD] = unit_codes[unit_of]
+    personale['RUOLI'] = np.where(is_head, 'Responsabile', None)
+    for role, flags in roles.items():
+        personale[role] = flags
+    personale['Sede_TNS'] = sede
+    personale['GruppoSind'] = gruppo_sind
+
+    invalid = rng.random(n) < invalid_rate
+    personale.loc[invalid, 'TxCodFiscale'] = [f"{c[:8]}-{c[8:14]}" for c in cf[invalid]]
+
+    head_name = np.full(n_units, None, dtype=object)
+    head_name[unit_of[is_head]] = titolare[is_head]
+    strutture = pd.DataFrame({col: None for col in config.EXCEL_COLUMNS}, index=range(n_units))
+    strutture['Unità Organizzativa'] = unit_area
+    strutture['CDCCOSTO'] = unit_cdc
+    strutture['DESCRIZIONE'] = unit_descr
+    strutture['Titolare'] = head_name
+    strutture['LIVELLO'] = depth.astype(str)
+    strutture['Codice'] = unit_codes
+    strutture[config.PARENT_FIELD] = np.where(parent >= 0, unit_codes[np.maximum(parent, 0)], None)
+
+    # === DB_ORG: una riga per struttura (posizione vacante) e per dipendente ===
+    unit_rows = pd.DataFrame({
+        'SocietàOrg': unit_company,
+        'Unità Organizzativa': unit_area,
+        'Unità Organizzativa 2': unit_descr,
+        'CdC': unit_cdc,
+        'Società': unit_company,
+        'ID': unit_codes,
+        'ReportsTo': strutture[config.PARENT_FIELD].to_numpy(),
+        'FTE': 0.0,
+    })
+    employee_rows = pd.DataFrame({
+        'SocietàOrg': unit_company[unit_of],
+        'Unità Organizzativa': unit_area[unit_of],
+        'Unità Organizzativa 2': unit_descr[unit_of],
+        'CdC': unit_cdc[unit_of],
+        'Titolare': titolare,
+        'Sede': sede,
+        'Tipo Collaborazione': np.where(qualifica == 'Collaboratore', 'Collaborazione', 'Dipendente'),
+        'FTE': np.where(rng.random(n) < 0.1, 0.5, 1.0),
+        'ID': [f"{c}_ID" for c in cf],
+        'ReportsTo': unit_codes[unit_of],
+        'TxCodFiscale': cf,
+        'Cognome': cognomi,
+        'Nome': nomi,
+        'Società': unit_company[unit_of],
+        'Area': unit_area[unit_of],
+        'SottoArea': unit_descr[unit_of],
+        'Data Assunzione': data_assunzione,
+        'Data Cessazione': data_cessazione,
+        'Sesso': sesso,
+        'Contratto': contratto,
+        'Qualifica': qualifica,
+        'Livello': livello,
+        'RAL': ral,
+        'Data Nascita': data_nascita,
+        'Email': [f"{nm}.{c}{i}@example.it".lower().replace(' ', '') for i, (c, nm) in enumerate(zip(cognomi, nomi))],
+        'Matricola': [f"{i + 1:07d}" for i in range(n)],
+        **roles,
+        'Sede_TNS': sede,
+        'GruppoSind': gruppo_sind,
+        'Codice TNS': cf,
+        'Padre TNS': boss_cf,
+        'CF Responsabile Diretto': boss_cf,
+    })
+    db_org = pd.concat([unit_rows, employee_rows], ignore_index=True)
+
+    # === RETRIBUZIONI: una riga per dipendente e mese (14 mensilità) ===
+    months = pd.period_range(end=pd.Period('2026-01', 'M'), periods=salary_months, freq='M')
+    salary_frames = []
+    for k, month in enumerate(months):
+        month_ral = ral * (1 + 0.02 * (rng.random(n) < 0.1) * (k == len(months) - 1))
+        part_time = np.where(employee_rows['FTE'].to_numpy() < 1, 50.0, 100.0)
+        salary_frames.append(pd.DataFrame({
+            'tx_cod_fiscale': cf,
+            'periodo_mese': str(month),
+            'periodo_date': month.to_timestamp().strftime('%Y-%m-%d'),
+            'ral': month_ral,
+            'monthly_gross': np.round(month_ral / 14 * part_time / 100, 2),
+            'part_time_percentage': part_time,
+            'area': unit_area[unit_of],
+            'sottoarea': unit_descr[unit_of],
+            'cdc': unit_cdc[unit_of],
+            'contratto': contratto,
+            'qualifica': qualifica,
+        }))
+    salaries = pd.concat(salary_frames, ignore_index=True)
+
+    return SyntheticDataset(
+        scale=scale,
+        seed=seed,
+        personale=personale,
+        strutture=strutture,
+        db_org=db_org,
+        salaries=salaries,
+        max_depth=int(depth.max()),
+    )
+
+
+def perturb_tns(
+    personale: pd.DataFrame,
+    strutture: pd.DataFrame,
+    rate: float = 0.05,
+    seed: int = 42
+):
+    """
+    Nuova "versione" del file TNS: modifica Titolare/sede/ruoli su una quota
+    `rate` dei dipendenti, ne rimuove rate/2 e ne aggiunge rate/2; sposta
+    rate/10 strutture sotto un altro padre.
+
+    Returns:
+        Tuple (personale, strutture)
+    """
+    rng = np.random.default_rng(seed + 1)
+    personale = personale.copy()
+    strutture = strutture.copy()
+    n = len(personale)
+
+    changed = rng.random(n) < rate
+    personale.loc[changed, 'Sede_TNS'] = rng.choice(SEDI, int(changed.sum()))
+    personale.loc[changed, 'Approvatore'] = np.where(personale.loc[changed, 'Approvatore'].isna(), 'SI', None)
+    personale.loc[changed, 'Titolare'] = personale.loc[changed, 'Titolare'] + ' (mod)'
+
+    removed = rng.random(n) < rate / 2
+    added = personale[rng.random(n) < rate / 2].copy()
+    added['TxCodFiscale'] = [f"NEW{i:013d}" for i in range(len(added))]
+    added['Codice'] = [f"N{i:07d}" for i in range(len(added))]
+    personale = pd.concat([personale[~removed], added], ignore_index=True)
+
+    # Solo spostamenti verso unità con indice minore: l'albero resta aciclico
+    moved = np.flatnonzero(rng.random(len(strutture)) < rate / 10)
+    moved = moved[moved > 1]
+    new_parent = (rng.random(len(moved)) * (moved // 2)).astype(int)
+    strutture.loc[moved, config.PARENT_FIELD] = strutture['Codice'].to_numpy()[new_parent]
+
+    return personale, strutture
+
+
+def salary_review(dataset: SyntheticDataset, rate: float = 0.2, seed: int = 42) -> pd.DataFrame:
+    """
+    File di salary review per MergeEngine (chiave tx_cod_fiscale): aumenti su
+    una quota `rate`, qualche CF assente dal DB (nuovi) e mancante (gap).
+    """
+    rng = np.random.default_rng(seed + 2)
+    latest = dataset.salaries.drop_duplicates('tx_cod_fiscale', keep='last')
+    review = latest[['tx_cod_fiscale', 'ral', 'qualifica', 'contratto']].copy()
+    raised = rng.random(len(review)) < rate
+    review.loc[raised, 'ral'] = np.round(review.loc[raised, 'ral'] * 1.03, -2)
+    review = review[rng.random(len(review)) >= 0.01]
+    extra = review.head(max(1, len(review) // 100)).copy()
+    extra['tx_cod_fiscale'] = [f"REV{i:013d}" for i in range(len(extra))]
+    return pd.concat([review, extra], ignore_index=True)
+
+
+def write_dataset(dataset: SyntheticDataset, output_dir: Path, fmt: str = 'xlsx') -> Dict[str, Path]:
+    """
+    Scrive il dataset come file importabili dall'app.
+
+    Args:
+        dataset: Dataset generato
+        output_dir: Directory di destinazione
+        fmt: 'xlsx' (workbook TNS a due fogli + DB_ORG), 'csv' o 'parquet'
+             (un file per tabella)
+
+    Returns:
+        Dict nome → path scritto
+    """
+    from services.tabular_io import write_table
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"synthetic_{dataset.scale}_s{dataset.seed}"
+    paths = {}
+
+    if fmt == 'xlsx':
+        paths['tns'] = output_dir / f"{stem}_TNS.xlsx"
+        with pd.ExcelWriter(paths['tns'], engine='openpyxl') as writer:
+            dataset.personale.to_excel(writer, sheet_name=config.SHEET_PERSONALE, index=False)
+            dataset.strutture.to_excel(writer, sheet_name=config.SHEET_STRUTTURE, index=False)
+        paths['db_org'] = output_dir / f"{stem}_DB_ORG.xlsx"
+        dataset.db_org.to_excel(paths['db_org'], sheet_name=DB_ORG_SHEET, index=False)
+        tables = {'salaries': dataset.salaries}
+        table_fmt = 'csv'
+    else:
+        tables = {
+            'personale': dataset.personale,
+            'strutture': dataset.strutture,
+            'db_org': dataset.db_org,
+            'salaries': dataset.salaries,
+        }
+        table_fmt = fmt
+
+    for name, df in tables.items():
+        paths[name] = output_dir / f"{stem}_{name}.{table_fmt}"
+        write_table(df, paths[name], table_fmt)
+
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera dati sintetici TNS/DB_ORG/retribuzioni")
+    parser.add_argument('--scale', type=int, default=1000, help="Numero di dipendenti")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--salary-months', type=int, default=3)
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default='xlsx')
+    parser.add_argument('--output', default=str(config.INPUT_DIR / 'synthetic'))
+    args = parser.parse_args(argv)
+
+    dataset = generate_dataset(args.scale, args.seed, args.salary_months)
+    print(f"📊 {dataset.summary()}")
+    for name, path in write_dataset(dataset, Path(args.output), args.format).items():
+        print(f"✅ {name}: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+HR Management Platform - Command line (senza Streamlit)
+
+Esegue import, export, confronto file, snapshot e verifica di consistenza
+dagli stessi servizi usati dall'app, per job schedulati (es. sync notturno).
+
+Usage:
+    python cli.py import DB_ORG_1.xlsx DB_ORG_2.xlsx --workers 4
+    python cli.py export --format parquet --output data/output/nightly
+    python cli.py diff TNS_base.xls TNS_new_1.xls TNS_new_2.xls --report-dir data/output
+    python cli.py snapshot create --note "Pre-sync notturno"
+    python cli.py snapshot list
+    python cli.py snapshot restore data/snapshots/snapshot_12_....json
+    python cli.py --db /backup/app.db snapshot list   # snapshot in /backup/snapshots
+    python cli.py sync TNS_1.xls TNS_2.xls --strict
+    python cli.py --json sync TNS.xls         # riepilogo JSON su stdout
+
+L'avanzamento e i log dei servizi vanno su stderr; stdout contiene solo il
+riepilogo (testo o JSON con --json), così l'output è utilizzabile da script.
+
+Exit code:
+    0  completato
+    1  almeno un'operazione fallita
+    2  argomenti non validi
+    3  differenze/incoerenze trovate (solo con --strict)
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).parent
+sys.path.insert(0, str(BASE_DIR))
+
+import config
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_CHANGES = 3
+
+
+def _progress(message: str):
+    """Riga di avanzamento su stderr (subito visibile anche se rediretto)."""
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+def _init_worker(db_path: str):
+    """Processo worker: stesso DB del padre e log dei servizi su stderr."""
+    config.DB_PATH = Path(db_path)
+    sys.stdout = sys.stderr
+
+
+def _run_parallel(
+    worker: Callable[..., Dict[str, Any]],
+    jobs: List[tuple],
+    workers: int,
+    label: Callable[[tuple], str],
+    file_of: Callable[[tuple], str] = lambda job: job[0]
+) -> List[Dict[str, Any]]:
+    """
+    Esegue worker(*job) per ogni job, in processi separati se workers > 1.
+
+    Args:
+        label: Descrizione del job per l'avanzamento
+        file_of: File di input del job (default: primo argomento)
+
+    Returns:
+        Risultati nell'ordine dei job; un'eccezione diventa
+        {'success': False, 'file': ..., 'error': ...}
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+
+    def failed(job: tuple, e: Exception) -> Dict[str, Any]:
+        return {'success': False, 'file': file_of(job), 'error': f"{type(e).__name__}: {e}"}
+
+    if workers <= 1 or len(jobs) <= 1:
+        for i, job in enumerate(jobs):
+            _progress(f"▶️ {label(job)}")
+            try:
+                results[i] = worker(*job)
+            except Exception as e:
+                results[i] = failed(job, e)
+            _progress(f"{'✅' if results[i].get('success') else '❌'} {label(job)}")
+        return results
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(jobs)),
+        initializer=_init_worker,
+        initargs=(str(config.DB_PATH),)
+    ) as pool:
+        futures = {pool.submit(worker, *job): i for i, job in enumerate(jobs)}
+        _progress(f"🚀 {len(jobs)} job su {min(workers, len(jobs))} processi")
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = failed(jobs[i], e)
+            _progress(f"{'✅' if results[i].get('success') else '❌'} [{done}/{len(jobs)}] {label(jobs[i])}")
+    return results
+
+
+# ==================== WORKER (top-level: eseguibili in altri processi) ====================
+
+def _prefetch_worker(path: str, sheet_name: str) -> Dict[str, Any]:
+    """Legge il file Excel (popolando la cache parsing su disco) e ne conta le righe."""
+    from services.db_org_import_service import DB_ORG_COLUMNS
+    from services.tabular_io import read_table
+
+    # Stesse colonne dell'import: stessa voce di cache
+    df = read_table(Path(path), sheet_name, usecols=DB_ORG_COLUMNS)
+    return {'success': True, 'file': path, 'rows': len(df), 'columns': len(df.columns)}
+
+
+def _diff_worker(base_path: str, new_path: str, report_dir: Optional[str]) -> Dict[str, Any]:
+    from services.excel_handler import ExcelHandler
+    from services.file_differ import FileDiffer
+
+    p_old, s_old, _ = ExcelHandler(Path(base_path)).load_data()
+    p_new, s_new, _ = ExcelHandler(Path(new_path)).load_data()
+    personale_diff, strutture_diff = FileDiffer.compare_full_files(p_old, s_old, p_new, s_new)
+
+    report_path = None
+    if report_dir and (personale_diff.has_changes() or strutture_diff.has_changes()):
+        report_path = str(Path(report_dir) / f"diff_{Path(new_path).stem}.xlsx")
+        FileDiffer.export_diff_report(personale_diff, strutture_diff, report_path)
+
+    def counts(diff) -> Dict[str, int]:
+        return {
+            'added': diff.added_count,
+            'deleted': diff.deleted_count,
+            'modified': diff.modified_count,
+            'unchanged': diff.unchanged_count
+        }
+
+    return {
+        'success': True,
+        'base': base_path,
+        'file': new_path,
+        'has_changes': personale_diff.has_changes() or strutture_diff.has_changes(),
+        'personale': counts(personale_diff),
+        'strutture': counts(strutture_diff),
+        'report': report_path
+    }
+
+
+def _sync_worker(path: str, sheet_name: str) -> Dict[str, Any]:
+    from services.database import DatabaseHandler
+    from services.sync_checker import SyncChecker
+
+    result = SyncChecker(DatabaseHandler()).check_consistency(path, sheet_name)
+    return {
+        'success': True,
+        'file': path,
+        'has_issues': result.has_issues,
+        'excel_rows': result.excel_row_count,
+        'db_rows': result.db_row_count,
+        'total_issues': result.total_issues,
+        'missing_in_db': result.missing_in_db_count,
+        'missing_in_excel': result.missing_in_excel_count,
+        'responsabile_issues': result.responsabile_issues_count,
+        'consistency_percentage': round(result.consistency_percentage, 2)
+    }
+
+
+# ==================== COMANDI ====================
+
+def cmd_import(args) -> Dict[str, Any]:
+    """
+    Import DB_ORG di uno o più file.
+
+    Con la cache parsing su disco attiva (config.EXCEL_CACHE_DISK) la
+    lettura dei file (la parte costosa per Excel) avviene in parallelo nei
+    processi worker; le scritture restano sequenziali perché SQLite ha un
+    solo writer alla volta.
+    """
+    from services.db_org_import_service import DBOrgImportService
+    from services.tabular_io import table_format
+
+    files = [str(Path(f)) for f in args.files]
+    excel_files = [f for f in files if table_format(f) == 'xlsx']
+    if config.EXCEL_CACHE_DISK and args.workers > 1 and len(excel_files) > 1:
+        _progress("📂 Lettura file Excel in parallelo...")
+        _run_parallel(_prefetch_worker, [(f, args.sheet) for f in excel_files], args.workers,
+                      label=lambda job: f"Lettura {Path(job[0]).name}")
+
+    service = DBOrgImportService(config.DB_PATH)
+    results = []
+    for i, path in enumerate(files, 1):
+        name = Path(path).name
+
+        def progress(fraction: float, message: str, name=name, i=i):
+            _progress(f"[{i}/{len(files)}] {name}: {fraction:.0%} {message}")
+
+        outcome = service.import_db_org_file(Path(path), args.sheet, args.note, progress_callback=progress)
+        outcome['file'] = path
+        results.append(outcome)
+        _progress(f"{'✅' if outcome['success'] else '❌'} {name}: {outcome['message']}")
+        if not outcome['success'] and args.stop_on_error:
+            break
+
+    return {'command': 'import', 'results': results, 'success': all(r['success'] for r in results)}
+
+
+def cmd_export(args) -> Dict[str, Any]:
+    from services.database import DatabaseHandler
+    from services.excel_handler import ExcelHandler
+
+    _progress(f"📤 Export dal database ({args.format})...")
+    output = Path(args.output) if args.output else None
+    path = ExcelHandler().export_from_database(
+        DatabaseHandler(),
+        include_db_tns=not args.no_db_tns,
+        output_path=output,
+        export_format=args.format
+    )
+    return {'command': 'export', 'success': True, 'path': str(path)}
+
+
+def cmd_diff(args) -> Dict[str, Any]:
+    jobs = [(str(Path(args.base)), str(Path(f)), args.report_dir) for f in args.files]
+    results = _run_parallel(_diff_worker, jobs, args.workers, label=lambda job: f"Confronto {Path(job[1]).name}",
+                            file_of=lambda job: job[1])
+    return {
+        'command': 'diff',
+        'results': results,
+        'success': all(r.get('success') for r in results),
+        'has_changes': any(r.get('has_changes') for r in results)
+    }
+
+
+def cmd_sync(args) -> Dict[str, Any]:
+    jobs = [(str(Path(f)), args.sheet) for f in args.files]
+    results = _run_parallel(_sync_worker, jobs, args.workers, label=lambda job: f"Verifica {Path(job[0]).name}")
+    return {
+        'command': 'sync',
+        'results': results,
+        'success': all(r.get('success') for r in results),
+        'has_changes': any(r.get('has_issues') for r in results)
+    }
+
+
+def cmd_snapshot(args) -> Dict[str, Any]:
+    from services.database import DatabaseHandler
+    from services.version_manager import VersionManager
+
+    # config.SNAPSHOTS_DIR segue --db / --snapshots-dir (vedi main)
+    vm = VersionManager(DatabaseHandler(), config.SNAPSHOTS_DIR)
+
+    if args.action == 'list':
+        snapshots = vm.list_snapshots()
+        return {'command': 'snapshot list', 'success': True, 'snapshots': snapshots}
+
+    if args.action == 'create':
+        _progress("📦 Creazione snapshot...")
+        path = vm.create_manual_snapshot(args.note, "CLI_SNAPSHOT")
+        return {'command': 'snapshot create', 'success': True, 'path': str(path)}
+
+    _progress(f"♻️ Ripristino da {args.path}...")
+    success, message = vm.restore_snapshot(args.path, create_backup=not args.no_backup)
+    return {'command': 'snapshot restore', 'success': success, 'message': message}
+
+
+# ==================== OUTPUT ====================
+
+def _print_summary(summary: Dict[str, Any]):
+    """Riepilogo leggibile su stdout."""
+    command = summary['command']
+    status = '✅' if summary['success'] else '❌'
+
+    if command == 'import':
+        for r in summary['results']:
+            mark = '✅' if r['success'] else '❌'
+            print(f"{mark} {r['file']}: {r.get('employees_imported', 0)} dipendenti, "
+                  f"{r.get('org_units_imported', 0)} strutture - {r['message']}")
+    elif command == 'diff':
+        for r in summary['results']:
+            if not r.get('success'):
+                print(f"❌ {r.get('file', '?')}: {r.get('error')}")
+                continue
+            p, s = r['personale'], r['strutture']
+            print(f"{'🔶' if r['has_changes'] else '✅'} {r['file']}: "
+                  f"Personale +{p['added']} -{p['deleted']} ~{p['modified']} | "
+                  f"Strutture +{s['added']} -{s['deleted']} ~{s['modified']}"
+                  + (f" → {r['report']}" if r.get('report') else ''))
+    elif command == 'sync':
+        for r in summary['results']:
+            if not r.get('success'):
+                print(f"❌ {r.get('file', '?')}: {r.get('error')}")
+                continue
+            print(f"{'🔶' if r['has_issues'] else '✅'} {r['file']}: {r['total_issues']} problemi, "
+                  f"consistenza {r['consistency_percentage']}%")
+    elif command == 'snapshot list':
+        for snap in summary['snapshots']:
+            print(f"#{snap['import_version_id']}\t{snap['timestamp']}\t{snap['source_filename']}\t{snap['file_path']}")
+    else:
+        print(f"{status} {summary.get('path') or summary.get('message', '')}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cli.py',
+        description="HR Management Platform: operazioni batch senza interfaccia web"
+    )
+    parser.add_argument('--json', action='store_true', help="Riepilogo JSON su stdout")
+    parser.add_argument('--db', help="Database SQLite (default: config.DB_PATH)")
+    parser.add_argument('--snapshots-dir', help="Directory snapshot (default: config.SNAPSHOTS_DIR, "
+                                                "con --db la cartella snapshots accanto al database)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    workers = dict(type=int, default=config.CLI_MAX_WORKERS, help="Processi paralleli per più file")
+
+    p = sub.add_parser('import', help="Import DB_ORG (Excel/CSV/Parquet)")
+    p.add_argument('files', nargs='+')
+    p.add_argument('--sheet', default='DB_ORG')
+    p.add_argument('--note', default=None, help="Nota versione import")
+    p.add_argument('--workers', **workers)
+    p.add_argument('--stop-on-error', action='store_true', help="Interrompe al primo file fallito")
+    p.set_defaults(handler=cmd_import)
+
+    p = sub.add_parser('export', help="Export dal database in streaming")
+    p.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default='xlsx')
+    p.add_argument('--output', default=None, help="Path output (default: data/output con timestamp)")
+    p.add_argument('--no-db-tns', action='store_true', help="Esclude il foglio DB_TNS")
+    p.set_defaults(handler=cmd_export)
+
+    p = sub.add_parser('diff', help="Confronta file TNS con un file base")
+    p.add_argument('base')
+    p.add_argument('files', nargs='+')
+    p.add_argument('--report-dir', default=None, help="Scrive un report Excel per ogni file con differenze")
+    p.add_argument('--workers', **workers)
+    p.add_argument('--strict', action='store_true', help="Exit code 3 se ci sono differenze")
+    p.set_defaults(handler=cmd_diff)
+
+    p = sub.add_parser('sync', help="Verifica consistenza DB / file Excel (SyncChecker)")
+    p.add_argument('files', nargs='+')
+    p.add_argument('--sheet', default=config.SHEET_PERSONALE)
+    p.add_argument('--workers', **workers)
+    p.add_argument('--strict', action='store_true', help="Exit code 3 se ci sono incoerenze")
+    p.set_defaults(handler=cmd_sync)
+
+    p = sub.add_parser('snapshot', help="Snapshot database")
+    snap = p.add_subparsers(dest='action', required=True)
+    s = snap.add_parser('create')
+    s.add_argument('--note', default=None)
+    snap.add_parser('list')
+    s = snap.add_parser('restore')
+    s.add_argument('path')
+    s.add_argument('--no-backup', action='store_true', help="Non crea il backup automatico prima del ripristino")
+    p.set_defaults(handler=cmd_snapshot)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.db:
+        config.DB_PATH = Path(args.db)
+        # Gli snapshot contengono version id del database: mai mescolarli tra DB diversi
+        config.SNAPSHOTS_DIR = config.DB_PATH.parent / 'snapshots'
+    if args.snapshots_dir:
+        config.SNAPSHOTS_DIR = Path(args.snapshots_dir)
+
+    started = time.monotonic()
+    try:
+        # I servizi stampano i propri log su stdout: qui vanno su stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = args.handler(args)
+    except Exception as e:
+        summary = {'command': args.command, 'success': False, 'error': f"{type(e).__name__}: {e}"}
+    summary['elapsed_seconds'] = round(time.monotonic() - started, 3)
+
+    if args.json:
+        print(json.dumps(summary, default=str, ensure_ascii=False, indent=2))
+    elif 'error' in summary:
+        print(f"❌ {summary['error']}")
+    else:
+        _print_summary(summary)
+
+    if not summary['success']:
+        return EXIT_FAILED
+    if getattr(args, 'strict', False) and summary.get('has_changes'):
+        return EXIT_CHANGES
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -88,6 +88,89 @@ def get_output_filename(prefix: str = "TNS_HR_Data") -> str:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return f"{prefix}_{timestamp}.xlsx"
 
+# Cache payload organigrammi (alberi + JSON serializzato)
+ORGCHART_CACHE_MAX_MB = 64
+
+# Caricamento progressivo organigrammi: oltre questa soglia di nodi
+# l'albero viene inviato al browser solo per i primi livelli
+ORGCHART_LAZY_THRESHOLD = 2000
+ORGCHART_LAZY_DEPTH = 3
+
+# Controlli qualità dashboard: conteggi salvati per versione dati in un
+# database di cache separato (scriverli non cambia la versione del DB
+# principale); oltre DATA_QUALITY_MAX_INCREMENTAL record modificati
+# (audit_log) si ricalcola tutto invece di aggiornare incrementalmente
+DATA_QUALITY_CACHE_PATH = DATA_DIR / "cache" / "data_quality.db"
+DATA_QUALITY_MAX_INCREMENTAL = 500
+
+# Validazione import grandi: oltre questa soglia di righe da validare con
+# Pydantic (scartate dalle regole per colonna) si usano più processi
+VALIDATION_PARALLEL_MIN_ROWS = 20000
+VALIDATION_CHUNK_ROWS = 5000
+VALIDATION_MAX_WORKERS = 4
+
+# Cache parsing Excel (frame letti indicizzati per hash del contenuto):
+# in memoria e, solo se EXCEL_CACHE_DISK, anche su disco in formato
+# colonnare. I file contengono dati personali non cifrati: la copia su
+# disco è disattivata di default ed è svuotata insieme al database
+EXCEL_CACHE_DISK = False
+EXCEL_CACHE_DIR = DATA_DIR / "cache" / "excel"
+EXCEL_CACHE_MAX_MB = 512
+EXCEL_CACHE_MEMORY_ITEMS = 8
+
+# Export Excel in streaming: righe lette/scritte per blocco
+EXPORT_CHUNK_ROWS = 5000
+
+# Formati di interscambio CSV/Parquet (services/tabular_io.py)
+CSV_CHUNK_ROWS = 50000
+CSV_SEPARATOR = ","
+CSV_ENCODING = "utf-8"
+
+# Applicazione diretta ChangeProposal su SQLite: chiavi per clausola IN
+# (sotto il limite di parametri delle versioni SQLite più vecchie)
+DB_KEY_CHUNK = 500
+
+# Applicazione merge/arricchimento: record per transazione (ogni blocco
+# confermato è registrato in merge_checkpoints per la ripresa)
+MERGE_CHUNK_SIZE = 1000
+
+# Job in background (services/job_runner.py, eseguiti uno alla volta): job
+# attivi massimi, risultati tenuti in memoria, intervallo minimo tra
+# scritture dell'avanzamento e intervallo di polling della UI (secondi)
+JOB_MAX_PENDING = 8
+JOB_MAX_RESULTS = 20
+JOB_PROGRESS_INTERVAL = 0.5
+JOB_POLL_SECONDS = 1.5
+
+# Command line (cli.py): processi paralleli per i comandi su più file
+CLI_MAX_WORKERS = 4
+
+# Benchmark (benchmarks/run_benchmarks.py): risultati JSON, scale e
+# ripetizioni di default; regressione se la mediana supera quella del
+# baseline di oltre la soglia relativa e di almeno BENCHMARK_MIN_DELTA_S
+BENCHMARK_DIR = DATA_DIR / "benchmarks"
+BENCHMARK_SCALES = [1000, 10000, 100000]
+BENCHMARK_REPEATS = 3
+BENCHMARK_REGRESSION_THRESHOLD = 0.20
+BENCHMARK_MIN_DELTA_S = 0.05
+
+# Strumentazione tempi (services/perf_trace.py): span e rerun tenuti in
+# memoria; la pagina "Performance" compare nel ribbon (Impostazioni) solo
+# con PERF_PANEL_VISIBLE o aprendo l'app con ?perf=1
+PERF_TRACE_ENABLED = True
+PERF_MAX_SPANS = 2000
+PERF_MAX_RERUNS = 200
+PERF_PANEL_VISIBLE = False
+
+# Query tracing SQLite (services/query_trace.py): statement oltre
+# SLOW_QUERY_MS registrate con EXPLAIN QUERY PLAN (tab "Query lente").
+# Disattivato di default: il wrapper rallenta fetch e lookup, da attivare
+# solo per le sessioni di profiling
+QUERY_TRACE_ENABLED = False
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG_MAX = 200
+QUERY_STATS_MAX_STATEMENTS = 500
+
 # Ollama Configuration (per bot conversazionale)
 OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "llama3"  # Alternative: "mistral", "phi3"
@@ -96,3 +179,5 @@ OLLAMA_TIMEOUT = 60  # seconds
 # Bot Configuration
 BOT_MAX_HISTORY = 20  # Max conversation turns
 BOT_MAX_BATCH_SIZE = 100  # Max record per batch operation
+BOT_FAST_PATH_ENABLED = True  # Grammatica deterministica prima del LLM (services/command_grammar.py)
+BOT_QUERY_MAX_RECORDS = 50  # Record mostrati nel risultato di una query
@@ -8,6 +8,7 @@ Available migrations:
 - 004: Multiple Hierarchies Support
 - 005: Role Management
 - 006: Salary Management
+- 008: Merge Checkpoints
 """
 
 # Import all migrations for easy access
@@ -17,6 +18,7 @@ from . import migration_003_normalize_db_org
 from . import migration_004_add_hierarchies
 from . import migration_005_add_roles
 from . import migration_006_add_salaries
+from . import migration_008_add_merge_checkpoints
 
 __all__ = [
     'migration_001_add_import_versioning',
@@ -25,4 +27,5 @@ __all__ = [
     'migration_004_add_hierarchies',
     'migration_005_add_roles',
     'migration_006_add_salaries',
+    'migration_008_add_merge_checkpoints',
 ]
@@ -0,0 +1,108 @@
+"""
+Migration 008: Add Merge Checkpoints
+
+Tabella merge_checkpoints per l'applicazione a blocchi di
+MergeEngine.apply_merge: ogni blocco confermato registra una riga nella
+propria transazione, così un merge interrotto riprende dal primo blocco
+mancante. Le righe di un merge vengono eliminate quando si completa.
+
+Tables created:
+- merge_checkpoints: Blocchi confermati per merge_id
+"""
+import sqlite3
+from pathlib import Path
+
+
+def check_table_exists(cursor: sqlite3.Cursor, table_name: str) -> bool:
+    """Check if table exists in database"""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+        (table_name,)
+    )
+    return cursor.fetchone() is not None
+
+
+def migrate(db_path: Path) -> bool:
+    """
+    Apply migration 008 to database.
+
+    Args:
+        db_path: Path to SQLite database
+
+    Returns:
+        True if migration successful (or already applied), False on error
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        print(f"⚠️ Database not found: {db_path}")
+        return False
+
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    try:
+        print("🔄 Starting migration 008: Add Merge Checkpoints...")
+
+        if not check_table_exists(cursor, 'merge_checkpoints'):
+            print("  📝 Creating merge_checkpoints table...")
+            cursor.execute("""
+                CREATE TABLE merge_checkpoints (
+                    merge_id TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    records INTEGER NOT NULL,
+                    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (merge_id, chunk_index)
+                )
+            """)
+            print("  ✅ merge_checkpoints table created")
+        else:
+            print("  ℹ️ merge_checkpoints table already exists")
+
+        conn.commit()
+        print("✅ Migration 008 completed successfully!")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration 008 failed: {str(e)}")
+        return False
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def rollback(db_path: Path) -> bool:
+    """Rollback migration 008 (drops merge_checkpoints)."""
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("DROP TABLE IF EXISTS merge_checkpoints")
+        conn.commit()
+        print("✅ Migration 008 rolled back")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Rollback failed: {str(e)}")
+        return False
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    # Test migration on database
+    import sys
+    sys.path.append(str(Path(__file__).parent.parent))
+    import config
+
+    print("=== Testing Migration 008 ===")
+    success = migrate(config.DB_PATH)
+
+    if success:
+        print("\n✅ Migration test successful!")
+    else:
+        print("\n❌ Migration test failed!")
@@ -25,7 +25,8 @@ from migrations import (
     migration_003_normalize_db_org,
     migration_004_add_hierarchies,
     migration_005_add_roles,
-    migration_006_add_salaries
+    migration_006_add_salaries,
+    migration_008_add_merge_checkpoints
 )
 
 
@@ -36,6 +37,7 @@ MIGRATIONS = [
     ("004", "Multiple Hierarchies", migration_004_add_hierarchies),
     ("005", "Role Management", migration_005_add_roles),
     ("006", "Salary Management", migration_006_add_salaries),
+    ("008", "Merge Checkpoints", migration_008_add_merge_checkpoints),
 ]
 
 
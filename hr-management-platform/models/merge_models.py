@@ -9,8 +9,12 @@ Defines data structures for:
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
 from enum import Enum
+import uuid
+
+import numpy as np
+import pandas as pd
 
 
 class MergeStrategy(str, Enum):
@@ -57,6 +61,54 @@ class MatchedPair(BaseModel):
     match_confidence: float = Field(default=1.0, ge=0.0, le=1.0)
 
 
+class MatchedPairSet:
+    """
+    Coppie matched tenute come due DataFrame allineati per chiave.
+
+    source e target hanno lo stesso indice (chiave normalizzata) e la
+    stessa posizione per la stessa coppia. Si comporta come una lista di
+    MatchedPair, costruiti solo per le righe effettivamente lette; il
+    merge planner lavora direttamente sui frame.
+    """
+
+    def __init__(self, source: pd.DataFrame, target: pd.DataFrame):
+        self.source = source
+        self.target = target
+
+    @property
+    def keys(self) -> List[str]:
+        return [str(key) for key in self.source.index]
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def __bool__(self) -> bool:
+        return len(self.source) > 0
+
+    def __iter__(self) -> Iterator[MatchedPair]:
+        for start in range(0, len(self.source), 1000):
+            yield from self._build(start, start + 1000)
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self.source))
+            return self._build(start, stop)[::step]
+        if item < 0:
+            item += len(self.source)
+        if not 0 <= item < len(self.source):
+            raise IndexError(item)
+        return self._build(item, item + 1)[0]
+
+    def _build(self, start: int, stop: int) -> List[MatchedPair]:
+        keys = self.source.index[start:stop]
+        sources = self.source.iloc[start:stop].to_dict('records')
+        targets = self.target.iloc[start:stop].to_dict('records')
+        return [
+            MatchedPair(source_id=str(key), target_id=str(key), source_data=src, target_data=tgt)
+            for key, src, tgt in zip(keys, sources, targets)
+        ]
+
+
 class MatchResult(BaseModel):
     """
     Risultato completo del matching file-DB.
@@ -67,11 +119,14 @@ class MatchResult(BaseModel):
         unmatched_target: Record solo in DB (gap, non aggiornati)
         match_stats: Metriche matching
     """
-    matched_pairs: List[MatchedPair]
+    matched_pairs: Union[MatchedPairSet, List[MatchedPair]]
     unmatched_source: List[Dict[str, Any]]  # Nuovi (file non in DB)
     unmatched_target: List[Dict[str, Any]]  # Gap (DB non in file)
     match_stats: Dict[str, int] = Field(default_factory=dict)
 
+    class Config:
+        arbitrary_types_allowed = True
+
     def __init__(self, **data):
         super().__init__(**data)
         # Auto-calcola stats se non fornite
@@ -175,26 +230,221 @@ class MergeRecord(BaseModel):
         if not self.changed_fields and self.before and self.after:
             self.changed_fields = [
                 k for k in self.after.keys()
-                if k in self.before and self.before[k] != self.after[k]
+                if k in self.before and values_differ(self.before[k], self.after[k])
             ]
 
 
+def values_differ(before: Any, after: Any) -> bool:
+    """Confronto di merge: due vuoti (None/NaN) non sono una modifica."""
+    try:
+        if pd.isna(before) and pd.isna(after):
+            return False
+    except (TypeError, ValueError):
+        pass
+    try:
+        return bool(before != after)
+    except (TypeError, ValueError):
+        return True
+
+
+# Colonne della tabella conflitti di MergePlan (campi di FieldConflict)
+CONFLICT_COLUMNS = ['record_id', 'field_name', 'file_value', 'db_value', 'suggested_strategy']
+
+
+class MergePlan:
+    """
+    Esito colonnare di MergeEngine.preview_merge.
+
+    Attributes:
+        before: Righe DB matched (indice = record_id)
+        after: Righe post-merge, stesse righe e colonne DB + campi nuovi dal file
+        changed: Maschera bool (righe x campi DB presenti nel file) dei campi modificati
+        equal: Maschera bool (stessa forma) dei campi con valore file = DB
+        field_strategies: Strategia per ogni campo del file, nell'ordine del file
+        conflicts: Tabella CONFLICT_COLUMNS + 'position', ordinata per riga
+    """
+
+    def __init__(
+        self,
+        before: pd.DataFrame,
+        after: pd.DataFrame,
+        changed: pd.DataFrame,
+        equal: pd.DataFrame,
+        field_strategies: Dict[str, 'MergeStrategy'],
+        conflicts: pd.DataFrame
+    ):
+        self.before = before
+        self.after = after
+        self.changed = changed
+        self.equal = equal
+        self.field_strategies = field_strategies
+        self.conflicts = conflicts
+        self.record_ids = np.asarray([str(i) for i in before.index], dtype=object)
+        self._conflict_positions = conflicts['position'].to_numpy()
+        self._records: Dict[int, 'MergeRecord'] = {}
+
+    def records(self, positions: Iterable[int]) -> List['MergeRecord']:
+        """MergeRecord delle posizioni indicate (costruiti una volta e riusati)."""
+        positions = list(positions)
+        missing = [p for p in positions if p not in self._records]
+        if missing:
+            befores = self.before.iloc[missing].to_dict('records')
+            afters = self.after.iloc[missing].to_dict('records')
+            changed = self.changed.to_numpy()[missing] if len(self.changed.columns) else None
+            equal = self.equal.to_numpy()[missing] if len(self.equal.columns) else None
+            for i, position in enumerate(missing):
+                self._records[position] = MergeRecord(
+                    record_id=self.record_ids[position],
+                    before=befores[i],
+                    after=afters[i],
+                    changed_fields=self._changed_fields(changed, i),
+                    conflicts=self._conflicts(position),
+                    merge_strategy_used=self._strategies(equal, i)
+                )
+        return [self._records[p] for p in positions]
+
+    def resolutions(self) -> Dict[int, Dict[str, Any]]:
+        """Valori scelti dall'utente sui conflitti: {posizione: {campo: valore}}."""
+        chosen: Dict[int, Dict[str, Any]] = {}
+        for position, record in self._records.items():
+            for conflict in record.conflicts:
+                if conflict.user_resolution is not None:
+                    chosen.setdefault(position, {})[conflict.field_name] = conflict.user_resolution
+        return chosen
+
+    def _changed_fields(self, changed, i: int) -> List[str]:
+        if changed is None:
+            return []
+        return [field for field, flag in zip(self.changed.columns, changed[i]) if flag]
+
+    def _strategies(self, equal, i: int) -> Dict[str, 'MergeStrategy']:
+        flags = dict(zip(self.equal.columns, equal[i])) if equal is not None else {}
+        return {
+            field: MergeStrategy.KEEP_TARGET if flags.get(field) else strategy
+            for field, strategy in self.field_strategies.items()
+        }
+
+    def _conflicts(self, position: int) -> List[FieldConflict]:
+        start, stop = np.searchsorted(self._conflict_positions, [position, position + 1])
+        rows = self.conflicts.iloc[start:stop]
+        return [
+            FieldConflict(
+                record_id=self.record_ids[position],
+                field_name=row['field_name'],
+                file_value=row['file_value'],
+                db_value=row['db_value'],
+                suggested_strategy=row['suggested_strategy']
+            )
+            for row in rows.to_dict('records')
+        ]
+
+
+class MergeRecordSet:
+    """
+    Vista su un MergePlan che si comporta come una lista di MergeRecord.
+
+    Gli oggetti sono costruiti solo per le righe lette (la pagina che il
+    wizard mostra) e memorizzati nel piano, così le risoluzioni dei
+    conflitti scelte dall'utente restano sugli stessi oggetti.
+    """
+
+    def __init__(self, plan: MergePlan, positions: Optional[np.ndarray] = None):
+        self.plan = plan
+        self.positions = np.arange(len(plan.before)) if positions is None else np.asarray(positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __bool__(self) -> bool:
+        return len(self.positions) > 0
+
+    def __iter__(self) -> Iterator['MergeRecord']:
+        for start in range(0, len(self.positions), 1000):
+            yield from self.plan.records(self.positions[start:start + 1000])
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            return self.plan.records(self.positions[item])
+        return self.plan.records([self.positions[item]])[0]
+
+    @property
+    def record_ids(self) -> List[str]:
+        return self.plan.record_ids[self.positions].tolist()
+
+    @property
+    def conflicts(self) -> pd.DataFrame:
+        """Tabella conflitti (CONFLICT_COLUMNS) delle sole righe della vista."""
+        table = self.plan.conflicts
+        if len(self.positions) != len(self.plan.before):
+            table = table[table['position'].isin(self.positions)]
+        return table[CONFLICT_COLUMNS].reset_index(drop=True)
+
+    def page(self, page: int, page_size: int) -> List['MergeRecord']:
+        """MergeRecord della pagina (0-based)."""
+        start = page * page_size
+        return self[start:start + page_size]
+
+    def subset(self, mask) -> 'MergeRecordSet':
+        """Nuova vista sulle righe selezionate (maschera booleana allineata alla vista)."""
+        return MergeRecordSet(self.plan, self.positions[np.asarray(mask, dtype=bool)])
+
+    def with_changes(self) -> 'MergeRecordSet':
+        if not len(self.plan.changed.columns):
+            return self.subset(np.zeros(len(self.positions), dtype=bool))
+        return self.subset(self.plan.changed.to_numpy().any(axis=1)[self.positions])
+
+    def with_conflicts(self) -> 'MergeRecordSet':
+        return self.subset(np.isin(self.positions, self.plan._conflict_positions))
+
+    def select(self, record_ids: Iterable[str]) -> 'MergeRecordSet':
+        """Vista sui record_id indicati (selezione per insieme, non per lista)."""
+        wanted = set(record_ids)
+        return self.subset([rid in wanted for rid in self.plan.record_ids[self.positions]])
+
+
 class MergePreview(BaseModel):
     """
     Preview completo del merge prima dell'applicazione.
 
     Attributes:
-        merge_records: Lista tutti i record da mergiare
+        merge_records: Record da mergiare (MergeRecordSet: costruiti a richiesta)
         total_records: Count totale record
         records_with_changes: Count record con modifiche
         total_conflicts: Count totale conflitti
         stats: Statistiche strategie usate
+        run_id: Identità del preview (i checkpoint valgono solo per questo preview)
+        data_version: Versione dati DB al momento del preview
     """
-    merge_records: List[MergeRecord]
+    merge_records: Union[MergeRecordSet, List[MergeRecord]]
     total_records: int = 0
     records_with_changes: int = 0
     total_conflicts: int = 0
     stats: Dict[str, int] = Field(default_factory=dict)
+    run_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    data_version: Optional[str] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def conflicts(self) -> pd.DataFrame:
+        """Tabella compatta dei conflitti (CONFLICT_COLUMNS)."""
+        if isinstance(self.merge_records, MergeRecordSet):
+            return self.merge_records.conflicts
+        return pd.DataFrame(
+            [
+                [c.record_id, c.field_name, c.file_value, c.db_value, c.suggested_strategy.value]
+                for rec in self.merge_records for c in rec.conflicts
+            ],
+            columns=CONFLICT_COLUMNS
+        )
+
+    @property
+    def after_frame(self) -> Optional[pd.DataFrame]:
+        """Righe post-merge (indice = record_id), se il preview è colonnare."""
+        if isinstance(self.merge_records, MergeRecordSet):
+            return self.merge_records.plan.after
+        return None
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -228,6 +478,11 @@ class MergeResult(BaseModel):
         errors: Lista errori riscontrati
         snapshot_path: Path snapshot pre-merge (se creato)
         audit_log_id: ID entry audit log (se creato)
+        merge_id: Identità del merge per la ripresa (merge_checkpoints)
+        chunks_total: Blocchi (transazioni) del merge
+        chunks_completed: Blocchi confermati, compresi quelli ripresi
+        chunks_resumed: Blocchi già confermati da un'esecuzione precedente
+        validation_passed: Esito DataValidator post-merge (None se non eseguito)
     """
     success: bool
     applied_count: int = 0
@@ -236,6 +491,11 @@ class MergeResult(BaseModel):
     errors: List[str] = Field(default_factory=list)
     snapshot_path: Optional[str] = None
     audit_log_id: Optional[int] = None
+    merge_id: Optional[str] = None
+    chunks_total: int = 0
+    chunks_completed: int = 0
+    chunks_resumed: int = 0
+    validation_passed: Optional[bool] = None
 
 
 # Type alias per convenienza
@@ -5,6 +5,9 @@ from typing import Optional
 from pydantic import BaseModel, Field, field_validator
 import re
 
+# Formato codice fiscale (dopo strip/upper): 16 caratteri alfanumerici
+CODICE_FISCALE_PATTERN = r'^[A-Z0-9]{16}$'
+
 
 class PersonaleRecord(BaseModel):
     """
@@ -81,7 +84,7 @@ class PersonaleRecord(BaseModel):
         v = v.strip().upper()
 
         # Pattern CF italiano: 16 caratteri (lettere e numeri)
-        if not re.match(r'^[A-Z0-9]{16}$', v):
+        if not re.match(CODICE_FISCALE_PATTERN, v):
             raise ValueError(f"Codice fiscale non valido: {v} (deve essere 16 caratteri alfanumerici)")
 
         return v
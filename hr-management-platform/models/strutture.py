@@ -1,7 +1,7 @@
 """
 Modelli Pydantic per validazione record TNS Strutture
 """
-from typing import Optional
+from typing import Optional, Sequence
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -129,47 +129,82 @@ class StrutturaRecord(BaseModel):
         ])
 
 
+def walk_parent_chains(parent: Sequence[int]) -> tuple[list[list[int]], bytearray]:
+    """
+    Risalita iterativa delle catene dei padri su puntatori interi.
+
+    Unica implementazione del rilevamento cicli della gerarchia strutture
+    (usata da detect_cycles e da services.hierarchy_integrity). Colorazione
+    senza ricorsione: ogni nodo entra ed esce dal cammino una volta, calcolo
+    lineare.
+
+    Args:
+        parent: parent[i] = indice del padre di i, negativo se fuori
+                dall'albero (radice o padre inesistente)
+
+    Returns:
+        (cicli, verso_ciclo): ogni ciclo distinto una sola volta, come indici
+        ruotati a partire dal minore; verso_ciclo[i] = 1 se la catena dei
+        padri di i finisce in un ciclo (nodi del ciclo compresi)
+    """
+    n = len(parent)
+    state = bytearray(n)      # 0 nuovo, 1 sul cammino, 2 risolto
+    to_cycle = bytearray(n)
+    path_pos: dict[int, int] = {}
+    cycles: list[list[int]] = []
+
+    for start in range(n):
+        if state[start]:
+            continue
+
+        # Risali i padri finché si esce dall'albero, si incontra un nodo
+        # già risolto o si torna su un nodo del cammino corrente
+        path: list[int] = []
+        node = start
+        while node >= 0 and not state[node]:
+            state[node] = 1
+            path_pos[node] = len(path)
+            path.append(node)
+            node = parent[node]
+
+        if node < 0:
+            ends_in_cycle = 0
+        elif state[node] == 1:
+            cycle = path[path_pos[node]:]
+            first = cycle.index(min(cycle))
+            cycles.append(cycle[first:] + cycle[:first])
+            ends_in_cycle = 1
+        else:
+            ends_in_cycle = to_cycle[node]
+
+        for v in path:
+            state[v] = 2
+            to_cycle[v] = ends_in_cycle
+            del path_pos[v]
+
+    return cycles, to_cycle
+
+
 def detect_cycles(strutture_dict: dict[str, StrutturaRecord]) -> list[str]:
     """
     Rileva cicli nell'albero gerarchico delle strutture.
-    
+
+    Ogni ciclo distinto è riportato una sola volta, a partire dal codice
+    inserito per primo nel dict (stesso formato di
+    HierarchyReport.cycle_messages). Calcolo lineare (walk_parent_chains).
+
     Args:
         strutture_dict: Dict con Codice -> StrutturaRecord
-    
+
     Returns:
         Lista di errori descrittivi per ogni ciclo trovato
     """
-    errors = []
-    
-    def has_cycle(codice: str, visited: set[str], path: list[str]) -> Optional[list[str]]:
-        """DFS per rilevare cicli"""
-        if codice in visited:
-            # Trovato ciclo: ritorna il percorso
-            cycle_start = path.index(codice)
-            return path[cycle_start:] + [codice]
-        
-        if codice not in strutture_dict:
-            return None
-        
-        visited.add(codice)
-        path.append(codice)
-        
-        struttura = strutture_dict[codice]
-        if struttura.unita_operativa_padre:
-            cycle = has_cycle(struttura.unita_operativa_padre, visited, path)
-            if cycle:
-                return cycle
-        
-        path.pop()
-        visited.remove(codice)
-        return None
-    
-    # Controlla ogni struttura
-    for codice in strutture_dict:
-        visited = set()
-        cycle = has_cycle(codice, visited, [])
-        if cycle:
-            cycle_str = " -> ".join(cycle)
-            errors.append(f"Ciclo rilevato: {cycle_str}")
-    
-    return errors
+    codes = list(strutture_dict)
+    position = {codice: i for i, codice in enumerate(codes)}
+    parent = [position.get(record.unita_operativa_padre, -1) for record in strutture_dict.values()]
+
+    cycles, _ = walk_parent_chains(parent)
+    return [
+        f"Ciclo rilevato: {' -> '.join([codes[i] for i in cycle] + [codes[cycle[0]]])}"
+        for cycle in cycles
+    ]
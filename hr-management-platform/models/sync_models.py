@@ -2,7 +2,8 @@
 Modelli per la verifica di consistenza DB-Excel.
 """
 from datetime import datetime
-from typing import List, Literal, Optional
+from typing import Iterator, List, Literal, Optional, Union
+import pandas as pd
 from pydantic import BaseModel, Field
 
 
@@ -30,6 +31,64 @@ class PersonMismatch(BaseModel):
         populate_by_name = True
 
 
+# Colonne del frame di MismatchSet (nomi/alias dei campi di PersonMismatch)
+MISMATCH_COLUMNS = [
+    'TxCodFiscale', 'codice', 'titolare', 'unita_organizzativa', 'issue_type',
+    'details', 'responsabile_codice', 'responsabile_nome', 'responsabile_approvatore_flag'
+]
+
+
+class MismatchSet:
+    """
+    Inconsistenze di una categoria tenute come DataFrame (MISMATCH_COLUMNS).
+
+    Si comporta come una lista di PersonMismatch (len, iterazione,
+    indicizzazione), ma gli oggetti sono costruiti solo per le righe
+    effettivamente lette: la UI materializza una pagina alla volta.
+    """
+
+    def __init__(self, frame: Optional[pd.DataFrame] = None):
+        if frame is None:
+            frame = pd.DataFrame(columns=MISMATCH_COLUMNS)
+        self.frame = frame.reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __bool__(self) -> bool:
+        return len(self.frame) > 0
+
+    def __iter__(self) -> Iterator[PersonMismatch]:
+        for start in range(0, len(self.frame), 1000):
+            yield from self._build(start, start + 1000)
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self.frame))
+            return self._build(start, stop)[::step]
+        if item < 0:
+            item += len(self.frame)
+        if not 0 <= item < len(self.frame):
+            raise IndexError(item)
+        return self._build(item, item + 1)[0]
+
+    def page(self, page: int, page_size: int) -> List[PersonMismatch]:
+        """PersonMismatch della pagina (0-based)."""
+        start = page * page_size
+        return self._build(start, start + page_size)
+
+    def subset(self, mask) -> 'MismatchSet':
+        """Nuovo MismatchSet con le sole righe selezionate (maschera booleana)."""
+        return MismatchSet(self.frame[mask])
+
+    def _build(self, start: int, stop: int) -> List[PersonMismatch]:
+        records = self.frame.iloc[start:stop].to_dict('records')
+        return [
+            PersonMismatch(**{k: v for k, v in record.items() if v is not None and not pd.isna(v)})
+            for record in records
+        ]
+
+
 class SyncCheckResult(BaseModel):
     """Risultato completo della verifica di consistenza."""
 
@@ -44,11 +103,14 @@ class SyncCheckResult(BaseModel):
     missing_in_excel_count: int
     responsabile_issues_count: int
 
-    # Dettagli per categoria
-    missing_in_db: List[PersonMismatch] = []
-    missing_in_excel: List[PersonMismatch] = []
-    responsabile_missing: List[PersonMismatch] = []
-    responsabile_not_approver: List[PersonMismatch] = []
+    # Dettagli per categoria (MismatchSet: oggetti costruiti a richiesta)
+    missing_in_db: Union[MismatchSet, List[PersonMismatch]] = []
+    missing_in_excel: Union[MismatchSet, List[PersonMismatch]] = []
+    responsabile_missing: Union[MismatchSet, List[PersonMismatch]] = []
+    responsabile_not_approver: Union[MismatchSet, List[PersonMismatch]] = []
+
+    class Config:
+        arbitrary_types_allowed = True
 
     @property
     def has_issues(self) -> bool:
@@ -0,0 +1,147 @@
+"""
+Background Jobs
+
+Operazioni lunghe eseguibili con JobRunner (services/job_runner.py):
+import con versione, import DB_ORG, snapshot, restore e merge.
+
+Ogni funzione riceve il JobContext come primo argomento, riporta
+l'avanzamento con context.report() (dove la cancellazione diventa
+effettiva) e restituisce un dict serializzabile. Nessuna usa
+st.session_state: la UI ricarica i dati in sessione quando il job risulta
+completato.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import config
+from services.database import DatabaseHandler
+from services.job_runner import JobContext
+from services.version_manager import VersionManager
+
+
+def confirm_import_job(
+    context: JobContext,
+    db_handler: DatabaseHandler,
+    preview_data: Dict[str, Any],
+    user_note: str = ""
+) -> Dict[str, Any]:
+    """Import personale/strutture con versione e snapshot (confirm_import_with_version)."""
+    context.report(0.0, "Creazione versione")
+    version_id = db_handler.begin_import_version(
+        source_filename=preview_data['filename'],
+        user_note=user_note or None
+    )
+
+    context.report(0.1, "Import dati")
+    p_count, s_count = db_handler.import_from_dataframe(preview_data['personale_df'], preview_data['strutture_df'])
+
+    changes_summary = json.dumps({
+        'type': 'upload_import',
+        'personale_imported': p_count,
+        'strutture_imported': s_count
+    })
+    db_handler.complete_import_version(version_id, p_count, s_count, changes_summary)
+
+    # Lo snapshot non blocca l'import: errore riportato nel risultato
+    context.report(0.8, "Creazione snapshot")
+    snapshot_path, snapshot_error = None, None
+    try:
+        vm = VersionManager(db_handler, config.SNAPSHOTS_DIR)
+        snapshot_path = vm.create_snapshot(
+            import_version_id=version_id,
+            source_filename=preview_data['filename'],
+            user_note=user_note
+        )
+        print(f"✓ Snapshot creato: {snapshot_path}")
+    except Exception as e:
+        print(f"! Errore creazione snapshot: {str(e)}")
+        snapshot_error = str(e)
+
+    return {
+        'version_id': version_id,
+        'personale_imported': p_count,
+        'strutture_imported': s_count,
+        'snapshot_path': snapshot_path,
+        'snapshot_error': snapshot_error
+    }
+
+
+def import_db_org_job(
+    context: JobContext,
+    file_path: Path,
+    sheet_name: str = 'DB_ORG',
+    import_note: Optional[str] = None,
+    cleanup: bool = True
+) -> Dict[str, Any]:
+    """Import DB_ORG da file temporaneo (rimosso al termine se cleanup)."""
+    from services.db_org_import_service import get_db_org_import_service
+
+    try:
+        return get_db_org_import_service().import_db_org_file(
+            excel_path=Path(file_path),
+            sheet_name=sheet_name,
+            import_note=import_note,
+            progress_callback=context.report
+        )
+    finally:
+        if cleanup and Path(file_path).exists():
+            Path(file_path).unlink()
+
+
+def snapshot_job(
+    context: JobContext,
+    db_handler: DatabaseHandler,
+    source_filename: str = "MANUAL_SNAPSHOT",
+    note: Optional[str] = None
+) -> Dict[str, Any]:
+    """Snapshot manuale dello stato attuale."""
+    context.report(0.0, "Creazione snapshot")
+    vm = VersionManager(db_handler, config.SNAPSHOTS_DIR)
+    return {'snapshot_path': vm.create_manual_snapshot(note, source_filename)}
+
+
+def restore_snapshot_job(
+    context: JobContext,
+    db_handler: DatabaseHandler,
+    snapshot_file_path: str,
+    create_backup: bool = True
+) -> Dict[str, Any]:
+    """Ripristino da snapshot (VersionManager.restore_snapshot)."""
+    context.report(0.0, "Ripristino in corso")
+    vm = VersionManager(db_handler, config.SNAPSHOTS_DIR)
+    success, message = vm.restore_snapshot(snapshot_file_path, create_backup=create_backup)
+    return {'success': success, 'message': message}
+
+
+def merge_job(
+    context: JobContext,
+    preview,
+    selected_record_ids: Optional[Iterable[str]] = None,
+    validate: bool = True,
+    record_type: str = "personale",
+    snapshot_note: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Merge a blocchi (MergeEngine.apply_merge), con snapshot preventivo se
+    snapshot_note è valorizzata. Una cancellazione ferma il merge dopo il
+    blocco in corso: i blocchi confermati restano e il merge si riprende.
+    """
+    from services.merge_engine import MergeEngine
+
+    db_handler = DatabaseHandler()
+    snapshot_path = None
+    if snapshot_note:
+        context.report(0.0, "Snapshot pre-merge")
+        vm = VersionManager(db_handler, config.SNAPSHOTS_DIR)
+        snapshot_path = vm.create_manual_snapshot(snapshot_note, "PRE_MERGE")
+
+    result = MergeEngine(db_handler).apply_merge(
+        preview=preview,
+        selected_record_ids=selected_record_ids,
+        validate=validate,
+        record_type=record_type,
+        progress_callback=context.progress_callback("Record")
+    )
+    result.snapshot_path = snapshot_path
+    return result.model_dump()
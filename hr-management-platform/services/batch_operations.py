@@ -3,9 +3,12 @@ Gestione operazioni batch su DataFrame HR.
 Applica modifiche proposte e valida risultato.
 """
 import pandas as pd
-from typing import List, Dict, Any, Tuple
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+from config import KEY_FIELD_PERSONALE, KEY_FIELD_STRUTTURE
 from models.bot_models import ChangeProposal, OperationType, RecordType
 from services.validator import DataValidator
+from services.validation_index import index_key
 
 
 class BatchOperations:
@@ -14,8 +17,9 @@ class BatchOperations:
 
     Workflow:
     1. Riceve lista ChangeProposal
-    2. Applica modifiche selezionate a df_copy
-    3. Valida risultato con DataValidator
+    2. Applica modifiche selezionate a df_copy (raggruppate per chiave
+       quando possibile, altrimenti una alla volta)
+    3. Valida righe modificate e dipendenti con DataValidator.validate_changes
     4. Ritorna (df_modificato, errori_validazione)
     """
 
@@ -47,26 +51,101 @@ class BatchOperations:
             >>> if not errors:
             ...     st.session_state.personale_df = df_result
         """
+        # Filtra solo changes selezionate
+        selected_changes = [c for c in changes if c.selected]
+        record_type = selected_changes[0].record_type if selected_changes else None
+        key_field = (
+            KEY_FIELD_PERSONALE if record_type == RecordType.PERSONALE else KEY_FIELD_STRUTTURE
+        )
+
+        # Applicazione raggruppata per chiave; se le modifiche dipendono
+        # l'una dall'altra (o qualcosa fallisce) si ripiega su quella
+        # sequenziale, che riporta gli errori per singola modifica
+        applied = BatchOperations._apply_grouped(df, selected_changes, key_field)
+        if applied is None:
+            applied = BatchOperations._apply_sequential(df, selected_changes, key_field)
+        df_result, validation_errors, changed_rows, touched_keys, reindexed = applied
+
+        # Validazione post-modifica se richiesta: solo righe toccate e dipendenti
+        if validate and selected_changes:
+            kind = RecordType(record_type).value
+            if reindexed:
+                result = DataValidator.validate_changes(
+                    df_result, kind, touched_keys=touched_keys
+                )
+            else:
+                result = DataValidator.validate_changes(
+                    df_result,
+                    kind,
+                    changed_rows=changed_rows,
+                    touched_keys=touched_keys,
+                    baseline=df
+                )
+
+            # Aggiungi errori validazione (limita a primi 10)
+            if not result.is_valid():
+                for err in result.errors[:10]:
+                    validation_errors.append({
+                        'change_id': 'validation',
+                        'error': f"Row {err['row']}, {err['field']}: {err['message']}"
+                    })
+
+            # Aggiungi warning come info (limita a primi 5)
+            for warn in result.warnings[:5]:
+                validation_errors.append({
+                    'change_id': 'warning',
+                    'error': f"⚠️ Row {warn['row']}: {warn['message']}"
+                })
+
+        return df_result, validation_errors
+
+    @staticmethod
+    def _apply_sequential(
+        df: pd.DataFrame,
+        selected_changes: List[ChangeProposal],
+        key_field: str
+    ) -> tuple:
+        """
+        Applica le modifiche una alla volta, nell'ordine ricevuto.
+
+        Returns:
+            Tuple (df_modificato, errori, changed_rows, touched_keys, reindexed)
+        """
         # Lavora su copia per non modificare originale fino a validazione OK
         df_result = df.copy()
         validation_errors = []
 
-        # Filtra solo changes selezionate
-        selected_changes = [c for c in changes if c.selected]
+        # Delta per la validazione incrementale: righe toccate e chiavi coinvolte
+        changed_rows = []
+        touched_keys = set()
+        reindexed = False
 
         for change in selected_changes:
             try:
                 if change.operation == OperationType.ADD_RECORD:
                     df_result = BatchOperations._add_record(df_result, change)
-
-                elif change.operation == OperationType.UPDATE_RECORD:
-                    df_result = BatchOperations._update_record(df_result, change)
+                    changed_rows.append(df_result.index[-1])
+                    touched_keys.add(change.after_values.get(key_field))
+
+                elif change.operation in (OperationType.UPDATE_RECORD, OperationType.BATCH_UPDATE):
+                    rows = BatchOperations._changed_rows(df_result, change)
+                    if key_field in df_result.columns:
+                        touched_keys.update(df_result.loc[rows, key_field].tolist())
+                    if change.operation == OperationType.UPDATE_RECORD:
+                        df_result = BatchOperations._update_record(df_result, change)
+                    else:
+                        df_result = BatchOperations._batch_update(df_result, change)
+                    changed_rows.extend(rows)
+                    if key_field in df_result.columns:
+                        touched_keys.update(df_result.loc[rows, key_field].tolist())
 
                 elif change.operation == OperationType.DELETE_RECORD:
+                    rows = BatchOperations._changed_rows(df_result, change)
+                    if key_field in df_result.columns:
+                        touched_keys.update(df_result.loc[rows, key_field].tolist())
                     df_result = BatchOperations._delete_record(df_result, change)
-
-                elif change.operation == OperationType.BATCH_UPDATE:
-                    df_result = BatchOperations._batch_update(df_result, change)
+                    # _delete_record resetta l'indice: le etichette non valgono più
+                    reindexed = True
 
                 # Query e validate_fix non modificano DataFrame
 
@@ -76,32 +155,142 @@ class BatchOperations:
                     'error': f"Errore applicazione modifica: {str(e)}"
                 })
 
-        # Validazione post-modifica se richiesta
-        if validate and selected_changes:
-            # Determina tipo record dal primo change
-            record_type = selected_changes[0].record_type
+        return df_result, validation_errors, changed_rows, touched_keys, reindexed
 
-            if record_type == RecordType.PERSONALE:
-                result = DataValidator.validate_personale(df_result)
-            else:
-                result = DataValidator.validate_strutture(df_result)
+    @staticmethod
+    def _apply_grouped(
+        df: pd.DataFrame,
+        selected_changes: List[ChangeProposal],
+        key_field: str
+    ) -> Optional[tuple]:
+        """
+        Applica le modifiche raggruppate per operazione.
 
-            # Aggiungi errori validazione (limita a primi 10)
-            if not result.is_valid():
-                for err in result.errors[:10]:
-                    validation_errors.append({
-                        'change_id': 'validation',
-                        'error': f"Row {err['row']}, {err['field']}: {err['message']}"
-                    })
+        Il frame viene indicizzato per chiave una sola volta; gli update
+        diventano un loc per (campo, valore) con semantica "vince l'ultima",
+        gli add un'unica concat e i delete un unico drop. Il risultato è
+        identico all'applicazione sequenziale purché ogni update/delete
+        filtri solo per chiave, non modifichi la chiave e non riguardi un
+        record aggiunto nello stesso batch: altrimenti ritorna None.
 
-            # Aggiungi warning come info (limita a primi 5)
-            for warn in result.warnings[:5]:
-                validation_errors.append({
-                    'change_id': 'warning',
-                    'error': f"⚠️ Row {warn['row']}: {warn['message']}"
-                })
+        Returns:
+            Tuple come _apply_sequential, o None se serve l'applicazione sequenziale
+        """
+        if key_field not in df.columns or not df.index.is_unique:
+            return None
 
-        return df_result, validation_errors
+        updates, deletes, adds = [], [], []
+        added_keys = set()
+        for change in selected_changes:
+            if change.operation == OperationType.ADD_RECORD:
+                adds.append(change)
+                added_keys.add(index_key(change.after_values.get(key_field)))
+            elif change.operation in (
+                OperationType.UPDATE_RECORD, OperationType.BATCH_UPDATE, OperationType.DELETE_RECORD
+            ):
+                keys = BatchOperations._criteria_keys(df, change.filter_criteria, key_field)
+                if keys is None or keys & added_keys:
+                    return None
+                if change.operation == OperationType.DELETE_RECORD:
+                    deletes.append(keys)
+                elif key_field in change.after_values:
+                    return None
+                else:
+                    updates.append((change, keys))
+
+        try:
+            df_result = df.copy()
+            rows_by_key = BatchOperations._rows_by_key(
+                df_result, key_field, set().union(*(keys for _, keys in updates), *deletes)
+            )
+
+            # Update: valore finale per (campo, riga), poi un loc per valore
+            assignments: Dict[str, Dict[Any, Any]] = defaultdict(dict)
+            changed_rows = []
+            for change, keys in updates:
+                rows = [label for key in keys for label in rows_by_key.get(key, ())]
+                if not rows:
+                    continue
+                changed_rows.extend(rows)
+                for field, value in change.after_values.items():
+                    if field in df_result.columns:
+                        for label in rows:
+                            assignments[field][label] = value
+
+            for field, values in assignments.items():
+                groups: Dict[tuple, list] = defaultdict(list)
+                for label, value in values.items():
+                    groups[(type(value), value)].append(label)
+                for (_, value), labels in groups.items():
+                    df_result.loc[labels, field] = value
+
+            deleted_rows = [label for keys in deletes for key in keys for label in rows_by_key.get(key, ())]
+            touched_keys = set(df_result.loc[changed_rows + deleted_rows, key_field].tolist())
+
+            # Delete: un solo drop
+            reindexed = False
+            if deletes:
+                df_result = df_result.drop(index=list(dict.fromkeys(deleted_rows)))
+                df_result = df_result.reset_index(drop=True)
+                reindexed = True
+
+            # Add: una sola concat
+            if adds:
+                start = len(df_result)
+                if not df_result.index.equals(pd.RangeIndex(start)):
+                    # ignore_index rinumera anche le righe esistenti
+                    reindexed = True
+                # Un frame per record (stessa inferenza dei tipi di _add_record), una concat
+                new_rows = [
+                    pd.DataFrame([{col: change.after_values.get(col, None) for col in df_result.columns}])
+                    for change in adds
+                ]
+                df_result = pd.concat([df_result, *new_rows], ignore_index=True)
+                changed_rows.extend(range(start, len(df_result)))
+                touched_keys.update(change.after_values.get(key_field) for change in adds)
+
+        except Exception:
+            # Errori per singola modifica: li riporta l'applicazione sequenziale
+            return None
+
+        return df_result, [], changed_rows, touched_keys, reindexed
+
+    @staticmethod
+    def _criteria_keys(df: pd.DataFrame, criteria: Dict[str, Any], key_field: str) -> Optional[set]:
+        """
+        Chiavi selezionate da filter_criteria, se il filtro è solo sulla chiave.
+
+        I campi assenti dal DataFrame sono ignorati come in _build_mask.
+        Ritorna None per filtri su altri campi, filtri vuoti (tutte le
+        righe) o valori nulli/non hashable.
+        """
+        fields = [field for field in criteria if field in df.columns]
+        if fields != [key_field]:
+            return None
+
+        value = criteria[key_field]
+        values = value if isinstance(value, list) else [value]
+        keys = set()
+        for item in values:
+            if not pd.api.types.is_scalar(item):
+                return None
+            key = index_key(item)
+            if key is None:
+                return None
+            keys.add(key)
+        return keys
+
+    @staticmethod
+    def _rows_by_key(df: pd.DataFrame, key_field: str, keys: set) -> Dict[Any, list]:
+        """Etichette riga per ciascuna chiave richiesta (una sola scansione della colonna)."""
+        if not keys:
+            return {}
+        column = df[key_field]
+        matched = column[column.isin(list(keys))]
+        rows: Dict[Any, list] = defaultdict(list)
+        for label, value in zip(matched.index, matched.tolist()):
+            rows[value].append(label)
+        return rows
 
     @staticmethod
     def _add_record(df: pd.DataFrame, change: ChangeProposal) -> pd.DataFrame:
@@ -187,6 +376,12 @@ class BatchOperations:
         """
         return BatchOperations._update_record(df, change)
 
+    @staticmethod
+    def _changed_rows(df: pd.DataFrame, change: ChangeProposal) -> list:
+        """Etichette delle righe selezionate da filter_criteria."""
+        mask = BatchOperations._build_mask(df, change.filter_criteria)
+        return df.index[mask.to_numpy()].tolist()
+
     @staticmethod
     def _build_mask(df: pd.DataFrame, criteria: Dict[str, Any]) -> pd.Series:
         """
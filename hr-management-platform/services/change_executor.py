@@ -0,0 +1,697 @@
+"""
+Change Executor
+
+Applicazione diretta di ChangeProposal al database SQLite, senza passare
+da un re-import completo del DataFrame in sessione.
+
+Le modifiche vengono compilate in istruzioni parametrizzate ed eseguite
+in un'unica transazione:
+- update per chiave consecutivi sugli stessi campi -> un solo executemany
+  (o UPDATE ... WHERE chiave IN (...) a blocchi se i valori coincidono)
+- delete per chiave consecutivi -> DELETE ... WHERE chiave IN (...)
+- add consecutivi con le stesse colonne -> executemany INSERT
+- filtri su altri campi -> una istruzione con WHERE parametrizzato
+
+Le righe audit (una per campo modificato) sono scritte in blocco nella
+stessa transazione; refresh_frame riallinea il DataFrame in cache
+rileggendo solo le chiavi toccate.
+"""
+import datetime as dt
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from config import KEY_FIELD_PERSONALE, KEY_FIELD_STRUTTURE
+from models.bot_models import ChangeProposal, OperationType, RecordType
+from services.database import DatabaseHandler, EXCEL_COLUMN_MAPPING
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """
+    Tabella target e mappa colonne DataFrame -> colonne DB.
+
+    Args:
+        table: Nome tabella SQLite
+        frame_key: Colonna chiave nel DataFrame
+        db_key: Colonna chiave nel DB
+        columns: Colonna DataFrame -> colonna DB
+        insertable: False se la tabella richiede campi non presenti nel frame
+        null_value: Valore con cui il caricamento rappresenta NULL nel frame
+    """
+    table: str
+    frame_key: str
+    db_key: str
+    columns: Dict[str, str]
+    insertable: bool = True
+    null_value: Any = None
+
+    @property
+    def frame_columns(self) -> Dict[str, str]:
+        """Colonna DB -> colonna DataFrame."""
+        return {db: frame for frame, db in self.columns.items()}
+
+
+_LEGACY_COLUMNS = {excel: db for db, excel in EXCEL_COLUMN_MAPPING.items()}
+
+# Stesse colonne lette da load_data_from_db (app.py) per lo schema DB_ORG
+_EMPLOYEES_COLUMNS = {
+    'TxCodFiscale': 'tx_cod_fiscale',
+    'Titolare': 'titolare',
+    'Codice': 'codice',
+    'Qualifica': 'qualifica',
+    'Area': 'area',
+    'Sede': 'sede',
+    'LIVELLO': 'livello',
+    'Contratto': 'contratto',
+    'RAL': 'ral',
+    'Data Assunzione': 'data_assunzione',
+    'Data Cessazione': 'data_cessazione',
+    'Società': 'societa',
+    'SottoArea': 'sottoarea',
+    'Sesso': 'sesso',
+    'Email': 'email',
+    'CF Responsabile Diretto': 'reports_to_cf',
+    'Codice TNS': 'cod_tns',
+    'Padre TNS': 'padre_tns',
+    'Matricola': 'matricola',
+    'Sede_TNS': 'sede_tns',
+    'GruppoSind': 'gruppo_sind',
+}
+
+_ORG_UNITS_COLUMNS = {
+    'Codice': 'codice',
+    'DESCRIZIONE': 'descrizione',
+    'Unità Organizzativa': 'unita_org_livello1',
+    'Unità Organizzativa 2': 'unita_org_livello2',
+    'CDCCOSTO': 'cdccosto',
+    'LIVELLO': 'livello',
+    'CdC Amm': 'cdc_amm',
+    'Testata GG/2': 'testata_gg',
+}
+
+TABLE_SPECS: Dict[str, TableSpec] = {
+    'personale': TableSpec('personale', KEY_FIELD_PERSONALE, 'TxCodFiscale', _LEGACY_COLUMNS),
+    'strutture': TableSpec('strutture', KEY_FIELD_STRUTTURE, 'Codice', _LEGACY_COLUMNS),
+    # Schema DB_ORG: gli inserimenti richiedono company_id, non presente nel frame
+    'employees': TableSpec(
+        'employees', KEY_FIELD_PERSONALE, 'tx_cod_fiscale', _EMPLOYEES_COLUMNS,
+        insertable=False, null_value=''
+    ),
+    'org_units': TableSpec(
+        'org_units', KEY_FIELD_STRUTTURE, 'codice', _ORG_UNITS_COLUMNS,
+        insertable=False, null_value=''
+    ),
+}
+
+_AUDIT_VERSIONED = {'import_version_id', 'change_severity', 'field_name'}
+
+# Savepoint usato quando apply_changes gira dentro una transazione già aperta
+_SAVEPOINT = 'change_executor'
+
+
+@dataclass
+class ExecutionResult:
+    """Esito dell'applicazione su database."""
+    table: str
+    applied_ids: List[str] = field(default_factory=list)
+    errors: List[Dict[str, str]] = field(default_factory=list)
+    rows_affected: int = 0
+    audit_rows: int = 0
+    touched_keys: Set[Any] = field(default_factory=set)
+    deleted_keys: Set[Any] = field(default_factory=set)
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class _Statement:
+    """Istruzione compilata: una o più modifiche consecutive compatibili."""
+    kind: str                                   # 'insert' | 'update' | 'delete'
+    change_ids: List[str]
+    columns: Tuple[str, ...] = ()               # colonne INSERT / SET
+    rows: List[tuple] = field(default_factory=list)   # insert: valori; update: (valori..., chiave)
+    keys: List[Any] = field(default_factory=list)     # delete per chiave
+    values: tuple = ()                          # update con filtro: valori SET
+    where: Optional[Tuple[str, list]] = None    # filtro generico (clausola, parametri)
+
+    def absorb(self, other: '_Statement') -> bool:
+        """Accoda other se eseguibile nella stessa istruzione."""
+        if other.kind != self.kind or self.where is not None or other.where is not None:
+            return False
+        if other.columns != self.columns:
+            return False
+        self.change_ids.extend(other.change_ids)
+        self.rows.extend(other.rows)
+        self.keys.extend(other.keys)
+        return True
+
+
+class ChangeExecutor:
+    """
+    Esegue liste di ChangeProposal sul database in una transazione.
+
+    Usage:
+        executor = ChangeExecutor(db_handler)
+        result = executor.apply_changes(selected_changes, user_action='bot')
+        if result.success:
+            personale_df = executor.refresh_frame(personale_df, result)
+    """
+
+    def __init__(self, db_handler: DatabaseHandler):
+        self.db = db_handler
+
+    # === TABELLA TARGET ===
+
+    def resolve_table(self, record_type) -> TableSpec:
+        """
+        Tabella che contiene i dati caricati in sessione.
+
+        Stessa regola di load_data_from_db: se lo schema DB_ORG
+        (employees/org_units) ha dati si usa quello, altrimenti
+        personale/strutture.
+        """
+        kind = RecordType(record_type).value
+        if self._has_rows('employees') or self._has_rows('org_units'):
+            return TABLE_SPECS['employees' if kind == RecordType.PERSONALE.value else 'org_units']
+        return TABLE_SPECS[kind]
+
+    def _has_rows(self, table: str) -> bool:
+        try:
+            return self.db.get_connection().execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None
+        except sqlite3.OperationalError:
+            return False
+
+    def _table_columns(self, table: str) -> List[str]:
+        return [row[1] for row in self.db.get_connection().execute(f"PRAGMA table_info({table})")]
+
+    # === APPLICAZIONE ===
+
+    def apply_changes(
+        self,
+        changes: List[ChangeProposal],
+        user_action: str = 'bot',
+        import_version_id: Optional[int] = None,
+        table: Optional[str] = None,
+        before_commit: Optional[Callable[[sqlite3.Cursor], None]] = None
+    ) -> ExecutionResult:
+        """
+        Applica le modifiche selezionate al database.
+
+        Tutto o niente: se una modifica non è compilabile nessuna istruzione
+        viene eseguita; se un'istruzione fallisce la transazione è annullata.
+        Se la connessione è già in una transazione le modifiche vanno in un
+        SAVEPOINT: in caso di errore si annulla solo quello, e il commit
+        resta a chi ha aperto la transazione.
+
+        Args:
+            changes: ChangeProposal (si applicano solo quelle selezionate)
+            user_action: Valore della colonna audit_log.user_action
+            import_version_id: Versione import da associare alle righe audit
+            table: Tabella target esplicita (chiave di TABLE_SPECS); default resolve_table
+            before_commit: Scritture aggiuntive nella stessa transazione (es. checkpoint)
+
+        Returns:
+            ExecutionResult con errori nello stesso formato di BatchOperations
+        """
+        selected = [c for c in changes if c.selected]
+        if not selected:
+            return ExecutionResult(table='')
+
+        if table is not None and table not in TABLE_SPECS:
+            raise ValueError(f"Tabella non supportata: {table}")
+        spec = TABLE_SPECS[table] if table is not None else self.resolve_table(selected[0].record_type)
+        result = ExecutionResult(table=spec.table)
+        table_columns = self._table_columns(spec.table)
+
+        statements = self._compile(selected, spec, table_columns, result.errors)
+        if result.errors or not statements:
+            if not result.errors:
+                result.applied_ids = [c.change_id for c in selected]
+            return result
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        current = None
+        nested = conn.in_transaction
+        try:
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}" if nested else "BEGIN IMMEDIATE")
+
+            audit = []
+            touch_updated_at = 'updated_at' in table_columns
+            for current in statements:
+                self._execute(cursor, spec, current, touch_updated_at, audit, result)
+            current = None
+
+            result.audit_rows = self._write_audit(cursor, audit, user_action, import_version_id)
+            if before_commit is not None:
+                before_commit(cursor)
+            if nested:
+                cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+            else:
+                conn.commit()
+            result.applied_ids = [c.change_id for c in selected]
+            print(f"✅ {len(selected)} modifiche applicate su {spec.table}: "
+                  f"{result.rows_affected} righe, {result.audit_rows} righe audit")
+
+        except Exception as e:
+            if nested:
+                # Solo le scritture di questa chiamata: la transazione esterna resta aperta
+                if conn.in_transaction:
+                    conn.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+                    conn.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+            else:
+                conn.rollback()
+            failed = current.change_ids if current is not None else ['database']
+            result.errors = [
+                {'change_id': change_id, 'error': f"Errore applicazione modifica: {str(e)}"}
+                for change_id in dict.fromkeys(failed)
+            ]
+            result.rows_affected = 0
+            result.audit_rows = 0
+            result.touched_keys.clear()
+            result.deleted_keys.clear()
+        finally:
+            cursor.close()
+
+        return result
+
+    # === COMPILAZIONE ===
+
+    def _compile(
+        self,
+        changes: List[ChangeProposal],
+        spec: TableSpec,
+        table_columns: List[str],
+        errors: List[Dict[str, str]]
+    ) -> List[_Statement]:
+        """Compila le modifiche in istruzioni, unendo quelle consecutive compatibili."""
+        record_type = RecordType(changes[0].record_type)
+        statements: List[_Statement] = []
+
+        for change in changes:
+            try:
+                if RecordType(change.record_type) != record_type:
+                    raise ValueError("modifiche su tipi record diversi nello stesso batch")
+                statement = self._compile_change(change, spec, table_columns)
+            except ValueError as e:
+                errors.append({
+                    'change_id': change.change_id,
+                    'error': f"Errore applicazione modifica: {str(e)}"
+                })
+                continue
+
+            if statement is not None and not (statements and statements[-1].absorb(statement)):
+                statements.append(statement)
+
+        return statements
+
+    def _compile_change(
+        self,
+        change: ChangeProposal,
+        spec: TableSpec,
+        table_columns: List[str]
+    ) -> Optional[_Statement]:
+        operation = change.operation
+
+        if operation == OperationType.ADD_RECORD:
+            if not spec.insertable:
+                raise ValueError(f"inserimento non supportato sulla tabella {spec.table}")
+            record = self._db_values(spec, change.after_values, table_columns)
+            if record.get(spec.db_key) is None:
+                raise ValueError(f"campo chiave {spec.frame_key} mancante")
+            return _Statement('insert', [change.change_id], tuple(record), rows=[tuple(record.values())])
+
+        if operation in (OperationType.UPDATE_RECORD, OperationType.BATCH_UPDATE):
+            values = self._db_values(spec, change.after_values, table_columns)
+            if not values:
+                raise ValueError("nessun campo aggiornabile in after_values")
+            keys, where = self._compile_filter(spec, change.filter_criteria, table_columns)
+            columns, row = tuple(values), tuple(values.values())
+            if keys is not None:
+                return _Statement('update', [change.change_id], columns, rows=[row + (key,) for key in keys])
+            return _Statement('update', [change.change_id], columns, values=row, where=where)
+
+        if operation == OperationType.DELETE_RECORD:
+            keys, where = self._compile_filter(spec, change.filter_criteria, table_columns)
+            if keys is not None:
+                return _Statement('delete', [change.change_id], keys=keys)
+            return _Statement('delete', [change.change_id], where=where)
+
+        # Query e validate_fix non modificano il database
+        return None
+
+    def _compile_filter(
+        self,
+        spec: TableSpec,
+        criteria: Dict[str, Any],
+        table_columns: List[str]
+    ) -> Tuple[Optional[list], Optional[Tuple[str, list]]]:
+        """
+        Filtro -> (chiavi, None) se è solo sulla chiave, altrimenti (None, (clausola, parametri)).
+
+        Semantica di BatchOperations._build_mask: None -> IS NULL,
+        lista -> IN, altrimenti uguaglianza.
+        """
+        resolved = {}
+        for column, value in criteria.items():
+            db_column = self._db_column(spec, column, table_columns)
+            if db_column is None:
+                raise ValueError(f"campo filtro sconosciuto: {column}")
+            resolved[db_column] = value
+        if not resolved:
+            raise ValueError("filtro vuoto: la modifica riguarderebbe tutti i record")
+
+        if list(resolved) == [spec.db_key] and resolved[spec.db_key] is not None:
+            value = resolved[spec.db_key]
+            keys = value if isinstance(value, list) else [value]
+            return [self._db_value(key) for key in keys], None
+
+        clauses, params = [], []
+        for db_column, value in resolved.items():
+            if value is None:
+                clauses.append(f'"{db_column}" IS NULL')
+            elif isinstance(value, list):
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f'"{db_column}" IN ({", ".join("?" * len(value))})')
+                params.extend(self._db_value(v) for v in value)
+            else:
+                clauses.append(f'"{db_column}" = ?')
+                params.append(self._db_value(value))
+        return None, (' AND '.join(clauses), params)
+
+    @staticmethod
+    def _db_column(spec: TableSpec, column: str, table_columns: List[str]) -> Optional[str]:
+        """Colonna DB per un nome colonna del frame (o già nel formato DB)."""
+        db_column = spec.columns.get(column)
+        if db_column in table_columns:
+            return db_column
+        return column if column in table_columns else None
+
+    def _db_values(self, spec: TableSpec, values: Dict[str, Any], table_columns: List[str]) -> Dict[str, Any]:
+        """after_values -> {colonna DB: valore}; i campi sconosciuti sono ignorati come nel frame."""
+        record = {}
+        for column, value in values.items():
+            db_column = self._db_column(spec, column, table_columns)
+            if db_column is None:
+                continue
+            value = self._db_value(value)
+            if spec.null_value is not None and value == spec.null_value:
+                value = None
+            record[db_column] = value
+        return record
+
+    @staticmethod
+    def _db_value(value):
+        """Valore Python/pandas -> tipo bindabile da sqlite3 (NaN -> NULL)."""
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, np.generic):
+            value = value.item()
+        try:
+            if pd.isna(value):
+                return None
+        except (TypeError, ValueError):
+            pass
+        if isinstance(value, dt.datetime):
+            return value.isoformat(sep=' ')
+        if isinstance(value, dt.date):
+            return value.isoformat()
+        if isinstance(value, (int, float, bytes)):
+            return value
+        return str(value)
+
+    # === ESECUZIONE ===
+
+    def _execute(
+        self,
+        cursor: sqlite3.Cursor,
+        spec: TableSpec,
+        statement: _Statement,
+        touch_updated_at: bool,
+        audit: List[tuple],
+        result: ExecutionResult
+    ) -> None:
+        table, key = spec.table, spec.db_key
+
+        if statement.kind == 'insert':
+            columns = ', '.join(f'"{c}"' for c in statement.columns)
+            placeholders = ', '.join('?' * len(statement.columns))
+            cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", statement.rows)
+            for row in statement.rows:
+                record = dict(zip(statement.columns, row))
+                audit.append(self._audit_row(table, 'INSERT', record[key], None, record))
+                result.touched_keys.add(record[key])
+            result.rows_affected += len(statement.rows)
+            return
+
+        if statement.kind == 'delete':
+            if statement.where is None:
+                before = self._fetch_by_keys(cursor, spec, statement.keys)
+                for chunk in _chunks(list(before)):
+                    cursor.execute(
+                        f'DELETE FROM {table} WHERE "{key}" IN ({", ".join("?" * len(chunk))})', chunk
+                    )
+            else:
+                clause, params = statement.where
+                before = self._fetch_where(cursor, spec, clause, params)
+                cursor.execute(f"DELETE FROM {table} WHERE {clause}", params)
+            for record_key, record in before.items():
+                audit.append(self._audit_row(table, 'DELETE', record_key, record, None))
+            result.deleted_keys.update(before)
+            result.touched_keys.difference_update(before)
+            result.rows_affected += len(before)
+            return
+
+        # UPDATE
+        set_clause = ', '.join(f'"{c}" = ?' for c in statement.columns)
+        if touch_updated_at:
+            set_clause += ', updated_at = CURRENT_TIMESTAMP'
+
+        if statement.where is None:
+            keys = [row[-1] for row in statement.rows]
+            before = self._fetch_by_keys(cursor, spec, keys)
+            shared = {row[:-1] for row in statement.rows}
+            if len(shared) == 1:
+                values = next(iter(shared))
+                for chunk in _chunks(list(dict.fromkeys(keys))):
+                    cursor.execute(
+                        f'UPDATE {table} SET {set_clause} WHERE "{key}" IN ({", ".join("?" * len(chunk))})',
+                        values + tuple(chunk)
+                    )
+            else:
+                cursor.executemany(f'UPDATE {table} SET {set_clause} WHERE "{key}" = ?', statement.rows)
+            targets = [(row[-1], row[:-1]) for row in statement.rows]
+        else:
+            clause, params = statement.where
+            before = self._fetch_where(cursor, spec, clause, params)
+            cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {clause}", statement.values + tuple(params))
+            targets = [(record_key, statement.values) for record_key in before]
+
+        # Audit per campo, nell'ordine di applicazione (più update sulla stessa chiave)
+        state: Dict[Any, dict] = {}
+        for record_key, values in targets:
+            if record_key not in before:
+                continue
+            current = state.setdefault(record_key, dict(before[record_key]))
+            for column, value in zip(statement.columns, values):
+                old = current.get(column)
+                if not _same_value(old, value):
+                    audit.append(self._audit_row(
+                        table, 'UPDATE', record_key, {column: old}, {column: value}, column
+                    ))
+                current[column] = value
+
+        for record_key, record in state.items():
+            result.touched_keys.add(record.get(key, record_key))
+            if record.get(key, record_key) != record_key:
+                # Chiave modificata: il vecchio record non esiste più
+                result.touched_keys.add(record_key)
+        result.rows_affected += len(state)
+
+    @staticmethod
+    def _fetch_by_keys(cursor: sqlite3.Cursor, spec: TableSpec, keys: list) -> Dict[Any, dict]:
+        """Righe correnti per chiave (SELECT ... WHERE chiave IN a blocchi)."""
+        rows = {}
+        for chunk in _chunks(list(dict.fromkeys(keys))):
+            cursor.execute(
+                f'SELECT * FROM {spec.table} WHERE "{spec.db_key}" IN ({", ".join("?" * len(chunk))})', chunk
+            )
+            for row in cursor.fetchall():
+                record = dict(row)
+                rows[record[spec.db_key]] = record
+        return rows
+
+    @staticmethod
+    def _fetch_where(cursor: sqlite3.Cursor, spec: TableSpec, clause: str, params: list) -> Dict[Any, dict]:
+        cursor.execute(f"SELECT * FROM {spec.table} WHERE {clause}", params)
+        return {dict(row)[spec.db_key]: dict(row) for row in cursor.fetchall()}
+
+    # === AUDIT ===
+
+    def _audit_row(
+        self,
+        table: str,
+        operation: str,
+        record_key,
+        before: Optional[dict],
+        after: Optional[dict],
+        field_name: Optional[str] = None
+    ) -> tuple:
+        return (
+            table,
+            operation,
+            str(record_key),
+            json.dumps(before, default=str) if before else None,
+            json.dumps(after, default=str) if after else None,
+            self.db._classify_change_severity(field_name, before, after),
+            field_name
+        )
+
+    @staticmethod
+    def _write_audit(
+        cursor: sqlite3.Cursor,
+        audit: List[tuple],
+        user_action: str,
+        import_version_id: Optional[int]
+    ) -> int:
+        """Scrive le righe audit con un solo executemany (schema audit_log di DatabaseHandler)."""
+        if not audit:
+            return 0
+
+        cursor.execute("PRAGMA table_info(audit_log)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'record_key' not in columns:
+            print("⚠️ audit_log senza colonna record_key: righe audit non scritte")
+            return 0
+
+        base = ['table_name', 'operation', 'record_key', 'before_values', 'after_values']
+        extra = ['user_action'] if 'user_action' in columns else []
+        versioned = _AUDIT_VERSIONED <= columns
+        if versioned:
+            extra += ['import_version_id', 'change_severity', 'field_name']
+
+        rows = []
+        for table, operation, record_key, before, after, severity, field_name in audit:
+            row = [table, operation, record_key, before, after]
+            if 'user_action' in columns:
+                row.append(user_action)
+            if versioned:
+                row += [import_version_id, severity, field_name]
+            rows.append(tuple(row))
+
+        names = base + extra
+        cursor.executemany(
+            f"INSERT INTO audit_log ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            rows
+        )
+        return len(rows)
+
+    # === CACHE DATAFRAME ===
+
+    def refresh_frame(self, df: Optional[pd.DataFrame], result: ExecutionResult) -> Optional[pd.DataFrame]:
+        """
+        Riallinea il DataFrame in sessione rileggendo dal DB solo le chiavi toccate.
+
+        Le righe toccate prendono i valori riletti per tutte le colonne del
+        frame presenti in tabella (mappate o con lo stesso nome, come
+        created_at/updated_at); quelle nuove sono accodate e quelle non più
+        presenti nel DB rimosse. Le altre righe restano invariate e ogni
+        colonna mantiene il tipo che aveva nel frame.
+        """
+        spec = TABLE_SPECS.get(result.table)
+        keys = result.touched_keys | result.deleted_keys
+        if df is None or spec is None or not keys or spec.frame_key not in df.columns:
+            return df
+
+        cursor = self.db.get_connection().cursor()
+        try:
+            rows = self._fetch_by_keys(cursor, spec, list(keys))
+        finally:
+            cursor.close()
+
+        frame_columns = spec.frame_columns
+        records = {
+            record_key: {
+                frame_columns.get(column, column): (spec.null_value if value is None else value)
+                for column, value in row.items()
+                if frame_columns.get(column, column) in df.columns
+            }
+            for record_key, row in rows.items()
+        }
+        refreshed = [
+            column for column in df.columns
+            if column != spec.frame_key and any(column in record for record in records.values())
+        ]
+
+        df_result = df.copy()
+        key_series = df_result[spec.frame_key]
+        in_keys = key_series.isin(list(keys))
+        present = key_series.isin(list(records))
+
+        # Righe esistenti: un loc per colonna
+        if present.any():
+            present_keys = key_series[present]
+            for column in refreshed:
+                values = present_keys.map(lambda k: records[k].get(column)).to_numpy(dtype=object)
+                try:
+                    df_result.loc[present, column] = values
+                except (TypeError, ValueError):
+                    df_result[column] = df_result[column].astype(object)
+                    df_result.loc[present, column] = values
+
+        # Record rimossi (o con chiave cambiata) e record nuovi
+        stale = in_keys & ~present
+        loaded = set(key_series[present].tolist())
+        new_keys = [k for k in records if k not in loaded]
+        if stale.any() or new_keys:
+            df_result = df_result[~stale.to_numpy()]
+            if new_keys:
+                new_rows = pd.DataFrame(
+                    [{column: records[k].get(column) for column in df_result.columns} for k in new_keys],
+                    columns=df_result.columns
+                )
+                df_result = pd.concat([df_result, new_rows], ignore_index=True)
+            df_result = df_result.reset_index(drop=True)
+
+        return _restore_dtypes(df_result, df.dtypes)
+
+
+def _chunks(items: list, size: Optional[int] = None):
+    size = size or config.DB_KEY_CHUNK
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _same_value(old, new) -> bool:
+    """Confronto tollerante all'affinità TEXT di SQLite (5 e '5' coincidono)."""
+    if old is None or new is None:
+        return old is None and new is None
+    return old == new or str(old) == str(new)
+
+
+def _restore_dtypes(df: pd.DataFrame, dtypes: pd.Series) -> pd.DataFrame:
+    """
+    Riporta le colonne al tipo del frame originale (SQLite restituisce
+    int/float anche per colonne testo, e le assegnazioni miste passano a object).
+    """
+    for column, dtype in dtypes.items():
+        series = df[column]
+        if series.dtype == dtype:
+            continue
+        if pd.api.types.is_string_dtype(dtype) and dtype != object:
+            series = series.map(lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+        try:
+            df[column] = series.astype(dtype)
+        except (TypeError, ValueError):
+            pass
+    return df
@@ -6,6 +6,8 @@ import json
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from services.database import DatabaseHandler
+from services.excel_stream_writer import stream_dataframes_to_excel
+from services.tabular_io import write_query, write_table
 
 
 class ChangeReportGenerator:
@@ -26,6 +28,17 @@ class ChangeReportGenerator:
         """
         self.db = db_handler
 
+    REPORT_COLUMNS = [
+        'Timestamp', 'Gravità', 'Tipo', 'Operazione',
+        'Chiave', 'Campo', 'Descrizione'
+    ]
+
+    _AUDIT_SELECT = """
+        SELECT timestamp, table_name, operation, record_key,
+               before_values, after_values, change_severity, field_name
+        FROM audit_log
+    """
+
     def generate_import_report(self, import_version_id: int) -> pd.DataFrame:
         """
         Genera report per un singolo import version.
@@ -43,54 +56,7 @@ class ChangeReportGenerator:
             - Campo: Nome campo modificato
             - Descrizione: Frase italiana descrittiva
         """
-        cursor = self.db.conn.cursor()
-
-        try:
-            # Query audit log per questa versione
-            cursor.execute("""
-                SELECT timestamp, table_name, operation, record_key,
-                       before_values, after_values, change_severity, field_name
-                FROM audit_log
-                WHERE import_version_id = ?
-                ORDER BY timestamp DESC
-            """, (import_version_id,))
-
-            rows = cursor.fetchall()
-
-            if not rows:
-                return pd.DataFrame(columns=[
-                    'Timestamp', 'Gravità', 'Tipo', 'Operazione',
-                    'Chiave', 'Campo', 'Descrizione'
-                ])
-
-            # Converti in report entries
-            report_entries = []
-            for row in rows:
-                timestamp, table_name, operation, record_key, before_json, after_json, severity, field_name = row
-
-                # Parse JSON
-                before = json.loads(before_json) if before_json else None
-                after = json.loads(after_json) if after_json else None
-
-                # Genera descrizione italiana
-                description = self._generate_change_description(
-                    operation, table_name, record_key, field_name, before, after
-                )
-
-                report_entries.append({
-                    'Timestamp': timestamp,
-                    'Gravità': severity or 'MEDIUM',
-                    'Tipo': table_name,
-                    'Operazione': self._translate_operation(operation),
-                    'Chiave': record_key,
-                    'Campo': self._translate_field_name(field_name) if field_name else '-',
-                    'Descrizione': description
-                })
-
-            return pd.DataFrame(report_entries)
-
-        finally:
-            cursor.close()
+        return self._report_frame(*self._import_query(import_version_id))
 
     def generate_summary_report(self, days: int = 30) -> pd.DataFrame:
         """
@@ -102,58 +68,54 @@ class ChangeReportGenerator:
         Returns:
             DataFrame con report completo modifiche recenti
         """
-        cursor = self.db.conn.cursor()
-
+        return self._report_frame(*self._summary_query(days))
+
+    def _import_query(self, import_version_id: int):
+        return (
+            self._AUDIT_SELECT + " WHERE import_version_id = ? ORDER BY timestamp DESC",
+            (import_version_id,)
+        )
+
+    def _summary_query(self, days: int):
+        # Calcola data limite
+        cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        return (
+            self._AUDIT_SELECT + " WHERE timestamp >= ? ORDER BY timestamp DESC",
+            (cutoff_date,)
+        )
+
+    def _report_frame(self, sql: str, params: tuple) -> pd.DataFrame:
+        cursor = self.db.get_connection().cursor()
         try:
-            # Calcola data limite
-            cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
-
-            # Query tutte le modifiche recenti
-            cursor.execute("""
-                SELECT timestamp, table_name, operation, record_key,
-                       before_values, after_values, change_severity, field_name
-                FROM audit_log
-                WHERE timestamp >= ?
-                ORDER BY timestamp DESC
-            """, (cutoff_date,))
-
-            rows = cursor.fetchall()
-
-            if not rows:
-                return pd.DataFrame(columns=[
-                    'Timestamp', 'Gravità', 'Tipo', 'Operazione',
-                    'Chiave', 'Campo', 'Descrizione'
-                ])
-
-            # Converti in report entries
-            report_entries = []
-            for row in rows:
-                timestamp, table_name, operation, record_key, before_json, after_json, severity, field_name = row
-
-                # Parse JSON
-                before = json.loads(before_json) if before_json else None
-                after = json.loads(after_json) if after_json else None
-
-                # Genera descrizione
-                description = self._generate_change_description(
-                    operation, table_name, record_key, field_name, before, after
-                )
-
-                report_entries.append({
-                    'Timestamp': timestamp,
-                    'Gravità': severity or 'MEDIUM',
-                    'Tipo': table_name,
-                    'Operazione': self._translate_operation(operation),
-                    'Chiave': record_key,
-                    'Campo': self._translate_field_name(field_name) if field_name else '-',
-                    'Descrizione': description
-                })
-
-            return pd.DataFrame(report_entries)
-
+            cursor.execute(sql, params)
+            rows = [self._report_row(row) for row in cursor.fetchall()]
+            return pd.DataFrame(rows, columns=self.REPORT_COLUMNS)
         finally:
             cursor.close()
 
+    def _report_row(self, row) -> tuple:
+        """Converte una riga audit_log in una riga di report (ordine REPORT_COLUMNS)."""
+        timestamp, table_name, operation, record_key, before_json, after_json, severity, field_name = tuple(row)
+
+        # Parse JSON
+        before = json.loads(before_json) if before_json else None
+        after = json.loads(after_json) if after_json else None
+
+        # Genera descrizione italiana
+        description = self._generate_change_description(
+            operation, table_name, record_key, field_name, before, after
+        )
+
+        return (
+            timestamp,
+            severity or 'MEDIUM',
+            table_name,
+            self._translate_operation(operation),
+            record_key,
+            self._translate_field_name(field_name) if field_name else '-',
+            description
+        )
+
     def export_to_excel(self, report_df: pd.DataFrame, output_path: str):
         """
         Export report a Excel con color-coding per severity.
@@ -162,8 +124,51 @@ class ChangeReportGenerator:
             report_df: DataFrame report da esportare
             output_path: Path file Excel output
         """
-        # Basic export (color-coding opzionale, non prioritario)
-        report_df.to_excel(output_path, index=False, engine='openpyxl')
+        # Basic export (color-coding opzionale, non prioritario), write-only
+        stream_dataframes_to_excel(output_path, [('Sheet1', report_df)])
+
+    def export_report(self, report_df: pd.DataFrame, output_path: str,
+                      export_format: Optional[str] = None):
+        """
+        Export report in Excel, CSV o Parquet.
+
+        Args:
+            report_df: DataFrame report da esportare
+            output_path: Path file output
+            export_format: 'xlsx', 'csv' o 'parquet' (default: dall'estensione)
+        """
+        write_table(report_df, output_path, export_format)
+
+    def stream_report(self, output_path: str,
+                      import_version_id: Optional[int] = None,
+                      days: int = 30,
+                      export_format: Optional[str] = None) -> int:
+        """
+        Export report direttamente da audit_log, senza DataFrame.
+
+        Il cursore è letto a blocchi (fetchmany) e le righe scritte su un
+        workbook write-only, un CSV o un Parquet a row group: memoria
+        costante qualunque sia il numero di modifiche.
+
+        Args:
+            output_path: Path file output
+            import_version_id: Report di una versione import (altrimenti summary)
+            days: Giorni inclusi nel summary
+            export_format: 'xlsx', 'csv' o 'parquet' (default: dall'estensione)
+
+        Returns:
+            Numero di righe esportate
+        """
+        if import_version_id is not None:
+            sql, params = self._import_query(import_version_id)
+        else:
+            sql, params = self._summary_query(days)
+
+        return write_query(
+            self.db.get_connection(), sql, output_path, params,
+            columns=self.REPORT_COLUMNS, transform=self._report_row,
+            fmt=export_format
+        )
 
     # === HELPER METHODS ===
 
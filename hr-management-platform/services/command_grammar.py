@@ -0,0 +1,442 @@
+"""
+Grammatica deterministica per i comandi bot più comuni.
+
+Riconosce in millisecondi le forme frequenti, senza passare dal LLM:
+- spostamento per sede: "sposta tutti i dipendenti di Milano a Roma"
+- flag ruolo: "rendi Mario Rossi approvatore", "togli il ruolo cassiere a RSSMRA80A01H501Z"
+- query per UO/ruolo: "mostra chi è approvatore in Amministrazione", "elenca i dipendenti di Roma"
+- conteggi: "quanti dipendenti ci sono a Milano?", "quanti approvatori in Finanza"
+
+Sedi, unità e persone sono risolte sui dati correnti: se il comando ha
+la forma giusta ma un valore non è riconosciuto la grammatica non risponde
+(None) e CommandParser passa il comando al LLM.
+"""
+import re
+import unicodedata
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+from models.bot_models import BotResponse, ChangeProposal, OperationType, RecordType
+from services.perf_trace import timed
+
+# Flag ruolo: forma nel comando (senza accenti) → colonna Personale
+ROLE_FLAGS = {
+    'approvatore': 'Approvatore', 'approvatori': 'Approvatore',
+    'viaggiatore': 'Viaggiatore', 'viaggiatori': 'Viaggiatore',
+    'controllore': 'Controllore', 'controllori': 'Controllore',
+    'cassiere': 'Cassiere', 'cassieri': 'Cassiere',
+    'segretario': 'Segretario', 'segretaria': 'Segretario', 'segretari': 'Segretario',
+    'visualizzatore': 'Visualizzatori', 'visualizzatori': 'Visualizzatori',
+    'amministrazione': 'Amministrazione',
+}
+# Valori che indicano flag attivo (come in DBOrgImportService)
+ROLE_TRUE_VALUES = ['SI', 'SÌ', 'YES', 'S', 'X', '1']
+# Valore scritto per attivare un flag: lo stesso confrontato da ricerca,
+# organigrammi e SyncChecker
+ROLE_SET_VALUE = 'SÌ'
+
+_ROLE = r'(?P<role>' + '|'.join(sorted(ROLE_FLAGS, key=len, reverse=True)) + r')'
+_PEOPLE = r'(?:dipendenti|persone|personale|colleghi|risorse)'
+_IN = r'(?:in|di|del|della|dello|dell|nella|nel|nello|nell|a|al|alla|all|presso|per)'
+_ARTICLE = r'(?:(?:tutti|tutte)\s+)?(?:(?:i|gli|le|il|la)\s+)?'
+_CF = re.compile(r'\b[A-Z]{6}\d{2}[A-Z]\d{2}[A-Z]\d{3}[A-Z]\b', re.I)
+
+_MOVE = re.compile(
+    rf'^(?:sposta|trasferisci|muovi|cambia\s+(?:la\s+)?sede\s+(?:a\s+|de(?:i|gli)\s+)?)\s*{_ARTICLE}{_PEOPLE}?\s*'
+    rf'(?:(?:della|dalla)\s+sede\s+(?:di\s+)?|(?:di|da|a|in)\s+|sede\s+)(?P<rest>.+)$'
+)
+_MOVE_TARGET = re.compile(r'\s+(?:a|in|su|verso|nella\s+sede\s+(?:di\s+)?|alla\s+sede\s+(?:di\s+)?|sede)\s+')
+_ROLE_SET = [
+    re.compile(rf'^(?:imposta|rendi|nomina|fai|metti)\s+(?P<who>.+?)\s+(?:come\s+)?(?:(?:un|una)\s+)?{_ROLE}$'),
+    re.compile(rf'^(?:rendi|nomina|imposta\s+come)\s+{_ROLE}\s+(?P<who>.+)$'),
+    re.compile(rf'^(?:assegna|aggiungi|dai|attiva|imposta)\s+(?:il\s+)?(?:ruolo\s+(?:di\s+)?|flag\s+)?{_ROLE}\s+(?:a|per)\s+(?P<who>.+)$'),
+]
+_ROLE_UNSET = [
+    re.compile(rf'^(?:togli|rimuovi|revoca|disattiva|leva)\s+(?:il\s+)?(?:ruolo\s+(?:di\s+)?|flag\s+)?{_ROLE}\s+(?:a|da|per)\s+(?P<who>.+)$'),
+]
+_SHOW = r'(?:(?:mostra|mostrami|elenca|visualizza|trova|cerca|dimmi|lista)\s+)?(?:(?:chi\s+e|chi\s+sono)\s+)?'
+_QUERY_ROLE = re.compile(rf'^{_SHOW}{_ARTICLE}(?:(?:ruolo\s+(?:di\s+)?|flag\s+))?{_ROLE}(?:\s+{_IN}\s+(?P<scope>.+))?$')
+_QUERY_PEOPLE = re.compile(rf'^(?:mostra|mostrami|elenca|visualizza|trova|cerca|lista)\s+{_ARTICLE}{_PEOPLE}\s+{_IN}\s+(?P<scope>.+)$')
+_QUERY_NO_SEDE = re.compile(rf'^(?:mostra|mostrami|elenca|visualizza|trova|cerca|lista)\s+{_ARTICLE}{_PEOPLE}\s+senza\s+sede(?:\s+assegnata)?$')
+_COUNT = re.compile(
+    rf'^(?:quanti|quante|conta|numero\s+(?:di\s+)?)\s*(?:sono\s+)?{_ARTICLE}(?:(?P<people>{_PEOPLE})|{_ROLE})'
+    rf'(?:\s+(?:ci\s+sono\s+)?(?:(?P<no_sede>senza\s+sede)|{_IN}\s+(?P<scope>.+?)))?(?:\s+ci\s+sono)?$'
+)
+_PLACE_NAME = re.compile(r"^[^\W\d_]+(?:[ '’-][^\W\d_]+){0,2}$")
+# Parole che in un nome di sede indicano altro (eccezioni, secondi comandi, ...)
+_NOT_PLACE_WORDS = {
+    'tranne', 'eccetto', 'escluso', 'esclusa', 'esclusi', 'salvo', 'poi', 'e', 'ed', 'ma', 'che',
+    'con', 'senza', 'per', 'solo', 'anche', 'non', 'tutti', 'tutte', 'in', 'di', 'a', 'da', 'se',
+}
+_SCOPE_SEDE = re.compile(r'^(?:sede|citta)\s+(?:di\s+)?')
+_SCOPE_UO = re.compile(r'^(?:unita(?:\s+organizzativa)?|uo|struttura|ufficio|reparto)\s+')
+
+
+def fold(text: str) -> str:
+    """
+    Minuscolo senza accenti, apostrofi come spazi: un carattere per
+    carattere, così gli span sul testo normalizzato valgono sull'originale.
+    """
+    out = []
+    for ch in text:
+        if ch in "'’`\"":
+            out.append(' ')
+        else:
+            out.append(unicodedata.normalize('NFKD', ch)[0].lower()[0])
+    return ''.join(out)
+
+
+def _clean(value: str) -> str:
+    return re.sub(r'\s+', ' ', value).strip(" \t'\"’`")
+
+
+def _risk(count: int) -> str:
+    """low (singolo), medium (<10), high (≥10)."""
+    return 'low' if count <= 1 else 'medium' if count < 10 else 'high'
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[str]:
+    """Colonna per nome, ignorando spazi finali (UNITA' OPERATIVA PADRE )."""
+    for col in df.columns:
+        if str(col).strip() == name:
+            return col
+    return None
+
+
+def _value_index(series: pd.Series) -> Dict[str, Any]:
+    """{valore normalizzato: valore originale} dei valori distinti."""
+    return {_clean(fold(str(v))): v for v in series.dropna().unique() if str(v).strip()}
+
+
+class CommandGrammar:
+    """Parser a regole per i comandi frequenti: BotResponse o None (→ LLM)."""
+
+    @timed('bot', name='CommandGrammar.parse', rows=None)
+    def parse(
+        self,
+        user_input: str,
+        personale_df: pd.DataFrame,
+        strutture_df: pd.DataFrame
+    ) -> Optional[BotResponse]:
+        """
+        Interpreta il comando se ha una forma nota.
+
+        Returns:
+            BotResponse, o None se la grammatica non riconosce il comando
+        """
+        original = user_input.strip().rstrip('?.!;').strip()
+        text = fold(original)
+        if not text or personale_df is None:
+            return None
+
+        for handler in (self._move_by_sede, self._role_flag, self._count, self._query):
+            response = handler(original, text, personale_df, strutture_df)
+            if response is not None:
+                return response
+        return None
+
+    # ========== RISOLUZIONE VALORI ==========
+
+    def _resolve_scope(
+        self,
+        scope: str,
+        personale_df: pd.DataFrame,
+        strutture_df: pd.DataFrame
+    ) -> Optional[Tuple[Dict[str, Any], pd.Series, str]]:
+        """
+        Sede o unità organizzativa → (filter_criteria, maschera, etichetta).
+
+        Ordine: Sede_TNS, Unità Organizzativa, codice UO padre, descrizione
+        struttura (→ codice); "sede ..." e "unità ..." restringono la ricerca.
+        """
+        scope = _clean(scope)
+        only_sede = bool(_SCOPE_SEDE.match(scope))
+        only_uo = bool(_SCOPE_UO.match(scope))
+        scope = _clean(_SCOPE_UO.sub('', _SCOPE_SEDE.sub('', scope)))
+        if not scope:
+            return None
+
+        candidates = []
+        if not only_uo:
+            candidates.append(('Sede_TNS', 'sede'))
+        if not only_sede:
+            candidates.append(('Unità Organizzativa', 'unità'))
+            parent = _column(personale_df, "UNITA' OPERATIVA PADRE")
+            if parent:
+                candidates.append((parent, 'unità'))
+
+        for col, kind in candidates:
+            if col not in personale_df.columns:
+                continue
+            value = _value_index(personale_df[col]).get(scope)
+            if value is not None:
+                return {col: value}, personale_df[col] == value, f"{kind} {value}"
+
+        parent = _column(personale_df, "UNITA' OPERATIVA PADRE")
+        if not only_sede and parent and strutture_df is not None and \
+                'DESCRIZIONE' in strutture_df.columns and 'Codice' in strutture_df.columns:
+            match = strutture_df[strutture_df['DESCRIZIONE'].map(lambda v: _clean(fold(str(v))) == scope)]
+            if not match.empty:
+                codici = match['Codice'].dropna().tolist()
+                label = f"unità {match['DESCRIZIONE'].iloc[0]}"
+                return {parent: codici[0] if len(codici) == 1 else codici}, personale_df[parent].isin(codici), label
+        return None
+
+    def _resolve_people(
+        self,
+        original: str,
+        who: str,
+        personale_df: pd.DataFrame,
+        strutture_df: pd.DataFrame
+    ) -> Optional[Tuple[Dict[str, Any], pd.DataFrame, str]]:
+        """Persona (CF o nominativo) o gruppo ("tutti i dipendenti di X") → (filtro, righe, etichetta)."""
+        cf_match = _CF.search(original)
+        if cf_match and 'TxCodFiscale' in personale_df.columns:
+            cf = cf_match.group(0).upper()
+            rows = personale_df[personale_df['TxCodFiscale'].astype(str).str.upper() == cf]
+            return ({'TxCodFiscale': cf}, rows, cf) if not rows.empty else None
+
+        group = re.match(rf'^{_ARTICLE}{_PEOPLE}\s+{_IN}\s+(?P<scope>.+)$', who)
+        if group:
+            scope = self._resolve_scope(group.group('scope'), personale_df, strutture_df)
+            if scope is None:
+                return None
+            criteria, mask, label = scope
+            return criteria, personale_df[mask], f"Dipendenti in {label}"
+
+        if 'Titolare' not in personale_df.columns:
+            return None
+        name = _clean(who)
+        reversed_name = ' '.join(reversed(name.split()))
+        folded = personale_df['Titolare'].map(lambda v: _clean(fold(str(v))) if pd.notna(v) else '')
+        rows = personale_df[(folded == name) | (folded == reversed_name)]
+        if rows.empty:
+            return None
+        if len(rows) == 1 and 'TxCodFiscale' in rows.columns:
+            return {'TxCodFiscale': rows['TxCodFiscale'].iloc[0]}, rows, str(rows['Titolare'].iloc[0])
+        return {'Titolare': rows['Titolare'].iloc[0]}, rows, str(rows['Titolare'].iloc[0])
+
+    @staticmethod
+    def _records(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Prime righe per il risultato query (colonne identificative, JSON-safe)."""
+        shown = [c for c in ('TxCodFiscale', 'Titolare', 'Unità Organizzativa', 'Sede_TNS') if c in rows.columns]
+        records = rows[shown].head(config.BOT_QUERY_MAX_RECORDS)
+        return records.astype(object).where(records.notna(), None).to_dict('records')
+
+    @staticmethod
+    def _role_mask(df: pd.DataFrame, column: str) -> pd.Series:
+        return df[column].astype(str).str.strip().str.upper().isin(ROLE_TRUE_VALUES)
+
+    # ========== COMANDI ==========
+
+    def _move_by_sede(self, original, text, personale_df, strutture_df) -> Optional[BotResponse]:
+        match = _MOVE.match(text)
+        if not match or 'Sede_TNS' not in personale_df.columns:
+            return None
+        rest_start = match.start('rest')
+        rest = match.group('rest')
+        sedi = _value_index(personale_df['Sede_TNS'])
+
+        # Separatore "a/in/verso": il primo che lascia a sinistra una sede esistente
+        for sep in _MOVE_TARGET.finditer(rest):
+            source = sedi.get(_clean(_SCOPE_SEDE.sub('', _clean(rest[:sep.start()]))))
+            target_text = _clean(original[rest_start + sep.end():])
+            if source is None or not target_text:
+                continue
+            target = sedi.get(_clean(_SCOPE_SEDE.sub('', fold(target_text))))
+            if target is None:
+                # Sede nuova: solo un nome di luogo, senza altre parole né punteggiatura
+                target = _clean(re.sub(r'^(?:sede|città)\s+(?:di\s+)?', '', target_text, flags=re.I))
+                if not self._is_new_place(target, personale_df, strutture_df):
+                    return None
+
+            count = int((personale_df['Sede_TNS'] == source).sum())
+            if source == target:
+                return BotResponse(
+                    success=True,
+                    message=f"I {count} dipendenti sono già nella sede {source}: nessuna modifica.",
+                    operation=OperationType.QUERY,
+                    changes=[]
+                )
+            change = ChangeProposal(
+                change_id=str(uuid.uuid4()),
+                operation=OperationType.BATCH_UPDATE,
+                record_type=RecordType.PERSONALE,
+                filter_criteria={'Sede_TNS': source},
+                affected_records_count=count,
+                before_values={'Sede_TNS': source},
+                after_values={'Sede_TNS': target},
+                description=f"Sposta dipendenti da sede {source} a {target} ({count} record)",
+                risk_level=_risk(count)
+            )
+            new_sede = '' if target in sedi.values() else f" ({target} è una nuova sede)"
+            return BotResponse(
+                success=True,
+                message=f"Ho trovato {count} dipendenti con sede {source}. Li sposterò tutti a {target}{new_sede}. "
+                        f"Conferma per procedere.",
+                operation=OperationType.BATCH_UPDATE,
+                changes=[change]
+            )
+        return None
+
+    def _is_new_place(self, name: str, personale_df, strutture_df) -> bool:
+        """
+        Nome di luogo plausibile per una sede nuova: fino a tre parole, nessuna
+        parola di collegamento, e non un'unità, un ruolo o un dipendente.
+        """
+        if not _PLACE_NAME.match(name):
+            return False
+        folded = _clean(fold(name))
+        if any(word in _NOT_PLACE_WORDS for word in folded.split()) or folded in ROLE_FLAGS:
+            return False
+        if self._resolve_scope(f"unita {folded}", personale_df, strutture_df) is not None:
+            return False
+        if 'Titolare' in personale_df.columns:
+            names = personale_df['Titolare'].dropna().map(lambda v: _clean(fold(str(v))))
+            reversed_name = ' '.join(reversed(folded.split()))
+            if names.isin([folded, reversed_name]).any():
+                return False
+        return True
+
+    def _role_flag(self, original, text, personale_df, strutture_df) -> Optional[BotResponse]:
+        for patterns, enable in ((_ROLE_SET, True), (_ROLE_UNSET, False)):
+            for pattern in patterns:
+                match = pattern.match(text)
+                if match:
+                    return self._role_change(original, match, enable, personale_df, strutture_df)
+        return None
+
+    def _role_change(self, original, match, enable, personale_df, strutture_df) -> Optional[BotResponse]:
+        column = ROLE_FLAGS[match.group('role')]
+        if column not in personale_df.columns:
+            return None
+        people = self._resolve_people(original, match.group('who'), personale_df, strutture_df)
+        if people is None:
+            return None
+        criteria, rows, label = people
+        if 'Titolare' in criteria and len(rows) > 1:
+            # Omonimi: serve il codice fiscale
+            return BotResponse(
+                success=True,
+                message=f"Ci sono {len(rows)} dipendenti di nome {label}: indica il codice fiscale.",
+                operation=OperationType.QUERY,
+                changes=[],
+                query_result={'filter': criteria, 'count': len(rows), 'action': 'display',
+                              'records': self._records(rows)}
+            )
+
+        # Solo i record da cambiare
+        has_role = self._role_mask(rows, column)
+        rows = rows[~has_role] if enable else rows[has_role]
+        new_value = ROLE_SET_VALUE if enable else None
+        action = f"imposta {column}" if enable else f"rimuove {column}"
+        if rows.empty:
+            state = "ha già" if enable else "non ha"
+            return BotResponse(
+                success=True,
+                message=f"{label} {state} il flag {column}: nessuna modifica.",
+                operation=OperationType.QUERY,
+                changes=[]
+            )
+
+        changes = []
+        for idx, row in rows.head(config.BOT_MAX_BATCH_SIZE).iterrows():
+            before = row.to_dict()
+            cf = before.get('TxCodFiscale')
+            changes.append(ChangeProposal(
+                change_id=str(uuid.uuid4()),
+                operation=OperationType.UPDATE_RECORD,
+                record_type=RecordType.PERSONALE,
+                filter_criteria={'TxCodFiscale': cf} if cf else criteria,
+                affected_records_count=1,
+                before_values=before,
+                after_values={**before, column: new_value},
+                description=f"{before.get('Titolare') or cf or idx}: {action}",
+                risk_level='low'
+            ))
+        extra = f" (prime {len(changes)} di {len(rows)})" if len(rows) > len(changes) else ""
+        return BotResponse(
+            success=True,
+            message=f"{label}: {action} su {len(rows)} record{extra}. Conferma per procedere.",
+            operation=OperationType.UPDATE_RECORD,
+            changes=changes
+        )
+
+    def _count(self, original, text, personale_df, strutture_df) -> Optional[BotResponse]:
+        match = _COUNT.match(text)
+        if not match:
+            return None
+        selection = self._select(match, personale_df, strutture_df)
+        if selection is None:
+            return None
+        criteria, rows, label = selection
+        return BotResponse(
+            success=True,
+            message=f"{label}: {len(rows)}.",
+            operation=OperationType.QUERY,
+            changes=[],
+            query_result={'filter': criteria, 'count': len(rows), 'action': 'count'}
+        )
+
+    def _query(self, original, text, personale_df, strutture_df) -> Optional[BotResponse]:
+        match = _QUERY_ROLE.match(text) or _QUERY_PEOPLE.match(text) or _QUERY_NO_SEDE.match(text)
+        if not match:
+            return None
+        selection = self._select(match, personale_df, strutture_df)
+        if selection is None:
+            return None
+        criteria, rows, label = selection
+
+        records = self._records(rows)
+        extra = f" (primi {len(records)})" if len(rows) > len(records) else ""
+        return BotResponse(
+            success=True,
+            message=f"{label}: {len(rows)} trovati{extra}.",
+            operation=OperationType.QUERY,
+            changes=[],
+            query_result={'filter': criteria, 'count': len(rows), 'action': 'display', 'records': records}
+        )
+
+    def _select(self, match, personale_df, strutture_df) -> Optional[Tuple[Dict[str, Any], pd.DataFrame, str]]:
+        """Filtro di query/conteggio: ruolo e/o sede-UO, oppure senza sede."""
+        groups = match.groupdict()
+        criteria: Dict[str, Any] = {}
+        mask = pd.Series(True, index=personale_df.index)
+        label = "Dipendenti"
+
+        role = groups.get('role')
+        if role:
+            column = ROLE_FLAGS[role]
+            if column not in personale_df.columns:
+                return None
+            # "mostra amministrazione": ruolo o unità con lo stesso nome? Senza
+            # "chi è"/"ruolo"/"flag" il comando è ambiguo e passa al LLM
+            explicit = re.search(r'\b(?:chi\s+e|chi\s+sono|ruolo|flag)\b', match.string)
+            if not explicit and self._resolve_scope(role, personale_df, strutture_df) is not None:
+                return None
+            criteria[column] = ROLE_SET_VALUE
+            mask &= self._role_mask(personale_df, column)
+            label = f"Dipendenti con flag {column}"
+
+        if groups.get('no_sede') or match.re is _QUERY_NO_SEDE:
+            if 'Sede_TNS' not in personale_df.columns:
+                return None
+            criteria['Sede_TNS'] = None
+            mask &= personale_df['Sede_TNS'].isna() | (personale_df['Sede_TNS'].astype(str).str.strip() == '')
+            label += " senza sede"
+        elif groups.get('scope'):
+            scope = self._resolve_scope(groups['scope'], personale_df, strutture_df)
+            if scope is None:
+                return None
+            scope_criteria, scope_mask, scope_label = scope
+            criteria.update(scope_criteria)
+            mask &= scope_mask
+            label += f" in {scope_label}"
+        elif not role:
+            # "quanti dipendenti": totale
+            label = "Dipendenti totali"
+
+        return criteria, personale_df[mask], label
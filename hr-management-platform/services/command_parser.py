@@ -1,11 +1,16 @@
 """
 Parser comandi linguaggio naturale → operazioni strutturate.
-Usa Ollama LLM per interpretare comandi utente e generare modifiche proposte.
+I comandi frequenti passano dalla grammatica deterministica
+(services/command_grammar.py); gli altri da Ollama LLM, che interpreta
+il comando e genera le modifiche proposte.
 """
+import logging
 import pandas as pd
 import json
 import uuid
 from typing import Dict, Any, List
+import config
+from services.command_grammar import CommandGrammar
 from services.ollama_client import OllamaClient
 from models.bot_models import (
     OperationType,
@@ -18,17 +23,20 @@ from prompts.system_prompts_simple import (
     get_simple_examples
 )
 
+logger = logging.getLogger(__name__)
+
 
 class CommandParser:
     """
     Parser comandi NL per operazioni HR.
 
     Workflow:
-    1. User input → build context (stats DataFrame)
-    2. Generate prompt con examples
-    3. Call Ollama LLM
-    4. Parse JSON response
-    5. Convert to BotResponse con ChangeProposal validati
+    1. User input → grammatica deterministica (se riconosce il comando: fine)
+    2. Build context (stats DataFrame)
+    3. Generate prompt con examples
+    4. Call Ollama LLM
+    5. Parse JSON response
+    6. Convert to BotResponse con ChangeProposal validati
     """
 
     def __init__(self, ollama_client: OllamaClient):
@@ -39,6 +47,22 @@ class CommandParser:
             ollama_client: Client Ollama configurato
         """
         self.client = ollama_client
+        self.grammar = CommandGrammar()
+        self.fast_path_hits = 0
+        self.llm_calls = 0
+
+    @property
+    def fast_path_hit_rate(self) -> float:
+        """Quota di comandi risolti dalla grammatica senza LLM."""
+        total = self.fast_path_hits + self.llm_calls
+        return self.fast_path_hits / total if total else 0.0
+
+    def _log_hit_rate(self, path: str, user_input: str):
+        logger.info(
+            "Comando via %s (fast path %d/%d, %.0f%%): %s",
+            path, self.fast_path_hits, self.fast_path_hits + self.llm_calls,
+            self.fast_path_hit_rate * 100, user_input[:120]
+        )
 
     def parse_command(
         self,
@@ -67,6 +91,17 @@ class CommandParser:
             >>> print(response.message)
             >>> print(len(response.changes))
         """
+        # Fast path: comandi frequenti riconosciuti senza LLM
+        if config.BOT_FAST_PATH_ENABLED:
+            response = self.grammar.parse(user_input, personale_df, strutture_df)
+            if response is not None:
+                self.fast_path_hits += 1
+                self._log_hit_rate('grammatica', user_input)
+                return response
+
+        self.llm_calls += 1
+        self._log_hit_rate('LLM', user_input)
+
         # Costruisci contesto dati SEMPLIFICATO per LLM
         context = self._build_simple_context(personale_df, strutture_df)
 
@@ -0,0 +1,542 @@
+"""
+Data Quality Engine
+
+Motore di rilevamento anomalie per la dashboard: record incompleti, chiavi
+duplicate, strutture orfane e riferimenti a padri inesistenti.
+
+Tutti i controlli sono calcolati in un'unica passata sui DataFrame di
+sessione e mantenuti come contatori/insiemi di posizioni. I conteggi per
+controllo sono salvati su SQLite (config.DATA_QUALITY_CACHE_PATH) per
+versione dati del database: un rerun o un riavvio con la stessa versione
+li rilegge senza toccare i DataFrame. Quando la versione cambia, i record
+modificati vengono letti dall'audit_log a partire dall'ultima versione
+salvata e solo quelli vengono riesaminati; modifiche non spiegate
+dall'audit (o troppe) portano a un ricalcolo completo.
+
+Lo stato in memoria è per sessione e per database (get_data_quality_engine
+con st.session_state come scope). Le righe anomale vengono estratte solo
+quando la UI le richiede, dai DataFrame passati dal chiamante.
+"""
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, MutableMapping, Optional, Set
+
+import pandas as pd
+
+import config
+
+# Tabelle audit_log → tipo record controllato (schema legacy e DB_ORG)
+_AUDIT_TABLES = {
+    'personale': 'personale',
+    'employees': 'personale',
+    'strutture': 'strutture',
+    'org_units': 'strutture',
+}
+
+# Check id → (tipo, categoria); l'ordine è quello di visualizzazione
+CHECKS = {
+    'incomplete_personale': ('error', 'Personale'),
+    'incomplete_strutture': ('error', 'Strutture'),
+    'duplicate_personale': ('warning', 'Personale'),
+    'duplicate_strutture': ('error', 'Strutture'),
+    'orphan_strutture': ('warning', 'Strutture'),
+    'missing_parent_personale': ('error', 'Personale'),
+    'missing_parent_strutture': ('error', 'Strutture'),
+}
+
+
+@dataclass
+class AnomalySummary:
+    """Conteggio di un controllo qualità (le righe si leggono con get_rows)."""
+    check_id: str
+    tipo: str
+    categoria: str
+    messaggio: str
+    count: int
+
+
+def _value(value):
+    """Normalizza NaN/None a None (chiave comune per i contatori)."""
+    return None if pd.isna(value) else value
+
+
+class _QualityState:
+    """Contatori e insiemi di posizioni per una coppia di DataFrame."""
+
+    def __init__(self, personale_df: pd.DataFrame, strutture_df: pd.DataFrame):
+        self.personale_df = personale_df
+        self.strutture_df = strutture_df
+
+        self.p_has_parent = config.PARENT_FIELD in personale_df.columns
+
+        # Snapshot dei valori rilevanti per posizione
+        self.p_keys = [_value(v) for v in personale_df[config.KEY_FIELD_PERSONALE].tolist()]
+        self.p_parents = [_value(v) for v in personale_df[config.PARENT_FIELD].tolist()] \
+            if self.p_has_parent else [None] * len(personale_df)
+        self.s_codes = [_value(v) for v in strutture_df[config.KEY_FIELD_STRUTTURE].tolist()]
+        self.s_parents = [_value(v) for v in strutture_df[config.PARENT_FIELD].tolist()]
+
+        # Record incompleti (vettorizzato)
+        self.p_incomplete: Set[int] = set(
+            personale_df[config.MANDATORY_PERSONALE].isna().any(axis=1).to_numpy().nonzero()[0].tolist()
+        )
+        self.s_incomplete: Set[int] = set(
+            strutture_df[config.MANDATORY_STRUTTURE].isna().any(axis=1).to_numpy().nonzero()[0].tolist()
+        )
+
+        # Indici chiave → posizioni
+        self.p_positions: Dict = {}
+        for pos, key in enumerate(self.p_keys):
+            self.p_positions.setdefault(key, set()).add(pos)
+        self.s_positions: Dict = {}
+        for pos, code in enumerate(self.s_codes):
+            self.s_positions.setdefault(code, set()).add(pos)
+
+        # Contatori valori
+        self.p_key_counts = Counter({k: len(v) for k, v in self.p_positions.items()})
+        self.s_code_counts = Counter({k: len(v) for k, v in self.s_positions.items()})
+        self.p_parent_counts = Counter(v for v in self.p_parents if v is not None)
+        self.s_parent_counts = Counter(v for v in self.s_parents if v is not None)
+
+        # Insiemi derivati, mantenuti incrementalmente da _add/_remove
+        self.dup_p_keys = {k for k, n in self.p_key_counts.items() if n > 1}
+        self.dup_s_codes = {k for k, n in self.s_code_counts.items() if n > 1}
+        self.orphan_codes = {
+            c for c in self.s_code_counts
+            if c is not None and c not in self.p_parent_counts
+        }
+        self.missing_p = {v for v in self.p_parent_counts if v not in self.s_code_counts}
+        self.missing_s = {v for v in self.s_parent_counts if v not in self.s_code_counts}
+
+    # === AGGIORNAMENTI PERSONALE ===
+
+    def _add_p_key(self, key, pos: int):
+        self.p_positions.setdefault(key, set()).add(pos)
+        self.p_key_counts[key] += 1
+        if self.p_key_counts[key] > 1:
+            self.dup_p_keys.add(key)
+
+    def _remove_p_key(self, key, pos: int):
+        self.p_positions[key].discard(pos)
+        self.p_key_counts[key] -= 1
+        if self.p_key_counts[key] <= 1:
+            self.dup_p_keys.discard(key)
+        if self.p_key_counts[key] == 0:
+            del self.p_key_counts[key]
+            del self.p_positions[key]
+
+    def _add_p_parent(self, value):
+        if value is None:
+            return
+        self.p_parent_counts[value] += 1
+        if self.p_parent_counts[value] == 1:
+            if value in self.s_code_counts:
+                self.orphan_codes.discard(value)
+            else:
+                self.missing_p.add(value)
+
+    def _remove_p_parent(self, value):
+        if value is None:
+            return
+        self.p_parent_counts[value] -= 1
+        if self.p_parent_counts[value] == 0:
+            del self.p_parent_counts[value]
+            self.missing_p.discard(value)
+            if value in self.s_code_counts:
+                self.orphan_codes.add(value)
+
+    # === AGGIORNAMENTI STRUTTURE ===
+
+    def _add_s_code(self, code, pos: int):
+        self.s_positions.setdefault(code, set()).add(pos)
+        self.s_code_counts[code] += 1
+        if self.s_code_counts[code] > 1:
+            self.dup_s_codes.add(code)
+        elif code is not None:
+            self.missing_p.discard(code)
+            self.missing_s.discard(code)
+            if code not in self.p_parent_counts:
+                self.orphan_codes.add(code)
+
+    def _remove_s_code(self, code, pos: int):
+        self.s_positions[code].discard(pos)
+        self.s_code_counts[code] -= 1
+        if self.s_code_counts[code] <= 1:
+            self.dup_s_codes.discard(code)
+        if self.s_code_counts[code] == 0:
+            del self.s_code_counts[code]
+            del self.s_positions[code]
+            self.orphan_codes.discard(code)
+            if code in self.p_parent_counts:
+                self.missing_p.add(code)
+            if code in self.s_parent_counts:
+                self.missing_s.add(code)
+
+    def _add_s_parent(self, value):
+        if value is None:
+            return
+        self.s_parent_counts[value] += 1
+        if self.s_parent_counts[value] == 1 and value not in self.s_code_counts:
+            self.missing_s.add(value)
+
+    def _remove_s_parent(self, value):
+        if value is None:
+            return
+        self.s_parent_counts[value] -= 1
+        if self.s_parent_counts[value] == 0:
+            del self.s_parent_counts[value]
+            self.missing_s.discard(value)
+
+    # === RILETTURA RIGHE MODIFICATE ===
+
+    def matches(self, personale_df: pd.DataFrame, strutture_df: pd.DataFrame) -> bool:
+        """True se lo stato descrive questi DataFrame (stessi oggetti e righe)."""
+        return (
+            self.personale_df is personale_df and self.strutture_df is strutture_df
+            and len(self.p_keys) == len(personale_df) and len(self.s_codes) == len(strutture_df)
+        )
+
+    def refresh_personale(self, record_key) -> None:
+        """Rilegge le righe personale del record (chiave prima della modifica)."""
+        df = self.personale_df
+        for pos in list(self.p_positions.get(record_key, ())):
+            row = df.iloc[pos]
+            key = _value(row[config.KEY_FIELD_PERSONALE])
+            parent = _value(row[config.PARENT_FIELD]) if self.p_has_parent else None
+
+            if key != self.p_keys[pos]:
+                self._remove_p_key(self.p_keys[pos], pos)
+                self._add_p_key(key, pos)
+                self.p_keys[pos] = key
+            if parent != self.p_parents[pos]:
+                self._remove_p_parent(self.p_parents[pos])
+                self._add_p_parent(parent)
+                self.p_parents[pos] = parent
+
+            if row[config.MANDATORY_PERSONALE].isna().any():
+                self.p_incomplete.add(pos)
+            else:
+                self.p_incomplete.discard(pos)
+
+    def refresh_strutture(self, record_key) -> None:
+        """Rilegge le righe strutture del record (codice prima della modifica)."""
+        df = self.strutture_df
+        for pos in list(self.s_positions.get(record_key, ())):
+            row = df.iloc[pos]
+            code = _value(row[config.KEY_FIELD_STRUTTURE])
+            parent = _value(row[config.PARENT_FIELD])
+
+            if code != self.s_codes[pos]:
+                self._remove_s_code(self.s_codes[pos], pos)
+                self._add_s_code(code, pos)
+                self.s_codes[pos] = code
+            if parent != self.s_parents[pos]:
+                self._remove_s_parent(self.s_parents[pos])
+                self._add_s_parent(parent)
+                self.s_parents[pos] = parent
+
+            if row[config.MANDATORY_STRUTTURE].isna().any():
+                self.s_incomplete.add(pos)
+            else:
+                self.s_incomplete.discard(pos)
+
+    # === RISULTATI ===
+
+    def counts(self) -> Dict[str, int]:
+        """Numero di righe/valori anomali per controllo."""
+        return {
+            'incomplete_personale': len(self.p_incomplete),
+            'incomplete_strutture': len(self.s_incomplete),
+            'duplicate_personale': sum(self.p_key_counts[k] for k in self.dup_p_keys),
+            'duplicate_strutture': sum(self.s_code_counts[k] for k in self.dup_s_codes),
+            'orphan_strutture': sum(self.s_code_counts[c] for c in self.orphan_codes),
+            'missing_parent_personale': len(self.missing_p),
+            'missing_parent_strutture': len(self.missing_s),
+        }
+
+    def positions(self, check_id: str) -> List[int]:
+        """Posizioni (ordinate) delle righe anomale per i controlli su record."""
+        if check_id == 'incomplete_personale':
+            positions = self.p_incomplete
+        elif check_id == 'incomplete_strutture':
+            positions = self.s_incomplete
+        elif check_id == 'duplicate_personale':
+            positions = set().union(*(self.p_positions[k] for k in self.dup_p_keys))
+        elif check_id == 'duplicate_strutture':
+            positions = set().union(*(self.s_positions[k] for k in self.dup_s_codes))
+        elif check_id == 'orphan_strutture':
+            positions = set().union(*(self.s_positions[c] for c in self.orphan_codes))
+        else:
+            raise ValueError(f"Controllo senza righe: {check_id}")
+        return sorted(positions)
+
+
+class _ResultStore:
+    """Conteggi per controllo su SQLite, per database e versione dati."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS quality_results (
+                db_path TEXT NOT NULL,
+                data_version TEXT NOT NULL,
+                audit_id INTEGER NOT NULL,
+                check_id TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (db_path, data_version, check_id)
+            )
+        """)
+        return conn
+
+    def load(self, db_path: str, data_version: str) -> Optional[tuple]:
+        """(conteggi, ultimo audit id) salvati per la versione, None se assenti."""
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT check_id, count, audit_id FROM quality_results WHERE db_path = ? AND data_version = ?",
+                    (db_path, data_version)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Errore lettura cache qualità dati: {str(e)}")
+            return None
+        counts = {check_id: count for check_id, count, _ in rows}
+        if set(counts) != set(CHECKS):
+            return None
+        return counts, rows[0][2]
+
+    def save(self, db_path: str, data_version: str, audit_id: int, counts: Dict[str, int]) -> None:
+        """Sostituisce i risultati del database con quelli della versione indicata."""
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM quality_results WHERE db_path = ?", (db_path,))
+                    conn.executemany(
+                        "INSERT INTO quality_results (db_path, data_version, audit_id, check_id, count) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(db_path, data_version, audit_id, check_id, counts[check_id]) for check_id in CHECKS]
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Errore scrittura cache qualità dati: {str(e)}")
+
+
+class DataQualityEngine:
+    """
+    Rilevamento anomalie incrementale per una sessione e un database.
+
+    Con un db_handler i conteggi seguono la versione dati del database
+    (DatabaseHandler.get_file_version): invariata → conteggi in memoria o
+    salvati, nessun accesso ai DataFrame; cambiata → record dell'audit_log
+    successivi all'ultima versione elaborata riesaminati sullo stato, se
+    descrive ancora i DataFrame della sessione, altrimenti ricalcolo.
+    Senza db_handler lo stato segue solo l'identità dei DataFrame.
+    """
+
+    def __init__(self, db_handler=None):
+        self.db = db_handler
+        self.db_path = str(db_handler.db_path) if db_handler is not None else None
+        self._store = _ResultStore(config.DATA_QUALITY_CACHE_PATH) if db_handler is not None else None
+        self._state: Optional[_QualityState] = None
+        self._counts: Optional[Dict[str, int]] = None
+        self._data_version: Optional[str] = None
+        self._last_audit_id = 0
+        self._summaries: List[AnomalySummary] = []
+        self._lock = threading.RLock()
+
+    def get_summaries(
+        self,
+        personale_df: pd.DataFrame,
+        strutture_df: pd.DataFrame
+    ) -> List[AnomalySummary]:
+        """
+        Anomalie correnti (solo controlli con count > 0), aggiornate se necessario.
+
+        Args:
+            personale_df: DataFrame TNS Personale
+            strutture_df: DataFrame TNS Strutture
+        """
+        with self._lock:
+            self._sync(personale_df, strutture_df)
+            return list(self._summaries)
+
+    def get_counts(
+        self,
+        personale_df: pd.DataFrame,
+        strutture_df: pd.DataFrame
+    ) -> Dict[str, int]:
+        """Conteggi per tutti i controlli (anche quelli a zero)."""
+        with self._lock:
+            self._sync(personale_df, strutture_df)
+            return dict(self._counts)
+
+    def get_rows(
+        self,
+        check_id: str,
+        personale_df: pd.DataFrame,
+        strutture_df: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Righe anomale del controllo, estratte on demand dai DataFrame indicati."""
+        with self._lock:
+            self._sync(personale_df, strutture_df, need_state=True)
+            state = self._state
+            if check_id == 'missing_parent_personale':
+                return pd.DataFrame({'Padre inesistente': sorted(state.missing_p, key=str)})
+            if check_id == 'missing_parent_strutture':
+                return pd.DataFrame({'Padre inesistente': sorted(state.missing_s, key=str)})
+
+            df = personale_df if check_id.endswith('_personale') else strutture_df
+            return df.iloc[state.positions(check_id)]
+
+    def invalidate(self) -> None:
+        """Forza il ricalcolo completo al prossimo accesso."""
+        with self._lock:
+            self._state = None
+            self._counts = None
+            self._data_version = None
+
+    # === SINCRONIZZAZIONE ===
+
+    def _sync(self, personale_df: pd.DataFrame, strutture_df: pd.DataFrame, need_state: bool = False) -> None:
+        state_ok = self._state is not None and self._state.matches(personale_df, strutture_df)
+
+        if self.db is None:
+            if not state_ok:
+                self._rebuild(personale_df, strutture_df, None)
+            return
+
+        data_version = self.db.get_file_version()
+        if self._counts is not None and data_version == self._data_version:
+            if need_state and not state_ok:
+                self._rebuild(personale_df, strutture_df, data_version)
+            return
+
+        # Versione cambiata: prima l'audit_log sullo stato della sessione
+        if state_ok and self._counts is not None:
+            changes = self._read_audit_changes()
+            if changes:
+                for record_type, record_key in changes:
+                    if record_type == 'personale':
+                        self._state.refresh_personale(record_key)
+                    else:
+                        self._state.refresh_strutture(record_key)
+                self._set_counts(self._state.counts(), data_version, self._max_audit_id())
+                self._store.save(self.db_path, data_version, self._last_audit_id, self._counts)
+                return
+
+        # Risultati già calcolati per questa versione (altra sessione, riavvio)
+        stored = self._store.load(self.db_path, data_version)
+        if stored is not None and not need_state:
+            counts, audit_id = stored
+            self._state = None
+            self._set_counts(counts, data_version, audit_id)
+            return
+
+        self._rebuild(personale_df, strutture_df, data_version)
+        self._store.save(self.db_path, data_version, self._last_audit_id, self._counts)
+
+    def _rebuild(self, personale_df, strutture_df, data_version) -> None:
+        self._state = _QualityState(personale_df, strutture_df)
+        self._set_counts(self._state.counts(), data_version, self._max_audit_id())
+
+    def _set_counts(self, counts: Dict[str, int], data_version, audit_id: int) -> None:
+        self._counts = counts
+        self._data_version = data_version
+        self._last_audit_id = audit_id
+        self._summaries = self._build_summaries()
+
+    def _max_audit_id(self) -> int:
+        if self.db is None:
+            return 0
+        try:
+            cursor = self.db.get_connection().cursor()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM audit_log")
+            return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"⚠️ Errore lettura audit_log: {str(e)}")
+            return 0
+
+    def _read_audit_changes(self) -> Optional[List[tuple]]:
+        """
+        Record personale/strutture modificati dopo l'ultimo audit elaborato.
+
+        Returns:
+            Lista (tipo record, record_key) distinti; vuota o None se serve un
+            ricalcolo (nessuna riga audit che spieghi la modifica, troppe
+            modifiche o audit non leggibile)
+        """
+        limit = config.DATA_QUALITY_MAX_INCREMENTAL
+        tables = list(_AUDIT_TABLES)
+        try:
+            cursor = self.db.get_connection().cursor()
+            cursor.execute(f"""
+                SELECT table_name, record_key FROM audit_log
+                WHERE id > ? AND table_name IN ({', '.join('?' * len(tables))})
+                ORDER BY id LIMIT ?
+            """, (self._last_audit_id, *tables, limit + 1))
+            rows = cursor.fetchall()
+        except Exception as e:
+            print(f"⚠️ Errore lettura audit_log: {str(e)}")
+            return None
+
+        if len(rows) > limit:
+            return None
+        return list(dict.fromkeys((_AUDIT_TABLES[row[0]], row[1]) for row in rows))
+
+    def _build_summaries(self) -> List[AnomalySummary]:
+        counts = self._counts
+        messages = {
+            'incomplete_personale': "{n} record incompleti (campi obbligatori mancanti)",
+            'incomplete_strutture': "{n} strutture incomplete",
+            'duplicate_personale': "{n} codici fiscali duplicati (verificare se legittimo)",
+            'duplicate_strutture': "{n} codici duplicati",
+            'orphan_strutture': "{n} strutture orfane (senza dipendenti assegnati)",
+            'missing_parent_personale': "{n} riferimenti a padri inesistenti",
+            'missing_parent_strutture': "{n} riferimenti a padri inesistenti",
+        }
+        summaries = []
+        for check_id, (tipo, categoria) in CHECKS.items():
+            count = counts[check_id]
+            if count > 0:
+                summaries.append(AnomalySummary(
+                    check_id=check_id,
+                    tipo=tipo,
+                    categoria=categoria,
+                    messaggio=messages[check_id].format(n=count),
+                    count=count,
+                ))
+        return summaries
+
+
+def get_data_quality_engine(
+    db_handler=None,
+    scope: Optional[MutableMapping] = None
+) -> DataQualityEngine:
+    """
+    Engine della sessione per il database indicato.
+
+    Args:
+        db_handler: DatabaseHandler (versione dati, audit_log, cache risultati)
+        scope: Dove conservare l'engine tra i rerun (st.session_state);
+            None per un engine usa e getta
+    """
+    if scope is None:
+        return DataQualityEngine(db_handler)
+    db_path = str(db_handler.db_path) if db_handler is not None else None
+    engine = scope.get('data_quality_engine')
+    if engine is None or engine.db_path != db_path:
+        engine = DataQualityEngine(db_handler)
+        scope['data_quality_engine'] = engine
+    return engine
@@ -9,6 +9,39 @@ from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import pandas as pd
 import config
+from services.perf_trace import timed
+from services.query_trace import connect
+
+
+# Mappa nomi colonna DB -> nomi Excel standard (ordine colonne TNS)
+EXCEL_COLUMN_MAPPING: Dict[str, str] = {
+    'Unità_Organizzativa': 'Unità Organizzativa',
+    'CDCCOSTO': 'CDCCOSTO',
+    'TxCodFiscale': 'TxCodFiscale',
+    'DESCRIZIONE': 'DESCRIZIONE',
+    'Titolare': 'Titolare',
+    'LIVELLO': 'LIVELLO',
+    'Codice': 'Codice',
+    'UNITA_OPERATIVA_PADRE': 'UNITA\' OPERATIVA PADRE ',
+    'RUOLI_OltreV': 'RUOLI OltreV',
+    'RUOLI': 'RUOLI',
+    'Viaggiatore': 'Viaggiatore',
+    'Segr_Redaz': 'Segr_Redaz',
+    'Approvatore': 'Approvatore',
+    'Cassiere': 'Cassiere',
+    'Visualizzatori': 'Visualizzatori',
+    'Segretario': 'Segretario',
+    'Controllore': 'Controllore',
+    'Amministrazione': 'Amministrazione',
+    'SegreteriA_Red_Assista': 'SegreteriA Red. Ass.ta',
+    'SegretariO_Assista': 'SegretariO Ass.to',
+    'Controllore_Assita': 'Controllore Ass.to',
+    'RuoliAFC': 'RuoliAFC',
+    'RuoliHR': 'RuoliHR',
+    'AltriRuoli': 'AltriRuoli',
+    'Sede_TNS': 'Sede_TNS',
+    'GruppoSind': 'GruppoSind',
+}
 
 
 class DatabaseHandler:
@@ -43,11 +76,44 @@ class DatabaseHandler:
     def get_connection(self) -> sqlite3.Connection:
         """Restituisce connessione SQLite thread-local (crea se non esiste)."""
         if not hasattr(self._local, 'conn') or self._local.conn is None:
-            self._local.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._local.conn = connect(self.db_path, check_same_thread=False)
             self._local.conn.row_factory = sqlite3.Row
             self._local.conn.execute("PRAGMA foreign_keys = ON")
         return self._local.conn
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connessione thread-local (alias di get_connection() per sidebar, dashboard e audit log)."""
+        return self.get_connection()
+
+    def get_data_version(self) -> str:
+        """
+        Restituisce un identificativo della versione corrente dei dati.
+
+        Cambia ad ogni commit sul database, anche se eseguito da un'altra
+        connessione o processo: combina mtime/size del file SQLite (e del
+        WAL se presente) con i cambiamenti della connessione corrente.
+        Usato come chiave di invalidazione per cache di payload derivati.
+        """
+        return f"{self.get_file_version()}|{self.get_connection().total_changes}"
+
+    def get_file_version(self) -> str:
+        """
+        Versione dei dati dal solo stato dei file (mtime/size di DB e WAL).
+
+        A differenza di get_data_version non dipende dalla connessione:
+        resta uguale tra processi e riavvii finché nessuno scrive sul
+        database, quindi è adatta come chiave di risultati salvati su disco.
+        """
+        parts = []
+        for path in (self.db_path, Path(str(self.db_path) + '-wal')):
+            try:
+                stat = path.stat()
+                parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+            except FileNotFoundError:
+                parts.append('-')
+        return '|'.join(parts)
+
     def init_db(self):
         """Crea schema database se non esiste"""
         cursor = self.get_connection().cursor()
@@ -383,6 +449,7 @@ class DatabaseHandler:
         finally:
             cursor.close()
 
+    @timed('db')
     def get_personale_all(self) -> List[Dict]:
         """Leggi tutti i record dipendenti"""
         cursor = self.get_connection().cursor()
@@ -499,6 +566,7 @@ class DatabaseHandler:
         finally:
             cursor.close()
 
+    @timed('db')
     def get_strutture_all(self) -> List[Dict]:
         """Leggi tutte le strutture"""
         cursor = self.get_connection().cursor()
@@ -541,6 +609,7 @@ class DatabaseHandler:
 
     # === IMPORT/EXPORT DATAFRAMES ===
 
+    @timed('db', rows=sum)
     def import_from_dataframe(self, personale_df: pd.DataFrame,
                              strutture_df: pd.DataFrame) -> Tuple[int, int]:
         """
@@ -604,6 +673,7 @@ class DatabaseHandler:
         finally:
             cursor.close()
 
+    @timed('db')
     def export_to_dataframe(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Esporta dati database a DataFrames.
@@ -637,6 +707,7 @@ class DatabaseHandler:
 
     # === AUDIT LOG ===
 
+    @timed('db')
     def get_audit_log(self, limit: int = 100, table_name: Optional[str] = None) -> List[Dict]:
         """
         Leggi audit log.
@@ -704,34 +775,7 @@ class DatabaseHandler:
 
     def _get_excel_column_mapping(self) -> Dict[str, str]:
         """Mappa da nomi DB a nomi Excel standard"""
-        return {
-            'Unità_Organizzativa': 'Unità Organizzativa',
-            'CDCCOSTO': 'CDCCOSTO',
-            'TxCodFiscale': 'TxCodFiscale',
-            'DESCRIZIONE': 'DESCRIZIONE',
-            'Titolare': 'Titolare',
-            'LIVELLO': 'LIVELLO',
-            'Codice': 'Codice',
-            'UNITA_OPERATIVA_PADRE': 'UNITA\' OPERATIVA PADRE ',
-            'RUOLI_OltreV': 'RUOLI OltreV',
-            'RUOLI': 'RUOLI',
-            'Viaggiatore': 'Viaggiatore',
-            'Segr_Redaz': 'Segr_Redaz',
-            'Approvatore': 'Approvatore',
-            'Cassiere': 'Cassiere',
-            'Visualizzatori': 'Visualizzatori',
-            'Segretario': 'Segretario',
-            'Controllore': 'Controllore',
-            'Amministrazione': 'Amministrazione',
-            'SegreteriA_Red_Assista': 'SegreteriA Red. Ass.ta',
-            'SegretariO_Assista': 'SegretariO Ass.to',
-            'Controllore_Assita': 'Controllore Ass.to',
-            'RuoliAFC': 'RuoliAFC',
-            'RuoliHR': 'RuoliHR',
-            'AltriRuoli': 'AltriRuoli',
-            'Sede_TNS': 'Sede_TNS',
-            'GruppoSind': 'GruppoSind',
-        }
+        return dict(EXCEL_COLUMN_MAPPING)
 
     def _log_audit(self, operation: str, table_name: str, record_key: str,
                   before: Optional[Dict] = None, after: Optional[Dict] = None,
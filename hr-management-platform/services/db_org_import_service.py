@@ -15,14 +15,83 @@ Maps the 135 columns across 6 domains:
 import sqlite3
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime, date
 from decimal import Decimal
 
 import config
 from services.employee_service import get_employee_service
 from services.hierarchy_service import get_hierarchy_service
+from services.perf_trace import timed
 from services.role_service import get_role_service
+from services.tabular_io import iter_table
+
+
+# Excel column name -> database field for each domain
+DB_ORG_COLUMN_MAPPINGS: Dict[str, str] = {
+    # AMBITO ORGANIZZATIVO (A-AC = 1-29)
+    'SocietàOrg': 'societa',
+    'Unità Organizzativa': 'unita_org_livello1',
+    'Unità Organizzativa 2': 'unita_org_livello2',
+    'Testata GG/2': 'testata_gg',
+    'CdC': 'cdccosto',
+    'CdC Amm': 'cdc_amm',
+    'Titolare': 'titolare',
+    'Sede': 'sede',
+    'Tipo Collaborazione': 'tipo_collaborazione',
+    'Formato': 'formato',
+    'Funzione': 'funzione',
+    'FTE': 'fte',
+    'ID': 'codice',
+    'ReportsTo': 'reports_to_codice',
+    'Photo': 'photo_url',
+
+    # AMBITO ANAGRAFICO (AF-BH = 32-60)
+    'TxCodFiscale': 'tx_cod_fiscale',
+    'Cognome': 'cognome',
+    'Nome': 'nome',
+    'Società': 'societa',
+    'Area': 'area',
+    'SottoArea': 'sottoarea',
+    'Data Assunzione': 'data_assunzione',
+    'Data Cessazione': 'data_cessazione',
+    'Sesso': 'sesso',
+    'Contratto': 'contratto',
+    'Qualifica': 'qualifica',
+    'Livello': 'livello',
+    'Indirizzo Via': 'indirizzo_via',
+    'CAP': 'indirizzo_cap',
+    'Città': 'indirizzo_citta',
+    'RAL': 'ral',
+    'Data Nascita': 'data_nascita',
+    'Email': 'email',
+    'Matricola': 'matricola',
+
+    # AMBITO TNS (BS-CV = 71-100)
+    'Viaggiatore': 'role_viaggiatore',
+    'Approvatore': 'role_approvatore',
+    'Controllore': 'role_controllore',
+    'Cassiere': 'role_cassiere',
+    'Segretario': 'role_segretario',
+    'Visualizzatori': 'role_visualizzatori',
+    'Amministrazione': 'role_amministrazione',
+    'RuoliAFC': 'role_afc',
+    'RuoliHR': 'role_hr',
+    'Sede_TNS': 'sede_tns',
+    'GruppoSind': 'gruppo_sind',
+    'Codice TNS': 'cod_tns',           # CB - Codice TNS per organigramma TNS
+    'Padre TNS': 'padre_tns',          # CC - Parent TNS per organigramma TNS
+
+    # GERARCHIA HR (CZ)
+    'CF Responsabile Diretto': 'reports_to_cf',  # CZ - CF Responsabile per organigramma HR
+}
+
+# Columns read by the import (usecols): the other DB_ORG columns are never
+# loaded into the frame, and CSV/Parquet readers skip them entirely
+DB_ORG_COLUMNS: List[str] = list(DB_ORG_COLUMN_MAPPINGS)
+
+# Columns identifying an organizational unit (one org_units row per distinct tuple)
+ORG_UNIT_COLUMNS: List[str] = ['ID', 'Unità Organizzativa', 'Unità Organizzativa 2', 'CdC', 'Società']
 
 
 class DBOrgImportService:
@@ -43,77 +112,24 @@ class DBOrgImportService:
 
         Returns dict with mappings for each domain.
         """
-        return {
-            # AMBITO ORGANIZZATIVO (A-AC = 1-29)
-            'SocietàOrg': 'societa',
-            'Unità Organizzativa': 'unita_org_livello1',
-            'Unità Organizzativa 2': 'unita_org_livello2',
-            'Testata GG/2': 'testata_gg',
-            'CdC': 'cdccosto',
-            'CdC Amm': 'cdc_amm',
-            'Titolare': 'titolare',
-            'Sede': 'sede',
-            'Tipo Collaborazione': 'tipo_collaborazione',
-            'Formato': 'formato',
-            'Funzione': 'funzione',
-            'FTE': 'fte',
-            'ID': 'codice',
-            'ReportsTo': 'reports_to_codice',
-            'Photo': 'photo_url',
-
-            # AMBITO ANAGRAFICO (AF-BH = 32-60)
-            'TxCodFiscale': 'tx_cod_fiscale',
-            'Cognome': 'cognome',
-            'Nome': 'nome',
-            'Società': 'societa',
-            'Area': 'area',
-            'SottoArea': 'sottoarea',
-            'Data Assunzione': 'data_assunzione',
-            'Data Cessazione': 'data_cessazione',
-            'Sesso': 'sesso',
-            'Contratto': 'contratto',
-            'Qualifica': 'qualifica',
-            'Livello': 'livello',
-            'Indirizzo Via': 'indirizzo_via',
-            'CAP': 'indirizzo_cap',
-            'Città': 'indirizzo_citta',
-            'RAL': 'ral',
-            'Data Nascita': 'data_nascita',
-            'Email': 'email',
-            'Matricola': 'matricola',
-
-            # AMBITO TNS (BS-CV = 71-100)
-            'Viaggiatore': 'role_viaggiatore',
-            'Approvatore': 'role_approvatore',
-            'Controllore': 'role_controllore',
-            'Cassiere': 'role_cassiere',
-            'Segretario': 'role_segretario',
-            'Visualizzatori': 'role_visualizzatori',
-            'Amministrazione': 'role_amministrazione',
-            'RuoliAFC': 'role_afc',
-            'RuoliHR': 'role_hr',
-            'Sede_TNS': 'sede_tns',
-            'GruppoSind': 'gruppo_sind',
-            'Codice TNS': 'cod_tns',           # CB - Codice TNS per organigramma TNS
-            'Padre TNS': 'padre_tns',          # CC - Parent TNS per organigramma TNS
-
-            # GERARCHIA HR (CZ)
-            'CF Responsabile Diretto': 'reports_to_cf',  # CZ - CF Responsabile per organigramma HR
-        }
+        return dict(DB_ORG_COLUMN_MAPPINGS)
 
+    @timed('import', rows=lambda result: result.get('employees_imported'))
     def import_db_org_file(
         self,
         excel_path: Path,
         sheet_name: str = 'DB_ORG',
-        import_note: Optional[str] = None
+        import_note: Optional[str] = None,
+        progress_callback: Optional[Callable[[float, str], None]] = None
     ) -> Dict[str, Any]:
         """
         Import complete DB_ORG Excel file into normalized database.
 
         Args:
-            excel_path: Path to Excel file
-            sheet_name: Name of sheet to import (default: DB_ORG)
+            excel_path: Path to Excel file (.csv/.parquet also accepted)
+            sheet_name: Name of sheet to import (default: DB_ORG, ignored for CSV/Parquet)
             import_note: Optional note for import version
+            progress_callback: Optional (fraction 0..1, step message), called at each step
 
         Returns:
             Dict with import statistics and results
@@ -128,15 +144,28 @@ class DBOrgImportService:
             'errors': []
         }
 
+        def progress(fraction: float, message: str):
+            if progress_callback:
+                progress_callback(fraction, message)
+
+        def chunks() -> Iterator[pd.DataFrame]:
+            # Excel, CSV o Parquet (formato dall'estensione): CSV/Parquet are
+            # read in blocks and each step streams the file again, Excel comes
+            # as a single block from the parse cache
+            return iter_table(excel_path, sheet_name, usecols=DB_ORG_COLUMNS)
+
         try:
-            # Read Excel file
-            print(f"📂 Reading Excel file: {excel_path}")
-            df = pd.read_excel(excel_path, sheet_name=sheet_name)
+            # Read file: one pass collecting what validation, companies and
+            # org units need (the employee rows are not kept)
+            progress(0.0, "Lettura file")
+            print(f"📂 Reading file: {excel_path}")
+            summary = self._scan_file(chunks())
 
-            print(f"✅ Loaded {len(df)} rows, {len(df.columns)} columns")
+            print(f"✅ Loaded {summary['rows']} rows, {len(summary['columns'])} columns")
 
             # Validate structure
-            validation_errors = self._validate_structure(df)
+            progress(0.1, "Validazione struttura")
+            validation_errors = self._validate_structure(summary)
             if validation_errors:
                 results['errors'] = validation_errors
                 results['message'] = f"Validation failed: {len(validation_errors)} errors"
@@ -156,26 +185,31 @@ class DBOrgImportService:
 
                 # Step 1: Import companies (if new)
                 print("\n📊 Step 1: Processing companies...")
-                companies_map = self._import_companies(cursor, df)
+                progress(0.2, "Società")
+                companies_map = self._import_companies(cursor, summary['companies'])
 
                 # Step 2: Import organizational units
                 print("\n🏢 Step 2: Processing organizational units...")
-                org_units_map = self._import_org_units(cursor, df, companies_map)
+                progress(0.3, "Strutture organizzative")
+                org_units_map = self._import_org_units(cursor, summary['org_units'], companies_map)
                 results['org_units_imported'] = len(org_units_map)
 
                 # Step 3: Import employees
                 print("\n👥 Step 3: Processing employees...")
-                employees_map = self._import_employees(cursor, df, companies_map, import_version_id)
+                progress(0.45, "Dipendenti")
+                employees_map = self._import_employees(cursor, chunks(), companies_map, import_version_id)
                 results['employees_imported'] = len(employees_map)
 
                 # Step 4: Assign hierarchies
                 print("\n🌳 Step 4: Assigning hierarchies...")
-                hierarchy_count = self._assign_hierarchies(cursor, df, employees_map, org_units_map)
+                progress(0.7, "Gerarchie")
+                hierarchy_count = self._assign_hierarchies(cursor, chunks(), employees_map, org_units_map)
                 results['hierarchies_assigned'] = hierarchy_count
 
                 # Step 5: Assign roles
                 print("\n🎭 Step 5: Assigning roles...")
-                role_count = self._assign_roles(cursor, df, employees_map)
+                progress(0.85, "Ruoli")
+                role_count = self._assign_roles(cursor, chunks(), employees_map)
                 results['roles_assigned'] = role_count
 
                 # Complete import version
@@ -187,6 +221,7 @@ class DBOrgImportService:
                 )
 
                 # Commit transaction
+                progress(0.95, "Salvataggio")
                 conn.commit()
 
                 results['success'] = True
@@ -213,54 +248,92 @@ class DBOrgImportService:
 
         return results
 
-    def _validate_structure(self, df: pd.DataFrame) -> List[str]:
-        """Validate Excel file structure"""
+    def _scan_file(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        """
+        Single pass over the file blocks.
+
+        Returns:
+            Dict with columns, row count, per-CF counters for the duplicate
+            check, unique companies and unique org unit rows
+        """
+        columns: List[str] = []
+        rows = 0
+        cf_counts: Dict[Any, int] = {}
+        cf_executive_title = set()  # CF with a CEO/AD Titolare
+        cf_dirigente = set()        # CF with a DIRIGENTE Qualifica
+        companies: Dict[str, None] = {}
+        unit_blocks: List[pd.DataFrame] = []
+
+        for df in chunks:
+            if not columns:
+                columns = list(df.columns)
+            rows += len(df)
+
+            if 'TxCodFiscale' in df.columns:
+                cf_column = df['TxCodFiscale']
+                for cf, count in cf_column.value_counts().items():
+                    cf_counts[cf] = cf_counts.get(cf, 0) + count
+                if 'Titolare' in df.columns:
+                    titolari = df['Titolare'].astype(str).str.upper()
+                    executive = titolari.str.contains('CEO', regex=False) | \
+                        titolari.str.contains('AMMINISTRATORE DELEGATO', regex=False)
+                    cf_executive_title.update(cf_column[executive].dropna())
+                if 'Qualifica' in df.columns:
+                    dirigente = df['Qualifica'].astype(str).str.upper().str.contains('DIRIGENTE', regex=False)
+                    cf_dirigente.update(cf_column[dirigente].dropna())
+
+            if 'Società' in df.columns:
+                companies.update(dict.fromkeys(df['Società'].dropna()))
+
+            if 'ID' in df.columns:
+                unit_columns = ORG_UNIT_COLUMNS + (['ReportsTo'] if 'ReportsTo' in df.columns else [])
+                unit_blocks.append(df[unit_columns].drop_duplicates())
+
+        org_units = (
+            pd.concat(unit_blocks, ignore_index=True).drop_duplicates()
+            if len(unit_blocks) > 1 else (unit_blocks[0] if unit_blocks else pd.DataFrame())
+        )
+        return {
+            'columns': columns,
+            'rows': rows,
+            'cf_counts': cf_counts,
+            'cf_executive_title': cf_executive_title,
+            'cf_dirigente': cf_dirigente,
+            'companies': list(companies),
+            'org_units': org_units,
+        }
+
+    def _validate_structure(self, summary: Dict[str, Any]) -> List[str]:
+        """Validate file structure (from the _scan_file summary)"""
         errors = []
+        columns = summary['columns']
 
         # Check for required columns (only ID is truly required for organizational positions)
-        if 'ID' not in df.columns:
+        if 'ID' not in columns:
             errors.append(f"Missing required column: ID")
 
         # Warn about optional but important columns
-        if 'TxCodFiscale' not in df.columns:
+        if 'TxCodFiscale' not in columns:
             print("  ⚠️ Warning: TxCodFiscale column not found - employees won't be imported")
-        if 'Titolare' not in df.columns:
+        if 'Titolare' not in columns:
             print("  ⚠️ Warning: Titolare column not found - only vacant positions will be imported")
 
         # Check for duplicate Codice Fiscale (excluding legitimate AD/CEO duplicates)
-        if 'TxCodFiscale' in df.columns:
-            # Count unique CF that appear more than once
-            cf_counts = df['TxCodFiscale'].value_counts()
-            duplicate_cfs = cf_counts[cf_counts > 1]
-
-            # Check if duplicates are legitimate (AD/CEO can have 2 CF)
-            legitimate_duplicates = []
-            if len(duplicate_cfs) > 0:
-                for cf in duplicate_cfs.index:
-                    cf_rows = df[df['TxCodFiscale'] == cf]
-                    titolari = cf_rows['Titolare'].values if 'Titolare' in cf_rows.columns else []
-                    qualifiche = cf_rows['Qualifica'].values if 'Qualifica' in cf_rows.columns else []
-
-                    # Check if it's AD/CEO
-                    is_ad = any(
-                        'CEO' in str(t).upper() or 'AMMINISTRATORE DELEGATO' in str(t).upper()
-                        for t in titolari
-                    ) or any(
-                        'DIRIGENTE' in str(q).upper() and len(cf_rows) == 2
-                        for q in qualifiche
-                    )
-
-                    if is_ad:
-                        legitimate_duplicates.append(cf)
+        if 'TxCodFiscale' in columns:
+            duplicate_cfs = [cf for cf, count in summary['cf_counts'].items() if count > 1]
+
+            # AD/CEO can have 2 CF: CEO/AD title, or DIRIGENTE on exactly two rows
+            legitimate_duplicates = [
+                cf for cf in duplicate_cfs
+                if cf in summary['cf_executive_title']
+                or (cf in summary['cf_dirigente'] and summary['cf_counts'][cf] == 2)
+            ]
 
             # Filter out legitimate duplicates
-            actual_duplicates = [cf for cf in duplicate_cfs.index if cf not in legitimate_duplicates]
+            actual_duplicates = [cf for cf in duplicate_cfs if cf not in legitimate_duplicates]
 
             if len(actual_duplicates) > 0:
                 errors.append(f"Found {len(actual_duplicates)} duplicate Codice Fiscale (excluding AD/CEO)")
-            elif len(legitimate_duplicates) > 0:
-                # Just a warning, not an error
-                pass  # AD/CEO duplicates are allowed
 
         return errors
 
@@ -299,15 +372,12 @@ class DBOrgImportService:
     def _import_companies(
         self,
         cursor: sqlite3.Cursor,
-        df: pd.DataFrame
+        unique_companies: List[str]
     ) -> Dict[str, int]:
-        """Import/update companies, return mapping"""
+        """Import/update companies (unique Società values), return mapping"""
         companies_map = {}
 
-        # Get unique companies from data
-        if 'Società' in df.columns:
-            unique_companies = df['Società'].dropna().unique()
-
+        if unique_companies:
             for company_name in unique_companies:
                 # Check if exists
                 cursor.execute(
@@ -349,21 +419,13 @@ class DBOrgImportService:
     def _import_org_units(
         self,
         cursor: sqlite3.Cursor,
-        df: pd.DataFrame,
+        unique_units: pd.DataFrame,
         companies_map: Dict[str, int]
     ) -> Dict[str, int]:
-        """Import organizational units"""
+        """Import organizational units (unique ORG_UNIT_COLUMNS rows, plus ReportsTo)"""
         org_units_map = {}
 
-        # Get unique org units
-        if 'ID' in df.columns:
-            # Include ReportsTo for parent relationship
-            columns_to_include = ['ID', 'Unità Organizzativa', 'Unità Organizzativa 2', 'CdC', 'Società']
-            if 'ReportsTo' in df.columns:
-                columns_to_include.append('ReportsTo')
-
-            unique_units = df[columns_to_include].drop_duplicates()
-
+        if 'ID' in unique_units.columns:
             # FIRST PASS: Insert all org units without parent
             for _, row in unique_units.iterrows():
                 codice = str(row.get('ID', '')).strip() if pd.notna(row.get('ID')) else None
@@ -402,7 +464,7 @@ class DBOrgImportService:
                     org_units_map[codice] = cursor.lastrowid
 
             # SECOND PASS: Update parent relationships using ReportsTo (AC column)
-            if 'ReportsTo' in df.columns:
+            if 'ReportsTo' in unique_units.columns:
                 print("  🔗 Setting up parent relationships...")
                 parent_count = 0
 
@@ -431,15 +493,15 @@ class DBOrgImportService:
     def _import_employees(
         self,
         cursor: sqlite3.Cursor,
-        df: pd.DataFrame,
+        chunks: Iterable[pd.DataFrame],
         companies_map: Dict[str, int],
         import_version_id: int
     ) -> Dict[str, int]:
-        """Import employees"""
+        """Import employees, block by block"""
         employees_map = {}
         imported_count = 0
 
-        for idx, row in df.iterrows():
+        for idx, row in self._iter_rows(chunks):
             try:
                 # Extract required fields (use .get() to handle unmapped columns)
                 cf = str(row.get('TxCodFiscale', '')).strip().upper() if pd.notna(row.get('TxCodFiscale')) else None
@@ -568,7 +630,7 @@ class DBOrgImportService:
     def _assign_hierarchies(
         self,
         cursor: sqlite3.Cursor,
-        df: pd.DataFrame,
+        chunks: Iterable[pd.DataFrame],
         employees_map: Dict[str, int],
         org_units_map: Dict[str, int]
     ) -> int:
@@ -585,7 +647,7 @@ class DBOrgImportService:
 
         today = date.today()
 
-        for _, row in df.iterrows():
+        for _, row in self._iter_rows(chunks):
             cf = str(row.get('TxCodFiscale', '')).strip().upper() if pd.notna(row.get('TxCodFiscale')) else None
             org_unit_code = str(row.get('ID', '')).strip() if pd.notna(row.get('ID')) else None
 
@@ -619,7 +681,7 @@ class DBOrgImportService:
     def _assign_roles(
         self,
         cursor: sqlite3.Cursor,
-        df: pd.DataFrame,
+        chunks: Iterable[pd.DataFrame],
         employees_map: Dict[str, int]
     ) -> int:
         """Assign TNS roles to employees"""
@@ -638,7 +700,7 @@ class DBOrgImportService:
 
         today = date.today()
 
-        for _, row in df.iterrows():
+        for _, row in self._iter_rows(chunks):
             cf = str(row.get('TxCodFiscale', '')).strip().upper() if pd.notna(row.get('TxCodFiscale')) else None
             if not cf:
                 continue
@@ -649,7 +711,7 @@ class DBOrgImportService:
 
             # Check each role column
             for excel_col, role_code in role_columns.items():
-                if excel_col not in df.columns:
+                if excel_col not in row.index:
                     continue
 
                 value = str(row.get(excel_col, '')).strip().upper() if pd.notna(row.get(excel_col)) else ''
@@ -684,6 +746,15 @@ class DBOrgImportService:
         print(f"  ✅ Assigned {count} role assignments")
         return count
 
+    @staticmethod
+    def _iter_rows(chunks: Iterable[pd.DataFrame]) -> Iterator[Tuple[int, pd.Series]]:
+        """(row number in the file, row) over all blocks"""
+        offset = 0
+        for df in chunks:
+            for position, (_, row) in enumerate(df.iterrows()):
+                yield offset + position, row
+            offset += len(df)
+
     def _parse_date(self, value) -> Optional[date]:
         """Parse date from various formats"""
         if pd.isna(value):
@@ -15,6 +15,8 @@ from models.employee import (
     Employee, EmployeeCreate, EmployeeUpdate,
     EmployeeListItem, EmployeeSearchResult
 )
+from services.perf_trace import timed
+from services.query_trace import connect
 
 
 class EmployeeService:
@@ -25,7 +27,7 @@ class EmployeeService:
 
     def _get_connection(self) -> sqlite3.Connection:
         """Get database connection"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn
 
@@ -172,6 +174,7 @@ class EmployeeService:
         finally:
             conn.close()
 
+    @timed('db')
     def list_employees(
         self,
         active_only: bool = True,
@@ -271,6 +274,7 @@ class EmployeeService:
         finally:
             conn.close()
 
+    @timed('db')
     def search_employees(
         self,
         query: str,
@@ -1,11 +1,315 @@
 """
 Service per lettura e scrittura file Excel TNS
+
+La lettura passa da una cache di parsing condivisa: i fogli letti sono
+indicizzati per hash SHA-1 del contenuto del file (+ foglio, colonne e
+motore/opzioni di lettura) e tenuti in memoria, così ricaricare lo stesso
+file (rerun Streamlit, anteprima seguita da import, sync ripetuti) non
+riesegue il parsing XML/BIFF. La copia su disco in formato colonnare è
+opzionale (config.EXCEL_CACHE_DISK): i fogli contengono dati personali e
+sono scritti in chiaro. Il motore di lettura è il più veloce disponibile
+(calamine, altrimenti openpyxl/xlrd scelti da pandas).
 """
+import hashlib
+import importlib.util
+import io
+import pickle
+import threading
+from collections import OrderedDict
 import pandas as pd
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 import config
 from datetime import datetime
+from services.excel_stream_writer import stream_dataframes_to_excel
+from services.perf_trace import span, timed
+
+
+# === MOTORE DI LETTURA ===
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def excel_engine() -> Optional[str]:
+    """Motore più veloce disponibile (None = scelta automatica di pandas)."""
+    if _has_module('python_calamine'):
+        return 'calamine'
+    return None
+
+
+# === CACHE DI PARSING ===
+
+ExcelSource = Union[str, Path, bytes, io.IOBase]
+
+
+class ExcelParseCache:
+    """
+    Cache dei fogli Excel letti, indicizzata per hash del contenuto.
+
+    Livelli:
+    - memoria: LRU di pochi frame (restituiti sempre come copia)
+    - disco (solo con disk=True): un file per (contenuto, foglio, colonne,
+      opzioni di lettura) in EXCEL_CACHE_DIR, Parquet se pyarrow è
+      installato e il round-trip è fedele, altrimenti pickle; la directory
+      è potata oltre EXCEL_CACHE_MAX_MB
+
+    Le voci sono distinte anche per motore di lettura e versione di pandas:
+    un frame letto con openpyxl non è servito a chi legge con calamine.
+    """
+
+    def __init__(self, cache_dir: Path, max_mb: int, memory_items: int, disk: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.memory_items = memory_items
+        self.disk = disk
+        self._frames: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+        self._sheet_names: Dict[str, List[str]] = {}
+        # (path, size, mtime) -> hash: evita di rileggere file invariati
+        self._path_hashes: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- Sorgente ---
+
+    def content_of(self, source: ExcelSource) -> Tuple[str, Union[Path, bytes]]:
+        """
+        Hash del contenuto e sorgente leggibile (Path o bytes).
+
+        Accetta path, bytes o oggetti file (es. UploadedFile di Streamlit,
+        letti con getvalue() senza spostarne la posizione).
+        """
+        if isinstance(source, (str, Path)):
+            path = Path(source)
+            stat = path.stat()
+            stat_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                digest = self._path_hashes.get(stat_key)
+            if digest is None:
+                sha = hashlib.sha1()
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        sha.update(block)
+                digest = sha.hexdigest()
+                with self._lock:
+                    self._path_hashes[stat_key] = digest
+            return digest, path
+
+        if isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+        elif hasattr(source, 'getvalue'):
+            data = source.getvalue()
+        else:
+            position = source.tell()
+            data = source.read()
+            source.seek(position)
+        return hashlib.sha1(data).hexdigest(), data
+
+    # --- Letture ---
+
+    def sheet_names(self, source: ExcelSource) -> List[str]:
+        """Nomi dei fogli (senza parsing delle celle)."""
+        digest, readable = self.content_of(source)
+        with self._lock:
+            names = self._sheet_names.get(digest)
+        if names is None:
+            with pd.ExcelFile(self._readable(readable), engine=excel_engine()) as xls:
+                names = list(xls.sheet_names)
+            with self._lock:
+                self._sheet_names[digest] = names
+        return list(names)
+
+    @timed('excel', rows=lambda frames: sum(len(df) for df in frames.values()))
+    def read_sheets(
+        self,
+        source: ExcelSource,
+        sheets: Sequence[Union[str, int]],
+        usecols: Optional[Sequence[str]] = None
+    ) -> Dict[Union[str, int], pd.DataFrame]:
+        """
+        Legge solo i fogli richiesti (e, se indicato, solo le colonne usecols).
+
+        I fogli non in cache sono letti con un'unica apertura del file.
+
+        Raises:
+            ValueError: se un foglio non esiste
+        """
+        digest, readable = self.content_of(source)
+        engine = excel_engine()
+        cols_key = (tuple(usecols) if usecols is not None else None, engine, pd.__version__)
+        usecols_arg = (lambda c, wanted=frozenset(usecols): c in wanted) if usecols is not None else None
+        frames: Dict[Union[str, int], pd.DataFrame] = {}
+        missing = []
+        for sheet in sheets:
+            cached = self._get(digest, sheet, cols_key)
+            if cached is None:
+                missing.append(sheet)
+            else:
+                frames[sheet] = cached
+
+        if missing:
+            with span('ExcelParseCache.parse', 'excel') as parse_span, \
+                    pd.ExcelFile(self._readable(readable), engine=engine) as xls:
+                for sheet in missing:
+                    if isinstance(sheet, str) and sheet not in xls.sheet_names:
+                        raise ValueError(f"Worksheet named '{sheet}' not found")
+                    df = pd.read_excel(xls, sheet_name=sheet, usecols=usecols_arg)
+                    self._put(digest, sheet, cols_key, df)
+                    frames[sheet] = df.copy()
+                parse_span.set_rows(sum(len(frames[sheet]) for sheet in missing))
+        return frames
+
+    def read_sheet(
+        self,
+        source: ExcelSource,
+        sheet: Union[str, int] = 0,
+        usecols: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """Legge un singolo foglio (default il primo)."""
+        return self.read_sheets(source, [sheet], usecols)[sheet]
+
+    @staticmethod
+    def _readable(readable: Union[Path, bytes]):
+        return io.BytesIO(readable) if isinstance(readable, bytes) else readable
+
+    # --- Livelli di cache ---
+
+    def _entry_name(self, digest: str, sheet, cols_key) -> str:
+        detail = hashlib.sha1(repr((sheet, cols_key)).encode('utf-8')).hexdigest()[:12]
+        return f"{digest}_{detail}"
+
+    def _get(self, digest: str, sheet, cols_key) -> Optional[pd.DataFrame]:
+        key = (digest, sheet, cols_key)
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return df.copy()
+
+        if not self.disk:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        df = self._load_from_disk(self._entry_name(digest, sheet, cols_key))
+        with self._lock:
+            if df is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, df)
+        return df.copy()
+
+    def _put(self, digest: str, sheet, cols_key, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._remember((digest, sheet, cols_key), df)
+        if not self.disk:
+            return
+        try:
+            self._save_to_disk(self._entry_name(digest, sheet, cols_key), df)
+        except OSError as e:
+            print(f"⚠️  Cache Excel non scrivibile: {e}")
+
+    def _remember(self, key: Tuple, df: pd.DataFrame) -> None:
+        self._frames[key] = df
+        self._frames.move_to_end(key)
+        while len(self._frames) > self.memory_items:
+            self._frames.popitem(last=False)
+
+    def _load_from_disk(self, name: str) -> Optional[pd.DataFrame]:
+        parquet_path = self.cache_dir / f"{name}.parquet"
+        pickle_path = self.cache_dir / f"{name}.pkl"
+        try:
+            if parquet_path.exists():
+                return pd.read_parquet(parquet_path)
+            if pickle_path.exists():
+                return pd.read_pickle(pickle_path)
+        except Exception as e:
+            # File di cache corrotto o di un'altra versione: si rilegge l'Excel
+            print(f"⚠️  Cache Excel ignorata ({name}): {e}")
+        return None
+
+    def _save_to_disk(self, name: str, df: pd.DataFrame) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        parquet_path = self.cache_dir / f"{name}.parquet"
+        if _has_module('pyarrow'):
+            try:
+                df.to_parquet(parquet_path, index=False)
+                # Tipi misti/nomi colonna non stringa: Parquet non è fedele
+                if pd.read_parquet(parquet_path).equals(df):
+                    self._prune()
+                    return
+            except Exception:
+                pass
+            parquet_path.unlink(missing_ok=True)
+
+        df.to_pickle(self.cache_dir / f"{name}.pkl", protocol=pickle.HIGHEST_PROTOCOL)
+        self._prune()
+
+    def _prune(self) -> None:
+        """Rimuove i file meno recenti oltre il budget su disco."""
+        files = [f for f in self.cache_dir.iterdir() if f.suffix in ('.parquet', '.pkl')]
+        files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+        total = 0
+        for f in files:
+            total += f.stat().st_size
+            if total > self.max_bytes:
+                f.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Svuota memoria e disco (anche file scritti prima di disattivare il disco)."""
+        with self._lock:
+            self._frames.clear()
+            self._sheet_names.clear()
+            self._path_hashes.clear()
+        if self.cache_dir.exists():
+            for f in self.cache_dir.iterdir():
+                if f.suffix in ('.parquet', '.pkl'):
+                    f.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._frames),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_parse_cache: Optional[ExcelParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_excel_parse_cache() -> ExcelParseCache:
+    """Get cache di parsing Excel condivisa (singleton)."""
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ExcelParseCache(
+                config.EXCEL_CACHE_DIR,
+                config.EXCEL_CACHE_MAX_MB,
+                config.EXCEL_CACHE_MEMORY_ITEMS,
+                disk=config.EXCEL_CACHE_DISK
+            )
+        return _parse_cache
+
+
+def read_excel_sheet(
+    source: ExcelSource,
+    sheet_name: Union[str, int] = 0,
+    usecols: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """Legge un foglio Excel passando dalla cache di parsing."""
+    return get_excel_parse_cache().read_sheet(source, sheet_name, usecols)
+
+
+def excel_sheet_names(source: ExcelSource) -> List[str]:
+    """Nomi dei fogli di un file Excel (cache per contenuto)."""
+    return get_excel_parse_cache().sheet_names(source)
 
 
 class ExcelHandler:
@@ -23,6 +327,7 @@ class ExcelHandler:
         self.strutture_df: Optional[pd.DataFrame] = None
         self.db_tns_df: Optional[pd.DataFrame] = None
         
+    @timed('excel')
     def load_data(self) -> Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame]]:
         """
         Carica tutti i fogli dal file Excel.
@@ -37,27 +342,29 @@ class ExcelHandler:
         if not self.file_path.exists():
             raise FileNotFoundError(f"File non trovato: {self.file_path}")
         
-        # Leggi file Excel
-        xls = pd.ExcelFile(self.file_path)
+        cache = get_excel_parse_cache()
+        sheet_names = cache.sheet_names(self.file_path)
         
         # Verifica presenza fogli obbligatori
         required_sheets = [config.SHEET_PERSONALE, config.SHEET_STRUTTURE]
-        missing_sheets = [s for s in required_sheets if s not in xls.sheet_names]
+        missing_sheets = [s for s in required_sheets if s not in sheet_names]
         if missing_sheets:
             raise ValueError(f"Fogli mancanti: {missing_sheets}")
         
-        # Carica fogli
-        self.personale_df = pd.read_excel(xls, sheet_name=config.SHEET_PERSONALE)
-        self.strutture_df = pd.read_excel(xls, sheet_name=config.SHEET_STRUTTURE)
+        # Carica solo i fogli usati (DB_TNS è opzionale: potrebbe non
+        # esistere se non ancora generato)
+        sheets = list(required_sheets)
+        if config.SHEET_DB_TNS in sheet_names:
+            sheets.append(config.SHEET_DB_TNS)
+        frames = cache.read_sheets(self.file_path, sheets)
         
-        # DB_TNS è opzionale (potrebbe non esistere se non ancora generato)
-        if config.SHEET_DB_TNS in xls.sheet_names:
-            self.db_tns_df = pd.read_excel(xls, sheet_name=config.SHEET_DB_TNS)
-        else:
-            self.db_tns_df = None
+        self.personale_df = frames[config.SHEET_PERSONALE]
+        self.strutture_df = frames[config.SHEET_STRUTTURE]
+        self.db_tns_df = frames.get(config.SHEET_DB_TNS)
         
         return self.personale_df, self.strutture_df, self.db_tns_df
     
+    @timed('excel', rows=None)
     def save_data(
         self,
         personale_df: pd.DataFrame,
@@ -88,17 +395,22 @@ class ExcelHandler:
         # Assicura che le directory esistano
         target_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Scrivi Excel con engine openpyxl per .xlsx o xlwt per .xls
-        if target_path.suffix == '.xlsx':
-            engine = 'openpyxl'
-        elif target_path.suffix == '.xls':
-            engine = 'xlwt'
-        else:
+        # .xlsx in streaming (workbook write-only, memoria costante);
+        # .xls solo tramite pandas/xlwt
+        if target_path.suffix not in ('.xlsx', '.xls'):
             # Default to xlsx
             target_path = target_path.with_suffix('.xlsx')
-            engine = 'openpyxl'
         
-        with pd.ExcelWriter(target_path, engine=engine) as writer:
+        if target_path.suffix == '.xlsx':
+            # Ordine fogli: DB_TNS, TNS Personale, TNS Strutture
+            sheets = []
+            if db_tns_df is not None:
+                sheets.append((config.SHEET_DB_TNS, db_tns_df))
+            sheets.append((config.SHEET_PERSONALE, personale_df))
+            sheets.append((config.SHEET_STRUTTURE, strutture_df))
+            return stream_dataframes_to_excel(target_path, sheets)
+        
+        with pd.ExcelWriter(target_path, engine='xlwt') as writer:
             # Ordine fogli: DB_TNS, TNS Personale, TNS Strutture
             if db_tns_df is not None:
                 db_tns_df.to_excel(writer, sheet_name=config.SHEET_DB_TNS, index=False)
@@ -154,7 +466,8 @@ class ExcelHandler:
         personale_df: pd.DataFrame,
         strutture_df: pd.DataFrame,
         db_tns_df: Optional[pd.DataFrame] = None,
-        prefix: str = "TNS_HR_Export"
+        prefix: str = "TNS_HR_Export",
+        export_format: str = 'xlsx'
     ) -> Path:
         """
         Esporta dati in directory output con nome timestampato.
@@ -164,6 +477,7 @@ class ExcelHandler:
             strutture_df: DataFrame TNS Strutture
             db_tns_df: DataFrame DB_TNS
             prefix: Prefisso nome file
+            export_format: 'xlsx', 'csv' o 'parquet' (CSV/Parquet: .zip con un file per foglio)
             
         Returns:
             Path del file esportato
@@ -171,6 +485,16 @@ class ExcelHandler:
         filename = config.get_output_filename(prefix)
         output_path = config.OUTPUT_DIR / filename
         
+        if export_format != 'xlsx':
+            from services.tabular_io import export_sheets
+            
+            sheets = []
+            if db_tns_df is not None:
+                sheets.append((config.SHEET_DB_TNS, db_tns_df))
+            sheets.append((config.SHEET_PERSONALE, personale_df))
+            sheets.append((config.SHEET_STRUTTURE, strutture_df))
+            return export_sheets(sheets, output_path, export_format)
+        
         return self.save_data(
             personale_df,
             strutture_df,
@@ -179,6 +503,52 @@ class ExcelHandler:
             create_backup=False  # Non serve backup per nuovi export
         )
     
+    @timed('excel', rows=None)
+    def export_from_database(
+        self,
+        db_handler,
+        include_db_tns: bool = True,
+        prefix: str = "TNS_HR_Export",
+        output_path: Optional[Path] = None,
+        export_format: str = 'xlsx'
+    ) -> Path:
+        """
+        Esporta i dati direttamente dal database in streaming.
+        
+        Le tabelle sono lette con fetchmany a blocchi e scritte su un
+        workbook write-only (o su CSV/Parquet): la memoria resta costante
+        anche per l'intero gruppo (nessun DataFrame completo, nessun grafo
+        di celle openpyxl).
+        
+        Args:
+            db_handler: DatabaseHandler sorgente
+            include_db_tns: Se True include il foglio DB_TNS
+            prefix: Prefisso nome file (se output_path non indicato)
+            output_path: Path output esplicito
+            export_format: 'xlsx', 'csv' o 'parquet' (CSV/Parquet: .zip con un file per foglio)
+            
+        Returns:
+            Path del file esportato
+        """
+        from services.tabular_io import export_queries
+        
+        output_path = output_path or config.OUTPUT_DIR / config.get_output_filename(prefix)
+        
+        # Colonne standard TNS, nomi DB -> nomi Excel
+        mapping = db_handler._get_excel_column_mapping()
+        select = ', '.join(f'"{col}"' for col in mapping)
+        headers = list(mapping.values())
+        
+        queries = []
+        if include_db_tns:
+            queries.append((config.SHEET_DB_TNS, f"SELECT {select} FROM db_tns ORDER BY id", headers))
+        queries.append((config.SHEET_PERSONALE, f"SELECT {select} FROM personale ORDER BY Titolare", headers))
+        queries.append((config.SHEET_STRUTTURE, f"SELECT {select} FROM strutture ORDER BY DESCRIZIONE", headers))
+        
+        path = export_queries(db_handler.get_connection(), queries, output_path, export_format)
+        print(f"✅ Export streaming: {path}")
+        return path
+    
     def get_backup_list(self) -> list[dict]:
         """
         Restituisce lista backup disponibili.
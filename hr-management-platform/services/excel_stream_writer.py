@@ -0,0 +1,187 @@
+"""
+Excel Stream Writer
+
+Scrittura .xlsx a memoria costante: workbook openpyxl in modalità
+write-only (le righe vengono serializzate man mano su file temporanei,
+senza costruire il grafo di oggetti cella) alimentato a blocchi da
+DataFrame o da cursori SQLite (fetchmany).
+
+La formattazione replica quella di DataFrame.to_excel(index=False):
+intestazione in grassetto con bordi sottili e centrata, date/ore con
+formato 'YYYY-MM-DD HH:MM:SS', date con 'YYYY-MM-DD', celle vuote per
+NaN/None.
+"""
+import datetime as dt
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+import config
+
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+DATE_FORMAT = 'YYYY-MM-DD'
+
+_THIN = Side(style='thin')
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+
+class StreamingExcelWriter:
+    """
+    Writer .xlsx write-only, un foglio alla volta.
+
+    Usage:
+        with StreamingExcelWriter(path) as writer:
+            writer.write_dataframe('Foglio', df)
+            writer.write_query('Altro', conn, "SELECT ...")
+    """
+
+    def __init__(self, path: Union[str, Path], chunk_rows: Optional[int] = None):
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows or config.EXPORT_CHUNK_ROWS
+        self._workbook = Workbook(write_only=True)
+        self.rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+    def close(self) -> Path:
+        """Finalizza il file (un foglio vuoto se non ne è stato scritto nessuno)."""
+        if not self._workbook.worksheets:
+            self._workbook.create_sheet('Sheet1')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._workbook.save(self.path)
+        return self.path
+
+    # === FOGLI ===
+
+    def write_rows(
+        self,
+        sheet_name: str,
+        columns: Sequence,
+        row_chunks: Iterable[Iterable[Sequence]]
+    ) -> int:
+        """
+        Scrive un foglio da blocchi di righe (tuple allineate a columns).
+
+        Returns:
+            Numero di righe dati scritte
+        """
+        ws = self._workbook.create_sheet(sheet_name)
+        ws.append([self._header_cell(ws, name) for name in columns])
+
+        count = 0
+        for chunk in row_chunks:
+            for row in chunk:
+                ws.append([self._value_cell(ws, value) for value in row])
+                count += 1
+        self.rows_written += count
+        return count
+
+    def write_dataframe(self, sheet_name: str, df: pd.DataFrame) -> int:
+        """Scrive un DataFrame (senza indice) a blocchi di chunk_rows righe."""
+        return self.write_rows(sheet_name, list(df.columns), self._frame_chunks(df))
+
+    def write_query(
+        self,
+        sheet_name: str,
+        conn: sqlite3.Connection,
+        sql: str,
+        params: Sequence = (),
+        columns: Optional[Sequence[str]] = None,
+        transform: Optional[Callable[[Sequence], Sequence]] = None
+    ) -> int:
+        """
+        Scrive il risultato di una query leggendo il cursore con fetchmany.
+
+        Args:
+            columns: Intestazioni (default: nomi colonna della query)
+            transform: Conversione opzionale di ogni riga
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, tuple(params))
+            header = list(columns) if columns is not None else [d[0] for d in cursor.description]
+
+            def chunks():
+                while True:
+                    rows = cursor.fetchmany(self.chunk_rows)
+                    if not rows:
+                        break
+                    yield (transform(row) for row in rows) if transform else rows
+
+            return self.write_rows(sheet_name, header, chunks())
+        finally:
+            cursor.close()
+
+    # === CONVERSIONI ===
+
+    def _frame_chunks(self, df: pd.DataFrame):
+        for start in range(0, len(df), self.chunk_rows):
+            chunk = df.iloc[start:start + self.chunk_rows]
+            yield chunk.itertuples(index=False, name=None)
+
+    @staticmethod
+    def _header_cell(ws, name) -> WriteOnlyCell:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = _HEADER_FONT
+        cell.border = _HEADER_BORDER
+        cell.alignment = _HEADER_ALIGNMENT
+        return cell
+
+    @staticmethod
+    def _value_cell(ws, value):
+        """Valore Excel (None per vuoti) o cella con formato data."""
+        if value is None or value is pd.NA or value is pd.NaT:
+            return None
+        if isinstance(value, float):
+            return None if value != value else value
+        if isinstance(value, (str, int)):
+            return value
+        if isinstance(value, np.datetime64):
+            return StreamingExcelWriter._value_cell(ws, pd.Timestamp(value))
+        if isinstance(value, np.generic):
+            value = value.item()
+            if isinstance(value, float) and value != value:
+                return None
+            if not isinstance(value, (dt.date, dt.datetime)):
+                return value
+        if isinstance(value, dt.datetime):
+            if isinstance(value, pd.Timestamp):
+                value = value.to_pydatetime()
+            cell = WriteOnlyCell(ws, value=value)
+            cell.number_format = DATETIME_FORMAT
+            return cell
+        if isinstance(value, dt.date):
+            cell = WriteOnlyCell(ws, value=dt.datetime(value.year, value.month, value.day))
+            cell.number_format = DATE_FORMAT
+            return cell
+        return value
+
+
+def stream_dataframes_to_excel(
+    path: Union[str, Path],
+    sheets: List[tuple],
+    chunk_rows: Optional[int] = None
+) -> Path:
+    """
+    Scrive più DataFrame in un .xlsx write-only.
+
+    Args:
+        sheets: Lista (nome_foglio, DataFrame) nell'ordine dei fogli
+    """
+    writer = StreamingExcelWriter(path, chunk_rows)
+    for sheet_name, df in sheets:
+        writer.write_dataframe(sheet_name, df)
+    return writer.close()
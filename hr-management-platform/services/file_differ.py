@@ -3,9 +3,11 @@ Service per confronto file Excel TNS.
 Identifica differenze tra due versioni: aggiunte, eliminazioni, modifiche.
 """
 import pandas as pd
-from typing import Dict, List, Tuple, Any
+from typing import Any, Dict, Iterable, List, Tuple, Union
 from datetime import datetime
 
+from services.perf_trace import timed
+
 
 class DiffResult:
     """Risultato confronto con statistiche e dettagli"""
@@ -48,6 +50,30 @@ class FileDiffer:
     """
 
     @staticmethod
+    def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Record del DataFrame con i valori mancanti (NaN/NA) come None."""
+        return df.astype(object).where(pd.notna(df), None).to_dict('records')
+
+    @staticmethod
+    def _field_changes(old_record: Dict, new_record: Dict, columns: List[str]) -> List[Dict]:
+        """Campi modificati tra due record (None e stringa vuota sono equivalenti)."""
+        changes = []
+        for col in columns:
+            old_val = old_record.get(col)
+            new_val = new_record.get(col)
+            if old_val == new_val:
+                continue
+            if old_val in (None, '') and new_val in (None, ''):
+                continue
+            changes.append({
+                'field': col,
+                'old_value': old_val,
+                'new_value': new_val
+            })
+        return changes
+
+    @staticmethod
+    @timed('diff', rows=None)
     def compare_dataframes(
         df_old: pd.DataFrame,
         df_new: pd.DataFrame,
@@ -63,81 +89,108 @@ class FileDiffer:
             key_field: Campo chiave univoca (es. TxCodFiscale, Codice)
             record_type: Tipo record per etichette (Personale/Strutture)
 
+        Returns:
+            DiffResult con dettagli differenze
+        """
+        return FileDiffer.compare_chunks(df_old, [df_new], key_field, record_type)
+
+    @staticmethod
+    def compare_chunks(
+        df_old: pd.DataFrame,
+        new_chunks: Iterable[pd.DataFrame],
+        key_field: str,
+        record_type: str = "Personale"
+    ) -> DiffResult:
+        """
+        Confronta la versione precedente con la nuova letta a blocchi.
+
+        La versione precedente è indicizzata una volta per chiave; i blocchi
+        della nuova (es. tabular_io.iter_table) sono confrontati man mano,
+        senza concatenarli. Per chiavi ripetute vale la prima occorrenza.
+
         Returns:
             DiffResult con dettagli differenze
         """
         result = DiffResult()
 
-        # Converti NaN in None per confronto
-        df_old_clean = df_old.where(pd.notna(df_old), None)
-        df_new_clean = df_new.where(pd.notna(df_new), None)
-
-        # Estrai chiavi univoche
-        old_keys = set(df_old_clean[key_field].dropna().unique())
-        new_keys = set(df_new_clean[key_field].dropna().unique())
-
-        # Identifica aggiunti, eliminati
-        added_keys = new_keys - old_keys
-        deleted_keys = old_keys - new_keys
-        common_keys = old_keys & new_keys
-
-        # Record aggiunti
-        for key in added_keys:
-            record = df_new_clean[df_new_clean[key_field] == key].iloc[0].to_dict()
-            result.added_records.append({
-                'key': key,
-                'record_type': record_type,
-                'data': record
-            })
-        result.added_count = len(added_keys)
-
-        # Record eliminati
-        for key in deleted_keys:
-            record = df_old_clean[df_old_clean[key_field] == key].iloc[0].to_dict()
-            result.deleted_records.append({
-                'key': key,
-                'record_type': record_type,
-                'data': record
-            })
-        result.deleted_count = len(deleted_keys)
-
-        # Record comuni: verifica modifiche
-        for key in common_keys:
-            old_record = df_old_clean[df_old_clean[key_field] == key].iloc[0]
-            new_record = df_new_clean[df_new_clean[key_field] == key].iloc[0]
-
-            # Confronta campo per campo
-            changes = []
-            for col in df_old_clean.columns:
-                old_val = old_record[col]
-                new_val = new_record[col]
-
-                # Considera cambiamento solo se diverso
-                if old_val != new_val:
-                    # Gestisci confronto None vs stringa vuota
-                    if not (pd.isna(old_val) and new_val == ''):
-                        if not (old_val == '' and pd.isna(new_val)):
-                            changes.append({
-                                'field': col,
-                                'old_value': old_val,
-                                'new_value': new_val
-                            })
-
-            if changes:
-                result.modified_records.append({
+        # Indice chiave -> record della versione precedente (prima occorrenza)
+        old_index: Dict[Any, Dict] = {}
+        for record in FileDiffer._records(df_old):
+            key = record.get(key_field)
+            if key is not None and key not in old_index:
+                old_index[key] = record
+        columns = list(df_old.columns)
+
+        seen_keys = set()
+        for chunk in new_chunks:
+            if key_field not in chunk.columns:
+                raise KeyError(key_field)
+            for new_record in FileDiffer._records(chunk):
+                key = new_record.get(key_field)
+                if key is None or key in seen_keys:
+                    continue
+                seen_keys.add(key)
+
+                old_record = old_index.get(key)
+                if old_record is None:
+                    # Record aggiunto
+                    result.added_records.append({
+                        'key': key,
+                        'record_type': record_type,
+                        'data': new_record
+                    })
+                    continue
+
+                # Record comune: confronta campo per campo
+                changes = FileDiffer._field_changes(old_record, new_record, columns)
+                if changes:
+                    result.modified_records.append({
+                        'key': key,
+                        'record_type': record_type,
+                        'changes': changes,
+                        'old_record': old_record,
+                        'new_record': new_record
+                    })
+                else:
+                    result.unchanged_count += 1
+
+        # Record eliminati: chiavi precedenti assenti nella nuova versione
+        for key, record in old_index.items():
+            if key not in seen_keys:
+                result.deleted_records.append({
                     'key': key,
                     'record_type': record_type,
-                    'changes': changes,
-                    'old_record': old_record.to_dict(),
-                    'new_record': new_record.to_dict()
+                    'data': record
                 })
-                result.modified_count += 1
-            else:
-                result.unchanged_count += 1
 
+        result.added_count = len(result.added_records)
+        result.deleted_count = len(result.deleted_records)
+        result.modified_count = len(result.modified_records)
         return result
 
     @staticmethod
+    @timed('diff', rows=None)
+    def compare_table_files(
+        old_source,
+        new_source,
+        key_field: str,
+        record_type: str = "Personale",
+        sheet_name: Union[str, int] = 0
+    ) -> DiffResult:
+        """
+        Confronta due file tabellari (Excel, CSV o Parquet).
+
+        Il file precedente è letto intero, il nuovo a blocchi (iter_table).
+        """
+        from services.tabular_io import iter_table, read_table
+
+        df_old = read_table(old_source, sheet_name)
+        return FileDiffer.compare_chunks(
+            df_old, iter_table(new_source, sheet_name), key_field, record_type
+        )
+
+    @staticmethod
+    @timed('diff', rows=None)
     def compare_full_files(
         personale_old: pd.DataFrame,
         strutture_old: pd.DataFrame,
@@ -172,11 +225,15 @@ class FileDiffer:
     def export_diff_report(
         personale_diff: DiffResult,
         strutture_diff: DiffResult,
-        output_path: str = None
+        output_path: str = None,
+        export_format: str = None
     ) -> pd.DataFrame:
         """
         Genera report Excel con differenze.
 
+        Se output_path è indicato il report viene anche scritto su file:
+        Excel, CSV o Parquet (export_format, default dall'estensione).
+
         Crea DataFrame con:
         - Tipo modifica (Added/Deleted/Modified)
         - Record type (Personale/Strutture)
@@ -266,6 +323,7 @@ class FileDiffer:
 
         # Export se specificato
         if output_path:
-            report_df.to_excel(output_path, index=False)
+            from services.tabular_io import write_table
+            write_table(report_df, output_path, export_format)
 
         return report_df
@@ -0,0 +1,167 @@
+"""
+Hierarchy Integrity
+
+Controlli di integrità della gerarchia strutture in un'unica passata
+lineare: cicli (ognuno riportato una sola volta), strutture orfane (padre
+inesistente), padri mancanti e strutture staccate sotto un ciclo.
+
+Lavora sui puntatori al padre codificati come interi di TreeMetrics; la
+risalita delle catene è quella di models.strutture.walk_parent_chains.
+Offre inoltre il controllo incrementale O(profondità) per un singolo
+cambio di padre, usato dalla UI di modifica ad ogni variazione.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.strutture import walk_parent_chains
+from services.tree_metrics import TreeMetrics, get_tree_metrics
+
+
+@dataclass
+class HierarchyReport:
+    """Esito dei controlli di integrità della gerarchia."""
+    cycles: List[List[str]] = field(default_factory=list)
+    orphans: List[str] = field(default_factory=list)
+    dangling_parents: List[str] = field(default_factory=list)
+    detached: List[str] = field(default_factory=list)
+
+    @property
+    def has_issues(self) -> bool:
+        return bool(self.cycles or self.orphans or self.detached)
+
+    def cycle_codes(self) -> List[str]:
+        """Tutti i codici coinvolti in un ciclo."""
+        return [codice for cycle in self.cycles for codice in cycle]
+
+    def cycle_messages(self) -> List[str]:
+        """Messaggi descrittivi, uno per ciclo distinto."""
+        return [
+            f"Ciclo rilevato: {' -> '.join(cycle + [cycle[0]])}"
+            for cycle in self.cycles
+        ]
+
+
+class HierarchyIntegrity:
+    """
+    Motore di integrità su una gerarchia codificata (TreeMetrics).
+
+    Il report completo è calcolato al primo accesso e memorizzato; il
+    controllo di un cambio padre non richiede il report.
+    """
+
+    def __init__(self, metrics: TreeMetrics):
+        self.metrics = metrics
+        self._report: Optional[HierarchyReport] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, codes: Sequence, parents: Sequence) -> 'HierarchyIntegrity':
+        """Costruisce il motore da liste parallele codice/padre."""
+        return cls(TreeMetrics(codes, parents))
+
+    @property
+    def report(self) -> HierarchyReport:
+        with self._lock:
+            if self._report is None:
+                self._report = self._check()
+            return self._report
+
+    def _check(self) -> HierarchyReport:
+        """Cicli e catene che vi finiscono da models.strutture.walk_parent_chains."""
+        codes = self.metrics.codes
+        parent = self.metrics.parent
+        is_root = self.metrics.is_root
+        n = len(codes)
+
+        cycles, to_cycle = walk_parent_chains(parent.tolist())
+        in_cycle = np.zeros(n, dtype=bool)
+        for cycle in cycles:
+            in_cycle[cycle] = True
+
+        orphan_mask = (parent < 0) & ~is_root if n else np.zeros(0, dtype=bool)
+        detached_mask = np.frombuffer(bytes(to_cycle), dtype=np.uint8).astype(bool) & ~in_cycle
+
+        return HierarchyReport(
+            cycles=[[codes[i] for i in cycle] for cycle in cycles],
+            orphans=codes[orphan_mask].tolist(),
+            dangling_parents=sorted(
+                {self._raw_parent(i) for i in np.flatnonzero(orphan_mask)}, key=str
+            ),
+            detached=codes[detached_mask].tolist(),
+        )
+
+    def _raw_parent(self, node: int):
+        return self.metrics.parent_codes[node]
+
+    def would_create_cycle(self, codice: str, new_padre: Optional[str]) -> bool:
+        """
+        Verifica se impostare new_padre come padre di codice creerebbe un ciclo.
+
+        Risale i padri da new_padre: costo O(profondità di new_padre).
+        """
+        if not new_padre or pd.isna(new_padre):
+            return False
+        if new_padre == codice:
+            return True
+
+        parent = self.metrics.parent
+        codes = self.metrics.codes
+        visited = set()
+        current = self.metrics.position(new_padre)
+        while current >= 0 and current not in visited:
+            if codes[current] == codice:
+                return True
+            visited.add(current)
+            current = parent[current]
+        return False
+
+    def parent_exists(self, padre: Optional[str]) -> bool:
+        """True se padre è vuoto o è un codice esistente."""
+        if not padre or pd.isna(padre):
+            return True
+        return self.metrics.position(padre) >= 0
+
+
+# === CACHE PER VERSIONE DATI ===
+
+# 'strutture' -> (chiave frame/versione dati o None, TreeMetrics, motore)
+_integrity_cache: Dict[str, Tuple[Optional[tuple], TreeMetrics, HierarchyIntegrity]] = {}
+_integrity_cache_lock = threading.Lock()
+
+
+def get_hierarchy_integrity(
+    strutture_df: pd.DataFrame,
+    data_version: Optional[str] = None
+) -> HierarchyIntegrity:
+    """
+    Get HierarchyIntegrity per strutture_df (condivide la codifica di TreeMetrics).
+
+    Con data_version (DatabaseHandler.get_data_version) il motore già
+    costruito per lo stesso frame e la stessa versione è riusato senza
+    ricalcolare l'impronta del frame: il controllo di un cambio padre resta
+    O(profondità). Chi modifica il frame sul posto senza scrivere sul DB
+    chiama invalidate_hierarchy_integrity.
+    """
+    key = (id(strutture_df), data_version) if data_version is not None else None
+    if key is not None:
+        with _integrity_cache_lock:
+            cached = _integrity_cache.get('strutture')
+            if cached is not None and cached[0] == key:
+                return cached[2]
+
+    metrics = get_tree_metrics(strutture_df)
+    with _integrity_cache_lock:
+        cached = _integrity_cache.get('strutture')
+        integrity = cached[2] if cached is not None and cached[1] is metrics else HierarchyIntegrity(metrics)
+        _integrity_cache['strutture'] = (key, metrics, integrity)
+        return integrity
+
+
+def invalidate_hierarchy_integrity() -> None:
+    """Scarta il motore in cache (es. dopo una modifica sul posto del frame)."""
+    with _integrity_cache_lock:
+        _integrity_cache.clear()
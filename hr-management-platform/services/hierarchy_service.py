@@ -14,6 +14,8 @@ from models.hierarchy import (
     HierarchyAssignmentListItem, EmployeeHierarchies, HierarchyTreeNode,
     ApprovalChain, HierarchyStats
 )
+from services.perf_trace import timed
+from services.query_trace import connect
 
 
 class HierarchyService:
@@ -24,7 +26,7 @@ class HierarchyService:
 
     def _get_connection(self) -> sqlite3.Connection:
         """Get database connection"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn
 
@@ -243,6 +245,7 @@ class HierarchyService:
         finally:
             conn.close()
 
+    @timed('db')
     def get_org_unit_employees(
         self,
         org_unit_id: int,
@@ -0,0 +1,376 @@
+"""
+Job Runner
+
+Esecuzione in background delle operazioni lunghe (import, snapshot,
+restore, merge) fuori dal thread dello script Streamlit: un rerun o un
+refresh del browser non le interrompe più.
+
+- un solo thread di esecuzione: tutti i job scrivono sul DB (import,
+  snapshot, restore, merge) e vengono eseguiti uno alla volta, in ordine
+  di sottomissione; coda massima config.JOB_MAX_PENDING
+- stato, avanzamento e messaggi nella tabella SQLite jobs, leggibile da
+  qualunque sessione
+- cancellazione cooperativa: il job la vede alla prima chiamata
+  JobContext.report()
+- il risultato resta in memoria (ultimi config.JOB_MAX_RESULTS) e, se
+  serializzabile, anche in jobs.result_json
+
+Le funzioni eseguite ricevono un JobContext come primo argomento e non
+devono usare st.session_state (non c'è un contesto di script).
+
+Usage:
+    runner = get_job_runner()
+    job_id = runner.submit('import_db_org', run_import, path, label="Import DB_ORG")
+    job = runner.get_job(job_id)        # status, progress, message
+    runner.cancel(job_id)
+    result = runner.get_result(job_id)
+"""
+import json
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+INTERRUPTED = 'interrupted'
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Oltre questa dimensione il risultato resta solo in memoria
+_MAX_RESULT_JSON = 64 * 1024
+
+
+class JobCancelled(Exception):
+    """Sollevata da JobContext.report() quando è stata chiesta la cancellazione."""
+
+
+class JobQueueFull(Exception):
+    """Troppi job in attesa: config.JOB_MAX_PENDING."""
+
+
+@dataclass
+class Job:
+    """Riga della tabella jobs."""
+    job_id: str
+    kind: str
+    label: str
+    status: str
+    progress: float = 0.0
+    message: str = ''
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    cancel_requested: bool = False
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+
+class JobContext:
+    """Handle passato alla funzione del job per avanzamento e cancellazione."""
+
+    def __init__(self, runner: 'JobRunner', job_id: str, cancel_event: threading.Event):
+        self.job_id = job_id
+        self._runner = runner
+        self._cancel_event = cancel_event
+        self._last_write = 0.0
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} annullato")
+
+    def report(self, progress: Optional[float] = None, message: Optional[str] = None) -> None:
+        """
+        Aggiorna avanzamento (0..1) e messaggio; solleva JobCancelled se richiesto.
+
+        Le scritture su DB sono limitate a una ogni config.JOB_PROGRESS_INTERVAL
+        secondi (sempre scritto il completamento).
+        """
+        self.check_cancelled()
+        now = time.monotonic()
+        if (progress is not None and progress >= 1.0) or now - self._last_write >= config.JOB_PROGRESS_INTERVAL:
+            self._last_write = now
+            self._runner._update(self.job_id, progress=progress, message=message)
+
+    def progress_callback(self, label: str = '') -> Callable[[int, int], None]:
+        """Adattatore per le callback (elaborati, totale) dei servizi (es. apply_merge)."""
+        def callback(done: int, total: int):
+            text = f"{label} {done}/{total}".strip()
+            self.report(done / total if total else 1.0, text)
+        return callback
+
+
+class JobRunner:
+    """
+    Pool di job in background con stato persistito su SQLite.
+
+    Un'istanza per processo (get_job_runner): i job vivono nel processo
+    Streamlit, quelli rimasti attivi da un processo precedente vengono
+    marcati 'interrupted' all'avvio.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        max_pending: Optional[int] = None
+    ):
+        self.db_path = Path(db_path or config.DB_PATH)
+        self.max_pending = max_pending or config.JOB_MAX_PENDING
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._results: "OrderedDict[str, Any]" = OrderedDict()
+
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_table()
+
+    def _init_table(self):
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    label TEXT,
+                    status TEXT NOT NULL,
+                    progress REAL DEFAULT 0,
+                    message TEXT,
+                    error TEXT,
+                    result_json TEXT,
+                    cancel_requested INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at DESC)")
+            stale = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = CURRENT_TIMESTAMP, "
+                "message = 'Interrotto dal riavvio dell''applicazione' WHERE status IN (?, ?)",
+                (INTERRUPTED, QUEUED, RUNNING)
+            ).rowcount
+            self._conn.commit()
+        if stale:
+            print(f"⚠️ {stale} job interrotti dal riavvio precedente")
+
+    # === SOTTOMISSIONE ===
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[..., Any],
+        *args,
+        label: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        """
+        Accoda fn(context, *args, **kwargs).
+
+        Args:
+            kind: Tipo job (es. 'import_db_org', 'restore_snapshot')
+            label: Descrizione per la UI
+
+        Returns:
+            job_id
+
+        Raises:
+            JobQueueFull: se i job attivi sono già config.JOB_MAX_PENDING
+        """
+        with self._lock:
+            self._futures = {jid: future for jid, future in self._futures.items() if not future.done()}
+            active = len(self._futures)
+            if active >= self.max_pending:
+                raise JobQueueFull(f"Troppi job in corso ({active}): riprova più tardi")
+
+            job_id = uuid.uuid4().hex[:12]
+            message = 'In attesa di un altro job sul database' if active else 'In coda'
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, label, status, message) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, label or kind, QUEUED, message)
+            )
+            self._conn.commit()
+            cancel_event = threading.Event()
+            self._cancel_events[job_id] = cancel_event
+            self._futures[job_id] = self._executor.submit(self._run, job_id, cancel_event, fn, args, kwargs)
+
+        print(f"📋 Job {job_id} accodato: {label or kind}")
+        return job_id
+
+    def _run(self, job_id: str, cancel_event: threading.Event, fn, args, kwargs):
+        context = JobContext(self, job_id, cancel_event)
+        try:
+            context.check_cancelled()
+            self._update(job_id, status=RUNNING, message='In esecuzione', started=True)
+            result = fn(context, *args, **kwargs)
+            # Cancellazione vista dal servizio ma gestita al suo interno
+            context.check_cancelled()
+
+        except JobCancelled:
+            self._finish(job_id, CANCELLED, message='Annullato')
+            print(f"⏹️ Job {job_id} annullato")
+            return None
+
+        except Exception as e:
+            self._finish(job_id, FAILED, message=f"Errore: {e}", error=traceback.format_exc())
+            print(f"❌ Job {job_id} fallito: {e}")
+            return None
+
+        with self._lock:
+            self._results[job_id] = result
+            while len(self._results) > config.JOB_MAX_RESULTS:
+                self._results.popitem(last=False)
+        self._finish(job_id, SUCCEEDED, message='Completato', result=result)
+        print(f"✅ Job {job_id} completato")
+        return result
+
+    # === STATO ===
+
+    def _update(
+        self,
+        job_id: str,
+        status: Optional[str] = None,
+        progress: Optional[float] = None,
+        message: Optional[str] = None,
+        started: bool = False
+    ):
+        sets, params = [], []
+        if status is not None:
+            sets.append("status = ?")
+            params.append(status)
+        if progress is not None:
+            sets.append("progress = ?")
+            params.append(max(0.0, min(1.0, float(progress))))
+        if message is not None:
+            sets.append("message = ?")
+            params.append(message)
+        if started:
+            sets.append("started_at = CURRENT_TIMESTAMP")
+        if not sets:
+            return
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(sets)} WHERE job_id = ?", params + [job_id])
+            self._conn.commit()
+
+    def _finish(self, job_id: str, status: str, message: str, error: Optional[str] = None, result: Any = None):
+        result_json = None
+        if result is not None:
+            try:
+                result_json = json.dumps(result, default=str)
+            except (TypeError, ValueError):
+                result_json = None
+            if result_json is not None and len(result_json) > _MAX_RESULT_JSON:
+                result_json = None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, error = ?, result_json = ?, "
+                "progress = CASE WHEN ? = ? THEN 1 ELSE progress END, "
+                "finished_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                (status, message, error, result_json, status, SUCCEEDED, job_id)
+            )
+            self._conn.commit()
+            self._cancel_events.pop(job_id, None)
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Stato corrente del job (None se sconosciuto)."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def list_jobs(self, limit: int = 20, active_only: bool = False) -> List[Job]:
+        """Ultimi job (più recenti prima)."""
+        sql = "SELECT * FROM jobs"
+        params: list = []
+        if active_only:
+            sql += " WHERE status IN (?, ?)"
+            params += list(ACTIVE_STATUSES)
+        sql += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit]).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def get_result(self, job_id: str) -> Any:
+        """Risultato del job completato (oggetto originale se ancora in memoria)."""
+        with self._lock:
+            if job_id in self._results:
+                return self._results[job_id]
+            row = self._conn.execute("SELECT result_json FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or row['result_json'] is None:
+            return None
+        return json.loads(row['result_json'])
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Chiede la cancellazione: immediata se il job è ancora in coda,
+        altrimenti alla prossima chiamata di report() del job.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            event = self._cancel_events.get(job_id)
+            if future is None or event is None or future.done():
+                return False
+            event.set()
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+            cancelled_in_queue = future.cancel()
+        if cancelled_in_queue:
+            self._finish(job_id, CANCELLED, message='Annullato prima dell\'avvio')
+        return True
+
+    def purge(self, keep_days: int = 7) -> int:
+        """Elimina i job terminati più vecchi di keep_days giorni."""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND created_at < datetime('now', ?)",
+                (*ACTIVE_STATUSES, f'-{int(keep_days)} days')
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row['job_id'],
+            kind=row['kind'],
+            label=row['label'] or row['kind'],
+            status=row['status'],
+            progress=row['progress'] or 0.0,
+            message=row['message'] or '',
+            error=row['error'],
+            created_at=row['created_at'],
+            started_at=row['started_at'],
+            finished_at=row['finished_at'],
+            cancel_requested=bool(row['cancel_requested'])
+        )
+
+
+# Singleton per processo
+_job_runner_instance = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Get singleton instance of JobRunner"""
+    global _job_runner_instance
+    with _job_runner_lock:
+        if _job_runner_instance is None:
+            _job_runner_instance = JobRunner()
+        return _job_runner_instance
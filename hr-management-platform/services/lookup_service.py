@@ -4,11 +4,11 @@ Lookup Service
 Provides lookup values for dropdown menus and autocomplete fields.
 Values are dynamically queried from database to ensure data quality.
 """
-import sqlite3
 from pathlib import Path
 from typing import List, Dict, Optional
 from functools import lru_cache
 import config
+from services.query_trace import connect
 
 
 class LookupService:
@@ -24,7 +24,7 @@ class LookupService:
 
     def _execute_query(self, query: str, params: tuple = ()) -> List[tuple]:
         """Execute a SELECT query and return results"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         try:
             cursor.execute(query, params)
@@ -5,21 +5,27 @@ Handles:
 - Record matching between Excel file and database
 - Gap analysis (DB records not in file)
 - Merge preview with conflict detection
-- Merge execution using BatchOperations
+- Merge execution a blocchi con checkpoint (ChangeExecutor)
 """
 
+import hashlib
+import json
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Any, Optional, Set, Tuple, Union
 import logging
 
+import config
+
 from models.merge_models import (
-    MatchedPair, MatchResult, GapDetail, GapAnalysis,
-    FieldConflict, MergeRecord, MergePreview, MergeResult,
-    MergeStrategy, ImportType, MergeStrategyDict
+    MatchedPair, MatchedPairSet, MatchResult, GapDetail, GapAnalysis,
+    MergeRecord, MergePlan, MergeRecordSet, MergePreview, MergeResult,
+    MergeStrategy, ImportType, MergeStrategyDict, values_differ
 )
-from models.bot_models import ChangeProposal, OperationType
-from services.batch_operations import BatchOperations
+from models.bot_models import ChangeProposal, OperationType, RecordType
+from services.change_executor import ChangeExecutor
 from services.database import DatabaseHandler
+from services.perf_trace import timed
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +49,7 @@ class MergeEngine:
 
     # ========== MATCHING ==========
 
+    @timed('merge', rows=None)
     def match_records(
         self,
         source_df: pd.DataFrame,
@@ -78,51 +85,31 @@ class MergeEngine:
         logger.info(f"Matching records on key '{key_column}' for import type '{import_type}'")
 
         # Normalizza key column (strip, uppercase se CF)
-        source_keys = set(self._normalize_key(source_df[key_column]))
-        target_keys = set(self._normalize_key(target_df[key_column]))
+        source_keys = self._normalize_key(source_df[key_column])
+        target_keys = self._normalize_key(target_df[key_column])
 
-        # Compute sets
-        matched_keys = source_keys & target_keys
-        new_keys = source_keys - target_keys
-        gap_keys = target_keys - source_keys
+        in_target = source_keys.isin(target_keys).to_numpy()
+        in_source = target_keys.isin(source_keys).to_numpy()
 
-        logger.info(
-            f"Match results: {len(matched_keys)} matched, "
-            f"{len(new_keys)} new, {len(gap_keys)} gap"
-        )
-
-        # Build matched pairs
-        matched_pairs = []
-        for key in matched_keys:
-            source_row = source_df[source_df[key_column].apply(self._normalize_single_key) == key].iloc[0]
-            target_row = target_df[target_df[key_column].apply(self._normalize_single_key) == key].iloc[0]
-
-            matched_pairs.append(MatchedPair(
-                source_id=str(key),
-                target_id=str(key),
-                source_data=source_row.to_dict(),
-                target_data=target_row.to_dict(),
-                match_confidence=1.0  # Exact match
-            ))
+        # Coppie: prima occorrenza della chiave in entrambi i frame, allineate per posizione
+        source_first = in_target & ~source_keys.duplicated().to_numpy()
+        matched_source = source_df[source_first]
+        matched_source.index = pd.Index(source_keys[source_first].to_numpy(), name=key_column)
 
-        # Build unmatched source (new records)
-        unmatched_source = [
-            row.to_dict()
-            for key in new_keys
-            for _, row in source_df[source_df[key_column].apply(self._normalize_single_key) == key].iterrows()
-        ]
+        target_first = ~target_keys.duplicated().to_numpy()
+        target_positions = pd.Index(target_keys[target_first].to_numpy()).get_indexer(matched_source.index)
+        matched_target = target_df[target_first].iloc[target_positions]
+        matched_target.index = matched_source.index
 
-        # Build unmatched target (gap records)
-        unmatched_target = [
-            row.to_dict()
-            for key in gap_keys
-            for _, row in target_df[target_df[key_column].apply(self._normalize_single_key) == key].iterrows()
-        ]
+        logger.info(
+            f"Match results: {len(matched_source)} matched, "
+            f"{source_keys[~in_target].nunique()} new, {target_keys[~in_source].nunique()} gap"
+        )
 
         return MatchResult(
-            matched_pairs=matched_pairs,
-            unmatched_source=unmatched_source,
-            unmatched_target=unmatched_target
+            matched_pairs=MatchedPairSet(matched_source, matched_target),
+            unmatched_source=source_df[~in_target].to_dict('records'),
+            unmatched_target=target_df[~in_source].to_dict('records')
         )
 
     def _normalize_key(self, series: pd.Series) -> pd.Series:
@@ -275,20 +262,25 @@ class MergeEngine:
 
     # ========== MERGE PREVIEW ==========
 
+    @timed('merge', rows=None)
     def preview_merge(
         self,
-        matched_pairs: List[MatchedPair],
+        matched_pairs: Union[MatchedPairSet, List[MatchedPair]],
         merge_strategy: MergeStrategy = MergeStrategy.OVERWRITE,
         per_field_strategies: Optional[MergeStrategyDict] = None
     ) -> MergePreview:
         """
         Genera preview del merge con detection conflitti.
 
-        Per ogni matched pair, calcola:
+        Planner colonnare: i frame file/DB sono allineati per chiave e ogni
+        strategia è valutata come maschera su tutta la colonna. Per ogni
+        riga risultano:
         - before: dati attuali DB
         - after: dati post-merge
         - changed_fields: campi modificati
-        - conflicts: campi con file ≠ DB
+        - conflicts: campi con file ≠ DB (tabella compatta)
+
+        I MergeRecord vengono costruiti solo per le righe lette dalla UI.
 
         Args:
             matched_pairs: Coppie matched da match_records()
@@ -296,223 +288,405 @@ class MergeEngine:
             per_field_strategies: Strategie specifiche per campo
 
         Returns:
-            MergePreview con merge_records, conflicts, stats
+            MergePreview con merge_records (MergeRecordSet), conflicts, stats
         """
         logger.info(f"Generating merge preview for {len(matched_pairs)} records")
 
-        per_field_strategies = per_field_strategies or {}
-        merge_records = []
-
-        for pair in matched_pairs:
-            before = pair.target_data
-            after, conflicts, strategies_used = self._compute_merge(
-                source_data=pair.source_data,
-                target_data=pair.target_data,
-                default_strategy=merge_strategy,
-                per_field_strategies=per_field_strategies,
-                record_id=pair.source_id
-            )
-
-            merge_records.append(MergeRecord(
-                record_id=pair.source_id,
-                before=before,
-                after=after,
-                conflicts=conflicts,
-                merge_strategy_used=strategies_used
-            ))
-
-        return MergePreview(merge_records=merge_records)
+        if isinstance(matched_pairs, MatchedPairSet):
+            source, target = matched_pairs.source, matched_pairs.target
+        else:
+            ids = [pair.source_id for pair in matched_pairs]
+            source = pd.DataFrame([pair.source_data for pair in matched_pairs], index=ids)
+            target = pd.DataFrame([pair.target_data for pair in matched_pairs], index=ids)
+
+        plan, stats = self._plan_merge(source, target, merge_strategy, per_field_strategies or {})
+        records = MergeRecordSet(plan)
+
+        return MergePreview(
+            merge_records=records,
+            total_records=len(records),
+            records_with_changes=len(records.with_changes()),
+            total_conflicts=len(plan.conflicts),
+            stats=stats,
+            data_version=self.db.get_data_version()
+        )
 
-    def _compute_merge(
+    def _plan_merge(
         self,
-        source_data: Dict[str, Any],
-        target_data: Dict[str, Any],
+        source: pd.DataFrame,
+        target: pd.DataFrame,
         default_strategy: MergeStrategy,
-        per_field_strategies: MergeStrategyDict,
-        record_id: str
-    ) -> Tuple[Dict[str, Any], List[FieldConflict], MergeStrategyDict]:
+        per_field_strategies: MergeStrategyDict
+    ) -> Tuple[MergePlan, Dict[str, int]]:
         """
-        Computa merge per singolo record.
+        Valuta le strategie campo per campo su colonne intere.
+
+        Per ogni campo del file presente anche nel DB:
+        - uguale (o entrambi vuoti) -> KEEP_TARGET
+        - OVERWRITE/SMART_MERGE -> valore file, conflitto
+        - FILL_EMPTY -> valore file solo dove il DB è vuoto
+        - KEEP_TARGET -> valore DB
+        - ASK_USER -> valore DB, conflitto
+        I campi solo nel file vengono aggiunti (OVERWRITE) senza contare
+        come modifica.
 
         Returns:
-            (after_data, conflicts, strategies_used)
+            (MergePlan, conteggi strategie usate)
         """
-        after = target_data.copy()
-        conflicts = []
-        strategies_used = {}
-
-        # Merge ogni campo
-        for field, source_value in source_data.items():
-            if field not in target_data:
+        n = len(target)
+        before = target
+        after_columns = {column: before[column] for column in before.columns}
+        field_strategies: MergeStrategyDict = {}
+        equal_masks: Dict[str, np.ndarray] = {}
+        changed_masks: Dict[str, np.ndarray] = {}
+        conflict_parts = []
+        stats: Dict[str, int] = {}
+
+        def count(strategy: MergeStrategy, amount: int):
+            if amount:
+                stats[strategy.value] = stats.get(strategy.value, 0) + int(amount)
+
+        for field in source.columns:
+            source_values = source[field].to_numpy(dtype=object)
+
+            if field not in before.columns:
                 # Campo nuovo, aggiungi
-                after[field] = source_value
-                strategies_used[field] = MergeStrategy.OVERWRITE
+                after_columns[field] = pd.Series(source_values, index=before.index, dtype=object)
+                field_strategies[field] = MergeStrategy.OVERWRITE
+                count(MergeStrategy.OVERWRITE, n)
                 continue
 
-            target_value = target_data[field]
-
-            # Se valori uguali, skip
-            if source_value == target_value or (pd.isna(source_value) and pd.isna(target_value)):
-                strategies_used[field] = MergeStrategy.KEEP_TARGET
-                continue
+            target_values = before[field].to_numpy(dtype=object)
+            equal = _equal_mask(source_values, target_values)
+            differ = ~equal
 
-            # Applica strategia
             strategy = per_field_strategies.get(field, default_strategy)
-            strategies_used[field] = strategy
-
-            merged_value, has_conflict = self._apply_field_strategy(
-                field=field,
-                source_value=source_value,
-                target_value=target_value,
-                strategy=strategy
-            )
-
-            after[field] = merged_value
-
-            # Detect conflict
-            if has_conflict:
-                conflicts.append(FieldConflict(
-                    record_id=record_id,
-                    field_name=field,
-                    file_value=source_value,
-                    db_value=target_value,
-                    suggested_strategy=strategy
-                ))
-
-        return after, conflicts, strategies_used
-
-    def _apply_field_strategy(
-        self,
-        field: str,
-        source_value: Any,
-        target_value: Any,
-        strategy: MergeStrategy
-    ) -> Tuple[Any, bool]:
-        """
-        Applica strategia merge a singolo campo.
-
-        Returns:
-            (merged_value, has_conflict)
-        """
-        if strategy == MergeStrategy.OVERWRITE:
-            # File > DB sempre
-            return source_value, (source_value != target_value)
-
-        elif strategy == MergeStrategy.FILL_EMPTY:
-            # File > DB solo se DB vuoto
-            if pd.isna(target_value) or target_value == '' or target_value is None:
-                return source_value, False
+            field_strategies[field] = strategy
+            count(MergeStrategy.KEEP_TARGET, equal.sum())
+            count(strategy, differ.sum())
+
+            if strategy == MergeStrategy.FILL_EMPTY:
+                # File > DB solo se DB vuoto
+                take = differ & (pd.isna(target_values) | _equal_scalar_mask(target_values, ''))
+                conflict = None
+            elif strategy == MergeStrategy.KEEP_TARGET:
+                take, conflict = np.zeros(n, dtype=bool), None
+            elif strategy == MergeStrategy.ASK_USER:
+                # Default DB, ma flag conflict
+                take, conflict = np.zeros(n, dtype=bool), differ
             else:
-                return target_value, False
-
-        elif strategy == MergeStrategy.KEEP_TARGET:
-            # DB > File (mantieni DB)
-            return target_value, False
-
-        elif strategy == MergeStrategy.ASK_USER:
-            # Conflict - richiede risoluzione utente
-            return target_value, True  # Default DB, ma flag conflict
-
-        elif strategy == MergeStrategy.SMART_MERGE:
-            # TODO: Implementa merge intelligente (es. merge liste, concat stringhe)
-            # Per ora default a OVERWRITE
-            return source_value, (source_value != target_value)
+                # OVERWRITE (e SMART_MERGE, per ora equivalente)
+                take, conflict = differ, differ
+
+            equal_masks[field] = equal
+            changed_masks[field] = take
+            if take.any():
+                after_columns[field] = pd.Series(
+                    np.where(take, source_values, target_values), index=before.index, dtype=object
+                )
 
+            if conflict is not None and conflict.any():
+                positions = np.flatnonzero(conflict)
+                conflict_parts.append(pd.DataFrame({
+                    'position': positions,
+                    'field_name': field,
+                    'file_value': source_values[positions],
+                    'db_value': target_values[positions],
+                    'suggested_strategy': strategy.value
+                }))
+
+        # Maschere nell'ordine delle colonne DB (ordine di changed_fields)
+        compared = [column for column in before.columns if column in equal_masks]
+        changed = pd.DataFrame({c: changed_masks[c] for c in compared}, index=before.index, columns=compared)
+        equal = pd.DataFrame({c: equal_masks[c] for c in compared}, index=before.index, columns=compared)
+        after = pd.DataFrame(after_columns, index=before.index)
+
+        record_ids = np.asarray([str(i) for i in before.index], dtype=object)
+        if conflict_parts:
+            conflicts = pd.concat(conflict_parts, ignore_index=True)
+            conflicts = conflicts.sort_values('position', kind='stable', ignore_index=True)
         else:
-            # Default: OVERWRITE
-            return source_value, (source_value != target_value)
+            conflicts = pd.DataFrame(columns=['position', 'field_name', 'file_value', 'db_value', 'suggested_strategy'])
+            conflicts['position'] = conflicts['position'].astype(np.int64)
+        conflicts.insert(0, 'record_id', record_ids[conflicts['position'].to_numpy(dtype=np.int64)])
+
+        plan = MergePlan(before, after, changed, equal, field_strategies, conflicts)
+        return plan, stats
 
     # ========== APPLY MERGE ==========
 
+    @timed('merge', rows=None)
     def apply_merge(
         self,
         preview: MergePreview,
-        selected_record_ids: Optional[List[str]] = None,
+        selected_record_ids: Optional[Iterable[str]] = None,
         validate: bool = True,
-        record_type: str = "personale"
+        record_type: str = "personale",
+        chunk_size: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> MergeResult:
         """
-        Applica merge usando BatchOperations.
+        Applica il merge al database a blocchi, con checkpoint.
+
+        Ogni blocco di chunk_size record è una transazione ChangeExecutor
+        che registra anche il proprio checkpoint (merge_checkpoints): se
+        l'applicazione si interrompe, rilanciarla sullo stesso preview
+        salta i blocchi già confermati e riprende dal primo mancante.
+        I checkpoint sono legati al preview (run_id e versione dati) e
+        vengono eliminati a merge completato: un nuovo preview, o lo stesso
+        dopo un merge concluso, riapplica sempre tutte le modifiche.
 
         Args:
             preview: MergePreview da preview_merge()
-            selected_record_ids: Lista ID record da applicare (None = tutti)
-            validate: Se True, valida con DataValidator post-merge
+            selected_record_ids: ID record da applicare (None = tutti)
+            validate: Se True, valida con DataValidator i record mergiati
             record_type: Tipo record ("personale" o "strutture")
+            chunk_size: Record per transazione (default config.MERGE_CHUNK_SIZE)
+            progress_callback: Chiamata (record elaborati, totale) dopo ogni blocco
 
         Returns:
-            MergeResult con applied_count, errors, etc.
+            MergeResult con applied_count, errors, blocchi completati
         """
-        logger.info(f"Applying merge for {len(preview.merge_records)} records")
+        records = preview.merge_records
+        chunk_size = chunk_size or config.MERGE_CHUNK_SIZE
+        logger.info(f"Applying merge for {len(records)} records (chunks of {chunk_size})")
 
-        # Filtra record selezionati
+        # Filtra record selezionati (per insieme)
         if selected_record_ids:
-            records_to_apply = [
-                rec for rec in preview.merge_records
-                if rec.record_id in selected_record_ids
-            ]
-        else:
-            records_to_apply = preview.merge_records
-
-        # Converti a ChangeProposal
-        changes = self._convert_to_change_proposals(records_to_apply, record_type)
+            if isinstance(records, MergeRecordSet):
+                records = records.select(selected_record_ids)
+            else:
+                wanted = set(selected_record_ids)
+                records = [rec for rec in records if rec.record_id in wanted]
+        skipped = len(preview.merge_records) - len(records)
 
-        # Apply usando BatchOperations
         try:
-            batch_ops = BatchOperations()
-            batch_result = batch_ops.apply_changes(
-                changes=changes,
-                record_type=record_type,
-                validate=validate
-            )
-
-            return MergeResult(
-                success=batch_result.success,
-                applied_count=batch_result.applied_count,
-                skipped_count=len(preview.merge_records) - len(records_to_apply),
-                error_count=len(batch_result.errors),
-                errors=batch_result.errors
-            )
-
+            executor = ChangeExecutor(self.db)
+            spec = executor.resolve_table(record_type)
+            updates = self._merge_updates(records, spec.db_key)
+            chunks = [updates[i:i + chunk_size] for i in range(0, len(updates), chunk_size)]
+            merge_id = self._merge_id(preview, spec.table, spec.db_key, chunk_size, updates)
+            done_chunks = self._completed_chunks(merge_id)
         except Exception as e:
             logger.error(f"Merge application failed: {e}", exc_info=True)
-            return MergeResult(
-                success=False,
-                error_count=1,
-                errors=[f"Merge failed: {str(e)}"]
+            return MergeResult(success=False, error_count=1, errors=[f"Merge failed: {str(e)}"])
+
+        result = MergeResult(
+            success=True,
+            skipped_count=skipped,
+            merge_id=merge_id,
+            chunks_total=len(chunks),
+            chunks_resumed=len(done_chunks)
+        )
+        total, processed = len(updates), 0
+
+        for index, chunk in enumerate(chunks):
+            if index in done_chunks:
+                result.applied_count += len(chunk)
+                result.chunks_completed += 1
+                processed += len(chunk)
+                if progress_callback:
+                    progress_callback(processed, total)
+                continue
+
+            changes = [
+                ChangeProposal(
+                    change_id=f"merge_{record_id}",
+                    operation=OperationType.UPDATE_RECORD,
+                    record_type=RecordType(record_type),
+                    filter_criteria={spec.db_key: key},
+                    after_values=values,
+                    description=f"Merge: {', '.join(values)}",
+                    risk_level="low"
+                )
+                for record_id, key, values in chunk
+            ]
+
+            def checkpoint(cursor, index=index, count=len(chunk)):
+                cursor.execute(
+                    "INSERT OR REPLACE INTO merge_checkpoints (merge_id, chunk_index, records) VALUES (?, ?, ?)",
+                    (merge_id, index, count)
+                )
+
+            executed = executor.apply_changes(
+                changes, user_action='merge', table=spec.table, before_commit=checkpoint
             )
+            if not executed.success:
+                result.success = False
+                result.errors.extend(
+                    f"Blocco {index + 1}/{len(chunks)}: {error['change_id']}: {error['error']}"
+                    for error in executed.errors
+                )
+                result.error_count = len(executed.errors)
+                break
+
+            result.applied_count += len(chunk)
+            result.chunks_completed += 1
+            if executed.rows_affected < len(chunk):
+                missing = len(chunk) - executed.rows_affected
+                result.errors.append(f"Blocco {index + 1}/{len(chunks)}: {missing} record non trovati in {spec.table}")
+                result.error_count += missing
+                result.applied_count -= missing
+
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed, total)
+
+        if result.chunks_completed == len(chunks):
+            # Merge concluso: i checkpoint servono solo alla ripresa
+            self._clear_checkpoints(merge_id)
+            if validate and updates:
+                self._validate_merged(spec, record_type, [key for _, key, _ in updates], result)
 
-    def _convert_to_change_proposals(
+        logger.info(
+            f"Merge {merge_id}: {result.chunks_completed}/{len(chunks)} blocchi "
+            f"({result.chunks_resumed} ripresi), {result.applied_count} record"
+        )
+        return result
+
+    def _merge_updates(
         self,
-        merge_records: List[MergeRecord],
-        record_type: str
-    ) -> List[ChangeProposal]:
-        """Converti MergeRecord a ChangeProposal per BatchOperations."""
-        key_field = self._get_key_field(record_type)
-        changes = []
-
-        for rec in merge_records:
-            # Skip record senza modifiche
-            if not rec.changed_fields:
-                continue
+        records: Union[MergeRecordSet, List[MergeRecord]],
+        key_field: str
+    ) -> List[Tuple[str, Any, Dict[str, Any]]]:
+        """
+        Modifiche da scrivere: (record_id, valore chiave DB, {campo: valore}).
 
-            changes.append(ChangeProposal(
-                change_id=f"merge_{rec.record_id}",
-                operation=OperationType.UPDATE_RECORD,
-                filter_criteria={key_field: rec.record_id},
-                before_values=rec.before,
-                after_values=rec.after,
-                description=f"Merge: {', '.join(rec.changed_fields)}",
-                risk_level="low"
-            ))
+        Solo i campi modificati (esclusa la chiave), con le risoluzioni dei
+        conflitti scelte dall'utente; i record senza modifiche sono esclusi.
+        """
+        updates = []
+
+        if isinstance(records, MergeRecordSet):
+            plan, positions = records.plan, records.positions
+            fields = [field for field in plan.changed.columns if field != key_field]
+            changed = plan.changed[fields].to_numpy()[positions] if fields else np.zeros((len(positions), 0), dtype=bool)
+            resolutions = plan.resolutions()
+            before = {field: plan.before[field].to_numpy(dtype=object) for field in plan.before.columns}
+            after = {field: plan.after[field].to_numpy(dtype=object) for field in fields}
+            keys = before.get(key_field, plan.record_ids)
+
+            rows = changed.any(axis=1) | np.isin(positions, list(resolutions))
+            for i in np.flatnonzero(rows):
+                position = positions[i]
+                values = {field: after[field][position] for field, flag in zip(fields, changed[i]) if flag}
+                for field, value in resolutions.get(position, {}).items():
+                    if field == key_field:
+                        continue
+                    if values_differ(before[field][position], value):
+                        values[field] = value
+                    else:
+                        values.pop(field, None)
+                if values:
+                    updates.append((plan.record_ids[position], keys[position], values))
+            return updates
+
+        for rec in records:
+            values = {field: rec.after.get(field) for field in rec.changed_fields}
+            values.update({c.field_name: c.user_resolution for c in rec.conflicts if c.user_resolution is not None})
+            values = {
+                field: value for field, value in values.items()
+                if field != key_field and field in rec.before and values_differ(rec.before[field], value)
+            }
+            if values:
+                updates.append((rec.record_id, rec.before.get(key_field, rec.record_id), values))
+        return updates
+
+    # ========== CHECKPOINT ==========
+
+    @staticmethod
+    def _merge_id(preview: MergePreview, table: str, key_field: str, chunk_size: int, updates: list) -> str:
+        """
+        Identità del merge: stesso preview (run_id e versione dati al preview),
+        stesse modifiche e stessi blocchi -> stesso id (ripresa).
+        """
+        payload = json.dumps(
+            [preview.run_id, preview.data_version, table, key_field, chunk_size, updates],
+            default=str, sort_keys=True
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _ensure_checkpoint_table(self):
+        """Crea merge_checkpoints (migration 008) sui database non ancora migrati."""
+        exists = self.db.get_connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='merge_checkpoints'"
+        ).fetchone()
+        if exists is None:
+            from migrations import migration_008_add_merge_checkpoints
+            if not migration_008_add_merge_checkpoints.migrate(self.db.db_path):
+                raise RuntimeError("Migration 008 (merge_checkpoints) non applicata")
+
+    def _completed_chunks(self, merge_id: str) -> Set[int]:
+        """Indici dei blocchi già confermati per questo merge."""
+        self._ensure_checkpoint_table()
+        rows = self.db.get_connection().execute(
+            "SELECT chunk_index FROM merge_checkpoints WHERE merge_id = ?", (merge_id,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def _clear_checkpoints(self, merge_id: str):
+        conn = self.db.get_connection()
+        conn.execute("DELETE FROM merge_checkpoints WHERE merge_id = ?", (merge_id,))
+        conn.commit()
+
+    # ========== VALIDAZIONE POST-MERGE ==========
+
+    def _validate_merged(self, spec, record_type: str, keys: List[Any], result: MergeResult):
+        """
+        DataValidator sui record mergiati (e dipendenti), sulla tabella
+        riletta dal DB; errori (primi 10) e warning (primi 5) come in
+        BatchOperations.
+        """
+        from services.validator import DataValidator
+
+        frame_columns = spec.frame_columns
+        df = pd.read_sql_query(f"SELECT * FROM {spec.table}", self.db.get_connection())
+        df = df[[c for c in df.columns if c in frame_columns]].rename(columns=frame_columns)
+        if spec.null_value is not None:
+            df = df.where(df.notna(), spec.null_value)
+        # Colonne obbligatorie che la tabella non contiene (schema DB_ORG): vuote
+        # come in load_data_from_db, e i loro errori non dipendono dal merge
+        mandatory = config.MANDATORY_STRUTTURE if record_type == RecordType.STRUTTURE.value else config.MANDATORY_PERSONALE
+        not_stored = [column for column in mandatory if column not in df.columns]
+        for column in not_stored:
+            df[column] = ''
+
+        changed_rows = df.index[df[spec.frame_key].isin(keys)] if spec.frame_key in df.columns else []
+        validation = DataValidator.validate_changes(
+            df, RecordType(record_type).value, changed_rows=changed_rows, touched_keys=keys
+        )
+        errors = [err for err in validation.errors if err['field'] not in not_stored]
+        result.validation_passed = not errors
+        for err in errors[:10]:
+            result.errors.append(f"Validazione: Row {err['row']}, {err['field']}: {err['message']}")
+        for warn in validation.warnings[:5]:
+            result.errors.append(f"⚠️ Validazione: Row {warn['row']}: {warn['message']}")
+        result.error_count += len(errors)
+
+
+def _equal_mask(source_values: np.ndarray, target_values: np.ndarray) -> np.ndarray:
+    """Maschera file == DB cella per cella (due vuoti sono uguali)."""
+    both_empty = pd.isna(source_values) & pd.isna(target_values)
+    try:
+        equal = np.asarray(source_values == target_values, dtype=bool)
+    except (TypeError, ValueError):
+        # Valori con confronto ambiguo (es. pd.NA): confronto singolo
+        equal = np.fromiter(
+            (_scalar_equal(a, b) for a, b in zip(source_values, target_values)),
+            dtype=bool, count=len(source_values)
+        )
+    return equal | both_empty
 
-        return changes
 
-    def _get_key_field(self, record_type: str) -> str:
-        """Get key field name per record type."""
-        if record_type == "personale":
-            return "tx_cod_fiscale"
-        elif record_type == "strutture":
-            return "cod_tns"
-        else:
-            return "id"
+def _equal_scalar_mask(values: np.ndarray, scalar: Any) -> np.ndarray:
+    try:
+        return np.asarray(values == scalar, dtype=bool)
+    except (TypeError, ValueError):
+        return np.fromiter((_scalar_equal(v, scalar) for v in values), dtype=bool, count=len(values))
+
+
+def _scalar_equal(a: Any, b: Any) -> bool:
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
@@ -6,6 +6,8 @@ import requests
 import json
 from typing import Optional, Dict, Any, Tuple
 
+from services.perf_trace import timed
+
 
 class OllamaClient:
     """
@@ -33,6 +35,7 @@ class OllamaClient:
         self.model = model
         self.timeout = timeout
 
+    @timed('llm', rows=None)
     def check_availability(self) -> Tuple[bool, str]:
         """
         Verifica disponibilità Ollama server e modello.
@@ -93,6 +96,7 @@ class OllamaClient:
         except Exception as e:
             return False, f"Errore verifica Ollama: {str(e)}"
 
+    @timed('llm', rows=None)
     def generate(
         self,
         prompt: str,
@@ -6,10 +6,215 @@ Prepares JSON data for interactive orgchart views using d3-org-chart.
 Data sources:
 - HR orgchart: strutture table (Codice = ID, UNITA_OPERATIVA_PADRE = ReportsTo)
 - TNS orgchart: strutture + personale with approvatore roles
+
+Tree payloads are cached per data version + filter parameters (see
+services.payload_cache), together with their serialized JSON, so Streamlit
+reruns triggered by UI controls don't rebuild or re-serialize the tree.
 """
-from typing import Dict, List, Optional, Any
+import json
+import sys
+from typing import Callable, Dict, List, Optional, Any
+
+import numpy as np
 
+import config
 from services.database import DatabaseHandler
+from services.payload_cache import PayloadCache
+from services.perf_trace import count_rows, span
+from services.tree_metrics import TreeMetrics
+
+# Python dicts/lists cost roughly 3x their JSON encoding: used to estimate
+# the memory footprint of a cached payload (nodes + serialized JSON).
+_PAYLOAD_OVERHEAD_FACTOR = 3
+
+# Approximate memory cost of one TreeIndex entry (children/depth/count maps)
+_INDEX_BYTES_PER_NODE = 400
+
+# Virtual roots added by the builders to join multiple top-level nodes
+VIRTUAL_ROOT_IDS = {'ROOT', 'ROOT_TNS', 'ROOT_ORG'}
+
+# Tree types served by the index/lazy API -> public cached builder
+TREE_GETTERS = {
+    'HR': 'get_hr_hierarchy_tree',
+    'TNS': 'get_tns_hierarchy_tree',
+    'POSITIONS': 'get_positions_tree',
+    'ORG': 'get_org_hierarchy_tree',
+}
+
+
+class TreeIndex:
+    """
+    Indexed view of a flat d3 node list (id / parentId).
+
+    Built once per cached payload: parent→children map plus per-node
+    aggregates computed in a single bottom-up pass. Nodes whose parentId
+    is missing or unknown are roots; nodes unreachable from any root
+    (reporting cycles) are left out of depth and aggregates.
+
+    Aggregates:
+    - direct_reports: number of direct children
+    - total_descendants: number of nodes in the subtree (self excluded)
+    - depth: distance from the root (virtual roots have depth 0)
+    - employee_count: direct children that are person nodes (the
+      "Dipendenti" shown and filtered on by the views)
+    - subtree_employee_count: person nodes in the subtree (self excluded)
+    - vacant_count: vacant positions in the subtree (self included),
+      i.e. struttura nodes without employees
+    - span_of_control: average direct reports of the managers in the
+      subtree (self included), 0 for leaves
+    """
+
+    def __init__(self, nodes: List[Dict]):
+        self.nodes: Dict[str, Dict] = {n['id']: n for n in nodes}
+        self.children: Dict[str, List[str]] = {}
+        self.roots: List[str] = []
+
+        for n in nodes:
+            parent = n.get('parentId')
+            if parent is not None and parent in self.nodes and parent != n['id']:
+                self.children.setdefault(parent, []).append(n['id'])
+            else:
+                self.roots.append(n['id'])
+
+        # Depth and subtree aggregates come from the shared vectorized
+        # TreeMetrics (unknown/self parents normalized to roots first).
+        ids = list(self.nodes)
+        root_set = set(self.roots)
+        metrics = TreeMetrics(
+            ids, [None if i in root_set else self.nodes[i]['parentId'] for i in ids]
+        )
+        reached = metrics.bfs_order()
+        order = [ids[i] for i in reached]
+        self.order = order
+
+        is_person = np.array([_is_person(self.nodes[i]) for i in ids], dtype=np.int64)
+        is_vacant = np.array([_is_vacant(self.nodes[i]) for i in ids], dtype=np.int64)
+        descendants = metrics.subtree_sizes() - 1
+        has_parent = metrics.parent >= 0
+        direct_persons = np.bincount(
+            metrics.parent[has_parent], weights=is_person[has_parent], minlength=len(ids)
+        ).astype(np.int64)
+        persons = metrics.subtree_sum(is_person) - is_person
+        vacants = metrics.subtree_sum(is_vacant)
+        managers = metrics.subtree_sum((metrics.child_count > 0).astype(np.int64))
+
+        self.depth: Dict[str, int] = dict(zip(order, metrics.depth[reached].tolist()))
+        self.descendant_count: Dict[str, int] = dict(zip(order, descendants[reached].tolist()))
+        self.direct_person_count: Dict[str, int] = dict(zip(order, direct_persons[reached].tolist()))
+        self.person_count: Dict[str, int] = dict(zip(order, persons[reached].tolist()))
+        self.vacant_count: Dict[str, int] = dict(zip(order, vacants[reached].tolist()))
+        self.manager_count: Dict[str, int] = dict(zip(order, managers[reached].tolist()))
+
+        # "Largest teams" index: real nodes sorted by subtree size
+        self.by_team_size: List[str] = sorted(
+            (node_id for node_id in order if node_id not in VIRTUAL_ROOT_IDS),
+            key=lambda node_id: self.descendant_count[node_id],
+            reverse=True
+        )
+
+    def aggregates(self, node_id: str) -> Dict[str, Any]:
+        """Aggregate fields of a node (zeros for unreachable nodes)."""
+        managers = self.manager_count.get(node_id, 0)
+        descendants = self.descendant_count.get(node_id, 0)
+        return {
+            'direct_reports': len(self.children.get(node_id, [])),
+            'total_descendants': descendants,
+            'depth': self.depth.get(node_id, 0),
+            'employee_count': self.direct_person_count.get(node_id, 0),
+            'subtree_employee_count': self.person_count.get(node_id, 0),
+            'vacant_count': self.vacant_count.get(node_id, 0),
+            'span_of_control': round(descendants / managers, 2) if managers else 0,
+        }
+
+    def annotate(self) -> None:
+        """Write aggregate fields into the indexed node dicts (in place)."""
+        for node_id, node in self.nodes.items():
+            node.update(self.aggregates(node_id))
+
+    def collect(self, start_ids: List[str], max_depth: int, expanded: set) -> List[Dict]:
+        """
+        Copies of start_ids and their descendants, max_depth levels deep
+        (start level included); children of ids in expanded are always
+        included. Each copy carries has_more=True when its children were
+        not included.
+        """
+        result = []
+        frontier = [(node_id, 1) for node_id in start_ids]
+        while frontier:
+            next_frontier = []
+            for node_id, level in frontier:
+                kids = self.children.get(node_id, [])
+                descend = bool(kids) and (level < max_depth or node_id in expanded)
+                node = dict(self.nodes[node_id])
+                node['has_more'] = bool(kids) and not descend
+                result.append(node)
+                if descend:
+                    next_frontier.extend((k, level + 1) for k in kids)
+            frontier = next_frontier
+        return result
+
+
+def _is_person(node: Dict) -> bool:
+    """Person node: explicit node_type='person' or person-only trees (HR/TNS)."""
+    return node.get('node_type', 'person') == 'person' and node['id'] not in VIRTUAL_ROOT_IDS
+
+
+def _is_vacant(node: Dict) -> bool:
+    """Vacant position: struttura node without assigned employees."""
+    return node.get('node_type') == 'struttura' and not node.get('has_employees', True)
+
+
+class StruttureIndex:
+    """
+    In-memory index of the strutture table: codice → (description, parent).
+
+    Loaded with a single query per data version; root paths are memoized
+    so breadcrumbs for siblings/descendants reuse the ancestors' paths.
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self.entries: Dict[str, Dict] = {}
+        for row in rows:
+            codice = row['Codice']
+            if codice:
+                self.entries[codice] = {
+                    'name': row['DESCRIZIONE'] or codice,
+                    'parent': row['UNITA_OPERATIVA_PADRE'],
+                }
+        self._paths: Dict[str, List[Dict]] = {}
+
+    def description(self, codice: str) -> Optional[str]:
+        """DESCRIZIONE of a struttura (None if unknown)."""
+        entry = self.entries.get(codice)
+        return entry['name'] if entry else None
+
+    def path(self, codice: str) -> List[Dict]:
+        """Path from root to codice as [{'id', 'name'}, ...] (memoized)."""
+        if not codice or codice not in self.entries:
+            return []
+        if codice in self._paths:
+            return list(self._paths[codice])
+
+        # Walk up until a memoized ancestor, the root, or a cycle
+        chain = []
+        seen = set()
+        current = codice
+        while current and current in self.entries and current not in seen \
+                and current not in self._paths:
+            seen.add(current)
+            chain.append(current)
+            current = self.entries[current]['parent']
+
+        in_cycle = bool(current) and current in seen
+        prefix = list(self._paths.get(current, [])) if not in_cycle else []
+
+        # Build paths top-down; paths through a cycle are not memoized
+        # because they depend on the starting node.
+        for node in reversed(chain):
+            prefix = prefix + [{'id': node, 'name': self.entries[node]['name']}]
+            if not in_cycle:
+                self._paths[node] = prefix
+        return list(prefix)
 
 
 class OrgChartDataService:
@@ -27,6 +232,7 @@ class OrgChartDataService:
         if self._initialized:
             return
         self.db = DatabaseHandler()
+        self._cache = PayloadCache(max_bytes=config.ORGCHART_CACHE_MAX_MB * 1024 * 1024)
         self._initialized = True
 
     def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
@@ -37,12 +243,186 @@ class OrgChartDataService:
         cols = [d[0] for d in cursor.description]
         return [dict(zip(cols, row)) for row in cursor.fetchall()]
 
+    # ========== PAYLOAD CACHE ==========
+
+    def _cached_tree(self, tree_type: str, builder: Callable[..., Dict[str, Any]],
+                     **params) -> Dict[str, Any]:
+        """
+        Return tree payload from cache, building it on miss.
+
+        Key = (tree_type, data version, filter params). The cached payload
+        also carries 'nodes_json', the serialized node list ready to embed
+        in components.html. Payloads are shared across reruns: callers must
+        treat them as read-only.
+        """
+        version = self.db.get_data_version()
+        param_key = tuple(sorted(params.items()))
+
+        def build():
+            with span(f'OrgChartDataService.build.{tree_type}', 'tree') as build_span:
+                data = builder(**params)
+                build_span.set_rows(count_rows(data))
+            if data:
+                # Server-side aggregates in one bottom-up pass, shipped with the nodes
+                index = TreeIndex(data.get('nodes', []))
+                index.annotate()
+                self._cache.put((f'INDEX_{tree_type}', version, param_key), index,
+                                len(index.nodes) * _INDEX_BYTES_PER_NODE)
+                data['nodes_json'] = json.dumps(data.get('nodes', []), ensure_ascii=False)
+                size = sys.getsizeof(data['nodes_json']) * _PAYLOAD_OVERHEAD_FACTOR
+            else:
+                size = sys.getsizeof(data)
+            return data, size
+
+        with span(f'OrgChartDataService.tree.{tree_type}', 'tree') as tree_span:
+            data = self._cache.get_or_build((tree_type, version, param_key), build)
+            tree_span.set_rows(count_rows(data))
+        return data
+
+    def _cached_json(self, name: str, builder: Callable[[], Any]) -> str:
+        """Return serialized JSON of builder() cached per data version."""
+        key = (name, self.db.get_data_version(), ())
+
+        def build():
+            payload = json.dumps(builder(), ensure_ascii=False)
+            return payload, sys.getsizeof(payload)
+
+        return self._cache.get_or_build(key, build)
+
+    def clear_cache(self):
+        """Drop all cached tree payloads."""
+        self._cache.invalidate()
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Return payload cache statistics."""
+        return self._cache.stats()
+
+    # ========== TREE INDEX & LAZY EXPANSION ==========
+
+    def get_tree_index(self, tree_type: str, **params) -> 'TreeIndex':
+        """
+        Return the parent→children index of a tree, cached per data version.
+
+        Args:
+            tree_type: One of TREE_GETTERS keys (HR, TNS, POSITIONS, ORG)
+            **params: Filter parameters forwarded to the tree builder
+        """
+        if tree_type not in TREE_GETTERS:
+            raise ValueError(f"Tipo albero non supportato: {tree_type}")
+
+        key = (f'INDEX_{tree_type}', self.db.get_data_version(),
+               tuple(sorted(params.items())))
+
+        index = self._cache.get(key)
+        if index is None:
+            # Building the tree payload also stores its index in the cache;
+            # rebuild locally if the payload was cached but the index evicted.
+            data = getattr(self, TREE_GETTERS[tree_type])(**params)
+            index = self._cache.get(key)
+            if index is None:
+                index = TreeIndex(data.get('nodes', []) if data else [])
+                # Index holds references to cached nodes: count only its own maps
+                self._cache.put(key, index, len(index.nodes) * _INDEX_BYTES_PER_NODE)
+        return index
+
+    def get_node_aggregates(self, tree_type: str, node_id: str, **params) -> Optional[Dict[str, Any]]:
+        """Aggregates of a single node (direct reports, descendants, depth, ...)."""
+        index = self.get_tree_index(tree_type, **params)
+        if node_id not in index.nodes:
+            return None
+        return index.aggregates(node_id)
+
+    def get_largest_teams(self, tree_type: str, limit: int = 10, **params) -> List[Dict[str, Any]]:
+        """
+        Nodes with the largest subtrees, from the pre-sorted team index.
+
+        Virtual roots are excluded. Returns node dicts (id, name, ...)
+        including their aggregate fields.
+        """
+        index = self.get_tree_index(tree_type, **params)
+        return [dict(index.nodes[node_id], **index.aggregates(node_id))
+                for node_id in index.by_team_size[:limit]]
+
+    def get_tree_levels(
+        self,
+        tree_type: str,
+        max_depth: int = 3,
+        expanded: Optional[List[str]] = None,
+        **params
+    ) -> Dict[str, Any]:
+        """
+        Depth-limited tree for lazy rendering.
+
+        Returns the top max_depth levels plus the direct children of every
+        node in expanded. Each node carries child_count, descendant_count
+        and has_more (children exist but were not shipped), so the chart
+        can show counts and request the missing subtree on expand.
+        """
+        index = self.get_tree_index(tree_type, **params)
+        nodes = index.collect(index.roots, max_depth, set(expanded or []))
+        return {
+            'nodes': nodes,
+            'type': tree_type,
+            'lazy': True,
+            'max_depth': max_depth,
+            'total_nodes': len(index.nodes),
+        }
+
+    def get_subtree(
+        self,
+        tree_type: str,
+        node_id: str,
+        max_depth: int = 2,
+        **params
+    ) -> Dict[str, Any]:
+        """
+        Descendants of node_id down to max_depth levels below it.
+
+        Served from the cached parent→children index: cost is proportional
+        to the returned nodes, not to the tree size.
+        """
+        index = self.get_tree_index(tree_type, **params)
+        if node_id not in index.nodes:
+            return {'nodes': [], 'type': tree_type, 'parentId': node_id}
+
+        nodes = index.collect(index.children.get(node_id, []), max_depth, set())
+        return {'nodes': nodes, 'type': tree_type, 'parentId': node_id}
+
     # ========== VIEW 1: HR HIERARCHY (employees tree by reports_to_cf) ==========
 
     def get_hr_hierarchy_tree(
         self,
         company_id: Optional[int] = None,
         area_filter: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Cached HR hierarchy payload (see _build_hr_hierarchy_tree)."""
+        return self._cached_tree('HR', self._build_hr_hierarchy_tree,
+                                 company_id=company_id, area_filter=area_filter)
+
+    def get_hr_direct_reports_json(self) -> str:
+        """Cached JSON map manager CF -> direct reports (for modal detail popup)."""
+        def build():
+            emp_rows = self._query("""
+                SELECT tx_cod_fiscale, titolare, reports_to_cf
+                FROM employees
+                WHERE reports_to_cf IS NOT NULL AND reports_to_cf != ''
+                ORDER BY titolare
+            """)
+            reports: Dict[str, List[Dict]] = {}
+            for e in emp_rows:
+                reports.setdefault(e['reports_to_cf'], []).append({
+                    'cf':    e['tx_cod_fiscale'],
+                    'name':  e['titolare'] or e['tx_cod_fiscale'],
+                    'roles': []  # Roles not imported yet
+                })
+            return reports
+
+        return self._cached_json('HR_REPORTS', build)
+
+    def _build_hr_hierarchy_tree(
+        self,
+        company_id: Optional[int] = None,
+        area_filter: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Build HR hierarchy as flat list for d3-org-chart.
@@ -65,7 +445,11 @@ class OrgChartDataService:
                 qualifica,
                 area,
                 sede,
-                company_id
+                company_id,
+                societa,
+                email,
+                data_assunzione,
+                contratto
             FROM employees
             WHERE tx_cod_fiscale IS NOT NULL
             ORDER BY titolare
@@ -91,12 +475,20 @@ class OrgChartDataService:
                 'parentId': parent_cf,
                 'name': emp['titolare'] or emp['tx_cod_fiscale'],
                 'title': emp['qualifica'] or '',
-                'area': emp['area'] or '',
-                'sede': emp['sede'] or '',
+                'area': emp['area'] or 'N/D',
+                'sede': emp['sede'] or 'N/D',
                 'codice': emp['codice'] or '',
-                'employee_count': 0,  # Calculated by frontend
+                'employee_count': 0,  # Filled by TreeIndex.annotate()
                 'has_responsible': parent_cf != 'ROOT',
-                'roles': []
+                'roles': [],
+                # Tooltip details
+                'full_name': emp['titolare'] or emp['tx_cod_fiscale'],
+                'cf': emp['tx_cod_fiscale'],
+                'qualifica': emp['qualifica'] or 'N/D',
+                'societa': emp['societa'] or 'N/D',
+                'email': emp['email'] or 'N/D',
+                'data_assunzione': emp['data_assunzione'] or 'N/D',
+                'contratto': emp['contratto'] or 'N/D'
             }
 
             if emp['qualifica']:
@@ -115,7 +507,14 @@ class OrgChartDataService:
             'codice': '',
             'employee_count': 0,
             'has_responsible': False,
-            'roles': []
+            'roles': [],
+            'full_name': 'Organizzazione',
+            'cf': '',
+            'qualifica': 'N/D',
+            'societa': 'N/D',
+            'email': 'N/D',
+            'data_assunzione': 'N/D',
+            'contratto': 'N/D'
         })
 
         return {'nodes': nodes, 'type': 'HR'}
@@ -126,6 +525,35 @@ class OrgChartDataService:
         self,
         company_id: Optional[int] = None,
         area_filter: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Cached TNS hierarchy payload (see _build_tns_hierarchy_tree)."""
+        return self._cached_tree('TNS', self._build_tns_hierarchy_tree,
+                                 company_id=company_id, area_filter=area_filter)
+
+    def get_tns_members_json(self) -> str:
+        """Cached JSON map TNS code -> employees (for modal detail popup)."""
+        def build():
+            emp_rows = self._query("""
+                SELECT tx_cod_fiscale, titolare, cod_tns, padre_tns
+                FROM employees
+                WHERE cod_tns IS NOT NULL AND cod_tns != ''
+                ORDER BY titolare
+            """)
+            members: Dict[str, List[Dict]] = {}
+            for e in emp_rows:
+                members.setdefault(e['cod_tns'], []).append({
+                    'cf':    e['tx_cod_fiscale'],
+                    'name':  e['titolare'] or e['tx_cod_fiscale'],
+                    'roles': []  # Roles not imported yet
+                })
+            return members
+
+        return self._cached_json('TNS_MEMBERS', build)
+
+    def _build_tns_hierarchy_tree(
+        self,
+        company_id: Optional[int] = None,
+        area_filter: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Build TNS hierarchy showing employees with TNS codes.
@@ -144,7 +572,8 @@ class OrgChartDataService:
                 titolare,
                 qualifica,
                 area,
-                sede
+                sede,
+                societa
             FROM employees
             WHERE cod_tns IS NOT NULL AND cod_tns != ''
             ORDER BY titolare
@@ -173,10 +602,17 @@ class OrgChartDataService:
                 'area': emp['area'] or '',
                 'sede': emp['sede'] or '',
                 'tx_cod_fiscale': emp['tx_cod_fiscale'],
-                'employee_count': 0,  # Calculated by frontend
+                'employee_count': 0,  # Filled by TreeIndex.annotate()
                 'has_parent': parent_tns != 'ROOT_TNS',
-                'roles': []
+                'roles': [],
+                # Tooltip details
+                'full_name': emp['titolare'] or emp['tx_cod_fiscale'],
+                'tns_code': emp['cod_tns'],
+                'societa': emp['societa'] or 'N/D',
+                'has_padre': bool(emp['padre_tns'])
             }
+            if not node['area']:
+                node['area'] = 'N/D'
 
             if emp['qualifica']:
                 node['roles'].append({'name': emp['qualifica'], 'color': 'green'})
@@ -194,7 +630,11 @@ class OrgChartDataService:
             'tx_cod_fiscale': '',
             'employee_count': 0,
             'has_parent': False,
-            'roles': []
+            'roles': [],
+            'full_name': 'Struttura TNS',
+            'tns_code': 'ROOT_TNS',
+            'societa': 'N/D',
+            'has_padre': False
         })
 
         return {'nodes': nodes, 'type': 'TNS'}
@@ -251,12 +691,10 @@ class OrgChartDataService:
         }
         nodes.append(root)
 
+        strutture_index = self.get_strutture_index()
         for sc, sn in struttura_nodes.items():
-            # Get struttura description
-            struttura_info = self._query(
-                "SELECT DESCRIZIONE FROM strutture WHERE Codice = ?", (sc,)
-            )
-            sn['name'] = struttura_info[0]['DESCRIZIONE'] if struttura_info else sc
+            # Struttura description from the preloaded index (no per-node query)
+            sn['name'] = strutture_index.description(sc) or sc
             sn['parentId'] = 'sgsl_root'
             sn['roles'] = []
             nodes.append(sn)
@@ -284,6 +722,10 @@ class OrgChartDataService:
     # ========== VIEW 5: POSITIONS TREE (all rows: strutture + personale as nodes) ==========
 
     def get_positions_tree(self) -> Dict[str, Any]:
+        """Cached positions payload (see _build_positions_tree)."""
+        return self._cached_tree('POSITIONS', self._build_positions_tree)
+
+    def _build_positions_tree(self) -> Dict[str, Any]:
         """
         Build the full org hierarchy for the 'Unità Organizzative' view.
 
@@ -341,7 +783,7 @@ class OrgChartDataService:
                 'name':         (s['DESCRIZIONE'] or sid),
                 'node_type':    'struttura',
                 'has_employees': sid in strutture_with_emp,
-                'employee_count': 0,  # filled in JS from children count
+                'employee_count': 0,  # Filled by TreeIndex.annotate()
                 'roles':        [],
             })
 
@@ -384,6 +826,10 @@ class OrgChartDataService:
     # ========== VIEW 0: ORGANIZATION HIERARCHY (strutture + personale leaves) ==========
 
     def get_org_hierarchy_tree(self) -> Dict[str, Any]:
+        """Cached organization payload (see _build_org_hierarchy_tree)."""
+        return self._cached_tree('ORG', self._build_org_hierarchy_tree)
+
+    def _build_org_hierarchy_tree(self) -> Dict[str, Any]:
         """
         Full organization hierarchy: strutture as internal nodes, personale as leaf nodes.
 
@@ -429,21 +875,11 @@ class OrgChartDataService:
                 'area': '',
                 'node_type': 'struttura',
                 'codice': s['Codice'],
-                'employee_count': 0,
+                'employee_count': 0,  # Filled by TreeIndex.annotate()
                 'has_responsible': False,
                 'roles': []
             })
 
-        # Employee count per struttura
-        emp_counts: Dict[str, int] = {}
-        for p in personale:
-            sc = p['UNITA_OPERATIVA_PADRE']
-            emp_counts[sc] = emp_counts.get(sc, 0) + 1
-
-        # Update employee counts on struttura nodes
-        for n in nodes:
-            n['employee_count'] = emp_counts.get(n['codice'], 0)
-
         # Personale nodes (leaves)
         for p in personale:
             sc = p['UNITA_OPERATIVA_PADRE']
@@ -583,29 +1019,31 @@ class OrgChartDataService:
         path = self._get_struttura_path(s['Codice'])
         return {'struttura': s, 'path': path}
 
+    def get_strutture_index(self) -> StruttureIndex:
+        """Strutture index (codice → description/parent), cached per data version."""
+        key = ('STRUTTURE_INDEX', self.db.get_data_version(), ())
+
+        def build():
+            rows = self._query(
+                "SELECT Codice, DESCRIZIONE, UNITA_OPERATIVA_PADRE FROM strutture"
+            )
+            return StruttureIndex(rows), len(rows) * _INDEX_BYTES_PER_NODE
+
+        return self._cache.get_or_build(key, build)
+
     def _get_struttura_path(self, codice: str) -> List[Dict]:
         """Walk up strutture hierarchy and return path from root to node."""
-        if not codice:
-            return []
+        return self.get_strutture_index().path(codice)
 
-        path = []
-        current = codice
-        visited = set()
+    def get_struttura_paths(self, codici: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Breadcrumbs for a list of strutture in one batch call.
 
-        while current and current not in visited:
-            visited.add(current)
-            rows = self._query(
-                "SELECT Codice, DESCRIZIONE, UNITA_OPERATIVA_PADRE FROM strutture WHERE Codice = ?",
-                (current,)
-            )
-            if not rows:
-                break
-            row = rows[0]
-            path.append({'id': row['Codice'], 'name': row['DESCRIZIONE'] or row['Codice']})
-            current = row['UNITA_OPERATIVA_PADRE']
-
-        path.reverse()
-        return path
+        Returns:
+            Dict codice → path from root (empty list for unknown codes)
+        """
+        index = self.get_strutture_index()
+        return {codice: index.path(codice) for codice in codici}
 
     def get_node_details(self, employee_cf: str) -> Optional[Dict]:
         """Get full employee details for tooltip/popup."""
@@ -0,0 +1,144 @@
+"""
+Payload Cache
+
+In-memory LRU cache for expensive read-only payloads (orgchart trees,
+serialized JSON for components.html) shared across Streamlit reruns.
+
+Entries are keyed by (namespace, data_version, params) so a new data version
+naturally invalidates stale entries; eviction is bounded by an approximate
+memory budget rather than by entry count.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class CacheEntry:
+    """Cached payload with its estimated memory cost."""
+    value: Any
+    size_bytes: int
+
+
+class PayloadCache:
+    """
+    Thread-safe LRU cache bounded by an approximate byte budget.
+
+    The cost of each entry is supplied by the caller (or estimated with
+    sys.getsizeof); when the total exceeds max_bytes the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return cached value (marking it as recently used) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, size_bytes: Optional[int] = None) -> None:
+        """Store value and evict LRU entries until the budget is respected."""
+        if size_bytes is None:
+            size_bytes = sys.getsizeof(value)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.size_bytes
+
+            # Payloads larger than the whole budget are not cached at all
+            if size_bytes > self.max_bytes:
+                return
+
+            self._entries[key] = CacheEntry(value=value, size_bytes=size_bytes)
+            self._total_bytes += size_bytes
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.size_bytes
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Tuple[Any, int]]) -> Any:
+        """
+        Return cached value or build it.
+
+        Args:
+            key: Cache key
+            builder: Callable returning (value, size_bytes)
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value, size_bytes = builder()
+        self.put(key, value, size_bytes)
+        return value
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Drop all entries, or only those whose key starts with namespace."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            for key in [k for k in self._entries
+                        if isinstance(k, tuple) and k and k[0] == namespace]:
+                self._total_bytes -= self._entries.pop(key).size_bytes
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache statistics (entries, bytes, hits, misses)."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def dataframe_fingerprint(df: pd.DataFrame, columns: List[str]) -> str:
+    """
+    Data version of a DataFrame: row count + hash of the given columns.
+
+    Used as cache key for indexes built from session DataFrames, which are
+    often modified in place (so object identity alone is not enough).
+    """
+    columns = [c for c in columns if c in df.columns]
+    if not columns or df.empty:
+        return f"{len(df)}:empty"
+    hashes = pd.util.hash_pandas_object(df[columns], index=False)
+    return f"{len(df)}:{hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()}"
+
+
+def row_hashes(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Per-row uint64 hashes of the given columns (aligned by position).
+
+    Complements dataframe_fingerprint: comparing two arrays tells which
+    rows changed, including in-place edits.
+    """
+    columns = [c for c in columns if c in df.columns]
+    if not columns or df.empty:
+        return np.zeros(len(df), dtype=np.uint64)
+    try:
+        return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    except TypeError:
+        # Unhashable cells (lists, dicts): compare their string representation
+        return pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy()
@@ -0,0 +1,276 @@
+"""
+Strumentazione tempi del service layer
+
+Span misurati con il decoratore @timed o il context manager span():
+durata, righe restituite e chiamate, raccolti in buffer circolari in
+memoria (ultimi config.PERF_MAX_SPANS span e config.PERF_MAX_RERUNS rerun).
+
+L'app apre un rerun con begin_rerun(page) e lo chiude con end_rerun():
+gli span eseguiti nello stesso thread vengono attribuiti a quel rerun
+(tempo di rendering per pagina e conteggio chiamate per rerun). Gli span
+dei job in background (services/job_runner.py) non hanno rerun.
+
+Nessuna dipendenza da Streamlit: la pagina "Performance"
+(ui/performance_view.py) legge i dati con get_perf_tracer().
+"""
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import config
+
+
+@dataclass
+class Span:
+    """Operazione misurata."""
+    name: str
+    category: str
+    duration_s: float
+    started_at: datetime
+    rows: Optional[int] = None
+    parent: Optional[str] = None
+    page: Optional[str] = None
+    rerun_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class RerunRecord:
+    """Rerun Streamlit: pagina, durata e chiamate per operazione."""
+    rerun_id: int
+    page: str
+    started_at: datetime
+    duration_s: Optional[float] = None
+    # nome span → [chiamate, secondi totali, righe]
+    calls: Dict[str, List[float]] = field(default_factory=dict)
+
+
+class SpanHandle:
+    """Span in corso: le righe si possono impostare prima della chiusura."""
+
+    def __init__(self, name: str, category: str, rows: Optional[int] = None):
+        self.name = name
+        self.category = category
+        self.rows = rows
+
+    def set_rows(self, rows: Optional[int]):
+        self.rows = rows
+
+
+def count_rows(result: Any) -> Optional[int]:
+    """
+    Righe di un risultato: len() di DataFrame/liste, nodi di un payload
+    albero ({'nodes': [...]}), somma degli elementi di una tupla.
+    """
+    if result is None or isinstance(result, (str, bytes, bool, int, float)):
+        return None
+    if isinstance(result, dict):
+        nodes = result.get('nodes')
+        return len(nodes) if isinstance(nodes, list) else None
+    if isinstance(result, tuple):
+        counts = [count_rows(item) for item in result]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+class PerfTracer:
+    """Raccoglitore di span e rerun (thread-safe, buffer circolari)."""
+
+    def __init__(self, max_spans: int = None, max_reruns: int = None, enabled: bool = None):
+        self.enabled = config.PERF_TRACE_ENABLED if enabled is None else enabled
+        self._spans: deque = deque(maxlen=max_spans or config.PERF_MAX_SPANS)
+        self._reruns: deque = deque(maxlen=max_reruns or config.PERF_MAX_RERUNS)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_rerun_id = 1
+
+    # ========== RERUN ==========
+
+    def begin_rerun(self, page: str) -> Optional[RerunRecord]:
+        """Apre il rerun del thread corrente (chiude l'eventuale precedente)."""
+        if not self.enabled:
+            return None
+        if getattr(self._local, 'rerun', None) is not None:
+            self.end_rerun()
+        with self._lock:
+            record = RerunRecord(self._next_rerun_id, page, datetime.now())
+            self._next_rerun_id += 1
+        self._local.rerun = record
+        self._local.rerun_start = time.perf_counter()
+        return record
+
+    def end_rerun(self, page: Optional[str] = None) -> Optional[RerunRecord]:
+        """Chiude il rerun del thread corrente e lo aggiunge al buffer."""
+        record = getattr(self._local, 'rerun', None)
+        if record is None:
+            return None
+        record.duration_s = time.perf_counter() - self._local.rerun_start
+        if page:
+            record.page = page
+        self._local.rerun = None
+        with self._lock:
+            self._reruns.append(record)
+        return record
+
+    # ========== SPAN ==========
+
+    @contextmanager
+    def span(self, name: str, category: str = 'service', rows: Optional[int] = None) -> Iterator[SpanHandle]:
+        """Misura il blocco; handle.set_rows() registra le righe elaborate."""
+        handle = SpanHandle(name, category, rows)
+        if not self.enabled:
+            yield handle
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        started_at = datetime.now()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield handle
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            self._record(Span(
+                name=name,
+                category=category,
+                duration_s=duration,
+                started_at=started_at,
+                rows=handle.rows,
+                parent=parent,
+                error=error
+            ))
+
+    def _record(self, span: Span):
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            span.rerun_id = rerun.rerun_id
+            span.page = rerun.page
+            calls = rerun.calls.setdefault(span.name, [0, 0.0, 0])
+            calls[0] += 1
+            calls[1] += span.duration_s
+            calls[2] += span.rows or 0
+        with self._lock:
+            self._spans.append(span)
+
+    # ========== LETTURA ==========
+
+    def spans(self, category: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if category is None or s.category == category]
+
+    def reruns(self) -> List[RerunRecord]:
+        with self._lock:
+            return list(self._reruns)
+
+    def slowest_spans(self, limit: int = 20, category: Optional[str] = None) -> List[Span]:
+        return sorted(self.spans(category), key=lambda s: s.duration_s, reverse=True)[:limit]
+
+    def span_summary(self) -> List[Dict[str, Any]]:
+        """Aggregato per operazione (chiamate, tempo totale/medio/massimo, righe)."""
+        summary: Dict[str, Dict[str, Any]] = {}
+        for s in self.spans():
+            entry = summary.setdefault(s.name, {
+                'name': s.name, 'category': s.category, 'calls': 0,
+                'total_s': 0.0, 'max_s': 0.0, 'rows': 0, 'errors': 0
+            })
+            entry['calls'] += 1
+            entry['total_s'] += s.duration_s
+            entry['max_s'] = max(entry['max_s'], s.duration_s)
+            entry['rows'] += s.rows or 0
+            entry['errors'] += 1 if s.error else 0
+        for entry in summary.values():
+            entry['mean_s'] = entry['total_s'] / entry['calls']
+        return sorted(summary.values(), key=lambda e: e['total_s'], reverse=True)
+
+    def page_summary(self) -> List[Dict[str, Any]]:
+        """Tempi di rendering per pagina (rerun completati)."""
+        pages: Dict[str, List[RerunRecord]] = {}
+        for r in self.reruns():
+            if r.duration_s is not None:
+                pages.setdefault(r.page, []).append(r)
+        summary = []
+        for page, records in pages.items():
+            durations = sorted(r.duration_s for r in records)
+            summary.append({
+                'page': page,
+                'renders': len(durations),
+                'mean_s': sum(durations) / len(durations),
+                'p95_s': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                'max_s': durations[-1],
+                'last_s': records[-1].duration_s,
+                'spans_per_render': sum(sum(int(c[0]) for c in r.calls.values()) for r in records) / len(records),
+            })
+        return sorted(summary, key=lambda e: e['mean_s'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._reruns.clear()
+
+
+_tracer: Optional[PerfTracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_perf_tracer() -> PerfTracer:
+    """Get tracer condiviso (singleton)."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = PerfTracer()
+        return _tracer
+
+
+def span(name: str, category: str = 'service', rows: Optional[int] = None):
+    """Context manager: `with span('tree.build', 'tree') as s: ...; s.set_rows(n)`."""
+    return get_perf_tracer().span(name, category, rows)
+
+
+def timed(category: str, name: Optional[str] = None,
+          rows: Optional[Callable[[Any], Optional[int]]] = count_rows):
+    """
+    Decoratore: misura ogni chiamata come span.
+
+    Args:
+        category: Categoria (db, excel, tree, diff, llm, merge, validation, ...)
+        name: Nome span (default: Classe.metodo)
+        rows: Funzione risultato → righe (default count_rows, None per non contarle)
+    """
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = get_perf_tracer()
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, category) as handle:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    try:
+                        handle.set_rows(rows(result))
+                    except Exception:
+                        pass
+                return result
+
+        return wrapper
+
+    return decorator
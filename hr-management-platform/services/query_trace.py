@@ -0,0 +1,483 @@
+"""
+Query tracing SQLite: statistiche per statement e log delle query lente
+
+connect() apre una connessione TracedConnection: ogni execute/executemany
+registra testo, forma dei parametri (tipi, mai i valori: contengono CF e
+dati personali), durata e righe lette (fetch compresi). Le statement oltre
+config.SLOW_QUERY_MS finiscono nel log delle query lente con il loro
+EXPLAIN QUERY PLAN (catturato una volta per statement).
+
+analyze_plan() legge il piano e il testo SQL e segnala:
+- scansioni complete di tabella (SCAN senza indice)
+- indici automatici creati da SQLite a ogni esecuzione
+- ordinamenti su B-tree temporaneo (ORDER BY/GROUP BY senza indice)
+- funzioni su colonne nel WHERE (LOWER/UPPER/TRIM/...: indice inutilizzabile)
+- LIKE con wildcard iniziale
+con suggerimenti CREATE INDEX per le colonne filtrate non indicizzate.
+
+Usato da DatabaseHandler.get_connection e dalle connessioni di
+EmployeeService, HierarchyService, RoleService e LookupService; il report
+è nella pagina "Performance".
+"""
+import itertools
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Statement per cui ha senso EXPLAIN QUERY PLAN
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$')
+_AUTOMATIC_INDEX = re.compile(r'^SEARCH (?:TABLE )?(\w+)(?: AS \w+)? USING AUTOMATIC (?:COVERING )?INDEX \(([^)]*)\)')
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|INNER\b|GROUP\b|ORDER\b|LIMIT\b)(\w+))?', re.I)
+_FILTERED_COLUMN = re.compile(r'(?:\b(\w+)\.)?\b(\w+)\s*(?:=|==|!=|<>|>=|<=|>|<|\bIN\b|\bIS\b|\bBETWEEN\b|\bLIKE\b)', re.I)
+_FUNCTION_ON_COLUMN = re.compile(
+    r'\b(LOWER|UPPER|TRIM|LTRIM|RTRIM|SUBSTR|SUBSTRING|CAST|COALESCE|IFNULL|DATE|DATETIME|STRFTIME|REPLACE)\s*\(\s*(?:(\w+)\.)?(\w+)',
+    re.I
+)
+_LEADING_WILDCARD = re.compile(r"LIKE\s+'%", re.I)
+_LIKE_PARAM = re.compile(r'LIKE\s+\?', re.I)
+_WHERE_CLAUSE = re.compile(r'\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|$)', re.I | re.S)
+
+
+def normalize_sql(sql: str) -> str:
+    """Testo su una riga (spazi compressi)."""
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    """Statement con letterali sostituiti da ? (raggruppa SQL composto con f-string)."""
+    text = _STRING_LITERAL.sub('?', normalize_sql(sql))
+    return _NUMBER_LITERAL.sub('?', text)
+
+
+def params_shape(params: Any) -> str:
+    """Forma dei parametri: tipi posizionali o nomi, senza valori."""
+    if params is None or params == ():
+        return ''
+    if isinstance(params, dict):
+        return '{' + ', '.join(sorted(params)) + '}'
+    try:
+        return '(' + ', '.join(type(p).__name__ for p in params) + ')'
+    except TypeError:
+        return type(params).__name__
+
+
+@dataclass
+class SlowQuery:
+    """Esecuzione oltre soglia, con piano e problemi rilevati."""
+    sql: str
+    params_shape: str
+    duration_s: float
+    rows: int
+    started_at: datetime
+    plan: List[str] = field(default_factory=list)
+    findings: List[Dict[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class _Execution:
+    """Esecuzione in corso su un cursore (i fetch aggiungono tempo e righe)."""
+    sql: str
+    params: Any
+    started_at: datetime
+    duration_s: float = 0.0
+    rows: int = 0
+    slow_logged: bool = False
+
+
+class QueryLog:
+    """Statistiche per statement e ring buffer delle query lente (thread-safe)."""
+
+    def __init__(self, max_slow: int = None, max_statements: int = None):
+        self._slow: deque = deque(maxlen=max_slow or config.SLOW_QUERY_LOG_MAX)
+        self._max_statements = max_statements or config.QUERY_STATS_MAX_STATEMENTS
+        # sql → [esecuzioni, secondi totali, secondi max, righe]
+        self._stats: Dict[str, List[float]] = {}
+        # sql → (piano, problemi): EXPLAIN una sola volta per statement
+        self._plans: Dict[str, Tuple[List[str], List[Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, execution: _Execution, conn: sqlite3.Connection, final: bool):
+        """
+        Registra l'esecuzione (final=True: una volta, a esecuzione conclusa).
+        Sopra soglia la aggiunge al log lento, anche prima della fine del fetch.
+        """
+        if final:
+            with self._lock:
+                key = execution.sql
+                if key not in self._stats and len(self._stats) >= self._max_statements:
+                    key = fingerprint(key)
+                stats = self._stats.setdefault(key, [0, 0.0, 0.0, 0])
+                stats[0] += 1
+                stats[1] += execution.duration_s
+                stats[2] = max(stats[2], execution.duration_s)
+                stats[3] += execution.rows
+
+        if execution.slow_logged or execution.duration_s * 1000 < config.SLOW_QUERY_MS:
+            return
+        execution.slow_logged = True
+        plan, findings = self._plan_for(execution.sql, execution.params, conn)
+        slow = SlowQuery(
+            sql=normalize_sql(execution.sql),
+            params_shape=params_shape(execution.params),
+            duration_s=execution.duration_s,
+            rows=execution.rows,
+            started_at=execution.started_at,
+            plan=plan,
+            findings=findings
+        )
+        with self._lock:
+            self._slow.append(slow)
+        logger.warning("Query lenta (%.0f ms, %d righe): %s", slow.duration_s * 1000, slow.rows, slow.sql[:300])
+
+    def _plan_for(self, sql: str, params: Any, conn: sqlite3.Connection):
+        with self._lock:
+            cached = self._plans.get(sql)
+        if cached is not None:
+            return cached
+        plan = explain(conn, sql, params)
+        result = (plan, analyze_plan(conn, sql, plan))
+        with self._lock:
+            self._plans[sql] = result
+        return result
+
+    # ========== LETTURA ==========
+
+    def slow_queries(self) -> List[SlowQuery]:
+        with self._lock:
+            return list(self._slow)
+
+    def statement_stats(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Statement ordinate per tempo totale."""
+        with self._lock:
+            items = list(self._stats.items())
+        rows = [
+            {'sql': normalize_sql(sql), 'calls': int(s[0]), 'total_s': s[1],
+             'mean_s': s[1] / s[0] if s[0] else 0.0, 'max_s': s[2], 'rows': int(s[3])}
+            for sql, s in items
+        ]
+        return sorted(rows, key=lambda r: r['total_s'], reverse=True)[:limit]
+
+    def report(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Problemi delle query lente raggruppati per tipo.
+
+        Returns:
+            {'full_scans': per tabella (esecuzioni lente, tempo, statement),
+             'findings': problemi distinti con suggerimento,
+             'index_suggestions': CREATE INDEX distinti}
+        """
+        scans: Dict[str, Dict[str, Any]] = {}
+        findings: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        suggestions: Dict[str, Dict[str, Any]] = {}
+        for q in self.slow_queries():
+            for f in q.findings:
+                key = (f['kind'], f['detail'])
+                entry = findings.setdefault(key, {**f, 'occurrences': 0, 'total_s': 0.0, 'sql': q.sql})
+                entry['occurrences'] += 1
+                entry['total_s'] += q.duration_s
+                if f['kind'] == 'full_scan':
+                    scan = scans.setdefault(f['table'], {'table': f['table'], 'occurrences': 0,
+                                                         'total_s': 0.0, 'statements': set()})
+                    scan['occurrences'] += 1
+                    scan['total_s'] += q.duration_s
+                    scan['statements'].add(q.sql)
+                if f.get('create_index'):
+                    s = suggestions.setdefault(f['create_index'], {'create_index': f['create_index'],
+                                                                   'table': f['table'], 'occurrences': 0, 'total_s': 0.0})
+                    s['occurrences'] += 1
+                    s['total_s'] += q.duration_s
+        for scan in scans.values():
+            scan['statements'] = len(scan['statements'])
+        by_time = lambda e: e['total_s']
+        return {
+            'full_scans': sorted(scans.values(), key=by_time, reverse=True),
+            'findings': sorted(findings.values(), key=by_time, reverse=True),
+            'index_suggestions': sorted(suggestions.values(), key=by_time, reverse=True),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._slow.clear()
+            self._stats.clear()
+            self._plans.clear()
+
+
+_query_log: Optional[QueryLog] = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log() -> QueryLog:
+    """Get log query condiviso (singleton)."""
+    global _query_log
+    with _query_log_lock:
+        if _query_log is None:
+            _query_log = QueryLog()
+        return _query_log
+
+
+# ========== CONNESSIONE TRACCIATA ==========
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursore che misura execute e fetch e li registra nel QueryLog."""
+
+    _execution: Optional[_Execution] = None
+
+    def _finish(self):
+        execution, self._execution = self._execution, None
+        if execution is not None:
+            get_query_log().record(execution, self.connection, final=True)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._execution is not None:
+                self._execution.duration_s += time.perf_counter() - start
+
+    def _begin(self, sql: str, params: Any):
+        self._finish()
+        self._execution = _Execution(sql=sql, params=params, started_at=datetime.now())
+
+    def execute(self, sql: str, parameters: Any = ()):
+        self._begin(sql, parameters)
+        result = self._timed(super().execute, sql, parameters)
+        if self.description is None:
+            # Nessun risultato da leggere (DML/DDL): esecuzione conclusa
+            self._execution.rows = max(self.rowcount, 0)
+            self._finish()
+        return result
+
+    def executemany(self, sql: str, seq_of_parameters):
+        # Primo elemento per la forma dei parametri, senza materializzare il generatore
+        params = iter(seq_of_parameters)
+        first = next(params, None)
+        self._begin(sql, first if first is not None else ())
+        if first is not None:
+            params = itertools.chain([first], params)
+        result = self._timed(super().executemany, sql, params)
+        self._execution.rows = max(self.rowcount, 0)
+        self._finish()
+        return result
+
+    def _fetched(self, rows: int, done: bool):
+        execution = self._execution
+        if execution is None:
+            return
+        execution.rows += rows
+        if done:
+            self._finish()
+        else:
+            get_query_log().record(execution, self.connection, final=False)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        self._fetched(0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size: int = None):
+        rows = self._timed(super().fetchmany, size or self.arraysize)
+        self._fetched(len(rows), len(rows) < (size or self.arraysize))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._fetched(len(rows), True)
+        return rows
+
+    def __next__(self):
+        # Percorso per riga: solo tempo e contatore, la registrazione avviene
+        # a cursore esaurito (o rieseguito/chiuso/rilasciato)
+        execution = self._execution
+        if execution is None:
+            return super().__next__()
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            execution.duration_s += time.perf_counter() - start
+            self._finish()
+            raise
+        execution.duration_s += time.perf_counter() - start
+        execution.rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # conn.execute(...).fetchone(): il cursore non viene esaurito né
+        # chiuso, l'esecuzione si registra quando viene rilasciato
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connessione i cui cursori (anche di conn.execute) sono TracedCursor."""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql: str, parameters: Any = ()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(db_path: Union[str, Path], **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect con tracing se config.QUERY_TRACE_ENABLED."""
+    if config.QUERY_TRACE_ENABLED:
+        kwargs.setdefault('factory', TracedConnection)
+    return sqlite3.connect(str(db_path), **kwargs)
+
+
+# ========== ANALISI PIANO ==========
+
+def explain(conn: sqlite3.Connection, sql: str, params: Any = ()) -> List[str]:
+    """Righe 'detail' di EXPLAIN QUERY PLAN (vuoto se la statement non è analizzabile)."""
+    if not normalize_sql(sql).upper().startswith(_EXPLAINABLE):
+        return []
+    cursor = sqlite3.Cursor(conn)
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params if params is not None else ())
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"(piano non disponibile: {e})"]
+    finally:
+        cursor.close()
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> Tuple[List[str], List[str]]:
+    """(colonne, prime colonne degli indici) della tabella."""
+    cursor = sqlite3.Cursor(conn)
+    try:
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+        leading = []
+        for index in cursor.execute(f"PRAGMA index_list({table})").fetchall():
+            info = cursor.execute(f"PRAGMA index_info({index[1]})").fetchall()
+            if info:
+                leading.append(info[0][2])
+        return columns, leading
+    except sqlite3.Error:
+        return [], []
+    finally:
+        cursor.close()
+
+
+def _filtered_columns(sql: str, table: str, alias: Optional[str], columns: Sequence[str]) -> List[str]:
+    """Colonne della tabella usate in confronti (WHERE e condizioni di JOIN)."""
+    lower_columns = {c.lower(): c for c in columns}
+    qualifiers = {table.lower()} | ({alias.lower()} if alias else set())
+    aliases = {t.lower() for t, _ in _TABLE_ALIAS.findall(sql)} | {a.lower() for _, a in _TABLE_ALIAS.findall(sql) if a}
+    found = []
+    for qualifier, column in _FILTERED_COLUMN.findall(sql):
+        name = lower_columns.get(column.lower())
+        if not name or name in found:
+            continue
+        # Colonna qualificata con un'altra tabella/alias: non è di questa tabella
+        if qualifier and qualifier.lower() not in qualifiers and qualifier.lower() in aliases:
+            continue
+        found.append(name)
+    return found
+
+
+def analyze_plan(conn: sqlite3.Connection, sql: str, plan: Sequence[str]) -> List[Dict[str, str]]:
+    """
+    Problemi di una statement dal suo piano e dal testo.
+
+    Returns:
+        Lista di {'kind', 'table', 'detail', 'suggestion', 'create_index'?}
+    """
+    findings: List[Dict[str, str]] = []
+    text = normalize_sql(sql)
+    aliases = {(alias or table).lower(): table for table, alias in _TABLE_ALIAS.findall(text)}
+    aliases.update({table.lower(): table for table, _ in _TABLE_ALIAS.findall(text)})
+    tables = set(aliases.values())
+    where = _WHERE_CLAUSE.search(text)
+    where_text = where.group(1) if where else ''
+    functions = _FUNCTION_ON_COLUMN.findall(where_text)
+    # Colonne usate solo dentro funzioni o LIKE '%x%': un indice semplice non servirebbe
+    unsargable = {column.lower() for _, _, column in functions}
+    unsargable |= {m.lower() for m in re.findall(r"(\w+)\s+LIKE\s+'%", where_text, re.I)}
+
+    for step in plan:
+        scan = _SCAN.match(step)
+        if scan and 'USING' not in scan.group(3) and not step.startswith('SCAN CONSTANT ROW'):
+            table, alias = scan.group(1), scan.group(2)
+            if table.startswith('sqlite_') or table not in tables:
+                # Subquery/CTE materializzate o tabelle di sistema
+                continue
+            columns, indexed = _table_columns(conn, table)
+            candidates = [c for c in _filtered_columns(text, table, alias, columns)
+                          if c not in indexed and c.lower() not in unsargable]
+            finding = {
+                'kind': 'full_scan',
+                'table': table,
+                'detail': step,
+                'suggestion': (f"Indice su {table}({candidates[0]})" if candidates
+                               else f"Scansione completa di {table}: aggiungere un filtro indicizzabile o LIMIT"),
+            }
+            if candidates:
+                finding['create_index'] = f"CREATE INDEX idx_{table}_{candidates[0].lower()} ON {table}({candidates[0]})"
+            findings.append(finding)
+            continue
+
+        automatic = _AUTOMATIC_INDEX.match(step)
+        if automatic:
+            table = aliases.get(automatic.group(1).lower(), automatic.group(1))
+            cols = [part.split('=')[0].strip() for part in automatic.group(2).split(' AND ')]
+            findings.append({
+                'kind': 'automatic_index',
+                'table': table,
+                'detail': step,
+                'suggestion': f"SQLite crea a ogni esecuzione un indice temporaneo su {table}({', '.join(cols)})",
+                'create_index': f"CREATE INDEX idx_{table}_{'_'.join(c.lower() for c in cols)} ON {table}({', '.join(cols)})",
+            })
+            continue
+
+        if step.startswith('USE TEMP B-TREE'):
+            findings.append({
+                'kind': 'temp_btree',
+                'table': '',
+                'detail': step,
+                'suggestion': "Ordinamento/raggruppamento senza indice: indice sulle colonne di ORDER BY/GROUP BY",
+            })
+
+    single_table = next(iter(tables)) if len(tables) == 1 else ''
+    for func, qualifier, column in functions:
+        table = aliases.get(qualifier.lower(), '') if qualifier else single_table
+        findings.append({
+            'kind': 'function_on_column',
+            'table': table,
+            'detail': f"{func.upper()}({qualifier + '.' if qualifier else ''}{column})",
+            'suggestion': (f"{func.upper()} su {column} impedisce l'uso dell'indice: normalizzare il valore "
+                           f"in scrittura o creare un indice su espressione"),
+        })
+    if _LEADING_WILDCARD.search(where_text) or _LIKE_PARAM.search(where_text):
+        findings.append({
+            'kind': 'like_wildcard',
+            'table': single_table,
+            'detail': 'LIKE con wildcard iniziale' if _LEADING_WILDCARD.search(where_text) else 'LIKE ? (pattern da parametro)',
+            'suggestion': "LIKE '%x%' non usa indici: ricerca per prefisso (LIKE 'x%') o tabella FTS5",
+        })
+    return findings
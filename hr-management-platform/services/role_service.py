@@ -15,6 +15,8 @@ from models.role import (
     RoleAssignmentListItem, EmployeeRoles, RoleMatrix,
     RoleCoverageReport
 )
+from services.perf_trace import timed
+from services.query_trace import connect
 
 
 class RoleService:
@@ -25,7 +27,7 @@ class RoleService:
 
     def _get_connection(self) -> sqlite3.Connection:
         """Get database connection"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn
 
@@ -445,6 +447,7 @@ class RoleService:
 
     # === ROLE MATRIX ===
 
+    @timed('db')
     def get_role_matrix(
         self,
         category: str,
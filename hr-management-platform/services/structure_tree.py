@@ -0,0 +1,216 @@
+"""
+Structure Tree
+
+Indice in memoria della gerarchia strutture (strutture_df + personale_df)
+condiviso dalle view di navigazione (organigramma, drill-down, accordion
+strutture).
+
+Costruito una sola volta per versione dei dati: adiacenza padre → figli,
+dipendenti raggruppati per unità, conteggi dipendenti del sotto-albero,
+profondità e percorsi da root sono precalcolati, così espandere un nodo
+costa O(figli) invece di una scansione completa dei DataFrame per nodo.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from services.payload_cache import dataframe_fingerprint
+from services.tree_metrics import TreeMetrics
+
+_EMPTY_POSITIONS = np.array([], dtype=np.intp)
+
+
+class StructureTree:
+    """
+    Indice gerarchico di strutture_df con dipendenti raggruppati per unità.
+
+    Args:
+        strutture_df: DataFrame strutture (Codice, DESCRIZIONE, padre)
+        personale_df: DataFrame personale
+        employee_column: Colonna di personale_df che collega il dipendente
+            alla struttura (le view organigramma usano 'Unità Organizzativa',
+            la gestione strutture usa il campo padre)
+    """
+
+    def __init__(
+        self,
+        strutture_df: pd.DataFrame,
+        personale_df: pd.DataFrame,
+        employee_column: str = config.PARENT_FIELD
+    ):
+        self.strutture_df = strutture_df
+        self.personale_df = personale_df
+        self.employee_column = employee_column
+
+        codes = strutture_df[config.KEY_FIELD_STRUTTURE].tolist()
+        self._codes = codes
+        parents = strutture_df[config.PARENT_FIELD]
+        descriptions = strutture_df['DESCRIZIONE'].tolist() \
+            if 'DESCRIZIONE' in strutture_df.columns else [None] * len(codes)
+
+        # Prima occorrenza di ogni codice (come .iloc[0] nelle view)
+        self._positions: Dict = {}
+        for pos, codice in enumerate(codes):
+            self._positions.setdefault(codice, pos)
+        self._descriptions = {c: descriptions[p] for c, p in self._positions.items()}
+        self._parents = {
+            c: (None if pd.isna(parents.iat[p]) else parents.iat[p])
+            for c, p in self._positions.items()
+        }
+
+        # Adiacenza padre → posizioni figli (ordine del DataFrame)
+        self._children: Dict = strutture_df.groupby(
+            config.PARENT_FIELD, sort=False
+        ).indices
+        self._root_positions = np.flatnonzero(parents.isna().to_numpy())
+        self.roots = [codes[p] for p in self._root_positions]
+
+        # Dipendenti raggruppati per unità
+        if employee_column in personale_df.columns:
+            self._employees: Dict = personale_df.groupby(
+                employee_column, sort=False
+            ).indices
+        else:
+            self._employees = {}
+
+        # Profondità e conteggi sul sotto-albero (BFS vettorizzata)
+        self.metrics = TreeMetrics(codes, parents, descriptions)
+        self.max_depth = self.metrics.max_depth
+        direct_counts = np.array(
+            [self.direct_employee_count(c) for c in self.metrics.codes], dtype=np.int64
+        )
+        self._subtree_counts = self.metrics.subtree_sum(direct_counts)
+
+        # Percorsi da root, in ordine BFS (il padre è sempre già calcolato)
+        self._paths: Dict[object, Tuple] = {}
+        metric_codes = self.metrics.codes
+        for node in self.metrics.bfs_order():
+            if not self.metrics.rooted[node]:
+                continue
+            codice = metric_codes[node]
+            parent = self.metrics.parent[node]
+            prefix = self._paths[metric_codes[parent]] if parent >= 0 else ()
+            self._paths[codice] = prefix + ((codice, self._descriptions.get(codice)),)
+
+    # === NAVIGAZIONE ===
+
+    def __contains__(self, codice) -> bool:
+        return codice in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def row(self, codice) -> Optional[pd.Series]:
+        """Riga strutture_df del codice (None se sconosciuto)."""
+        pos = self._positions.get(codice)
+        return None if pos is None else self.strutture_df.iloc[pos]
+
+    def description(self, codice) -> Optional[str]:
+        """DESCRIZIONE della struttura (None se sconosciuta)."""
+        return self._descriptions.get(codice)
+
+    def parent(self, codice):
+        """Codice padre (None per root o codice sconosciuto)."""
+        return self._parents.get(codice)
+
+    def children(self, codice) -> List:
+        """Codici dei figli diretti, nell'ordine di strutture_df."""
+        positions = self._children.get(codice, _EMPTY_POSITIONS)
+        return [self._codes[p] for p in positions]
+
+    def child_count(self, codice) -> int:
+        """Numero di sotto-strutture dirette."""
+        return len(self._children.get(codice, _EMPTY_POSITIONS))
+
+    def children_df(self, codice) -> pd.DataFrame:
+        """Righe strutture_df dei figli diretti (indice originale preservato)."""
+        return self.strutture_df.iloc[self._children.get(codice, _EMPTY_POSITIONS)]
+
+    def roots_df(self) -> pd.DataFrame:
+        """Righe strutture_df delle strutture root."""
+        return self.strutture_df.iloc[self._root_positions]
+
+    # === DIPENDENTI ===
+
+    def employees_df(self, codice) -> pd.DataFrame:
+        """Dipendenti assegnati direttamente alla struttura."""
+        return self.personale_df.iloc[self._employees.get(codice, _EMPTY_POSITIONS)]
+
+    def direct_employee_count(self, codice) -> int:
+        """Numero di dipendenti diretti."""
+        return len(self._employees.get(codice, _EMPTY_POSITIONS))
+
+    def subtree_employee_count(self, codice) -> int:
+        """Dipendenti diretti + dipendenti di tutte le sotto-strutture."""
+        pos = self.metrics.position(codice)
+        if pos < 0:
+            return self.direct_employee_count(codice)
+        return int(self._subtree_counts[pos])
+
+    def has_employees(self, codice) -> bool:
+        """True se la struttura o un suo discendente ha dipendenti."""
+        return self.subtree_employee_count(codice) > 0
+
+    # === PROFONDITÀ E PERCORSI ===
+
+    def depth(self, codice) -> Optional[int]:
+        """Livello del nodo (root = 0); None se non raggiungibile da root."""
+        return self.metrics.depth_of(codice)
+
+    def path(self, codice) -> List[Tuple]:
+        """Percorso da root a codice come lista di (codice, descrizione)."""
+        if codice in self._paths:
+            return list(self._paths[codice])
+
+        # Nodo non raggiungibile da root: risali i padri fino a root/ciclo
+        path = []
+        visited = set()
+        current = codice
+        while current is not None and current in self._positions and current not in visited:
+            visited.add(current)
+            path.insert(0, (current, self._descriptions.get(current)))
+            current = self._parents.get(current)
+        return path
+
+
+# === CACHE PER VERSIONE DATI ===
+
+_tree_cache: Dict[str, Tuple[Tuple, StructureTree]] = {}
+_tree_cache_lock = threading.Lock()
+
+
+def get_structure_tree(
+    strutture_df: pd.DataFrame,
+    personale_df: pd.DataFrame,
+    employee_column: str = config.PARENT_FIELD
+) -> StructureTree:
+    """
+    Get StructureTree per i DataFrame correnti (ricostruito solo se cambiano).
+
+    La versione dei dati è l'identità dei DataFrame più un hash delle colonne
+    usate dall'indice, così anche le modifiche in-place (es. cambio padre in
+    strutture_view) invalidano l'albero.
+    """
+    version = (
+        id(strutture_df),
+        id(personale_df),
+        dataframe_fingerprint(
+            strutture_df,
+            [config.KEY_FIELD_STRUTTURE, config.PARENT_FIELD, 'DESCRIZIONE']
+        ),
+        dataframe_fingerprint(personale_df, [employee_column]),
+    )
+
+    with _tree_cache_lock:
+        cached = _tree_cache.get(employee_column)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    tree = StructureTree(strutture_df, personale_df, employee_column)
+
+    with _tree_cache_lock:
+        _tree_cache[employee_column] = (version, tree)
+    return tree
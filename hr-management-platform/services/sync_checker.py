@@ -5,9 +5,10 @@ import pandas as pd
 from pathlib import Path
 from typing import List, Tuple
 
-from models.sync_models import PersonMismatch, SyncCheckResult
-from services.database import DatabaseHandler
-from services.excel_handler import ExcelHandler
+from models.sync_models import MISMATCH_COLUMNS, MismatchSet, SyncCheckResult
+from services.database import DatabaseHandler, EXCEL_COLUMN_MAPPING
+from services.excel_handler import read_excel_sheet
+from services.perf_trace import timed
 
 
 class SyncChecker:
@@ -22,6 +23,7 @@ class SyncChecker:
         """
         self.db_handler = db_handler
 
+    @timed('diff', rows=None)
     def check_consistency(
         self,
         excel_path: str,
@@ -107,12 +109,9 @@ class SyncChecker:
         if not Path(excel_path).exists():
             raise FileNotFoundError(f"File Excel non trovato: {excel_path}")
 
-        # Carica con ExcelHandler
-        handler = ExcelHandler(excel_path)
-
         try:
-            # Carica il foglio specifico
-            df = pd.read_excel(excel_path, sheet_name=sheet_name, engine='openpyxl')
+            # Carica il foglio specifico (cache di parsing condivisa)
+            df = read_excel_sheet(excel_path, sheet_name)
         except ValueError as e:
             raise ValueError(f"Foglio '{sheet_name}' non trovato nel file: {e}")
 
@@ -143,55 +142,59 @@ class SyncChecker:
         """
         Carica i dati Personale dal database.
 
+        Legge con una sola query le colonne usate dai controlli (nomi
+        Excel standard), nell'ordine di get_personale_all.
+
         Returns:
             DataFrame con i dati Personale dal DB
         """
-        personale_df, _ = self.db_handler.export_to_dataframe()
-        return personale_df
+        columns = ['TxCodFiscale', 'Codice', 'Titolare', 'Unità_Organizzativa', 'Approvatore']
+        select = ', '.join(f'"{col}"' for col in columns)
+        cursor = self.db_handler.get_connection().cursor()
+        # Tuple semplici: sqlite3.Row rallenta il fetch di grandi volumi
+        cursor.row_factory = None
+        try:
+            cursor.execute(f"SELECT {select} FROM personale ORDER BY Titolare")
+            df = pd.DataFrame(cursor.fetchall(), columns=columns)
+        finally:
+            cursor.close()
+        return df.rename(columns=EXCEL_COLUMN_MAPPING)
+
+    # === CONTROLLI (join per chiave, nessun iterrows) ===
 
     def _check_missing_in_db(
         self,
         excel_df: pd.DataFrame,
         db_df: pd.DataFrame
-    ) -> List[PersonMismatch]:
+    ) -> MismatchSet:
         """
-        Trova persone presenti in Excel ma non nel DB.
+        Trova persone presenti in Excel ma non nel DB (anti-join su CF).
 
         Args:
             excel_df: DataFrame Excel
             db_df: DataFrame DB
 
         Returns:
-            Lista di PersonMismatch per persone mancanti nel DB
+            MismatchSet per persone mancanti nel DB
         """
-        mismatches = []
-
-        # Set di CF presenti nel DB
-        db_cf_set = set(db_df['TxCodFiscale'].dropna().unique())
-
-        # Trova CF in Excel ma non in DB
-        for _, row in excel_df.iterrows():
-            cf = row.get('TxCodFiscale')
-            if cf and cf not in db_cf_set:
-                mismatch = PersonMismatch(
-                    TxCodFiscale=cf,
-                    codice=row.get('Codice'),
-                    titolare=row.get('Titolare', 'N/D'),
-                    unita_organizzativa=row.get('Unità Organizzativa'),
-                    issue_type='missing_in_db',
-                    details=f"Persona presente in Excel ma non trovata nel DB"
-                )
-                mismatches.append(mismatch)
-
-        return mismatches
+        cf = excel_df['TxCodFiscale']
+        missing = _present(cf) & ~cf.isin(db_df['TxCodFiscale'].dropna())
+        rows = excel_df[missing]
+
+        return _mismatch_set(
+            rows,
+            unita_column='Unità Organizzativa',
+            issue_type='missing_in_db',
+            details="Persona presente in Excel ma non trovata nel DB"
+        )
 
     def _check_missing_in_excel(
         self,
         excel_df: pd.DataFrame,
         db_df: pd.DataFrame
-    ) -> List[PersonMismatch]:
+    ) -> MismatchSet:
         """
-        Trova persone presenti nel DB ma non in Excel.
+        Trova persone presenti nel DB ma non in Excel (anti-join su CF).
 
         Questo non è necessariamente un errore, ma un'informazione utile.
 
@@ -200,34 +203,24 @@ class SyncChecker:
             db_df: DataFrame DB
 
         Returns:
-            Lista di PersonMismatch per persone mancanti in Excel
+            MismatchSet per persone mancanti in Excel
         """
-        mismatches = []
-
-        # Set di CF presenti in Excel
-        excel_cf_set = set(excel_df['TxCodFiscale'].dropna().unique())
-
-        # Trova CF in DB ma non in Excel
-        for _, row in db_df.iterrows():
-            cf = row.get('TxCodFiscale')
-            if cf and cf not in excel_cf_set:
-                mismatch = PersonMismatch(
-                    TxCodFiscale=cf,
-                    codice=row.get('Codice'),
-                    titolare=row.get('Titolare', 'N/D'),
-                    unita_organizzativa=row.get('Unità_Organizzativa'),
-                    issue_type='missing_in_excel',
-                    details=f"Persona presente nel DB ma non trovata in Excel"
-                )
-                mismatches.append(mismatch)
-
-        return mismatches
+        cf = db_df['TxCodFiscale']
+        missing = _present(cf) & ~cf.isin(excel_df['TxCodFiscale'].dropna())
+        rows = db_df[missing]
+
+        return _mismatch_set(
+            rows,
+            unita_column='Unità Organizzativa',
+            issue_type='missing_in_excel',
+            details="Persona presente nel DB ma non trovata in Excel"
+        )
 
     def _check_responsabili_consistency(
         self,
         excel_df: pd.DataFrame,
         db_df: pd.DataFrame
-    ) -> Tuple[List[PersonMismatch], List[PersonMismatch]]:
+    ) -> Tuple[MismatchSet, MismatchSet]:
         """
         Verifica la coerenza dei responsabili.
 
@@ -235,6 +228,11 @@ class SyncChecker:
         1. Ogni responsabile assegnato esista nel DB
         2. Ogni responsabile abbia il flag Approvatore=SÌ
 
+        Un'unica left join (Primo responsabile -> Codice DB) separa i due
+        casi: senza corrispondenza -> responsabile_missing, con
+        corrispondenza ma Approvatore diverso da 'SÌ' ->
+        responsabile_not_approver.
+
         Args:
             excel_df: DataFrame Excel
             db_df: DataFrame DB
@@ -242,67 +240,106 @@ class SyncChecker:
         Returns:
             Tuple di (responsabili_missing, responsabili_not_approver)
         """
-        responsabili_missing = []
-        responsabili_not_approver = []
-
         # Verifica presenza colonna "Primo responsabile"
         if 'Primo responsabile' not in excel_df.columns:
             # File senza campo responsabile, skip check
-            return (responsabili_missing, responsabili_not_approver)
-
-        # Crea dizionario DB: Codice -> (Titolare, Approvatore)
-        db_dict = {}
-        for _, row in db_df.iterrows():
-            codice = row.get('Codice')
-            if codice:
-                db_dict[codice] = {
-                    'titolare': row.get('Titolare', 'N/D'),
-                    'approvatore': row.get('Approvatore', '')
-                }
-
-        # Per ogni persona con responsabile
-        for _, row in excel_df.iterrows():
-            resp_codice = row.get('Primo responsabile')
-
-            # Skip se responsabile non assegnato
-            if not resp_codice or pd.isna(resp_codice) or resp_codice == '':
-                continue
-
-            resp_codice = str(resp_codice).strip()
-            if not resp_codice:
-                continue
-
-            # Check 1: Responsabile esiste nel DB?
-            if resp_codice not in db_dict:
-                mismatch = PersonMismatch(
-                    TxCodFiscale=row.get('TxCodFiscale'),
-                    codice=row.get('Codice'),
-                    titolare=row.get('Titolare', 'N/D'),
-                    unita_organizzativa=row.get('Unità Organizzativa'),
-                    issue_type='responsabile_missing',
-                    details=f"Responsabile '{resp_codice}' non trovato nel DB",
-                    responsabile_codice=resp_codice,
-                    responsabile_nome=row.get('Descrizione primo responsabile', 'N/D')
-                )
-                responsabili_missing.append(mismatch)
-                continue  # Skip check 2 se responsabile non esiste
-
-            # Check 2: Responsabile ha flag Approvatore=SÌ?
-            resp_info = db_dict[resp_codice]
-            resp_approvatore = resp_info.get('approvatore', '')
-
-            if resp_approvatore != 'SÌ':
-                mismatch = PersonMismatch(
-                    TxCodFiscale=row.get('TxCodFiscale'),
-                    codice=row.get('Codice'),
-                    titolare=row.get('Titolare', 'N/D'),
-                    unita_organizzativa=row.get('Unità Organizzativa'),
-                    issue_type='responsabile_not_approver',
-                    details=f"Responsabile '{resp_codice}' esiste ma non ha flag Approvatore=SÌ",
-                    responsabile_codice=resp_codice,
-                    responsabile_nome=resp_info.get('titolare', 'N/D'),
-                    responsabile_approvatore_flag=resp_approvatore if resp_approvatore else 'NO'
-                )
-                responsabili_not_approver.append(mismatch)
-
-        return (responsabili_missing, responsabili_not_approver)
+            return MismatchSet(), MismatchSet()
+
+        # Persone con responsabile assegnato (codice come testo, senza spazi)
+        resp = excel_df['Primo responsabile']
+        resp = resp[resp.notna()].astype(str).str.strip()
+        resp = resp[resp != '']
+        rows = excel_df.loc[resp.index]
+
+        # Lookup DB: Codice -> (Titolare, Approvatore); a parità di codice vince l'ultima riga
+        db_codes = db_df[_present(db_df['Codice'])]
+        lookup = pd.DataFrame({
+            'resp_codice': db_codes['Codice'].to_numpy(),
+            'resp_titolare': db_codes['Titolare'].to_numpy() if 'Titolare' in db_codes else None,
+            'resp_approvatore': db_codes['Approvatore'].to_numpy() if 'Approvatore' in db_codes else None,
+        }).drop_duplicates('resp_codice', keep='last')
+
+        joined = pd.DataFrame({'resp_codice': resp.to_numpy()}).merge(
+            lookup, on='resp_codice', how='left', indicator=True
+        )
+        found = (joined['_merge'] == 'both').to_numpy()
+        approvatore = joined['resp_approvatore']
+        not_approver = found & (approvatore != 'SÌ').to_numpy()
+
+        # Check 1: responsabile inesistente nel DB
+        missing_rows = rows[~found]
+        missing_codes = joined.loc[~found, 'resp_codice']
+        resp_nome = (
+            missing_rows['Descrizione primo responsabile']
+            if 'Descrizione primo responsabile' in missing_rows.columns
+            else pd.Series('N/D', index=missing_rows.index)
+        )
+        responsabili_missing = _mismatch_set(
+            missing_rows,
+            unita_column='Unità Organizzativa',
+            issue_type='responsabile_missing',
+            details="Responsabile '" + missing_codes + "' non trovato nel DB",
+            responsabile_codice=missing_codes,
+            responsabile_nome=resp_nome
+        )
+
+        # Check 2: responsabile esistente ma senza flag Approvatore=SÌ
+        flagged_rows = rows[not_approver]
+        flagged = joined[not_approver]
+        flag = flagged['resp_approvatore']
+        responsabili_not_approver = _mismatch_set(
+            flagged_rows,
+            unita_column='Unità Organizzativa',
+            issue_type='responsabile_not_approver',
+            details="Responsabile '" + flagged['resp_codice'] + "' esiste ma non ha flag Approvatore=SÌ",
+            responsabile_codice=flagged['resp_codice'],
+            responsabile_nome=_text(flagged['resp_titolare']).fillna('N/D'),
+            responsabile_approvatore_flag=_text(flag).where(_present(flag), 'NO')
+        )
+
+        return responsabili_missing, responsabili_not_approver
+
+
+# === HELPER VETTORIALI ===
+
+def _present(series: pd.Series) -> pd.Series:
+    """Valori 'veri' come negli if originali: non nulli e non stringa vuota."""
+    return series.notna() & (series != '')
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """Valori come str (None per i nulli), per i campi str di PersonMismatch."""
+    values = series.astype(object)
+    present = values.notna()
+    out = pd.Series(None, index=series.index, dtype=object)
+    kept = values[present]
+    out[present] = kept if pd.api.types.infer_dtype(kept, skipna=True) == 'string' else kept.map(str)
+    return out
+
+
+def _mismatch_set(rows: pd.DataFrame, unita_column: str, issue_type: str, details, **extra) -> MismatchSet:
+    """
+    Frame MISMATCH_COLUMNS per le righe date.
+
+    details e i campi extra possono essere scalari o Series/array
+    allineati posizionalmente alle righe.
+    """
+    def column(name):
+        return _text(rows[name]) if name in rows.columns else pd.Series(None, index=rows.index, dtype=object)
+
+    def aligned(value):
+        if isinstance(value, pd.Series):
+            return _text(value).to_numpy()
+        return value
+
+    frame = pd.DataFrame({
+        'TxCodFiscale': column('TxCodFiscale').to_numpy(),
+        'codice': column('Codice').to_numpy(),
+        'titolare': column('Titolare').fillna('N/D').to_numpy(),
+        'unita_organizzativa': column(unita_column).to_numpy(),
+        'issue_type': issue_type,
+        'details': aligned(details),
+    }, columns=MISMATCH_COLUMNS, index=range(len(rows)))
+    for name, value in extra.items():
+        frame[name] = aligned(value)
+    return MismatchSet(frame)
@@ -0,0 +1,511 @@
+"""
+Tabular I/O
+
+Lettura e scrittura di tabelle nei formati di interscambio Parquet e CSV
+accanto all'Excel: il formato è dedotto dall'estensione (path o nome del
+file caricato) e le letture Excel passano dalla cache di ExcelHandler.
+
+- CSV: letto come testo, così codici con zeri iniziali non diventano
+  numeri; scritto a blocchi in append.
+- iter_table legge CSV/Parquet a blocchi per chi lavora blocco per
+  blocco (diff, import DB_ORG); read_table legge la tabella intera.
+- Parquet: richiede pyarrow (o fastparquet in sola lettura/scrittura di
+  DataFrame); le query SQLite sono scritte a row group con ParquetWriter.
+
+I nomi colonna DB (Unità_Organizzativa, ...) sono riportati ai nomi Excel
+standard della mappatura di DatabaseHandler, così validazione e import
+ricevono le stesse colonne qualunque sia il formato.
+"""
+import codecs
+import csv
+import importlib.util
+import io
+import sqlite3
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+import config
+from services.database import EXCEL_COLUMN_MAPPING
+from services.excel_handler import read_excel_sheet
+from services.excel_stream_writer import StreamingExcelWriter
+from services.perf_trace import timed
+
+# Formato -> estensioni riconosciute
+_FORMAT_SUFFIXES = {
+    'xlsx': ('.xlsx', '.xlsm', '.xls'),
+    'csv': ('.csv', '.txt'),
+    'parquet': ('.parquet', '.pq'),
+}
+
+EXPORT_FORMATS = {
+    'xlsx': 'Excel (.xlsx)',
+    'csv': 'CSV (.csv)',
+    'parquet': 'Parquet (.parquet)',
+}
+
+EXPORT_MIME_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/octet-stream',
+    'zip': 'application/zip',
+}
+
+# Estensioni accettate dagli uploader degli import
+UPLOAD_TYPES = ['xlsx', 'xls', 'xlsm', 'csv', 'parquet']
+
+Source = Union[str, Path, bytes, io.IOBase]
+
+
+# === FORMATI ===
+
+def parquet_available() -> bool:
+    """True se è installato un motore Parquet."""
+    return any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet'))
+
+
+def available_export_formats() -> Dict[str, str]:
+    """Formati di export utilizzabili in questo ambiente."""
+    return {
+        fmt: label for fmt, label in EXPORT_FORMATS.items()
+        if fmt != 'parquet' or parquet_available()
+    }
+
+
+def table_format(source: Source) -> str:
+    """Formato ('xlsx', 'csv', 'parquet') dall'estensione del path o del file caricato."""
+    name = source if isinstance(source, (str, Path)) else getattr(source, 'name', '')
+    suffix = Path(str(name)).suffix.lower()
+    for fmt, suffixes in _FORMAT_SUFFIXES.items():
+        if suffix in suffixes:
+            return fmt
+    # bytes o file senza nome: si assume Excel (comportamento storico)
+    return 'xlsx'
+
+
+def interchange_suffix() -> str:
+    """
+    Estensione per file temporanei tra UI e servizi di import.
+
+    Parquet conserva i tipi delle colonne ed è molto più veloce da
+    scrivere e rileggere; senza motore Parquet si resta su .xlsx (il CSV
+    perderebbe i tipi).
+    """
+    return '.parquet' if parquet_available() else '.xlsx'
+
+
+def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Rinomina le colonne con nomi DB nei nomi Excel standard."""
+    rename = {
+        db_col: excel_col for db_col, excel_col in EXCEL_COLUMN_MAPPING.items()
+        if db_col != excel_col and db_col in df.columns and excel_col not in df.columns
+    }
+    return df.rename(columns=rename) if rename else df
+
+
+def _require_parquet() -> None:
+    if not parquet_available():
+        raise ImportError("Formato Parquet non disponibile: installare pyarrow")
+
+
+# === LETTURA ===
+
+def _source_bytes_or_path(source: Source) -> Union[Path, io.BytesIO]:
+    if isinstance(source, (str, Path)):
+        return Path(source)
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(bytes(source))
+    if hasattr(source, 'getvalue'):
+        return io.BytesIO(source.getvalue())
+    return source
+
+
+def _detect_encoding(readable: Union[Path, io.BytesIO]) -> str:
+    """utf-8 (con eventuale BOM) se il contenuto è decodificabile, altrimenti cp1252."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        if isinstance(readable, Path):
+            with open(readable, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    decoder.decode(block)
+        else:
+            decoder.decode(readable.getvalue())
+        decoder.decode(b'', final=True)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def _sniff_separator(readable: Union[Path, io.BytesIO], encoding: str) -> str:
+    """Separatore tra quelli comuni (',', ';', tab, '|') dalla prima parte del file."""
+    if isinstance(readable, Path):
+        with open(readable, 'rb') as f:
+            sample = f.read(64 * 1024)
+    else:
+        sample = readable.getvalue()[:64 * 1024]
+    text = sample.decode(encoding, errors='ignore')
+    try:
+        return csv.Sniffer().sniff(text, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return config.CSV_SEPARATOR
+
+
+def _parquet_columns(readable, usecols: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """
+    Colonne di usecols presenti nel file (come per Excel/CSV, quelle assenti
+    sono ignorate: read_parquet solleverebbe errore).
+    """
+    if usecols is None:
+        return None
+    if importlib.util.find_spec('pyarrow') is not None:
+        import pyarrow.parquet as pq
+        names = pq.read_schema(readable).names
+    else:
+        import fastparquet
+        names = fastparquet.ParquetFile(readable).columns
+    if isinstance(readable, io.BytesIO):
+        readable.seek(0)
+    present = set(names)
+    return [c for c in usecols if c in present]
+
+
+def _csv_reader_options(source: Source, usecols: Optional[Sequence[str]]):
+    """Sorgente leggibile e opzioni read_csv (encoding, separatore, testo, colonne)."""
+    readable = _source_bytes_or_path(source)
+    encoding = _detect_encoding(readable)
+    sep = _sniff_separator(readable, encoding)
+    if isinstance(readable, io.BytesIO):
+        readable.seek(0)
+    wanted = set(usecols) if usecols is not None else None
+    return readable, {
+        'sep': sep,
+        'encoding': encoding,
+        'dtype': str,
+        'usecols': (lambda c: c in wanted) if wanted is not None else None,
+    }
+
+
+def iter_csv_chunks(
+    source: Source,
+    chunk_rows: Optional[int] = None,
+    usecols: Optional[Sequence[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Legge un CSV a blocchi di chunk_rows righe (valori come testo).
+
+    Encoding (utf-8/cp1252) e separatore sono rilevati automaticamente.
+    """
+    readable, options = _csv_reader_options(source, usecols)
+    reader = pd.read_csv(readable, chunksize=chunk_rows or config.CSV_CHUNK_ROWS, **options)
+    with reader:
+        for chunk in reader:
+            yield normalize_column_names(chunk)
+
+
+def _iter_parquet_batches(
+    source: Source,
+    chunk_rows: Optional[int] = None,
+    usecols: Optional[Sequence[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """Legge un Parquet a batch (pyarrow) o a row group (fastparquet)."""
+    _require_parquet()
+    readable = _source_bytes_or_path(source)
+    columns = _parquet_columns(readable, usecols)
+    if importlib.util.find_spec('pyarrow') is not None:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(readable)
+        for batch in parquet_file.iter_batches(
+            batch_size=chunk_rows or config.CSV_CHUNK_ROWS, columns=columns
+        ):
+            yield normalize_column_names(batch.to_pandas())
+    else:
+        import fastparquet
+        for chunk in fastparquet.ParquetFile(readable).iter_row_groups(columns=columns):
+            yield normalize_column_names(chunk)
+
+
+def iter_table(
+    source: Source,
+    sheet_name: Union[str, int] = 0,
+    usecols: Optional[Sequence[str]] = None,
+    chunk_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Legge una tabella a blocchi, senza tenerla tutta in memoria.
+
+    CSV e Parquet sono letti a blocchi di al più chunk_rows righe; l'Excel
+    non si legge a blocchi e arriva come blocco unico (dalla cache).
+    Chi può lavorare blocco per blocco (diff, import di staging) consuma
+    l'iteratore; chi ha bisogno della tabella intera usa read_table.
+    """
+    fmt = table_format(source)
+    if fmt == 'csv':
+        yield from iter_csv_chunks(source, chunk_rows, usecols)
+    elif fmt == 'parquet':
+        yield from _iter_parquet_batches(source, chunk_rows, usecols)
+    else:
+        yield read_excel_sheet(source, sheet_name, usecols)
+
+
+@timed('excel')
+def read_table(
+    source: Source,
+    sheet_name: Union[str, int] = 0,
+    usecols: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """
+    Legge una tabella intera da Excel, CSV o Parquet.
+
+    Args:
+        source: Path, bytes o file caricato (il formato viene dal nome)
+        sheet_name: Foglio Excel (ignorato per CSV/Parquet, che hanno una sola tabella)
+        usecols: Colonne da leggere (default: tutte)
+    """
+    fmt = table_format(source)
+    if fmt == 'csv':
+        readable, options = _csv_reader_options(source, usecols)
+        return normalize_column_names(pd.read_csv(readable, **options))
+
+    if fmt == 'parquet':
+        _require_parquet()
+        readable = _source_bytes_or_path(source)
+        df = pd.read_parquet(readable, columns=_parquet_columns(readable, usecols))
+        return normalize_column_names(df)
+
+    return read_excel_sheet(source, sheet_name, usecols)
+
+
+# === SCRITTURA ===
+
+def _parquet_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """Colonne con nomi stringa e tipi omogenei (Parquet non ammette object misti)."""
+    df = df.rename(columns=str)
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+            df[col] = series.where(series.isna(), series.astype(str))
+    return df
+
+
+def _conform_chunk(chunk: pd.DataFrame, schema) -> pd.DataFrame:
+    """
+    Allinea un blocco di write_query allo schema Parquet fissato dal primo.
+
+    Le colonne testo (anche quelle tutte nulle nel primo blocco) ricevono i
+    valori convertiti in stringa; le colonne numeriche quelli convertiti
+    con pd.to_numeric (errore se non numerici).
+    """
+    import pyarrow as pa
+
+    for field in schema:
+        series = chunk[field.name]
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+                # Interi letti come float (colonna con NULL): "5", non "5.0"
+                chunk[field.name] = series.astype(object).map(
+                    lambda v: None if pd.isna(v)
+                    else str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+                )
+        elif (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)) \
+                and not pd.api.types.is_numeric_dtype(series):
+            chunk[field.name] = pd.to_numeric(series)
+    return chunk
+
+
+@timed('excel', rows=None)
+def write_table(df: pd.DataFrame, path: Union[str, Path], fmt: Optional[str] = None,
+                sheet_name: str = 'Sheet1') -> Path:
+    """
+    Scrive un DataFrame in Excel (write-only), CSV (a blocchi) o Parquet.
+
+    Args:
+        fmt: Formato esplicito (default: dall'estensione di path)
+        sheet_name: Nome foglio per l'Excel
+    """
+    path = Path(path)
+    fmt = fmt or table_format(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if fmt == 'parquet':
+        _require_parquet()
+        _parquet_ready(df).to_parquet(path, index=False)
+    elif fmt == 'csv':
+        chunk_rows = config.CSV_CHUNK_ROWS
+        with open(path, 'w', encoding=config.CSV_ENCODING, newline='') as f:
+            if df.empty:
+                df.to_csv(f, index=False, sep=config.CSV_SEPARATOR)
+            for start in range(0, len(df), chunk_rows):
+                df.iloc[start:start + chunk_rows].to_csv(
+                    f, index=False, header=start == 0, sep=config.CSV_SEPARATOR
+                )
+    else:
+        with StreamingExcelWriter(path) as writer:
+            writer.write_dataframe(sheet_name, df)
+    return path
+
+
+def write_query(
+    conn: sqlite3.Connection,
+    sql: str,
+    path: Union[str, Path],
+    params: Sequence = (),
+    columns: Optional[Sequence[str]] = None,
+    transform: Optional[Callable[[Sequence], Sequence]] = None,
+    fmt: Optional[str] = None,
+    sheet_name: str = 'Sheet1'
+) -> int:
+    """
+    Scrive il risultato di una query a blocchi (fetchmany), senza DataFrame completo.
+
+    Returns:
+        Numero di righe scritte
+    """
+    path = Path(path)
+    fmt = fmt or table_format(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if fmt == 'xlsx':
+        with StreamingExcelWriter(path) as writer:
+            return writer.write_query(sheet_name, conn, sql, params, columns, transform)
+
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        _require_parquet()
+        # Solo fastparquet: nessuna scrittura a row group, si passa da un DataFrame
+        cursor = conn.execute(sql, tuple(params))
+        header = list(columns) if columns is not None else [d[0] for d in cursor.description]
+        rows = [transform(r) if transform else tuple(r) for r in cursor.fetchall()]
+        write_table(pd.DataFrame(rows, columns=header), path, 'parquet')
+        return len(rows)
+
+    cursor = conn.cursor()
+    count = 0
+    try:
+        cursor.execute(sql, tuple(params))
+        header = list(columns) if columns is not None else [d[0] for d in cursor.description]
+
+        if fmt == 'csv':
+            with open(path, 'w', encoding=config.CSV_ENCODING, newline='') as f:
+                writer = csv.writer(f, delimiter=config.CSV_SEPARATOR)
+                writer.writerow(header)
+                while True:
+                    rows = cursor.fetchmany(config.CSV_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    writer.writerows(transform(r) if transform else tuple(r) for r in rows)
+                    count += len(rows)
+            return count
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet_writer = None
+        try:
+            while True:
+                rows = cursor.fetchmany(config.CSV_CHUNK_ROWS)
+                if not rows and parquet_writer is not None:
+                    break
+                chunk = _parquet_ready(pd.DataFrame(
+                    [transform(r) if transform else tuple(r) for r in rows], columns=header
+                ))
+                if parquet_writer is None:
+                    # Schema dal primo blocco; colonne tutte nulle come testo
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    schema = pa.schema([
+                        pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                        for f in table.schema
+                    ])
+                    parquet_writer = pq.ParquetWriter(str(path), schema)
+                else:
+                    chunk = _conform_chunk(chunk, schema)
+                parquet_writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                count += len(rows)
+                if not rows:
+                    break
+        finally:
+            if parquet_writer is not None:
+                parquet_writer.close()
+        return count
+    finally:
+        cursor.close()
+
+
+# === EXPORT MULTI-FOGLIO ===
+
+def _export_path(output_path: Path, fmt: str, multiple: bool) -> Path:
+    if fmt == 'xlsx':
+        return output_path.with_suffix('.xlsx')
+    return output_path.with_suffix('.zip' if multiple else f'.{fmt}')
+
+
+def export_sheets(
+    sheets: List[Tuple[str, pd.DataFrame]],
+    output_path: Union[str, Path],
+    fmt: str = 'xlsx'
+) -> Path:
+    """
+    Esporta più tabelle: un .xlsx multi-foglio o, per CSV/Parquet, un file
+    per tabella (in un archivio .zip se sono più di una).
+
+    Returns:
+        Path effettivo (estensione adeguata al formato)
+    """
+    output_path = Path(output_path)
+    if fmt == 'xlsx':
+        path = _export_path(output_path, fmt, len(sheets) > 1)
+        with StreamingExcelWriter(path) as writer:
+            for name, df in sheets:
+                writer.write_dataframe(name, df)
+        return path
+
+    return _export(
+        [(name, lambda p, f, df=df: write_table(df, p, f)) for name, df in sheets],
+        output_path, fmt
+    )
+
+
+def export_queries(
+    conn: sqlite3.Connection,
+    queries: List[Tuple[str, str, Optional[Sequence[str]]]],
+    output_path: Union[str, Path],
+    fmt: str = 'xlsx'
+) -> Path:
+    """
+    Come export_sheets, leggendo ogni tabella da una query in streaming.
+
+    Args:
+        queries: Lista (nome, sql, intestazioni)
+    """
+    output_path = Path(output_path)
+    if fmt == 'xlsx':
+        path = _export_path(output_path, fmt, len(queries) > 1)
+        with StreamingExcelWriter(path) as writer:
+            for name, sql, columns in queries:
+                writer.write_query(name, conn, sql, (), columns)
+        return path
+
+    return _export(
+        [(name, lambda p, f, sql=sql, columns=columns: write_query(conn, sql, p, (), columns, fmt=f))
+         for name, sql, columns in queries],
+        output_path, fmt
+    )
+
+
+def _export(writers: List[Tuple[str, Callable]], output_path: Path, fmt: str) -> Path:
+    """CSV/Parquet: un file, o un .zip con un file per tabella."""
+    path = _export_path(output_path, fmt, len(writers) > 1)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if len(writers) == 1:
+        writers[0][1](path, fmt)
+        return path
+
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, write in writers:
+            member = Path(tmp_dir) / f"{name}.{fmt}"
+            write(member, fmt)
+            archive.write(member, arcname=member.name)
+    return path
@@ -0,0 +1,200 @@
+"""
+Tree Metrics
+
+Metriche della gerarchia strutture calcolate in tempo lineare: i codici
+sono codificati come interi, il padre di ogni nodo è un array di indici e
+la visita in ampiezza procede un livello alla volta con operazioni numpy
+(nessuna ricorsione, nessun filtro del DataFrame per nodo).
+
+Fornisce profondità per nodo, profondità massima, conteggio foglie,
+aggregazioni sul sotto-albero e frame per sunburst/treemap dei primi N
+livelli. Usato dalla dashboard e dall'indice StructureTree delle view
+organigramma.
+"""
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from services.payload_cache import dataframe_fingerprint
+
+
+class TreeMetrics:
+    """
+    Gerarchia codificata a interi (un nodo per codice, prima occorrenza).
+
+    Args:
+        codes: Codici dei nodi
+        parents: Codice padre di ogni nodo (NaN/None per le root)
+        names: Etichette dei nodi (default: il codice)
+    """
+
+    def __init__(self, codes: Sequence, parents: Sequence, names: Optional[Sequence] = None):
+        codes_s = pd.Series(list(codes), dtype=object)
+        parents_s = pd.Series(list(parents), dtype=object)
+        names_s = pd.Series(list(names), dtype=object) if names is not None else codes_s
+
+        # Un nodo per codice non nullo (prima occorrenza, come .iloc[0])
+        keep = (codes_s.notna() & ~codes_s.duplicated()).to_numpy()
+        self.codes = codes_s[keep].to_numpy()
+        parent_codes = parents_s[keep]
+        self.parent_codes = parent_codes.to_numpy()
+        labels = names_s[keep]
+        self.names = labels.where(labels.notna() & (labels != ''), codes_s[keep]).to_numpy()
+        self._index = pd.Index(self.codes)
+
+        n = len(self.codes)
+        # Indice intero del padre: -1 per root e padri inesistenti
+        self.parent = self._index.get_indexer(parent_codes.to_numpy()) if n else np.array([], dtype=np.intp)
+        self.is_root = parent_codes.isna().to_numpy()
+
+        # Figli in formato CSR (ordinati per padre, stabile rispetto all'input)
+        child_nodes = np.flatnonzero(self.parent >= 0)
+        self._children = child_nodes[np.argsort(self.parent[child_nodes], kind='stable')]
+        self.child_count = np.bincount(self.parent[child_nodes], minlength=n)
+        self._child_start = np.cumsum(self.child_count) - self.child_count
+
+        # BFS per livelli da tutti i nodi senza padre valido. I nodi
+        # raggiunti da una root vera hanno profondità; quelli sotto un padre
+        # inesistente sono visitati solo per le aggregazioni; i nodi in un
+        # ciclo non vengono mai raggiunti (livello -1).
+        self._level = np.full(n, -1, dtype=np.int64)
+        rooted = np.zeros(n, dtype=bool)
+        frontier = np.flatnonzero(self.parent < 0)
+        self._level[frontier] = 0
+        rooted[frontier] = self.is_root[frontier]
+        self._levels: List[np.ndarray] = []
+        depth = 0
+        while frontier.size:
+            self._levels.append(frontier)
+            kids = self.children_of(frontier)
+            kids = kids[self._level[kids] < 0]
+            depth += 1
+            self._level[kids] = depth
+            rooted[kids] = rooted[self.parent[kids]]
+            frontier = kids
+
+        self.rooted = rooted
+        self.depth = np.where(rooted, self._level, -1)
+        self.max_depth = int(self.depth.max()) if rooted.any() else 0
+
+    @classmethod
+    def from_strutture(cls, strutture_df: pd.DataFrame) -> 'TreeMetrics':
+        """Costruisce le metriche da un DataFrame strutture."""
+        names = strutture_df['DESCRIZIONE'] if 'DESCRIZIONE' in strutture_df.columns else None
+        return cls(
+            strutture_df[config.KEY_FIELD_STRUTTURE],
+            strutture_df[config.PARENT_FIELD],
+            names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    # === NAVIGAZIONE ===
+
+    def position(self, code) -> int:
+        """Indice intero del codice (-1 se sconosciuto)."""
+        try:
+            loc = self._index.get_loc(code)
+        except (KeyError, TypeError):
+            return -1
+        return loc if isinstance(loc, (int, np.integer)) else -1
+
+    def children_of(self, nodes: np.ndarray) -> np.ndarray:
+        """Indici di tutti i figli dei nodi dati (gather CSR vettorizzato)."""
+        counts = self.child_count[nodes]
+        total = int(counts.sum())
+        if total == 0:
+            return np.array([], dtype=np.intp)
+        offsets = np.repeat(self._child_start[nodes] - (np.cumsum(counts) - counts), counts)
+        return self._children[offsets + np.arange(total)]
+
+    def bfs_order(self) -> np.ndarray:
+        """Nodi visitati, in ordine di livello (padri prima dei figli)."""
+        if not self._levels:
+            return np.array([], dtype=np.intp)
+        return np.concatenate(self._levels)
+
+    def depth_of(self, code) -> Optional[int]:
+        """Profondità del codice (root = 0); None se non raggiungibile da root."""
+        pos = self.position(code)
+        if pos < 0 or self.depth[pos] < 0:
+            return None
+        return int(self.depth[pos])
+
+    # === METRICHE ===
+
+    @property
+    def level_count(self) -> int:
+        """Numero di livelli della gerarchia (0 se non ci sono root)."""
+        return self.max_depth + 1 if self.is_root.any() else 0
+
+    def leaf_count(self) -> int:
+        """Strutture foglia (codici mai usati come padre)."""
+        return int((self.child_count == 0).sum())
+
+    def subtree_sum(self, values: np.ndarray) -> np.ndarray:
+        """
+        Somma di values su ogni sotto-albero (nodo incluso).
+
+        Bottom-up per livelli con np.add.at; i nodi in un ciclo mantengono
+        solo il proprio valore.
+        """
+        totals = np.array(values, copy=True)
+        for level_nodes in reversed(self._levels[1:]):
+            np.add.at(totals, self.parent[level_nodes], totals[level_nodes])
+        return totals
+
+    def subtree_sizes(self) -> np.ndarray:
+        """Numero di nodi di ogni sotto-albero (nodo incluso)."""
+        return self.subtree_sum(np.ones(len(self.codes), dtype=np.int64))
+
+    def level_frame(self, max_levels: int = 3) -> pd.DataFrame:
+        """
+        Frame per sunburst/treemap con i primi max_levels livelli.
+
+        Columns: id, parent ('' per le root), name, level, size (nodi del
+        sotto-albero completo).
+        """
+        nodes = self.bfs_order()
+        nodes = nodes[self._level[nodes] < max_levels]
+        nodes = nodes[self.rooted[nodes]]
+        parents = self.parent[nodes]
+        parent_ids = np.where(parents >= 0, self.codes[np.maximum(parents, 0)], '')
+        return pd.DataFrame({
+            'id': self.codes[nodes],
+            'parent': parent_ids,
+            'name': self.names[nodes],
+            'level': self.depth[nodes],
+            'size': self.subtree_sizes()[nodes],
+        })
+
+
+# === CACHE PER VERSIONE DATI ===
+
+_metrics_cache: Dict[str, Tuple[Tuple, TreeMetrics]] = {}
+_metrics_cache_lock = threading.Lock()
+
+
+def get_tree_metrics(strutture_df: pd.DataFrame) -> TreeMetrics:
+    """Get TreeMetrics per strutture_df (ricalcolato solo se cambia)."""
+    version = (
+        id(strutture_df),
+        dataframe_fingerprint(
+            strutture_df,
+            [config.KEY_FIELD_STRUTTURE, config.PARENT_FIELD, 'DESCRIZIONE']
+        ),
+    )
+    with _metrics_cache_lock:
+        cached = _metrics_cache.get('strutture')
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    metrics = TreeMetrics.from_strutture(strutture_df)
+
+    with _metrics_cache_lock:
+        _metrics_cache['strutture'] = (version, metrics)
+    return metrics
@@ -0,0 +1,205 @@
+"""
+Validation Index
+
+Indici chiave/padre mantenuti tra una modifica e l'altra per la
+validazione incrementale (DataValidator.validate_changes).
+
+Per ogni riga (etichetta dell'indice del DataFrame) conserva la chiave
+grezza e, per le strutture valide, il codice e il padre normalizzati.
+Aggiornare k righe costa O(k); le dipendenze di una modifica (righe con
+la stessa chiave, figli di un codice, padre vincente di un codice) si
+leggono senza scorrere il DataFrame.
+
+L'indice è legato al contenuto, non all'identità del frame: conserva un
+hash per riga delle colonne indicizzate e changed_rows() restituisce le
+righe cambiate dall'ultimo bind (anche con scritture in place non
+dichiarate, o con il frame di un'altra sessione).
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from services.payload_cache import row_hashes
+
+
+def index_key(value) -> Optional[Hashable]:
+    """Chiave grezza indicizzabile (None per vuoti e valori non hashable)."""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+        hash(value)
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+class ValidationIndex:
+    """
+    Indici per un tipo di record ('personale' o 'strutture').
+
+    L'indice descrive il contenuto del frame dell'ultimo bind; le righe
+    cambiate da allora si ottengono con changed_rows.
+    """
+
+    def __init__(self, record_type: str):
+        self.record_type = record_type
+        self._hashes: Optional[pd.Series] = None
+        self._hash_columns: List[str] = []
+        self._labels: Set[Hashable] = set()
+
+        # Chiave grezza per riga e righe per chiave
+        self._raw: Dict[Hashable, Hashable] = {}
+        self._raw_rows: Dict[Hashable, Set[Hashable]] = defaultdict(set)
+
+        # Solo strutture valide: (codice, padre) per riga, righe per codice e per padre
+        self._records: Dict[Hashable, tuple] = {}
+        self._code_rows: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._child_rows: Dict[str, Set[Hashable]] = defaultdict(set)
+
+    # === STATO ===
+
+    def bind(self, df: pd.DataFrame, columns: List[str]) -> None:
+        """Associa l'indice al contenuto corrente di df (hash per riga di columns)."""
+        self._hash_columns = list(columns)
+        self._hashes = pd.Series(row_hashes(df, self._hash_columns), index=df.index)
+
+    def changed_rows(self, df: pd.DataFrame, columns: List[str]) -> Optional[List[Hashable]]:
+        """
+        Etichette delle righe di df diverse da quelle descritte dall'indice.
+
+        Comprende righe con hash diverso, righe nuove e righe non più
+        presenti. None se l'indice non è confrontabile con df (mai
+        costruito, colonne diverse, etichette non univoche): va ricostruito.
+        """
+        old = self._hashes
+        if old is None or list(columns) != self._hash_columns or not df.index.is_unique:
+            return None
+        new = row_hashes(df, self._hash_columns)
+        if old.index.equals(df.index):
+            return df.index[old.to_numpy() != new].tolist()
+        positions = old.index.get_indexer(df.index)
+        known = positions >= 0
+        changed = ~known
+        changed[known] = old.to_numpy()[positions[known]] != new[known]
+        return df.index[changed].tolist() + old.index.difference(df.index).tolist()
+
+    def clear(self) -> None:
+        self._hashes = None
+        self._labels.clear()
+        self._raw.clear()
+        self._raw_rows.clear()
+        self._records.clear()
+        self._code_rows.clear()
+        self._child_rows.clear()
+
+    # === AGGIORNAMENTO ===
+
+    def drop_rows(self, labels: Iterable[Hashable]) -> None:
+        """Rimuove le righe dagli indici."""
+        for label in labels:
+            self._labels.discard(label)
+            raw = self._raw.pop(label, None)
+            if raw is not None:
+                self._discard(self._raw_rows, raw, label)
+            record = self._records.pop(label, None)
+            if record is not None:
+                codice, padre = record
+                self._discard(self._code_rows, codice, label)
+                if padre is not None:
+                    self._discard(self._child_rows, padre, label)
+
+    def set_rows(
+        self,
+        labels: List[Hashable],
+        raw_keys: List,
+        codici: Optional[List] = None,
+        padri: Optional[List] = None,
+        valid: Optional[List[bool]] = None
+    ) -> None:
+        """
+        Sostituisce le voci delle righe indicate.
+
+        Args:
+            labels: Etichette riga
+            raw_keys: Valore grezzo della colonna chiave
+            codici/padri/valid: Solo strutture, esito della validazione per riga
+        """
+        self.drop_rows(labels)
+        for i, label in enumerate(labels):
+            self._labels.add(label)
+            raw = index_key(raw_keys[i])
+            if raw is not None:
+                self._raw[label] = raw
+                self._raw_rows[raw].add(label)
+            if valid is not None and valid[i]:
+                codice, padre = codici[i], padri[i]
+                self._records[label] = (codice, padre)
+                self._code_rows[codice].add(label)
+                if padre is not None:
+                    self._child_rows[padre].add(label)
+
+    @staticmethod
+    def _discard(index: Dict[Hashable, Set[Hashable]], key: Hashable, label: Hashable) -> None:
+        rows = index.get(key)
+        if rows is not None:
+            rows.discard(label)
+            if not rows:
+                del index[key]
+
+    # === INTERROGAZIONI ===
+
+    def raw_key(self, label: Hashable) -> Optional[Hashable]:
+        return self._raw.get(label)
+
+    def record(self, label: Hashable) -> Optional[tuple]:
+        """(codice, padre) della riga se struttura valida."""
+        return self._records.get(label)
+
+    def rows_with_key(self, key) -> Set[Hashable]:
+        """Righe con chiave grezza uguale a key."""
+        key = index_key(key)
+        return set(self._raw_rows.get(key, ())) if key is not None else set()
+
+    def is_code(self, codice) -> bool:
+        """True se esiste almeno una struttura valida con questo codice."""
+        return codice is not None and bool(self._code_rows.get(codice))
+
+    def child_rows(self, codice) -> Set[Hashable]:
+        """Righe di strutture valide che hanno codice come padre."""
+        return set(self._child_rows.get(codice, ())) if codice is not None else set()
+
+    def winner(self, codice, df: pd.DataFrame) -> Optional[Hashable]:
+        """Riga che definisce il codice (a parità di codice vince l'ultima)."""
+        rows = self._code_rows.get(codice)
+        if not rows:
+            return None
+        return max(rows, key=df.index.get_loc)
+
+    def first_position(self, codice, df: pd.DataFrame) -> int:
+        """Posizione della prima struttura valida con questo codice."""
+        return min(df.index.get_loc(label) for label in self._code_rows[codice])
+
+    def padre_of(self, codice, df: pd.DataFrame) -> Optional[str]:
+        """Padre del record che definisce il codice."""
+        label = self.winner(codice, df)
+        return self._records[label][1] if label is not None else None
+
+
+# === REGISTRO INDICI ===
+
+_indexes: Dict[str, ValidationIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_validation_index(record_type: str) -> ValidationIndex:
+    """Get indice di validazione condiviso per tipo record."""
+    with _indexes_lock:
+        index = _indexes.get(record_type)
+        if index is None:
+            index = ValidationIndex(record_type)
+            _indexes[record_type] = index
+        return index
@@ -0,0 +1,162 @@
+"""
+Validation Rules
+
+Regole di validazione dichiarative valutate per colonna con maschere
+pandas/NumPy, invece di costruire un modello Pydantic per ogni riga.
+
+Le regole sono conservative: una riga che le supera tutte è sicuramente
+valida anche per PersonaleRecord/StrutturaRecord. Le righe che non le
+superano (o con valori che le regole non sanno giudicare, es. date o tipi
+misti) vengono rivalidate con Pydantic, che produce i messaggi dettagliati.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Type
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from models.personale import PersonaleRecord, CODICE_FISCALE_PATTERN
+from models.strutture import StrutturaRecord
+
+# Esiti di pandas.api.types.infer_dtype convertibili in str dai modelli
+_PLAIN_INFERRED = {
+    'string', 'empty', 'integer', 'floating', 'mixed-integer-float', 'boolean'
+}
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """
+    Regola su una colonna.
+
+    Args:
+        name: Nome regola (diagnostica)
+        column: Colonna del DataFrame
+        check: Funzione Series -> maschera bool delle righe che rispettano la regola
+        required: Se la colonna manca, la regola fallisce (True) o è superata (False)
+    """
+    name: str
+    column: str
+    check: Callable[[pd.Series], pd.Series]
+    required: bool = True
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        if self.column not in df.columns:
+            return np.full(len(df), not self.required)
+        return np.asarray(self.check(df[self.column]), dtype=bool)
+
+
+# === CHECK PER COLONNA ===
+
+def _as_object(series: pd.Series) -> pd.Series:
+    return series if series.dtype == object else series.astype(object)
+
+
+def _stripped(series: pd.Series) -> pd.Series:
+    """Stringhe senza spazi; NaN per celle non stringa."""
+    try:
+        return _as_object(series).str.strip()
+    except AttributeError:
+        # Nessuna stringa nella colonna (.str non disponibile)
+        return pd.Series(np.nan, index=series.index, dtype=object)
+
+
+def non_empty_text(series: pd.Series) -> pd.Series:
+    """Stringa non vuota (i numeri vanno al fallback Pydantic)."""
+    stripped = _stripped(series)
+    return stripped.notna() & stripped.ne('')
+
+
+def blank(series: pd.Series) -> pd.Series:
+    """Cella vuota: NaN/None o stringa di soli spazi."""
+    return series.isna() | _stripped(series).eq('')
+
+
+def matches(pattern: str) -> Callable[[pd.Series], pd.Series]:
+    """Stringa che, dopo strip/upper, rispetta pattern (semantica re.match)."""
+    def check(series: pd.Series) -> pd.Series:
+        stripped = _stripped(series)
+        if not stripped.notna().any():
+            return pd.Series(False, index=series.index)
+        return stripped.str.upper().str.match(pattern, na=False)
+    return check
+
+
+def _is_plain_value(value) -> bool:
+    if isinstance(value, (str, int, float)):
+        return True
+    return value is None or value is pd.NA or value is pd.NaT
+
+
+def plain_values(series: pd.Series) -> pd.Series:
+    """Valori che il validatore 'before' dei modelli converte in str o None."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.StringDtype) or dtype.kind in 'biuf':
+        return pd.Series(True, index=series.index)
+    if dtype.kind == 'M':
+        return series.isna()
+    if dtype == object and pd.api.types.infer_dtype(series, skipna=True) in _PLAIN_INFERRED:
+        return pd.Series(True, index=series.index)
+    return _as_object(series).map(_is_plain_value).astype(bool)
+
+
+def _to_text(value):
+    """Replica di empty_str_to_none + str_strip_whitespace per valori semplici."""
+    if isinstance(value, str):
+        return value.strip() or None
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalized_text(series: pd.Series) -> pd.Series:
+    """Valori come li vedrebbe il modello (str senza spazi o None)."""
+    if isinstance(series.dtype, pd.StringDtype) or (
+        series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty')
+    ):
+        stripped = _stripped(series)
+        return stripped.where(stripped.notna() & stripped.ne(''), None)
+    return _as_object(series).map(_to_text)
+
+
+# === SET DI REGOLE ===
+
+def _plain_value_rules(model: Type[BaseModel]) -> List[ColumnRule]:
+    """Tipi ammessi su ogni campo del modello (alias e nome, per populate_by_name)."""
+    rules = []
+    for name, field in model.model_fields.items():
+        for column in {field.alias or name, name}:
+            rules.append(ColumnRule('tipo_valore', column, plain_values, required=False))
+    return rules
+
+
+PERSONALE_RULES: List[ColumnRule] = _plain_value_rules(PersonaleRecord) + [
+    ColumnRule('obbligatorio', 'Unità Organizzativa', non_empty_text),
+    ColumnRule('obbligatorio', 'Titolare', non_empty_text),
+    ColumnRule('obbligatorio', 'Codice', non_empty_text),
+    ColumnRule('obbligatorio', 'TxCodFiscale', non_empty_text),
+    ColumnRule('formato_cf', 'TxCodFiscale', matches(CODICE_FISCALE_PATTERN)),
+]
+
+STRUTTURE_RULES: List[ColumnRule] = _plain_value_rules(StrutturaRecord) + [
+    ColumnRule('obbligatorio', 'Codice', non_empty_text),
+    ColumnRule('obbligatorio', 'DESCRIZIONE', non_empty_text),
+    ColumnRule('cf_vuoto', 'TxCodFiscale', blank, required=False),
+]
+
+
+def passing_mask(df: pd.DataFrame, rules: List[ColumnRule]) -> np.ndarray:
+    """Maschera posizionale delle righe che superano tutte le regole."""
+    if not df.columns.is_unique:
+        # Colonne duplicate: nessuna garanzia sul dict di riga, tutto al fallback
+        return np.zeros(len(df), dtype=bool)
+
+    mask = np.ones(len(df), dtype=bool)
+    for rule in rules:
+        mask &= rule.mask(df)
+        if not mask.any():
+            break
+    return mask
@@ -1,11 +1,29 @@
 """
 Service per validazione dati TNS usando modelli Pydantic
 """
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Tuple
+from typing import Callable, Hashable, Iterable, Iterator, List, Dict, Optional, Set, Tuple
+import config
+from config import KEY_FIELD_PERSONALE, KEY_FIELD_STRUTTURE, PARENT_FIELD
 from models.personale import PersonaleRecord
-from models.strutture import StrutturaRecord, detect_cycles
+from models.strutture import StrutturaRecord
 from pydantic import ValidationError
+from services.hierarchy_integrity import HierarchyIntegrity, HierarchyReport
+from services.perf_trace import timed
+from services.validation_index import ValidationIndex, get_validation_index, index_key
+from services.validation_rules import (
+    PERSONALE_RULES,
+    STRUTTURE_RULES,
+    normalized_text,
+    passing_mask,
+)
 
 
 class ValidationResult:
@@ -51,13 +69,293 @@ class ValidationResult:
         )
 
 
+def _fallback_rows(df: pd.DataFrame, mask: np.ndarray) -> Iterator[Tuple[int, object, Dict]]:
+    """Righe da validare con Pydantic: (posizione, indice, dict riga con NaN -> None)."""
+    positions = np.flatnonzero(mask)
+    if positions.size == 0:
+        return
+    subset = df.iloc[positions]
+    # Converti NaN in None per compatibilità Pydantic
+    subset = subset.where(pd.notna(subset), None)
+    for pos, (idx, row) in zip(positions, subset.iterrows()):
+        yield pos, idx, row.to_dict()
+
+
+def _personale_first_pass(df: pd.DataFrame, result: ValidationResult) -> None:
+    """Validazione per riga Personale: regole per colonna, Pydantic sulle righe scartate."""
+    passing = passing_mask(df, PERSONALE_RULES)
+    result.valid_count += int(passing.sum())
+    _personale_fallback(df, ~passing, result)
+
+
+def _personale_fallback(df: pd.DataFrame, mask: np.ndarray, result: ValidationResult) -> None:
+    """Validazione PersonaleRecord delle righe in mask (messaggi dettagliati)."""
+    for _, idx, row_dict in _fallback_rows(df, mask):
+        try:
+            # Validazione Pydantic
+            record = PersonaleRecord(**row_dict)
+            
+            # Validazione business logic
+            business_errors = record.get_validation_errors()
+            if business_errors:
+                for err in business_errors:
+                    result.add_warning(
+                        idx, 
+                        'business_logic', 
+                        err,
+                        record.tx_cod_fiscale
+                    )
+            
+            # Verifica completezza
+            if not record.is_complete():
+                result.add_warning(
+                    idx,
+                    'completeness',
+                    'Record incompleto: mancano campi obbligatori',
+                    record.tx_cod_fiscale
+                )
+            
+            result.valid_count += 1
+            
+        except ValidationError as e:
+            # Errori Pydantic
+            for error in e.errors():
+                field = error['loc'][0] if error['loc'] else 'unknown'
+                message = error['msg']
+                identifier = row_dict.get('TxCodFiscale', f"row_{idx}")
+                
+                result.add_error(idx, field, message, identifier)
+        
+        except Exception as e:
+            result.add_error(idx, 'general', str(e), f"row_{idx}")
+
+
+def _strutture_first_pass(
+    df: pd.DataFrame,
+    result: ValidationResult
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Validazione per riga Strutture: regole per colonna, Pydantic sulle righe scartate.
+
+    Returns:
+        (valid, codici, padri) allineati per posizione, con i valori come
+        li normalizza il modello
+    """
+    passing, valid, codici, padri = _strutture_rule_pass(df)
+    result.valid_count += int(passing.sum())
+    _strutture_fallback(df, ~passing, result, valid, codici, padri)
+    return valid, codici, padri
+
+
+def _strutture_rule_pass(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Regole per colonna Strutture.
+
+    Returns:
+        (passing, valid, codici, padri): codici/padri valorizzati per le
+        righe che superano le regole; valid è una copia di passing
+    """
+    n = len(df)
+    passing = passing_mask(df, STRUTTURE_RULES)
+
+    valid = passing.copy()
+    codici = np.full(n, None, dtype=object)
+    padri = np.full(n, None, dtype=object)
+    if passing.any():
+        codici[passing] = normalized_text(df['Codice'][passing]).to_numpy()
+        if PARENT_FIELD in df.columns:
+            padri[passing] = normalized_text(df[PARENT_FIELD][passing]).to_numpy()
+    return passing, valid, codici, padri
+
+
+def _strutture_fallback(
+    df: pd.DataFrame,
+    mask: np.ndarray,
+    result: ValidationResult,
+    valid: np.ndarray,
+    codici: np.ndarray,
+    padri: np.ndarray
+) -> None:
+    """Validazione StrutturaRecord delle righe in mask; aggiorna valid/codici/padri."""
+    for pos, idx, row_dict in _fallback_rows(df, mask):
+        try:
+            # Validazione Pydantic
+            record = StrutturaRecord(**row_dict)
+            codici[pos] = record.codice
+            padri[pos] = record.unita_operativa_padre
+            valid[pos] = True
+            
+            # Verifica completezza
+            if not record.is_complete():
+                result.add_warning(
+                    idx,
+                    'completeness',
+                    'Record incompleto: mancano campi obbligatori',
+                    record.codice
+                )
+            
+            result.valid_count += 1
+            
+        except ValidationError as e:
+            # Errori Pydantic
+            for error in e.errors():
+                field = error['loc'][0] if error['loc'] else 'unknown'
+                message = error['msg']
+                identifier = row_dict.get('Codice', f"row_{idx}")
+                
+                result.add_error(idx, field, message, identifier)
+        
+        except Exception as e:
+            result.add_error(idx, 'general', str(e), f"row_{idx}")
+
+
+def _strutture_cross_checks(
+    df: pd.DataFrame,
+    result: ValidationResult,
+    valid: np.ndarray,
+    codici: np.ndarray,
+    padri: np.ndarray
+) -> None:
+    """Controlli tra record Strutture: padre esistente, auto-referenza, cicli."""
+    # Codice -> padre dei record validi (a parità di codice vince l'ultimo)
+    strutture_padre: Dict[str, str] = {}
+    for codice, padre in zip(codici[valid], padri[valid]):
+        strutture_padre[codice] = padre
+
+    # Seconda passata: validazione business logic (padre esistente, auto-referenza)
+    if strutture_padre and 'Codice' in df.columns:
+        raw_codici = df['Codice']
+        matched = np.flatnonzero(raw_codici.isin(list(strutture_padre)).to_numpy())
+        row_codici = raw_codici.iloc[matched]
+        row_padri = row_codici.map(strutture_padre)
+
+        has_padre = row_padri.notna().to_numpy()
+        missing_padre = has_padre & ~row_padri.isin(list(strutture_padre)).to_numpy()
+        self_parent = has_padre & (row_padri.to_numpy() == row_codici.to_numpy())
+
+        for i in np.flatnonzero(missing_padre | self_parent):
+            idx = df.index[matched[i]]
+            codice = row_codici.iat[i]
+            if missing_padre[i]:
+                result.add_error(
+                    idx,
+                    'business_logic',
+                    f"Padre '{row_padri.iat[i]}' non esiste nelle strutture",
+                    codice
+                )
+            if self_parent[i]:
+                result.add_error(
+                    idx,
+                    'business_logic',
+                    "Una struttura non può essere padre di se stessa",
+                    codice
+                )
+    
+    # Rilevamento cicli
+    integrity = HierarchyIntegrity.from_records(
+        list(strutture_padre.keys()), list(strutture_padre.values())
+    )
+    for err in integrity.report.cycle_messages():
+        result.add_error(-1, 'hierarchy', err, 'cycle_detection')
+
+
+def _validate_chunk(record_type: str, chunk: pd.DataFrame) -> Tuple:
+    """
+    Validazione Pydantic di un blocco di righe (eseguita in un processo separato).
+
+    Returns:
+        (result, valid, codici, padri); gli array sono None per il Personale
+    """
+    result = ValidationResult()
+    mask = np.ones(len(chunk), dtype=bool)
+    if record_type == 'strutture':
+        valid = np.zeros(len(chunk), dtype=bool)
+        codici = np.full(len(chunk), None, dtype=object)
+        padri = np.full(len(chunk), None, dtype=object)
+        _strutture_fallback(chunk, mask, result, valid, codici, padri)
+        return result, valid, codici, padri
+    _personale_fallback(chunk, mask, result)
+    return result, None, None, None
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Pool di processi condiviso (l'avvio dei worker si paga una volta)."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn: il processo Streamlit ha thread attivi, fork non è sicuro
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            atexit.register(_process_pool.shutdown, wait=False, cancel_futures=True)
+        return _process_pool
+
+
+def _reset_process_pool() -> None:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _index_columns(record_type: str, df: pd.DataFrame) -> List[str]:
+    """Colonne da cui dipendono le voci dell'indice (chiave; per le strutture anche padre e regole)."""
+    if record_type == 'strutture':
+        columns = [KEY_FIELD_STRUTTURE, PARENT_FIELD] + [rule.column for rule in STRUTTURE_RULES]
+    else:
+        columns = [KEY_FIELD_PERSONALE]
+    return [c for c in dict.fromkeys(columns) if c in df.columns]
+
+
+def _rebuild_index(index: ValidationIndex, df: pd.DataFrame) -> None:
+    """Ricostruisce l'indice di validazione su df (una passata completa)."""
+    key_field = KEY_FIELD_STRUTTURE if index.record_type == 'strutture' else KEY_FIELD_PERSONALE
+    raw_keys = df[key_field].tolist() if key_field in df.columns else [None] * len(df)
+
+    index.clear()
+    if index.record_type == 'strutture':
+        valid, codici, padri = _strutture_first_pass(df, ValidationResult())
+        index.set_rows(list(df.index), raw_keys, codici.tolist(), padri.tolist(), valid.tolist())
+    else:
+        index.set_rows(list(df.index), raw_keys)
+    index.bind(df, _index_columns(index.record_type, df))
+
+
+def _cycle_through(index: ValidationIndex, codice: str, df: pd.DataFrame) -> Optional[List[str]]:
+    """Ciclo che passa per codice (risalendo i padri), None se assente."""
+    path = [codice]
+    seen = {codice}
+    current = index.padre_of(codice, df)
+    while index.is_code(current):
+        if current == codice:
+            return path
+        if current in seen:
+            # Ciclo sopra codice: non passa per codice
+            return None
+        seen.add(current)
+        path.append(current)
+        current = index.padre_of(current, df)
+    return None
+
+
 class DataValidator:
     """Validatore per dati TNS Personale e Strutture"""
     
     @staticmethod
+    @timed('validation', rows=None)
     def validate_personale(df: pd.DataFrame) -> ValidationResult:
         """
         Valida DataFrame TNS Personale.
+
+        Le regole (obbligatori, formato CF, tipi) sono valutate per colonna;
+        solo le righe che non le superano sono validate con PersonaleRecord
+        per ottenere i messaggi dettagliati.
         
         Args:
             df: DataFrame da validare
@@ -66,57 +364,18 @@ class DataValidator:
             ValidationResult con dettagli validazione
         """
         result = ValidationResult()
-        
-        # Converti NaN in None per compatibilità Pydantic
-        df_clean = df.where(pd.notna(df), None)
-        
-        for idx, row in df_clean.iterrows():
-            row_dict = row.to_dict()
-            
-            try:
-                # Validazione Pydantic
-                record = PersonaleRecord(**row_dict)
-                
-                # Validazione business logic
-                business_errors = record.get_validation_errors()
-                if business_errors:
-                    for err in business_errors:
-                        result.add_warning(
-                            idx, 
-                            'business_logic', 
-                            err,
-                            record.tx_cod_fiscale
-                        )
-                
-                # Verifica completezza
-                if not record.is_complete():
-                    result.add_warning(
-                        idx,
-                        'completeness',
-                        'Record incompleto: mancano campi obbligatori',
-                        record.tx_cod_fiscale
-                    )
-                
-                result.valid_count += 1
-                
-            except ValidationError as e:
-                # Errori Pydantic
-                for error in e.errors():
-                    field = error['loc'][0] if error['loc'] else 'unknown'
-                    message = error['msg']
-                    identifier = row_dict.get('TxCodFiscale', f"row_{idx}")
-                    
-                    result.add_error(idx, field, message, identifier)
-            
-            except Exception as e:
-                result.add_error(idx, 'general', str(e), f"row_{idx}")
-        
+        _personale_first_pass(df, result)
         return result
     
     @staticmethod
+    @timed('validation', rows=None)
     def validate_strutture(df: pd.DataFrame) -> ValidationResult:
         """
         Valida DataFrame TNS Strutture.
+
+        Regole per colonna + fallback Pydantic come validate_personale;
+        padre esistente, auto-referenza e cicli sono verificati sull'intero
+        insieme dei codici validi.
         
         Args:
             df: DataFrame da validare
@@ -125,71 +384,238 @@ class DataValidator:
             ValidationResult con dettagli validazione
         """
         result = ValidationResult()
-        
-        # Converti NaN in None
-        df_clean = df.where(pd.notna(df), None)
-        
-        # Prima passata: validazione Pydantic e costruzione dict
-        strutture_dict = {}
-        
-        for idx, row in df_clean.iterrows():
-            row_dict = row.to_dict()
-            
-            try:
-                # Validazione Pydantic
-                record = StrutturaRecord(**row_dict)
-                strutture_dict[record.codice] = record
-                
-                # Verifica completezza
-                if not record.is_complete():
-                    result.add_warning(
-                        idx,
-                        'completeness',
-                        'Record incompleto: mancano campi obbligatori',
-                        record.codice
-                    )
-                
-                result.valid_count += 1
-                
-            except ValidationError as e:
-                # Errori Pydantic
-                for error in e.errors():
-                    field = error['loc'][0] if error['loc'] else 'unknown'
-                    message = error['msg']
-                    identifier = row_dict.get('Codice', f"row_{idx}")
-                    
-                    result.add_error(idx, field, message, identifier)
-            
-            except Exception as e:
-                result.add_error(idx, 'general', str(e), f"row_{idx}")
-        
-        # Seconda passata: validazione business logic (padre esistente, cicli)
-        all_codici = set(strutture_dict.keys())
-        
-        for idx, row in df_clean.iterrows():
-            codice = row.get('Codice')
-            if codice in strutture_dict:
-                record = strutture_dict[codice]
-                
-                # Validazione business logic
-                business_errors = record.get_validation_errors(all_codici)
-                if business_errors:
-                    for err in business_errors:
-                        result.add_error(
-                            idx,
-                            'business_logic',
-                            err,
-                            record.codice
-                        )
-        
-        # Rilevamento cicli
-        cycle_errors = detect_cycles(strutture_dict)
-        if cycle_errors:
-            for err in cycle_errors:
-                result.add_error(-1, 'hierarchy', err, 'cycle_detection')
+        valid, codici, padri = _strutture_first_pass(df, result)
+
+        _strutture_cross_checks(df, result, valid, codici, padri)
         
         return result
     
+    @staticmethod
+    @timed('validation', rows=None)
+    def validate_parallel(
+        df: pd.DataFrame,
+        record_type: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        chunk_rows: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> ValidationResult:
+        """
+        Validazione a blocchi su più processi, per import di grandi dimensioni.
+
+        Le regole per colonna girano nel processo principale; le righe che
+        non le superano (la parte costosa: un modello Pydantic per riga) sono
+        divise in blocchi validati in un ProcessPoolExecutor e i risultati
+        sono uniti nell'ordine originale. I controlli tra record (padre
+        esistente, cicli) girano una sola volta alla fine. L'esito è
+        identico a validate_personale / validate_strutture.
+
+        Sotto config.VALIDATION_PARALLEL_MIN_ROWS righe totali, senza righe
+        da rivalidare, con una sola CPU o se i processi non sono disponibili
+        la validazione è seriale.
+
+        Args:
+            df: DataFrame da validare
+            record_type: 'personale' o 'strutture'
+            progress_callback: Chiamata con (righe_validate, righe_totali)
+            chunk_rows: Righe per blocco (default config.VALIDATION_CHUNK_ROWS)
+            max_workers: Processi (default config.VALIDATION_MAX_WORKERS)
+
+        Returns:
+            ValidationResult con dettagli validazione
+        """
+        chunk_rows = chunk_rows or config.VALIDATION_CHUNK_ROWS
+        strutture = record_type == 'strutture'
+        total = len(df)
+        result = ValidationResult()
+
+        if strutture:
+            passing, valid, codici, padri = _strutture_rule_pass(df)
+        else:
+            passing = passing_mask(df, PERSONALE_RULES)
+        result.valid_count += int(passing.sum())
+        positions = np.flatnonzero(~passing)
+
+        if progress_callback:
+            progress_callback(total - len(positions), total)
+
+        workers = min(max_workers or config.VALIDATION_MAX_WORKERS, os.cpu_count() or 1)
+        chunk_results = None
+        if workers > 1 and total >= config.VALIDATION_PARALLEL_MIN_ROWS and len(positions):
+            chunks = [positions[i:i + chunk_rows] for i in range(0, len(positions), chunk_rows)]
+            chunk_results = [None] * len(chunks)
+            done = total - len(positions)
+            try:
+                pool = _get_process_pool(workers)
+                futures = {
+                    pool.submit(_validate_chunk, record_type, df.iloc[chunk]): i
+                    for i, chunk in enumerate(chunks)
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    chunk_results[i] = future.result()
+                    done += len(chunks[i])
+                    if progress_callback:
+                        progress_callback(done, total)
+            except (OSError, BrokenProcessPool) as e:
+                print(f"⚠️ Validazione parallela non disponibile ({e}), uso validazione seriale")
+                _reset_process_pool()
+                chunk_results = None
+
+        if chunk_results is None:
+            # Seriale: poche righe da rivalidare o pool non disponibile
+            if strutture:
+                _strutture_fallback(df, ~passing, result, valid, codici, padri)
+            else:
+                _personale_fallback(df, ~passing, result)
+        else:
+            # Unione nell'ordine dei blocchi (= ordine delle righe)
+            for chunk, (chunk_result, chunk_valid, chunk_codici, chunk_padri) in zip(chunks, chunk_results):
+                result.errors.extend(chunk_result.errors)
+                result.warnings.extend(chunk_result.warnings)
+                result.valid_count += chunk_result.valid_count
+                result.invalid_count += chunk_result.invalid_count
+                if strutture:
+                    valid[chunk] = chunk_valid
+                    codici[chunk] = chunk_codici
+                    padri[chunk] = chunk_padri
+
+        if progress_callback:
+            progress_callback(total, total)
+
+        if strutture:
+            _strutture_cross_checks(df, result, valid, codici, padri)
+        return result
+
+    @staticmethod
+    def validate_changes(
+        df: pd.DataFrame,
+        record_type: str,
+        changed_rows: Iterable[Hashable] = (),
+        touched_keys: Iterable = (),
+        baseline: Optional[pd.DataFrame] = None
+    ) -> ValidationResult:
+        """
+        Validazione incrementale: solo righe modificate e record dipendenti.
+
+        Le righe modificate passano le stesse regole di validate_personale /
+        validate_strutture. Per le strutture si ricontrollano anche le righe
+        con lo stesso codice (vince l'ultimo record), i figli dei codici
+        toccati (padre esistente) e i cicli che passano per quei codici.
+        Gli indici chiave/padre (services.validation_index) sono mantenuti
+        tra una chiamata e l'altra: il costo è proporzionale alla modifica.
+        Le righe cambiate dall'ultima validazione senza essere dichiarate
+        (scritture in place, frame di un'altra sessione) sono rilevate per
+        hash di contenuto e trattate come modificate.
+
+        Args:
+            df: DataFrame dopo la modifica
+            record_type: 'personale' o 'strutture'
+            changed_rows: Etichette delle righe modificate, aggiunte o rimosse
+            touched_keys: Chiavi coinvolte non ricavabili dalle righe
+                (es. record eliminati dopo un reset dell'indice)
+            baseline: Frame descritto dall'indice prima della modifica
+                (default: df, per modifiche in place)
+
+        Returns:
+            ValidationResult limitato alle righe coinvolte
+        """
+        if not df.index.is_unique:
+            # Etichette ambigue: nessun indice possibile, validazione completa
+            if record_type == 'strutture':
+                return DataValidator.validate_strutture(df)
+            return DataValidator.validate_personale(df)
+
+        strutture = record_type == 'strutture'
+        key_field = KEY_FIELD_STRUTTURE if strutture else KEY_FIELD_PERSONALE
+        labels = list(dict.fromkeys(changed_rows))
+        index = get_validation_index(record_type)
+        reference = baseline if baseline is not None else df
+        drift = index.changed_rows(reference, _index_columns(record_type, reference))
+        if drift is None:
+            _rebuild_index(index, reference)
+        else:
+            labels = list(dict.fromkeys(labels + drift))
+
+        removed = [label for label in labels if label not in df.index]
+
+        # Chiavi e codici prima della modifica
+        touched: Set = {index_key(key) for key in touched_keys}
+        for label in labels:
+            touched.add(index.raw_key(label))
+            record = index.record(label)
+            if record is not None:
+                touched.add(record[0])
+        touched.discard(None)
+
+        index.drop_rows(removed)
+
+        # Righe da rivalidare: modificate + righe con chiavi coinvolte
+        check_rows: Set[Hashable] = {label for label in labels if label not in removed}
+        for key in touched:
+            check_rows |= index.rows_with_key(key)
+        positions = np.sort(df.index.get_indexer(list(check_rows))) if check_rows else np.array([], dtype=int)
+        subset = df.iloc[positions]
+        raw_keys = subset[key_field].tolist() if key_field in subset.columns else [None] * len(subset)
+
+        result = ValidationResult()
+        if not strutture:
+            _personale_first_pass(subset, result)
+            index.set_rows(list(subset.index), raw_keys)
+            index.bind(df, _index_columns(record_type, df))
+            return result
+
+        valid, codici, padri = _strutture_first_pass(subset, result)
+        index.set_rows(list(subset.index), raw_keys, codici.tolist(), padri.tolist(), valid.tolist())
+        index.bind(df, _index_columns(record_type, df))
+        touched.update(codice for codice in codici[valid])
+
+        # Dipendenti: righe con codice toccato e figli dei codici toccati
+        dependents = set(subset.index)
+        for codice in touched:
+            dependents |= index.rows_with_key(codice)
+            for child in index.child_rows(codice):
+                # Il controllo usa il padre del record vincente del codice
+                dependents |= index.rows_with_key(index.record(child)[0])
+
+        # Seconda passata sui soli dipendenti (padre esistente, auto-referenza)
+        for label in sorted(dependents, key=df.index.get_loc):
+            codice = index.raw_key(label)
+            if not index.is_code(codice):
+                continue
+            padre = index.padre_of(codice, df)
+            if not padre:
+                continue
+            if not index.is_code(padre):
+                result.add_error(
+                    label,
+                    'business_logic',
+                    f"Padre '{padre}' non esiste nelle strutture",
+                    codice
+                )
+            if padre == codice:
+                result.add_error(
+                    label,
+                    'business_logic',
+                    "Una struttura non può essere padre di se stessa",
+                    codice
+                )
+
+        # Cicli che passano per i codici toccati (ognuno una volta)
+        cycles: Dict[frozenset, List[str]] = {}
+        for codice in touched:
+            if not index.is_code(codice):
+                continue
+            cycle = _cycle_through(index, codice, df)
+            if cycle and frozenset(cycle) not in cycles:
+                # Stessa rotazione del controllo completo: prima il codice apparso prima
+                first = min(range(len(cycle)), key=lambda i: index.first_position(cycle[i], df))
+                cycles[frozenset(cycle)] = cycle[first:] + cycle[:first]
+        ordered = sorted(cycles.values(), key=lambda c: index.first_position(c[0], df))
+        for err in HierarchyReport(cycles=ordered).cycle_messages():
+            result.add_error(-1, 'hierarchy', err, 'cycle_detection')
+
+        return result
+
     @staticmethod
     def find_orphan_structures(
         strutture_df: pd.DataFrame,
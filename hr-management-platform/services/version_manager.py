@@ -8,7 +8,9 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import pandas as pd
+import config
 from services.database import DatabaseHandler
+from services.perf_trace import timed
 
 
 class VersionManager:
@@ -34,6 +36,7 @@ class VersionManager:
         self.snapshots_dir = Path(snapshots_dir)
         self.snapshots_dir.mkdir(parents=True, exist_ok=True)
 
+    @timed('snapshot', rows=None)
     def create_snapshot(self, import_version_id: int,
                        source_filename: str, user_note: Optional[str] = None,
                        certified: bool = False, description: Optional[str] = None) -> str:
@@ -79,6 +82,30 @@ class VersionManager:
         print(f"✅ Snapshot creato: {snapshot_path}")
         return str(snapshot_path)
 
+    def create_manual_snapshot(self, note: Optional[str] = None,
+                               source_filename: str = "MANUAL_SNAPSHOT") -> str:
+        """
+        Snapshot dello stato attuale legato a una nuova import_version.
+
+        Args:
+            note: Nota utente
+            source_filename: Etichetta origine (es. MANUAL_SNAPSHOT, PRE_MERGE)
+
+        Returns:
+            Path al file snapshot creato
+        """
+        personale_df, strutture_df = self.db.export_to_dataframe()
+        version_id = self.db.begin_import_version(source_filename=source_filename, user_note=note)
+        self.db.complete_import_version(
+            version_id, len(personale_df), len(strutture_df),
+            json.dumps({'type': source_filename.lower()})
+        )
+        return self.create_snapshot(
+            import_version_id=version_id,
+            source_filename=source_filename,
+            user_note=note
+        )
+
     def list_snapshots(self) -> List[Dict]:
         """
         Lista tutti gli snapshot disponibili.
@@ -112,6 +139,33 @@ class VersionManager:
         snapshots.sort(key=lambda x: x['timestamp'], reverse=True)
         return snapshots
 
+    def export_snapshot(self, snapshot_file_path: str, output_path: Path,
+                        export_format: str = 'parquet') -> Path:
+        """
+        Esporta uno snapshot per job esterni (payroll, BI).
+
+        Args:
+            snapshot_file_path: Path al file snapshot JSON
+            output_path: Path di output (l'estensione è adeguata al formato)
+            export_format: 'xlsx' (due fogli), 'csv' o 'parquet' (.zip con un file per tabella)
+
+        Returns:
+            Path del file esportato
+        """
+        from services.tabular_io import export_sheets
+
+        with open(snapshot_file_path, 'r', encoding='utf-8') as f:
+            snapshot_data = json.load(f)
+
+        sheets = [
+            (config.SHEET_PERSONALE, pd.DataFrame(snapshot_data.get('personale', []))),
+            (config.SHEET_STRUTTURE, pd.DataFrame(snapshot_data.get('strutture', []))),
+        ]
+        path = export_sheets(sheets, output_path, export_format)
+        print(f"✅ Snapshot esportato: {path}")
+        return path
+
+    @timed('snapshot', rows=None)
     def restore_snapshot(self, snapshot_file_path: str,
                         create_backup: bool = True) -> Tuple[bool, str]:
         """
@@ -365,6 +419,7 @@ class VersionManager:
         except Exception as e:
             return False, f"❌ Errore creazione milestone: {str(e)}", None
 
+    @timed('diff')
     def compare_versions(self, version_a_id: int, version_b_id: int) -> pd.DataFrame:
         """
         Genera diff tra 2 versioni (snapshot).
@@ -0,0 +1,35 @@
+"""
+Fixture comuni: path dell'app su sys.path e dati su directory temporanee.
+
+Ogni test lavora su DB, snapshot e cache in tmp_path: i file in data/ non
+vengono mai toccati.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import config  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_data(tmp_path, monkeypatch):
+    """Redirige database, snapshot e cache su tmp_path."""
+    monkeypatch.setattr(config, 'DB_PATH', tmp_path / 'db' / 'app.db')
+    monkeypatch.setattr(config, 'SNAPSHOTS_DIR', tmp_path / 'snapshots')
+    monkeypatch.setattr(config, 'EXCEL_CACHE_DIR', tmp_path / 'cache' / 'excel')
+    monkeypatch.setattr(config, 'DATA_QUALITY_CACHE_PATH', tmp_path / 'cache' / 'data_quality.db')
+    return tmp_path
+
+
+@pytest.fixture
+def db_handler(tmp_path):
+    """DatabaseHandler con schema legacy (personale/strutture/audit_log) inizializzato."""
+    from services.database import DatabaseHandler
+
+    handler = DatabaseHandler(tmp_path / 'db' / 'app.db')
+    handler.init_db()
+    return handler
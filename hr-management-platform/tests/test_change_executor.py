@@ -0,0 +1,95 @@
+"""Test ChangeExecutor: transazione/savepoint, tutto o niente e refresh del frame dal DB."""
+import pytest
+
+from models.bot_models import ChangeProposal, OperationType, RecordType
+from services.change_executor import ChangeExecutor
+
+
+def _change(change_id, operation, filter_criteria=None, after_values=None):
+    return ChangeProposal(
+        change_id=change_id,
+        operation=operation,
+        record_type=RecordType.STRUTTURE,
+        filter_criteria=filter_criteria or {},
+        after_values=after_values or {},
+        description=change_id,
+    )
+
+
+@pytest.fixture
+def strutture(db_handler):
+    conn = db_handler.get_connection()
+    conn.executemany(
+        "INSERT INTO strutture (Codice, DESCRIZIONE, LIVELLO, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+        [(code, f"desc {code}", '1', '2020-01-01 00:00:00', '2020-01-01 00:00:00') for code in ('A', 'B', 'C')]
+    )
+    conn.commit()
+    return db_handler
+
+
+def _descrizioni(db_handler):
+    rows = db_handler.get_connection().execute("SELECT Codice, DESCRIZIONE FROM strutture ORDER BY Codice")
+    return {row[0]: row[1] for row in rows}
+
+
+def test_failing_statement_rolls_back_the_whole_batch(strutture):
+    executor = ChangeExecutor(strutture)
+    changes = [
+        _change('u1', OperationType.UPDATE_RECORD, {'Codice': 'A'}, {'DESCRIZIONE': 'nuova'}),
+        # Chiave duplicata: l'INSERT fallisce
+        _change('a1', OperationType.ADD_RECORD, after_values={'Codice': 'B', 'DESCRIZIONE': 'doppia'}),
+    ]
+
+    result = executor.apply_changes(changes)
+
+    assert not result.success
+    assert [e['change_id'] for e in result.errors] == ['a1']
+    assert _descrizioni(strutture)['A'] == 'desc A'
+    assert not strutture.get_connection().in_transaction
+
+
+def test_open_transaction_is_left_to_its_owner(strutture):
+    conn = strutture.get_connection()
+    executor = ChangeExecutor(strutture)
+    conn.execute("UPDATE strutture SET DESCRIZIONE = 'esterna' WHERE Codice = 'C'")
+    assert conn.in_transaction
+
+    ok = executor.apply_changes([
+        _change('u1', OperationType.UPDATE_RECORD, {'Codice': 'A'}, {'DESCRIZIONE': 'nuova'})
+    ])
+    failed = executor.apply_changes([
+        _change('a1', OperationType.ADD_RECORD, after_values={'Codice': 'B'})
+    ])
+
+    assert ok.success and not failed.success
+    # Nessun commit: la transazione esterna è ancora aperta e il fallimento
+    # ha annullato solo il proprio savepoint
+    assert conn.in_transaction
+    assert _descrizioni(strutture) == {'A': 'nuova', 'B': 'desc B', 'C': 'esterna'}
+
+    conn.rollback()
+    assert _descrizioni(strutture) == {'A': 'desc A', 'B': 'desc B', 'C': 'desc C'}
+
+
+def test_refresh_frame_rereads_touched_rows(strutture):
+    _, df = strutture.export_to_dataframe()
+    executor = ChangeExecutor(strutture)
+
+    result = executor.apply_changes([
+        _change('u1', OperationType.UPDATE_RECORD, {'Codice': 'A'}, {'DESCRIZIONE': 'nuova'}),
+        _change('d1', OperationType.DELETE_RECORD, {'Codice': 'B'}),
+        _change('a1', OperationType.ADD_RECORD, after_values={'Codice': 'D', 'LIVELLO': 2}),
+    ])
+    assert result.success
+
+    refreshed = executor.refresh_frame(df, result).set_index('Codice')
+
+    assert list(refreshed.index) == ['A', 'C', 'D']
+    assert refreshed.loc['A', 'DESCRIZIONE'] == 'nuova'
+    # Timestamp riletti dal DB, righe non toccate invariate
+    assert refreshed.loc['A', 'updated_at'] != '2020-01-01 00:00:00'
+    assert refreshed.loc['C', 'updated_at'] == '2020-01-01 00:00:00'
+    assert refreshed.loc['D', 'created_at'] is not None
+    # Stessi tipi del frame caricato (LIVELLO resta testo)
+    assert refreshed.loc['D', 'LIVELLO'] == '2'
+    assert refreshed.reset_index()[df.columns].dtypes.equals(df.dtypes)
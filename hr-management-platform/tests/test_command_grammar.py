@@ -0,0 +1,73 @@
+"""Test CommandGrammar: comandi riconosciuti e fall-through al LLM."""
+import pandas as pd
+import pytest
+
+from models.bot_models import OperationType
+from services.batch_operations import BatchOperations
+from services.command_grammar import CommandGrammar
+from services.sync_checker import SyncChecker
+
+
+@pytest.fixture
+def frames():
+    personale = pd.DataFrame({
+        'TxCodFiscale': ['BNCLGU80A01H501X', 'RSSMRA80A01H501U', 'VRDLGU80A01H501U'],
+        'Titolare': ['Bianchi Luigi', 'Rossi Mario', 'Verdi Luigi'],
+        'Codice': ['1001', '1002', '1003'],
+        'Unità Organizzativa': ['Finanza', 'Finanza', 'Amministrazione'],
+        'Sede_TNS': ['Milano', 'Milano', 'Roma'],
+        'Approvatore': [None, None, None],
+        'Cassiere': [None, 'SÌ', None],
+        'Amministrazione': [None, None, None],
+    })
+    strutture = pd.DataFrame({
+        'Codice': ['UO1', 'UO2'],
+        'DESCRIZIONE': ['Finanza', 'Amministrazione'],
+        "UNITA' OPERATIVA PADRE ": [None, 'UO1'],
+    })
+    return personale, strutture
+
+
+def test_role_flag_uses_accented_value_and_passes_sync_checker(frames):
+    personale, strutture = frames
+    response = CommandGrammar().parse("rendi Bianchi Luigi approvatore", personale, strutture)
+    assert response.changes[0].after_values['Approvatore'] == 'SÌ'
+
+    updated, errors = BatchOperations.apply_changes(personale, response.changes, validate=False)
+    assert not errors
+
+    # Bianchi è responsabile nel file: SyncChecker lo deve vedere come approvatore
+    excel = pd.DataFrame({
+        'TxCodFiscale': ['RSSMRA80A01H501U'],
+        'Unità Organizzativa': ['Finanza'],
+        'Primo responsabile': ['1001'],
+    })
+    missing, not_approver = SyncChecker(db_handler=None)._check_responsabili_consistency(excel, updated)
+    assert len(missing) == 0
+    assert len(not_approver) == 0
+
+
+def test_role_flag_on_rows_already_flagged_keeps_single_spelling(frames):
+    personale, strutture = frames
+    response = CommandGrammar().parse("rendi cassieri i dipendenti di Milano", personale, strutture)
+    if response is None:
+        pytest.skip("forma batch non coperta dalla grammatica")
+    assert {c.after_values['Cassiere'] for c in response.changes} == {'SÌ'}
+
+
+@pytest.mark.parametrize('command', [
+    "sposta tutti i dipendenti di Milano a Roma tranne Rossi Mario",
+    "sposta tutti i dipendenti di Milano a Roma, poi rendi Verdi Luigi cassiere",
+    "sposta tutti i dipendenti di Milano in Finanza",
+    "mostra amministrazione",
+])
+def test_unparsed_qualifiers_fall_through(frames, command):
+    personale, strutture = frames
+    assert CommandGrammar().parse(command, personale, strutture) is None
+
+
+def test_move_to_new_sede(frames):
+    personale, strutture = frames
+    response = CommandGrammar().parse("sposta tutti i dipendenti di Milano a Torino", personale, strutture)
+    assert response.changes[0].operation == OperationType.BATCH_UPDATE
+    assert response.changes[0].after_values == {'Sede_TNS': 'Torino'}
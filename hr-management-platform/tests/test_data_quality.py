@@ -0,0 +1,129 @@
+"""Test DataQualityEngine: conteggi per versione dati e aggiornamento da audit_log."""
+import pandas as pd
+import pytest
+
+import config
+from services import data_quality
+from services.data_quality import DataQualityEngine, _QualityState, get_data_quality_engine
+
+P = config.PARENT_FIELD
+
+
+def _frames():
+    personale = pd.DataFrame({
+        'TxCodFiscale': ['CF1', 'CF2', 'CF2', 'CF4'],
+        'Titolare': ['a', 'b', 'c', 'd'],
+        'Codice': ['1', '2', '3', '4'],
+        'Unità Organizzativa': ['u', 'u', 'u', None],
+        P: ['S1', 'S2', 'S9', 'S1'],
+    })
+    strutture = pd.DataFrame({
+        'Codice': ['S1', 'S2', 'S3'],
+        'DESCRIZIONE': ['d1', 'd2', 'd3'],
+        P: [None, 'S1', 'S1'],
+    })
+    return personale, strutture
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Conta le ricostruzioni complete dello stato."""
+    calls = []
+
+    class CountingState(_QualityState):
+        def __init__(self, *args):
+            calls.append(1)
+            super().__init__(*args)
+
+    monkeypatch.setattr(data_quality, '_QualityState', CountingState)
+    return calls
+
+
+def _audit(db, table, key):
+    conn = db.get_connection()
+    conn.execute(
+        "INSERT INTO audit_log (table_name, operation, record_key) VALUES (?, 'UPDATE', ?)",
+        (table, key)
+    )
+    conn.commit()
+
+
+def test_counts_without_db():
+    personale, strutture = _frames()
+    counts = DataQualityEngine().get_counts(personale, strutture)
+    assert counts == {
+        'incomplete_personale': 1,
+        'incomplete_strutture': 0,
+        'duplicate_personale': 2,
+        'duplicate_strutture': 0,
+        'orphan_strutture': 1,
+        'missing_parent_personale': 1,
+        'missing_parent_strutture': 0,
+    }
+
+
+def test_rerun_with_same_version_does_not_touch_frames(db_handler, builds):
+    personale, strutture = _frames()
+    engine = DataQualityEngine(db_handler)
+    first = engine.get_counts(personale, strutture)
+    assert engine.get_counts(personale, strutture) == first
+    assert len(builds) == 1
+
+
+def test_audited_change_is_applied_incrementally(db_handler, builds):
+    personale, strutture = _frames()
+    engine = DataQualityEngine(db_handler)
+    engine.get_counts(personale, strutture)
+
+    personale.at[2, 'TxCodFiscale'] = 'CF3'
+    personale.at[2, P] = 'S3'
+    _audit(db_handler, 'employees', 'CF2')
+
+    counts = engine.get_counts(personale, strutture)
+    assert len(builds) == 1
+    assert counts == _QualityState(personale, strutture).counts()
+    assert counts['duplicate_personale'] == 0
+    assert counts['orphan_strutture'] == 0
+    assert counts['missing_parent_personale'] == 0
+
+
+def test_unaudited_write_rebuilds(db_handler, builds):
+    personale, strutture = _frames()
+    engine = DataQualityEngine(db_handler)
+    engine.get_counts(personale, strutture)
+
+    strutture.at[2, P] = 'S404'
+    conn = db_handler.get_connection()
+    conn.execute("INSERT INTO strutture (Codice, DESCRIZIONE) VALUES ('X', 'raw')")
+    conn.commit()
+
+    counts = engine.get_counts(personale, strutture)
+    assert len(builds) == 2
+    assert counts['missing_parent_strutture'] == 1
+
+
+def test_results_survive_a_new_engine(db_handler, builds):
+    personale, strutture = _frames()
+    first = DataQualityEngine(db_handler).get_counts(personale, strutture)
+
+    # Nuova sessione / riavvio: stessa versione dati, conteggi dalla cache
+    restarted = DataQualityEngine(db_handler)
+    assert restarted.get_counts(personale, strutture) == first
+    assert len(builds) == 1
+
+    # Le righe richiedono lo stato: costruito solo ora
+    rows = restarted.get_rows('duplicate_personale', personale, strutture)
+    assert rows['TxCodFiscale'].tolist() == ['CF2', 'CF2']
+    assert len(builds) == 2
+
+
+def test_engine_is_scoped_per_session_and_database(db_handler, tmp_path):
+    from services.database import DatabaseHandler
+
+    session_a, session_b = {}, {}
+    engine_a = get_data_quality_engine(db_handler, session_a)
+    assert get_data_quality_engine(db_handler, session_a) is engine_a
+    assert get_data_quality_engine(db_handler, session_b) is not engine_a
+
+    other = DatabaseHandler(tmp_path / 'other.db')
+    assert get_data_quality_engine(other, session_a) is not engine_a
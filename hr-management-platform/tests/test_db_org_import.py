@@ -0,0 +1,57 @@
+"""Test import DB_ORG a blocchi: lettura unica di validazione, società e strutture."""
+import pandas as pd
+
+from services.db_org_import_service import DBOrgImportService
+
+
+def _blocks():
+    first = pd.DataFrame({
+        'ID': ['U1', 'U2'],
+        'Unità Organizzativa': ['A', 'B'],
+        'Unità Organizzativa 2': [None, None],
+        'CdC': ['001', '002'],
+        'Società': ['S1', 'S1'],
+        'ReportsTo': [None, 'U1'],
+        'TxCodFiscale': ['CF1', 'CF2'],
+        'Titolare': ['Uno', 'Amministratore Delegato'],
+        'Qualifica': ['Impiegato', 'Dirigente'],
+    })
+    second = pd.DataFrame({
+        'ID': ['U2', 'U3'],
+        'Unità Organizzativa': ['B', 'C'],
+        'Unità Organizzativa 2': [None, None],
+        'CdC': ['002', '003'],
+        'Società': ['S1', 'S2'],
+        'ReportsTo': ['U1', 'U2'],
+        'TxCodFiscale': ['CF2', 'CF1'],
+        'Titolare': ['Due', 'Uno bis'],
+        'Qualifica': ['Dirigente', 'Impiegato'],
+    })
+    return [first, second]
+
+
+def test_scan_accumulates_across_blocks():
+    service = DBOrgImportService()
+
+    summary = service._scan_file(_blocks())
+
+    assert summary['rows'] == 4
+    assert summary['companies'] == ['S1', 'S2']
+    assert list(summary['org_units']['ID']) == ['U1', 'U2', 'U3']
+    assert summary['cf_counts'] == {'CF1': 2, 'CF2': 2}
+
+
+def test_duplicate_cf_split_over_blocks_is_reported():
+    service = DBOrgImportService()
+
+    errors = service._validate_structure(service._scan_file(_blocks()))
+
+    # CF2 è un AD (ammesso due volte), CF1 no
+    assert errors == ["Found 1 duplicate Codice Fiscale (excluding AD/CEO)"]
+
+
+def test_rows_are_numbered_across_blocks():
+    rows = list(DBOrgImportService._iter_rows(_blocks()))
+
+    assert [n for n, _ in rows] == [0, 1, 2, 3]
+    assert rows[3][1]['ID'] == 'U3'
@@ -0,0 +1,73 @@
+"""Test cache di parsing Excel: disco opzionale, chiave con colonne e motore di lettura."""
+import pandas as pd
+import pytest
+
+import config
+from services import excel_handler
+from services.excel_handler import ExcelParseCache
+
+pytest.importorskip('openpyxl')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / 'db_org.xlsx'
+    pd.DataFrame({
+        'ID': ['P1', 'P2'],
+        'TxCodFiscale': ['RSSMRA80A01H501Z', None],
+        'RAL': [30000, 40000],
+    }).to_excel(path, sheet_name='DB_ORG', index=False)
+    return path
+
+
+def _cache(disk: bool) -> ExcelParseCache:
+    return ExcelParseCache(config.EXCEL_CACHE_DIR, max_mb=16, memory_items=4, disk=disk)
+
+
+def _disk_files():
+    if not config.EXCEL_CACHE_DIR.exists():
+        return []
+    return sorted(config.EXCEL_CACHE_DIR.iterdir())
+
+
+def test_disk_cache_is_off_by_default(workbook):
+    assert config.EXCEL_CACHE_DISK is False
+    cache = _cache(disk=config.EXCEL_CACHE_DISK)
+
+    cache.read_sheet(workbook, 'DB_ORG')
+    cache.read_sheet(workbook, 'DB_ORG')
+
+    assert _disk_files() == []
+    assert cache.stats()['hits'] == 1
+    # Un'altra istanza (altro processo) non trova nulla su disco
+    other = _cache(disk=False)
+    other.read_sheet(workbook, 'DB_ORG')
+    assert other.stats()['misses'] == 1
+
+
+def test_opt_in_disk_cache_is_shared_and_cleared(workbook):
+    _cache(disk=True).read_sheet(workbook, 'DB_ORG')
+    assert len(_disk_files()) == 1
+
+    other = _cache(disk=True)
+    df = other.read_sheet(workbook, 'DB_ORG')
+    assert other.stats()['hits'] == 1
+    assert list(df['ID']) == ['P1', 'P2']
+
+    other.clear()
+    assert _disk_files() == []
+
+
+def test_usecols_and_engine_are_part_of_the_key(workbook, monkeypatch):
+    cache = _cache(disk=False)
+
+    subset = cache.read_sheet(workbook, 'DB_ORG', usecols=['ID', 'Missing'])
+    assert list(subset.columns) == ['ID']
+    full = cache.read_sheet(workbook, 'DB_ORG')
+    assert list(full.columns) == ['ID', 'TxCodFiscale', 'RAL']
+    assert cache.stats()['misses'] == 2
+
+    # Stesso file e colonne, altro motore: nuova lettura
+    monkeypatch.setattr(excel_handler, 'excel_engine', lambda: 'openpyxl')
+    cache.read_sheet(workbook, 'DB_ORG')
+    assert cache.stats()['misses'] == 3
@@ -0,0 +1,58 @@
+"""Test FileDiffer: confronto a blocchi equivalente al confronto tra DataFrame interi."""
+import pandas as pd
+
+from services.file_differ import FileDiffer
+from services.tabular_io import write_table
+
+
+def _summary(result):
+    return (
+        sorted(item['key'] for item in result.added_records),
+        sorted(item['key'] for item in result.deleted_records),
+        sorted((item['key'], c['field'], c['old_value'], c['new_value'])
+               for item in result.modified_records for c in item['changes']),
+        result.unchanged_count,
+    )
+
+
+OLD = pd.DataFrame({
+    'Codice': ['A', 'B', 'C', 'D', None],
+    'DESCRIZIONE': ['Alfa', 'Beta', None, 'Delta', 'Senza codice'],
+    'CdC': ['1', '2', '3', '', '5'],
+})
+NEW = pd.DataFrame({
+    'Codice': ['A', 'B', 'C', 'E', 'B'],
+    'DESCRIZIONE': ['Alfa', 'Beta 2', None, 'Eco', 'Beta duplicato'],
+    'CdC': ['1', '2', '3', '9', '2'],
+})
+
+
+def test_compare_dataframes_classifies_records():
+    result = FileDiffer.compare_dataframes(OLD, NEW, 'Codice', 'Strutture')
+
+    assert _summary(result) == (
+        ['E'], ['D'], [('B', 'DESCRIZIONE', 'Beta', 'Beta 2')], 2
+    )
+    # Valori mancanti uguali da entrambe le parti non sono modifiche
+    assert result.get_summary() == "Aggiunti: 1 | Eliminati: 1 | Modificati: 1 | Invariati: 2"
+
+
+def test_chunked_new_version_matches_whole_frame():
+    whole = FileDiffer.compare_dataframes(OLD, NEW, 'Codice', 'Strutture')
+    chunks = [NEW.iloc[start:start + 2] for start in range(0, len(NEW), 2)]
+
+    chunked = FileDiffer.compare_chunks(OLD, chunks, 'Codice', 'Strutture')
+
+    assert _summary(chunked) == _summary(whole)
+
+
+def test_compare_table_files_reads_new_file_in_blocks(tmp_path, monkeypatch):
+    import config
+
+    monkeypatch.setattr(config, 'CSV_CHUNK_ROWS', 2)
+    old_path = write_table(OLD, tmp_path / 'old.csv')
+    new_path = write_table(NEW, tmp_path / 'new.csv')
+
+    result = FileDiffer.compare_table_files(old_path, new_path, 'Codice', 'Strutture')
+
+    assert _summary(result) == _summary(FileDiffer.compare_dataframes(OLD, NEW, 'Codice', 'Strutture'))
@@ -0,0 +1,88 @@
+"""Test integrità gerarchia strutture: cicli, orfani, cambio padre e cache per versione."""
+import random
+
+import pandas as pd
+
+import config
+from models.strutture import StrutturaRecord, detect_cycles
+from services import hierarchy_integrity
+from services.hierarchy_integrity import (
+    HierarchyIntegrity, get_hierarchy_integrity, invalidate_hierarchy_integrity
+)
+
+P = config.PARENT_FIELD
+
+
+def _strutture(pairs):
+    return pd.DataFrame({
+        'Codice': [c for c, _ in pairs],
+        'DESCRIZIONE': [f"desc {c}" for c, _ in pairs],
+        P: [p for _, p in pairs],
+    })
+
+
+def test_report_finds_cycles_orphans_and_detached():
+    integrity = HierarchyIntegrity.from_records(
+        ['R', 'A', 'B', 'C', 'D', 'E', 'X'],
+        [None, 'R', 'C', 'B', 'C', 'MISSING', 'X'],
+    )
+    report = integrity.report
+
+    assert report.cycles == [['B', 'C'], ['X']]
+    assert report.cycle_messages() == ["Ciclo rilevato: B -> C -> B", "Ciclo rilevato: X -> X"]
+    assert report.orphans == ['E']
+    assert report.dangling_parents == ['MISSING']
+    assert report.detached == ['D']
+    assert report.has_issues
+
+
+def test_detect_cycles_matches_report_on_random_hierarchies():
+    rng = random.Random(7)
+    for _ in range(50):
+        codes = [f"S{i}" for i in range(30)]
+        parents = [rng.choice(codes + [None, 'NOPE']) for _ in codes]
+        records = {
+            c: StrutturaRecord(**{'Codice': c, 'DESCRIZIONE': c, "UNITA' OPERATIVA PADRE ": p})
+            for c, p in zip(codes, parents)
+        }
+        expected = HierarchyIntegrity.from_records(codes, parents).report.cycle_messages()
+        assert detect_cycles(records) == expected
+
+
+def test_would_create_cycle_walks_ancestors_of_new_parent():
+    integrity = HierarchyIntegrity.from_records(['R', 'A', 'B', 'C'], [None, 'R', 'A', 'B'])
+
+    assert integrity.would_create_cycle('A', 'C')
+    assert integrity.would_create_cycle('A', 'A')
+    assert not integrity.would_create_cycle('C', 'R')
+    assert not integrity.would_create_cycle('B', None)
+    assert integrity.parent_exists('R')
+    assert not integrity.parent_exists('ZZZ')
+
+
+def test_data_version_reuses_engine_without_fingerprinting(monkeypatch):
+    invalidate_hierarchy_integrity()
+    calls = []
+    original = hierarchy_integrity.get_tree_metrics
+
+    def counting(df):
+        calls.append(1)
+        return original(df)
+
+    monkeypatch.setattr(hierarchy_integrity, 'get_tree_metrics', counting)
+    df = _strutture([('R', None), ('A', 'R'), ('B', 'A')])
+
+    first = get_hierarchy_integrity(df, 'v1')
+    assert get_hierarchy_integrity(df, 'v1') is first
+    assert len(calls) == 1
+
+    # Nuova versione, frame invariato: stessa codifica, stesso motore
+    assert get_hierarchy_integrity(df, 'v2') is first
+    assert len(calls) == 2
+
+    # Modifica sul posto + invalidazione: il controllo vede il nuovo padre
+    df.loc[df['Codice'] == 'R', P] = 'B'
+    invalidate_hierarchy_integrity()
+    updated = get_hierarchy_integrity(df, 'v2')
+    assert updated is not first
+    assert updated.report.cycles == [['R', 'B', 'A']]
@@ -0,0 +1,110 @@
+"""Test JobRunner: esecuzione seriale, cancellazione, risultati e riavvio."""
+import threading
+
+import pytest
+
+from services.job_runner import (
+    CANCELLED, FAILED, INTERRUPTED, QUEUED, SUCCEEDED, JobQueueFull, JobRunner
+)
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = JobRunner(db_path=tmp_path / 'jobs.db', max_pending=3)
+    yield runner
+    runner._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _wait(runner, job_id):
+    runner._futures[job_id].result(timeout=10)
+    return runner.get_job(job_id)
+
+
+def test_jobs_run_one_at_a_time_in_order(runner):
+    release = threading.Event()
+    started = threading.Event()
+    order = []
+
+    def blocking(context, name):
+        order.append(name)
+        started.set()
+        release.wait(10)
+        return {'name': name}
+
+    first = runner.submit('merge', blocking, 'first')
+    second = runner.submit('snapshot', blocking, 'second')
+    assert started.wait(10)
+    assert runner.get_job(second).status == QUEUED
+    assert runner.get_job(second).message == 'In attesa di un altro job sul database'
+    assert order == ['first']
+
+    release.set()
+    assert _wait(runner, first).status == SUCCEEDED
+    assert _wait(runner, second).status == SUCCEEDED
+    assert order == ['first', 'second']
+    assert runner.get_result(second) == {'name': 'second'}
+
+
+def test_cancel_queued_and_running_jobs(runner):
+    started = threading.Event()
+    never = threading.Event()
+
+    def cooperative(context):
+        started.set()
+        for _ in range(1000):
+            context.report(message='lavoro')
+            never.wait(0.01)
+        return 'mai annullato'
+
+    running = runner.submit('merge', cooperative)
+    queued = runner.submit('merge', cooperative)
+    assert started.wait(10)
+
+    assert runner.cancel(queued) is True
+    assert runner.get_job(queued).status == CANCELLED
+
+    assert runner.cancel(running) is True
+    job = _wait(runner, running)
+    assert job.status == CANCELLED
+    assert job.cancel_requested
+    assert runner.cancel(running) is False
+
+
+def test_failure_is_recorded(runner):
+    def broken(context):
+        raise ValueError('boom')
+
+    job = _wait(runner, runner.submit('import_db_org', broken))
+    assert job.status == FAILED
+    assert 'boom' in job.message and 'ValueError' in job.error
+
+
+def test_queue_limit(runner):
+    release = threading.Event()
+    for _ in range(3):
+        runner.submit('merge', lambda context: release.wait(10))
+    with pytest.raises(JobQueueFull):
+        runner.submit('merge', lambda context: None)
+    release.set()
+
+
+def test_result_survives_restart_and_active_jobs_are_interrupted(tmp_path, runner):
+    done = runner.submit('snapshot', lambda context: {'snapshot_path': 'x.json'})
+    _wait(runner, done)
+    release = threading.Event()
+    started = threading.Event()
+
+    def hang(context):
+        started.set()
+        release.wait(10)
+
+    hanging = runner.submit('merge', hang)
+    assert started.wait(10)
+
+    restarted = JobRunner(db_path=tmp_path / 'jobs.db')
+    try:
+        assert restarted.get_result(done) == {'snapshot_path': 'x.json'}
+        assert restarted.get_job(hanging).status == INTERRUPTED
+    finally:
+        release.set()
+        restarted._executor.shutdown(wait=True)
@@ -0,0 +1,97 @@
+"""Test apply_merge a blocchi: checkpoint per blocco, ripresa dopo interruzione, pulizia."""
+import pandas as pd
+import pytest
+
+from models.merge_models import MergeStrategy
+from services import merge_engine
+from services.change_executor import ChangeExecutor
+from services.merge_engine import MergeEngine
+
+CFS = [f"RSSMRA80A01H50{i}Z" for i in range(5)]
+
+
+@pytest.fixture
+def engine(db_handler):
+    conn = db_handler.get_connection()
+    conn.executemany(
+        "INSERT INTO personale (TxCodFiscale, Titolare, Codice) VALUES (?, ?, ?)",
+        [(cf, f"Vecchio {i}", f"C{i}") for i, cf in enumerate(CFS)]
+    )
+    conn.commit()
+    return MergeEngine(db_handler)
+
+
+def _preview(engine):
+    target = pd.DataFrame([dict(row) for row in engine.db.get_connection().execute(
+        "SELECT TxCodFiscale, Titolare, Codice FROM personale ORDER BY TxCodFiscale"
+    )])
+    source = target.assign(Titolare=[f"Nuovo {i}" for i in range(len(target))])
+    match = engine.match_records(source, target, 'TxCodFiscale', 'personale')
+    return engine.preview_merge(match.matched_pairs, MergeStrategy.OVERWRITE)
+
+
+def _titolari(engine):
+    rows = engine.db.get_connection().execute("SELECT Titolare FROM personale ORDER BY TxCodFiscale")
+    return [row[0] for row in rows]
+
+
+def _checkpoints(engine):
+    return engine.db.get_connection().execute("SELECT COUNT(*) FROM merge_checkpoints").fetchone()[0]
+
+
+def test_interrupted_merge_resumes_from_first_missing_chunk(engine, monkeypatch):
+    preview = _preview(engine)
+    original = ChangeExecutor.apply_changes
+    calls = []
+
+    def crash_on_second_chunk(self, changes, **kwargs):
+        calls.append(len(changes))
+        if len(calls) == 2:
+            raise RuntimeError("processo interrotto")
+        return original(self, changes, **kwargs)
+
+    monkeypatch.setattr(merge_engine.ChangeExecutor, 'apply_changes', crash_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        engine.apply_merge(preview, validate=False, chunk_size=2)
+
+    # Primo blocco confermato con il suo checkpoint, il resto invariato
+    assert _titolari(engine) == ['Nuovo 0', 'Nuovo 1', 'Vecchio 2', 'Vecchio 3', 'Vecchio 4']
+    assert _checkpoints(engine) == 1
+
+    monkeypatch.setattr(merge_engine.ChangeExecutor, 'apply_changes', original)
+    progress = []
+    result = engine.apply_merge(
+        preview, validate=False, chunk_size=2, progress_callback=lambda done, total: progress.append(done)
+    )
+
+    assert result.success
+    assert (result.chunks_total, result.chunks_resumed, result.chunks_completed) == (3, 1, 3)
+    assert result.applied_count == 5
+    assert progress == [2, 4, 5]
+    assert _titolari(engine) == [f"Nuovo {i}" for i in range(5)]
+    # Merge concluso: checkpoint eliminati
+    assert _checkpoints(engine) == 0
+
+
+def test_merge_identity_depends_on_preview_and_chunking(engine):
+    preview = _preview(engine)
+    other_preview = _preview(engine)
+
+    first = engine.apply_merge(preview, validate=False, chunk_size=2)
+    again = engine.apply_merge(preview, validate=False, chunk_size=2)
+
+    # Stesso preview dopo un merge concluso: nessuna ripresa
+    assert again.merge_id == first.merge_id
+    assert again.chunks_resumed == 0
+    assert engine.apply_merge(other_preview, validate=False, chunk_size=2).merge_id != first.merge_id
+    assert engine.apply_merge(preview, validate=False, chunk_size=3).merge_id != first.merge_id
+
+
+def test_selected_records_only(engine):
+    preview = _preview(engine)
+
+    result = engine.apply_merge(preview, selected_record_ids=[CFS[1], CFS[3]], validate=False)
+
+    assert result.applied_count == 2
+    assert result.skipped_count == 3
+    assert _titolari(engine) == ['Vecchio 0', 'Nuovo 1', 'Vecchio 2', 'Nuovo 3', 'Vecchio 4']
@@ -0,0 +1,42 @@
+"""Test TreeIndex: aggregati per nodo dei payload orgchart."""
+from services.orgchart_data_service import TreeIndex
+
+
+def _org_nodes():
+    def struttura(code, parent):
+        return {'id': 's_' + code, 'parentId': parent and 's_' + parent, 'node_type': 'struttura'}
+
+    def person(cf, struttura_code):
+        return {'id': 'p_' + cf, 'parentId': 's_' + struttura_code, 'node_type': 'person'}
+
+    return [
+        struttura('A', None), struttura('B', 'A'), struttura('C', 'B'),
+        person('1', 'A'), person('2', 'B'), person('3', 'B'), person('4', 'C'),
+    ]
+
+
+def test_employee_count_is_direct_and_subtree_count_is_total():
+    index = TreeIndex(_org_nodes())
+
+    assert index.aggregates('s_A')['employee_count'] == 1
+    assert index.aggregates('s_A')['subtree_employee_count'] == 4
+    assert index.aggregates('s_B')['employee_count'] == 2
+    assert index.aggregates('s_B')['subtree_employee_count'] == 3
+    assert index.aggregates('p_4')['employee_count'] == 0
+    assert index.aggregates('s_A')['total_descendants'] == 6
+    assert index.aggregates('s_A')['direct_reports'] == 2
+
+
+def test_person_only_tree_counts_direct_reports():
+    nodes = [
+        {'id': 'M', 'parentId': None},
+        {'id': 'E1', 'parentId': 'M'},
+        {'id': 'E2', 'parentId': 'M'},
+        {'id': 'E3', 'parentId': 'E1'},
+    ]
+    index = TreeIndex(nodes)
+    index.annotate()
+
+    assert index.nodes['M']['employee_count'] == 2
+    assert index.nodes['M']['subtree_employee_count'] == 3
+    assert index.nodes['E1']['employee_count'] == 1
@@ -0,0 +1,86 @@
+"""Test query tracing: disattivo di default, esecuzioni e fetch registrati, analisi piano."""
+import sqlite3
+
+import pytest
+
+import config
+from services import query_trace
+from services.query_trace import QueryLog, TracedConnection, analyze_plan, connect, explain
+
+
+@pytest.fixture
+def query_log(monkeypatch):
+    log = QueryLog(max_slow=10, max_statements=10)
+    monkeypatch.setattr(query_trace, '_query_log', log)
+    monkeypatch.setattr(config, 'QUERY_TRACE_ENABLED', True)
+    return log
+
+
+@pytest.fixture
+def conn(tmp_path, query_log):
+    conn = connect(tmp_path / 'trace.db')
+    conn.execute("CREATE TABLE persone (cf TEXT PRIMARY KEY, nome TEXT, sede TEXT)")
+    conn.executemany(
+        "INSERT INTO persone VALUES (?, ?, ?)",
+        [(f"CF{i}", f"Nome {i}", 'Milano' if i % 2 else 'Roma') for i in range(10)]
+    )
+    conn.commit()
+    query_log.clear()
+    yield conn
+    conn.close()
+
+
+def _stats(log, sql):
+    return next(s for s in log.statement_stats() if s['sql'] == sql)
+
+
+def test_tracing_is_off_by_default(tmp_path):
+    assert config.QUERY_TRACE_ENABLED is False
+    conn = connect(tmp_path / 'plain.db')
+    try:
+        assert type(conn) is sqlite3.Connection
+    finally:
+        conn.close()
+
+
+def test_fetch_rows_and_fetchone_are_recorded(conn, query_log):
+    assert isinstance(conn, TracedConnection)
+
+    rows = conn.execute("SELECT * FROM persone WHERE sede = ?", ('Roma',)).fetchall()
+    # Cursore temporaneo mai esaurito: registrato quando viene rilasciato
+    assert conn.execute("SELECT nome FROM persone WHERE cf = ?", ('CF1',)).fetchone()[0] == 'Nome 1'
+    cursor = conn.cursor()
+    for _ in cursor.execute("SELECT cf FROM persone"):
+        pass
+
+    assert len(rows) == 5
+    assert _stats(query_log, "SELECT * FROM persone WHERE sede = ?")['rows'] == 5
+    assert _stats(query_log, "SELECT nome FROM persone WHERE cf = ?")['calls'] == 1
+    assert _stats(query_log, "SELECT cf FROM persone")['rows'] == 10
+
+
+def test_slow_log_keeps_parameter_types_not_values(conn, query_log, monkeypatch):
+    monkeypatch.setattr(config, 'SLOW_QUERY_MS', 0)
+
+    conn.execute("SELECT * FROM persone WHERE sede = ?", ('Roma',)).fetchall()
+
+    slow = query_log.slow_queries()
+    assert len(slow) == 1
+    assert slow[0].params_shape == '(str)'
+    assert 'Roma' not in repr(slow[0])
+    assert any(f['kind'] == 'full_scan' for f in slow[0].findings)
+
+
+def test_analyze_plan_suggests_index_and_flags_unsargable_filters(conn):
+    sql = "SELECT * FROM persone WHERE sede = ?"
+    findings = analyze_plan(conn, sql, explain(conn, sql, ('Roma',)))
+    assert findings[0]['kind'] == 'full_scan'
+    assert findings[0]['create_index'] == "CREATE INDEX idx_persone_sede ON persone(sede)"
+
+    sql = "SELECT * FROM persone WHERE LOWER(nome) LIKE '%rossi%'"
+    kinds = {f['kind'] for f in analyze_plan(conn, sql, explain(conn, sql))}
+    assert kinds == {'full_scan', 'function_on_column', 'like_wildcard'}
+
+    # Chiave primaria: nessun problema
+    sql = "SELECT * FROM persone WHERE cf = ?"
+    assert analyze_plan(conn, sql, explain(conn, sql, ('CF1',))) == []
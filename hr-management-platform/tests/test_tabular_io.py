@@ -0,0 +1,66 @@
+"""Test lettura tabelle: CSV/Parquet a blocchi senza concatenazione, testo conservato."""
+import pandas as pd
+import pytest
+
+from services import tabular_io
+from services.tabular_io import iter_table, read_table, write_table
+
+
+def _frame(rows: int = 5) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Codice': [f"{i:05d}" for i in range(rows)],
+        'Unità_Organizzativa': [f"UO {i}" for i in range(rows)],
+        'Extra': ['x'] * rows,
+    })
+
+
+@pytest.fixture
+def no_concat(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("pd.concat non atteso")
+
+    monkeypatch.setattr(tabular_io.pd, 'concat', fail)
+
+
+def test_csv_chunks_are_streamed(tmp_path, no_concat):
+    path = write_table(_frame(5), tmp_path / 'strutture.csv')
+
+    chunks = list(iter_table(path, chunk_rows=2))
+
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    # Nomi DB riportati ai nomi Excel, codici come testo
+    assert list(chunks[0].columns) == ['Codice', 'Unità Organizzativa', 'Extra']
+    assert list(chunks[2]['Codice']) == ['00004']
+
+
+def test_read_table_csv_is_a_single_read(tmp_path, no_concat):
+    path = write_table(_frame(5), tmp_path / 'strutture.csv')
+
+    df = read_table(path, usecols=['Codice', 'Missing'])
+
+    assert list(df.columns) == ['Codice']
+    assert list(df['Codice']) == [f"{i:05d}" for i in range(5)]
+
+
+def test_csv_separator_and_encoding_are_detected(tmp_path):
+    path = tmp_path / 'personale.csv'
+    path.write_bytes("Codice|Città\n007|Forlì\n".encode('cp1252'))
+
+    chunks = list(iter_table(path))
+
+    assert len(chunks) == 1
+    assert chunks[0].to_dict('records') == [{'Codice': '007', 'Città': 'Forlì'}]
+    assert read_table(path).equals(chunks[0])
+
+
+def test_parquet_batches_match_full_read(tmp_path, no_concat):
+    pytest.importorskip('pyarrow')
+    path = write_table(_frame(5), tmp_path / 'strutture.parquet')
+
+    chunks = list(iter_table(path, usecols=['Codice', 'Unità Organizzativa', 'Missing'], chunk_rows=2))
+    full = read_table(path, usecols=['Codice', 'Unità Organizzativa', 'Missing'])
+
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    # Le colonne si filtrano sui nomi del file, poi si normalizzano
+    assert list(full.columns) == ['Codice']
+    assert [v for c in chunks for v in c['Codice']] == list(full['Codice'])
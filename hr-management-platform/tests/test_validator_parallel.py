@@ -0,0 +1,65 @@
+"""Test validazione parallela: attivata dal numero totale di righe, esito identico al seriale."""
+import pandas as pd
+import pytest
+
+import config
+from services import validator
+from services.validator import DataValidator
+
+
+def _personale(rows: int, bad_every: int) -> pd.DataFrame:
+    data = {
+        'TxCodFiscale': [f"RSSMRA80A01H{i % 1000:03d}Z" for i in range(rows)],
+        'Titolare': [f"Persona {i}" for i in range(rows)],
+        'Codice': [str(i) for i in range(rows)],
+        'Unità Organizzativa': ['UO'] * rows,
+    }
+    df = pd.DataFrame(data)
+    df.loc[::bad_every, 'TxCodFiscale'] = 'NON-VALIDO'
+    df.loc[1::bad_every, 'Titolare'] = None
+    return df
+
+
+def _summary(result):
+    return (
+        result.valid_count, result.invalid_count,
+        [(e['row'], e['field'], e['message']) for e in result.errors],
+    )
+
+
+@pytest.fixture
+def pool_calls(monkeypatch):
+    calls = []
+    original = validator._get_process_pool
+    # Il numero di processi è limitato dalle CPU della macchina di test
+    monkeypatch.setattr(validator.os, 'cpu_count', lambda: 4)
+
+    def spy(max_workers):
+        calls.append(max_workers)
+        return original(max_workers)
+
+    monkeypatch.setattr(validator, '_get_process_pool', spy)
+    yield calls
+    validator._reset_process_pool()
+
+
+def test_parallel_path_gated_on_total_rows(monkeypatch, pool_calls):
+    # Poche righe da rivalidare su un import grande: il gate guarda il totale
+    monkeypatch.setattr(config, 'VALIDATION_PARALLEL_MIN_ROWS', 300)
+    df = _personale(400, bad_every=50)
+
+    parallel = DataValidator.validate_parallel(df, 'personale', chunk_rows=4, max_workers=2)
+
+    assert pool_calls == [2]
+    assert _summary(parallel) == _summary(DataValidator.validate_personale(df))
+    assert parallel.invalid_count == 16
+
+
+def test_small_imports_stay_serial(monkeypatch, pool_calls):
+    monkeypatch.setattr(config, 'VALIDATION_PARALLEL_MIN_ROWS', 1000)
+    df = _personale(400, bad_every=2)
+
+    result = DataValidator.validate_parallel(df, 'personale', max_workers=2)
+
+    assert pool_calls == []
+    assert _summary(result) == _summary(DataValidator.validate_personale(df))
@@ -8,7 +8,8 @@ import config
 from services.ollama_client import OllamaClient
 from services.command_parser import CommandParser
 from services.batch_operations import BatchOperations
-from models.bot_models import BotResponse, ChangeProposal
+from services.change_executor import ChangeExecutor
+from models.bot_models import BotResponse, ChangeProposal, OperationType
 
 def show_chatbot_view():
     """
@@ -208,6 +209,28 @@ Il bot sarà disponibile dopo aver completato questi step. Ricarica la pagina.
                     with col2:
                         st.json(change.after_values)
 
+        # Persistenza: diretta su database o solo in memoria (salvataggio successivo)
+        db_handler = st.session_state.get('database_handler')
+        selected_pending = [c for c in st.session_state.pending_changes if c.selected]
+        insert_blocked = False
+        if db_handler is not None and any(c.operation == OperationType.ADD_RECORD for c in selected_pending):
+            # Lo schema DB_ORG (employees/org_units) richiede campi che il frame
+            # TNS non ha: ChangeExecutor rifiuta gli inserimenti su quelle tabelle
+            spec = ChangeExecutor(db_handler).resolve_table(selected_pending[0].record_type)
+            insert_blocked = not spec.insertable
+        persist_to_db = st.checkbox(
+            "💾 Salva direttamente nel database",
+            value=db_handler is not None and not insert_blocked,
+            disabled=db_handler is None or insert_blocked,
+            help="Applica le modifiche al database in un'unica transazione con audit log"
+        )
+        if insert_blocked:
+            st.info(
+                f"ℹ️ I nuovi record non possono essere inseriti direttamente nella tabella "
+                f"{spec.table} (schema DB_ORG): le modifiche verranno applicate solo in memoria. "
+                f"Per aggiungere dipendenti usa l'import DB_ORG."
+            )
+
         # Bottoni azione
         col1, col2, col3 = st.columns([2, 1, 1])
 
@@ -236,23 +259,43 @@ Il bot sarà disponibile dopo aver completato questi step. Ricarica la pagina.
                     with st.spinner("⚙️ Applicazione modifiche..."):
                         # Determina target DataFrame
                         record_type = selected_changes[0].record_type.value
+                        df_key = 'personale_df' if record_type == "personale" else 'strutture_df'
+                        df_current = st.session_state[df_key]
+
+                        # Applicazione in memoria: anteprima e validazione
+                        df_result, errors = BatchOperations.apply_changes(
+                            df_current,
+                            selected_changes,
+                            validate=True
+                        )
+                        blocking = any(e['change_id'] == 'validation' for e in errors)
+
+                        # Modifiche fallite in memoria (chiave assente, campo errato, ...):
+                        # non vanno né in sessione né su database
+                        failed_ids = {
+                            e['change_id'] for e in errors
+                            if e['change_id'] not in ('validation', 'warning')
+                        }
+                        applied_changes = [
+                            c for c in selected_changes if c.change_id not in failed_ids
+                        ]
+                        if not applied_changes:
+                            blocking = True
+
+                        # Persistenza diretta: transazione unica + refresh incrementale
+                        persisted = False
+                        if persist_to_db and not blocking:
+                            executor = ChangeExecutor(st.session_state.database_handler)
+                            execution = executor.apply_changes(applied_changes, user_action='bot')
+                            if execution.success:
+                                df_result = executor.refresh_frame(df_current, execution)
+                                persisted = True
+                            else:
+                                errors.extend(execution.errors)
+                                blocking = True
 
-                        if record_type == "personale":
-                            df_result, errors = BatchOperations.apply_changes(
-                                st.session_state.personale_df,
-                                selected_changes,
-                                validate=True
-                            )
-                            if not errors:
-                                st.session_state.personale_df = df_result
-                        else:
-                            df_result, errors = BatchOperations.apply_changes(
-                                st.session_state.strutture_df,
-                                selected_changes,
-                                validate=True
-                            )
-                            if not errors:
-                                st.session_state.strutture_df = df_result
+                        if not blocking:
+                            st.session_state[df_key] = df_result
 
                         # Mostra risultato
                         if errors:
@@ -265,43 +308,35 @@ Il bot sarà disponibile dopo aver completato questi step. Ricarica la pagina.
                                 else:
                                     st.error(f"Change {err['change_id'][:8]}: {err['error']}")
 
-                            # Se ci sono errori bloccanti, non procedere
-                            if any(e['change_id'] == 'validation' for e in errors):
-                                st.error("❌ Modifiche non applicate a causa di errori validazione")
-                            else:
-                                # Solo warning, applica comunque
-                                st.success(f"✅ {len(selected_changes)} modifiche applicate (con warning)")
-
-                                # Update history
-                                if st.session_state.chat_history:
-                                    st.session_state.chat_history[-1]['changes_applied'] = [
-                                        c.change_id for c in selected_changes
-                                    ]
-
-                                # Clear pending
-                                st.session_state.pending_changes = []
-
-                                # Abilita prompt salvataggio
-                                st.session_state.show_save_prompt = True
-
-                                st.rerun()
-
+                        if blocking:
+                            # Errori bloccanti: non procedere
+                            st.error("❌ Modifiche non applicate a causa di errori validazione")
                         else:
-                            st.success(f"✅ {len(selected_changes)} modifiche applicate con successo!")
+                            if failed_ids:
+                                st.warning(
+                                    f"⚠️ {len(applied_changes)} modifiche applicate, "
+                                    f"{len(failed_ids)} non applicate (vedi errori sopra)"
+                                )
+                            elif errors:
+                                st.success(f"✅ {len(applied_changes)} modifiche applicate (con warning)")
+                            else:
+                                st.success(f"✅ {len(applied_changes)} modifiche applicate con successo!")
 
                             # Update history
                             if st.session_state.chat_history:
                                 st.session_state.chat_history[-1]['changes_applied'] = [
-                                    c.change_id for c in selected_changes
+                                    c.change_id for c in applied_changes
                                 ]
 
                             # Clear pending
                             st.session_state.pending_changes = []
 
-                            # Abilita prompt salvataggio
-                            st.session_state.show_save_prompt = True
+                            # Già salvate su database: nessun prompt di salvataggio
+                            st.session_state.show_save_prompt = not persisted
 
-                            st.rerun()
+                            # Con modifiche non applicate gli errori restano visibili
+                            if not failed_ids:
+                                st.rerun()
 
     # === BANNER SALVATAGGIO POST-APPLY ===
     if st.session_state.get('show_save_prompt', False):
@@ -12,6 +12,7 @@ from datetime import datetime
 from services.excel_handler import ExcelHandler
 from services.file_differ import FileDiffer, DiffResult
 from services.change_report_generator import ChangeReportGenerator
+from services.tabular_io import available_export_formats, EXPORT_MIME_TYPES
 
 def show_comparison_audit_view():
     """
@@ -178,25 +179,32 @@ def show_file_comparison_tab():
             show_diff_details(strutture_diff, "Strutture", "Codice")
 
         # Export report
+        export_formats = available_export_formats()
+        diff_format = st.selectbox(
+            "Formato report",
+            list(export_formats),
+            format_func=export_formats.get,
+            key="diff_report_format"
+        )
 
-        if st.button("📄 Genera Report Excel", use_container_width=True):
+        if st.button("📄 Genera Report", use_container_width=True):
             with st.spinner("Generazione report..."):
                 try:
-                    report_df = FileDiffer.export_diff_report(
+                    # Scrive il report nel formato scelto per il download
+                    output = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{diff_format}')
+                    FileDiffer.export_diff_report(
                         personale_diff,
-                        strutture_diff
+                        strutture_diff,
+                        output_path=output.name,
+                        export_format=diff_format
                     )
 
-                    # Converti in Excel per download
-                    output = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-                    report_df.to_excel(output.name, index=False)
-
                     with open(output.name, 'rb') as f:
                         st.download_button(
                             label="⬇️ Scarica Report Differenze",
                             data=f,
-                            file_name=f"diff_report_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            file_name=f"diff_report_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.{diff_format}",
+                            mime=EXPORT_MIME_TYPES[diff_format],
                             use_container_width=True
                         )
 
@@ -463,19 +471,27 @@ def show_audit_history_tab():
             )
 
             # === EXPORT (opzionale) ===
-            if st.button("📄 Esporta Report Excel", use_container_width=True):
+            export_formats = available_export_formats()
+            report_format = st.selectbox(
+                "Formato report",
+                list(export_formats),
+                format_func=export_formats.get,
+                key="audit_report_format"
+            )
+
+            if st.button("📄 Esporta Report", use_container_width=True):
                 try:
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    output = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+                    output = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{report_format}')
 
-                    report_gen.export_to_excel(report_df, output.name)
+                    report_gen.export_report(report_df, output.name, report_format)
 
                     with open(output.name, 'rb') as f:
                         st.download_button(
                             label="⬇️ Scarica Report",
                             data=f,
-                            file_name=f"audit_report_{timestamp}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            file_name=f"audit_report_{timestamp}.{report_format}",
+                            mime=EXPORT_MIME_TYPES[report_format],
                             use_container_width=True
                         )
 
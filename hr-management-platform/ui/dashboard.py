@@ -5,8 +5,9 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from services.validator import DataValidator
+from services.data_quality import get_data_quality_engine
 from services.merger import DBTNSMerger
+from services.tree_metrics import get_tree_metrics
 from ui.styles import render_critical_alert, render_warning_alert
 
 def show_dashboard():
@@ -123,96 +124,17 @@ def show_dashboard():
         st.warning(f"⚠️ Impossibile caricare modifiche recenti: {str(e)}")
 
     # === ALERT ANOMALIE ===
-    
-    # Controlla anomalie
-    anomalies = []
-    
-    # 1. Record incompleti Personale
-    incomplete_personale = DataValidator.find_incomplete_records_personale(personale_df)
-    if len(incomplete_personale) > 0:
-        anomalies.append({
-            'tipo': 'error',
-            'categoria': 'Personale',
-            'messaggio': f"{len(incomplete_personale)} record incompleti (campi obbligatori mancanti)",
-            'count': len(incomplete_personale),
-            'data': incomplete_personale
-        })
-    
-    # 2. Record incompleti Strutture
-    incomplete_strutture = DataValidator.find_incomplete_records_strutture(strutture_df)
-    if len(incomplete_strutture) > 0:
-        anomalies.append({
-            'tipo': 'error',
-            'categoria': 'Strutture',
-            'messaggio': f"{len(incomplete_strutture)} strutture incomplete",
-            'count': len(incomplete_strutture),
-            'data': incomplete_strutture
-        })
-    
-    # 3. Codici duplicati Personale (WARNING: potrebbe essere legittimo in alcuni casi)
-    has_dup_pers, dup_pers = DataValidator.check_duplicate_keys(personale_df, 'TxCodFiscale')
-    if has_dup_pers:
-        anomalies.append({
-            'tipo': 'warning',  # Non bloccante: duplicati potrebbero essere legittimi
-            'categoria': 'Personale',
-            'messaggio': f"{len(dup_pers)} codici fiscali duplicati (verificare se legittimo)",
-            'count': len(dup_pers),
-            'data': dup_pers
-        })
-    
-    # 4. Codici duplicati Strutture
-    has_dup_strut, dup_strut = DataValidator.check_duplicate_keys(strutture_df, 'Codice')
-    if has_dup_strut:
-        anomalies.append({
-            'tipo': 'error',
-            'categoria': 'Strutture',
-            'messaggio': f"{len(dup_strut)} codici duplicati",
-            'count': len(dup_strut),
-            'data': dup_strut
-        })
-    
-    # 5. Strutture orfane (senza dipendenti)
-    orphan_structures = DataValidator.find_orphan_structures(strutture_df, personale_df)
-    if len(orphan_structures) > 0:
-        anomalies.append({
-            'tipo': 'warning',
-            'categoria': 'Strutture',
-            'messaggio': f"{len(orphan_structures)} strutture orfane (senza dipendenti assegnati)",
-            'count': len(orphan_structures),
-            'data': orphan_structures
-        })
-    
-    # 6. Riferimenti a padri inesistenti
-    all_codici_strutture = set(strutture_df['Codice'].dropna().unique())
-    padri_personale = set(personale_df['UNITA\' OPERATIVA PADRE '].dropna().unique())
-    padri_strutture = set(strutture_df['UNITA\' OPERATIVA PADRE '].dropna().unique())
-    
-    missing_refs_pers = padri_personale - all_codici_strutture
-    missing_refs_strut = padri_strutture - all_codici_strutture
-    
-    if missing_refs_pers:
-        anomalies.append({
-            'tipo': 'error',
-            'categoria': 'Personale',
-            'messaggio': f"{len(missing_refs_pers)} riferimenti a padri inesistenti",
-            'count': len(missing_refs_pers),
-            'data': pd.DataFrame({'Padre inesistente': list(missing_refs_pers)})
-        })
-    
-    if missing_refs_strut:
-        anomalies.append({
-            'tipo': 'error',
-            'categoria': 'Strutture',
-            'messaggio': f"{len(missing_refs_strut)} riferimenti a padri inesistenti",
-            'count': len(missing_refs_strut),
-            'data': pd.DataFrame({'Padre inesistente': list(missing_refs_strut)})
-        })
-    
+
+    # Conteggi salvati per versione dati e aggiornati dall'audit_log;
+    # le righe si leggono solo su richiesta
+    quality_engine = get_data_quality_engine(db, st.session_state)
+    anomalies = quality_engine.get_summaries(personale_df, strutture_df)
+
     # === SMART EXPANDERS: Anomalie Critiche sempre visibili ===
 
     # Separa errori critici da warning
-    errors = [a for a in anomalies if a['tipo'] == 'error']
-    warnings = [a for a in anomalies if a['tipo'] == 'warning']
+    errors = [a for a in anomalies if a.tipo == 'error']
+    warnings = [a for a in anomalies if a.tipo == 'warning']
 
     if not anomalies:
         st.success("✅ Nessuna anomalia rilevata! Dati integri.")
@@ -225,22 +147,24 @@ def show_dashboard():
             for anomaly in errors:
                 # Usa render_critical_alert da styles.py
                 render_critical_alert(
-                    f"**{anomaly['categoria']}**: {anomaly['messaggio']}",
+                    f"**{anomaly.categoria}**: {anomaly.messaggio}",
                     details=None  # Non mostriamo dettagli inline per evitare troppo spazio
                 )
 
-                # Mostra tabella dati sotto l'alert (compatta)
-                st.dataframe(
-                    anomaly['data'],
-                    use_container_width=True,
-                    height=min(200, len(anomaly['data']) * 35 + 50),
-                    hide_index=True
-                )
+                # Tabella dati sotto l'alert (compatta), caricata su richiesta
+                if st.checkbox(f"📋 Mostra record ({anomaly.count})", key=f"dq_show_{anomaly.check_id}"):
+                    rows = quality_engine.get_rows(anomaly.check_id, personale_df, strutture_df)
+                    st.dataframe(
+                        rows,
+                        use_container_width=True,
+                        height=min(200, len(rows) * 35 + 50),
+                        hide_index=True
+                    )
 
                 # Link azione diretta se possibile
-                if anomaly['categoria'] == 'Personale':
+                if anomaly.categoria == 'Personale':
                     st.caption("💡 Vai a **Gestione Personale** per correggere")
-                elif anomaly['categoria'] == 'Strutture':
+                elif anomaly.categoria == 'Strutture':
                     st.caption("💡 Vai a **Gestione Strutture** per correggere")
 
         # ANOMALIE WARNING: Expander collapsed con badge contatore
@@ -251,15 +175,17 @@ def show_dashboard():
             for anomaly in warnings:
                 # Usa render_warning_alert da styles.py
                 with st.expander(
-                    f"⚠️ {anomaly['categoria']}: {anomaly['messaggio']} ({anomaly['count']} record)",
+                    f"⚠️ {anomaly.categoria}: {anomaly.messaggio} ({anomaly.count} record)",
                     expanded=False
                 ):
-                    st.dataframe(
-                        anomaly['data'],
-                        use_container_width=True,
-                        height=min(300, len(anomaly['data']) * 35 + 50),
-                        hide_index=True
-                    )
+                    if st.checkbox("📋 Carica record", key=f"dq_show_{anomaly.check_id}"):
+                        rows = quality_engine.get_rows(anomaly.check_id, personale_df, strutture_df)
+                        st.dataframe(
+                            rows,
+                            use_container_width=True,
+                            height=min(300, len(rows) * 35 + 50),
+                            hide_index=True
+                        )
     
     # === GRAFICI STATISTICHE (in expander collapsed) ===
     with st.expander("📈 Statistiche Distribuzione", expanded=False):
@@ -324,9 +250,10 @@ def show_dashboard():
         # Sunburst chart gerarchia (sample top levels)
         if st.checkbox("Mostra grafico gerarchia (top 3 livelli)", value=False):
             hierarchy_data = build_hierarchy_for_sunburst(strutture_df, max_depth=3)
-            if hierarchy_data:
+            if not hierarchy_data.empty:
                 fig_hierarchy = px.sunburst(
                     hierarchy_data,
+                    ids='id',
                     names='name',
                     parents='parent',
                     title='Gerarchia Strutture Organizzative (primi 3 livelli)'
@@ -349,100 +276,13 @@ def show_dashboard():
             st.metric("Codici duplicati", stats['duplicate_codes'])
 
 def calculate_max_depth(strutture_df: pd.DataFrame) -> int:
-    """Calcola profondità massima albero strutture"""
-    
-    # Costruisci mappa padre -> figli
-    children_map = {}
-    for _, row in strutture_df.iterrows():
-        codice = row['Codice']
-        padre = row['UNITA\' OPERATIVA PADRE ']
-        if pd.notna(padre):
-            if padre not in children_map:
-                children_map[padre] = []
-            children_map[padre].append(codice)
-    
-    # DFS per calcolare profondità
-    def get_depth(codice, visited=None):
-        if visited is None:
-            visited = set()
-        
-        if codice in visited:  # Ciclo
-            return 0
-        
-        visited.add(codice)
-        
-        if codice not in children_map:
-            return 1
-        
-        max_child_depth = 0
-        for child in children_map[codice]:
-            max_child_depth = max(max_child_depth, get_depth(child, visited.copy()))
-        
-        return 1 + max_child_depth
-    
-    # Trova root e calcola profondità massima
-    roots = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]['Codice'].tolist()
-    max_depth = 0
-    
-    for root in roots:
-        depth = get_depth(root)
-        max_depth = max(max_depth, depth)
-    
-    return max_depth
+    """Calcola numero di livelli della gerarchia (root = livello 1)"""
+    return get_tree_metrics(strutture_df).level_count
 
 def count_leaf_structures(strutture_df: pd.DataFrame) -> int:
     """Conta strutture foglia (senza figli)"""
-    all_codes = set(strutture_df['Codice'].dropna().unique())
-    parents = set(strutture_df['UNITA\' OPERATIVA PADRE '].dropna().unique())
-    
-    # Foglie = codici mai usati come padre
-    leaves = all_codes - parents
-    return len(leaves)
+    return get_tree_metrics(strutture_df).leaf_count()
 
-def build_hierarchy_for_sunburst(strutture_df: pd.DataFrame, max_depth: int = 3) -> list:
-    """Costruisce dati per sunburst chart (primi N livelli)"""
-    
-    # Costruisci lista con name, parent
-    hierarchy = []
-    
-    # Root
-    roots = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]
-    for _, row in roots.iterrows():
-        hierarchy.append({
-            'name': row['DESCRIZIONE'] or row['Codice'],
-            'parent': ''
-        })
-    
-    # BFS per primi N livelli
-    visited = set()
-    current_level = [r['Codice'] for _, r in roots.iterrows()]
-    
-    for level in range(max_depth - 1):
-        next_level = []
-        
-        for parent_code in current_level:
-            if parent_code in visited:
-                continue
-            visited.add(parent_code)
-            
-            # Trova figli
-            children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == parent_code]
-            
-            for _, child in children.iterrows():
-                child_name = child['DESCRIZIONE'] or child['Codice']
-                parent_name = strutture_df[strutture_df['Codice'] == parent_code].iloc[0]['DESCRIZIONE']
-                if pd.isna(parent_name):
-                    parent_name = parent_code
-                
-                hierarchy.append({
-                    'name': child_name,
-                    'parent': parent_name
-                })
-                
-                next_level.append(child['Codice'])
-        
-        current_level = next_level
-        if not current_level:
-            break
-    
-    return hierarchy
+def build_hierarchy_for_sunburst(strutture_df: pd.DataFrame, max_depth: int = 3) -> pd.DataFrame:
+    """Costruisce dati per sunburst chart (primi N livelli): id, parent, name, level, size"""
+    return get_tree_metrics(strutture_df).level_frame(max_depth)
@@ -8,7 +8,10 @@ import pandas as pd
 from pathlib import Path
 import tempfile
 
-from services.db_org_import_service import get_db_org_import_service
+from services.background_jobs import import_db_org_job
+from services.job_runner import SUCCEEDED, get_job_runner
+from services.tabular_io import read_table, write_table, interchange_suffix, UPLOAD_TYPES
+from ui.job_status_view import render_job_status
 
 def render_db_org_import_view():
     """Render DB_ORG import interface"""
@@ -33,6 +36,17 @@ def render_db_org_import_view():
     - Solo le righe senza ID e senza CF vengono ignorate
     """)
 
+    # Import in corso/terminato in background
+    import_job_id = st.session_state.get('db_org_import_job')
+    if import_job_id:
+        job = render_job_status(import_job_id, key="db_org_import")
+        if job is not None and job.status == SUCCEEDED:
+            _render_import_results(get_job_runner().get_result(import_job_id))
+        if st.button("↩️ Nuovo import", key="db_org_import_reset"):
+            del st.session_state.db_org_import_job
+            st.rerun()
+        return
+
     # Step 1: Upload File
     st.markdown("### 📂 Step 1: Carica File Excel")
 
@@ -51,8 +65,8 @@ def render_db_org_import_view():
     else:
         uploaded_file = st.file_uploader(
             "Seleziona file DB_ORG",
-            type=['xls', 'xlsx', 'xlsm'],
-            help="File Excel con foglio DB_ORG"
+            type=UPLOAD_TYPES,
+            help="File Excel con foglio DB_ORG (oppure CSV/Parquet con le stesse colonne)"
         )
 
     if uploaded_file is not None:
@@ -71,7 +85,9 @@ def render_db_org_import_view():
         try:
             # Read Excel to preview
             with st.spinner("Lettura file in corso..."):
-                df = pd.read_excel(tmp_path, sheet_name='DB_ORG', nrows=10)
+                # Un solo parsing (in cache): lo riusa anche l'import
+                df_full = read_table(tmp_path, 'DB_ORG')
+                df = df_full.head(10)
 
             col1, col2, col3 = st.columns(3)
 
@@ -80,7 +96,6 @@ def render_db_org_import_view():
 
             with col2:
                 # Count rows (full file)
-                df_full = pd.read_excel(tmp_path, sheet_name='DB_ORG')
                 st.metric("👥 Righe Totali", len(df_full))
 
             with col3:
@@ -589,57 +604,20 @@ def render_db_org_import_view():
                             st.success(f"✅ Colonne rinominate per import: {len(standard_rename)}")
 
                             # Save filtered dataframe to temporary file
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_filtered:
-                                df_to_import.to_excel(tmp_filtered.name, sheet_name='DB_ORG', index=False)
+                            with tempfile.NamedTemporaryFile(delete=False, suffix=interchange_suffix()) as tmp_filtered:
                                 tmp_filtered_path = Path(tmp_filtered.name)
-
-                            # Execute import
-                            import_service = get_db_org_import_service()
-
-                            results = import_service.import_db_org_file(
-                                excel_path=tmp_filtered_path,
-                                sheet_name='DB_ORG',
-                                import_note=import_note
+                            write_table(df_to_import, tmp_filtered_path, sheet_name='DB_ORG')
+
+                            # Execute import (in background: sopravvive a rerun/refresh)
+                            st.session_state.db_org_import_job = get_job_runner().submit(
+                                'import_db_org',
+                                import_db_org_job,
+                                tmp_filtered_path,
+                                'DB_ORG',
+                                import_note,
+                                label="Import DB_ORG"
                             )
-
-                            # Show results
-                            if results['success']:
-                                st.success("✅ Import completato con successo!")
-
-                                # Statistics
-                                st.markdown("### 📊 Riepilogo Import")
-
-                                col1, col2, col3, col4 = st.columns(4)
-
-                                with col1:
-                                    st.metric("👥 Dipendenti", results['employees_imported'])
-                                with col2:
-                                    st.metric("🏢 Strutture", results['org_units_imported'])
-                                with col3:
-                                    st.metric("🌳 Gerarchie", results['hierarchies_assigned'])
-                                with col4:
-                                    st.metric("🎭 Ruoli", results['roles_assigned'])
-
-                                st.balloons()
-
-                                # Reload app
-                                if st.button("🔄 Vai alla Dashboard", use_container_width=True):
-                                    st.session_state.current_page = "📊 Dashboard DB_ORG"
-                                    st.rerun()
-
-                            else:
-                                st.error(f"❌ Import fallito: {results.get('message', 'Errore sconosciuto')}")
-
-                                # Mostra dettagli errore
-                                if 'errors' in results and results['errors']:
-                                    st.warning("**Errori rilevati:**")
-                                    for error in results['errors'][:10]:
-                                        st.markdown(f"- {error}")
-
-                                # Mostra traceback se presente
-                                if 'traceback' in results:
-                                    with st.expander("🔍 Traceback completo"):
-                                        st.code(results['traceback'])
+                            st.rerun()
 
                         except Exception as e:
                             st.error(f"❌ Errore durante import: {str(e)}")
@@ -680,5 +658,47 @@ def render_db_org_import_view():
            l'import non parte. Errori minori su singole righe vengono skippati e loggati.
         """)
 
+def _render_import_results(results):
+    """Riepilogo dell'import DB_ORG (risultato del job)."""
+    if results['success']:
+        st.success("✅ Import completato con successo!")
+
+        # Statistics
+        st.markdown("### 📊 Riepilogo Import")
+
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric("👥 Dipendenti", results['employees_imported'])
+        with col2:
+            st.metric("🏢 Strutture", results['org_units_imported'])
+        with col3:
+            st.metric("🌳 Gerarchie", results['hierarchies_assigned'])
+        with col4:
+            st.metric("🎭 Ruoli", results['roles_assigned'])
+
+        st.balloons()
+
+        # Reload app
+        if st.button("🔄 Vai alla Dashboard", use_container_width=True):
+            st.session_state.pop('db_org_import_job', None)
+            st.session_state.current_page = "📊 Dashboard DB_ORG"
+            st.rerun()
+
+    else:
+        st.error(f"❌ Import fallito: {results.get('message', 'Errore sconosciuto')}")
+
+        # Mostra dettagli errore
+        if 'errors' in results and results['errors']:
+            st.warning("**Errori rilevati:**")
+            for error in results['errors'][:10]:
+                st.markdown(f"- {error}")
+
+        # Mostra traceback se presente
+        if 'traceback' in results:
+            with st.expander("🔍 Traceback completo"):
+                st.code(results['traceback'])
+
+
 if __name__ == "__main__":
     render_db_org_import_view()
@@ -0,0 +1,77 @@
+"""
+Stato job in background (services/job_runner.py)
+
+render_job_status mostra avanzamento e pulsante di annullamento finché il
+job è attivo e ripianifica un rerun ogni config.JOB_POLL_SECONDS: la
+pagina resta interattiva e un refresh del browser non interrompe il job.
+"""
+import time
+from typing import Optional
+
+import streamlit as st
+
+import config
+from services.job_runner import CANCELLED, FAILED, INTERRUPTED, Job, get_job_runner
+
+
+def render_job_status(job_id: str, key: str) -> Optional[Job]:
+    """
+    Mostra lo stato del job.
+
+    Finché il job è in coda/in esecuzione la funzione non ritorna (polling
+    con st.rerun); a job terminato mostra eventuali errori/annullamenti e
+    restituisce il Job, così il chiamante gestisce il risultato.
+
+    Args:
+        job_id: ID restituito da JobRunner.submit
+        key: Prefisso chiavi widget (univoco nella pagina)
+    """
+    runner = get_job_runner()
+    job = runner.get_job(job_id)
+    if job is None:
+        st.warning("⚠️ Job non trovato (forse eliminato)")
+        return None
+
+    if job.is_active:
+        st.progress(job.progress, text=f"⏳ {job.label}: {job.message}")
+        if job.cancel_requested:
+            st.caption("⏹️ Annullamento richiesto, in attesa del punto di arresto...")
+        elif st.button("⏹️ Annulla", key=f"{key}_cancel"):
+            runner.cancel(job_id)
+        time.sleep(config.JOB_POLL_SECONDS)
+        st.rerun()
+
+    if job.status == FAILED:
+        st.error(f"❌ {job.label}: {job.message}")
+        if job.error:
+            with st.expander("🔍 Traceback completo"):
+                st.code(job.error)
+    elif job.status == CANCELLED:
+        st.warning(f"⏹️ {job.label}: annullato")
+    elif job.status == INTERRUPTED:
+        st.warning(f"⚠️ {job.label}: {job.message}")
+
+    return job
+
+
+def render_recent_jobs(limit: int = 10):
+    """Tabella degli ultimi job (stato, avanzamento, durata)."""
+    jobs = get_job_runner().list_jobs(limit=limit)
+    if not jobs:
+        st.caption("Nessun job eseguito")
+        return
+    st.dataframe(
+        [
+            {
+                'Job': job.label,
+                'Stato': job.status,
+                'Avanzamento': f"{job.progress:.0%}",
+                'Messaggio': job.message,
+                'Creato': job.created_at,
+                'Terminato': job.finished_at or ''
+            }
+            for job in jobs
+        ],
+        use_container_width=True,
+        hide_index=True
+    )
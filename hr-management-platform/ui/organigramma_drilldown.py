@@ -6,6 +6,8 @@ import streamlit as st
 import pandas as pd
 from typing import Optional, List, Dict
 
+from services.structure_tree import StructureTree, get_structure_tree
+
 def show_organigramma_drilldown(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
     """Vista drill-down interattiva con navigazione breadcrumb"""
 
@@ -16,8 +18,11 @@ def show_organigramma_drilldown(strutture_df: pd.DataFrame, personale_df: pd.Dat
     if 'drill_path' not in st.session_state:
         st.session_state.drill_path = []  # Stack di codici strutture
 
+    # Indice gerarchia condiviso: ogni livello costa O(figli)
+    tree = get_structure_tree(strutture_df, personale_df, 'Unità Organizzativa')
+
     # === BREADCRUMB NAVIGATION ===
-    render_breadcrumb(strutture_df)
+    render_breadcrumb(tree)
 
     # Determina livello corrente
     current_codice = st.session_state.drill_path[-1] if st.session_state.drill_path else None
@@ -26,14 +31,13 @@ def show_organigramma_drilldown(strutture_df: pd.DataFrame, personale_df: pd.Dat
     if current_codice is None:
         # Livello root
         st.markdown("#### 🏛️ Strutture Principali")
-        render_root_structures(strutture_df, personale_df)
+        render_root_structures(tree)
     else:
         # Livello figlio
-        current_struct = strutture_df[strutture_df['Codice'] == current_codice].iloc[0]
-        st.markdown(f"#### 🏢 {current_struct['DESCRIZIONE']}")
-        render_child_level(current_codice, strutture_df, personale_df)
+        st.markdown(f"#### 🏢 {tree.description(current_codice)}")
+        render_child_level(current_codice, tree)
 
-def render_breadcrumb(strutture_df: pd.DataFrame):
+def render_breadcrumb(tree: StructureTree):
     """Render breadcrumb navigation per tornare indietro"""
 
     path = st.session_state.drill_path
@@ -46,9 +50,8 @@ def render_breadcrumb(strutture_df: pd.DataFrame):
     breadcrumb_parts = ["🏠 Home"]
 
     for codice in path:
-        struct = strutture_df[strutture_df['Codice'] == codice]
-        if not struct.empty:
-            nome = struct.iloc[0]['DESCRIZIONE']
+        if codice in tree:
+            nome = tree.description(codice)
             breadcrumb_parts.append(nome[:20])
 
     st.markdown(f"📍 **Posizione:** {' → '.join(breadcrumb_parts)}")
@@ -66,10 +69,10 @@ def render_breadcrumb(strutture_df: pd.DataFrame):
             st.session_state.drill_path = []
             st.rerun()
 
-def render_root_structures(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
+def render_root_structures(tree: StructureTree):
     """Render strutture root con possibilità di drill-down"""
 
-    root_structures = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]
+    root_structures = tree.roots_df()
 
     if root_structures.empty:
         st.info("Nessuna struttura root trovata")
@@ -88,22 +91,21 @@ def render_root_structures(strutture_df: pd.DataFrame, personale_df: pd.DataFram
     for idx, (_, struct) in enumerate(root_structures.iterrows()):
         render_structure_card(
             struct,
-            strutture_df,
-            personale_df,
+            tree,
             show_counts=show_counts,
             show_empty=show_empty,
             key_prefix=f"root_{idx}"
         )
 
-def render_child_level(parent_codice: str, strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
+def render_child_level(parent_codice: str, tree: StructureTree):
     """Render figli di una struttura (sotto-strutture + dipendenti)"""
 
     # === STATISTICHE STRUTTURA CORRENTE ===
     col1, col2, col3 = st.columns(3)
 
     # Conta figli diretti
-    children_structs = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == parent_codice]
-    direct_employees = personale_df[personale_df['Unità Organizzativa'] == parent_codice]
+    children_structs = tree.children_df(parent_codice)
+    direct_employees = tree.employees_df(parent_codice)
 
     with col1:
         st.metric("🏢 Sotto-strutture", len(children_structs))
@@ -111,7 +113,7 @@ def render_child_level(parent_codice: str, strutture_df: pd.DataFrame, personale
         st.metric("👥 Dipendenti Diretti", len(direct_employees))
     with col3:
         # Conta ricorsivo tutti dipendenti nel sotto-albero
-        total_employees = count_employees_recursive(parent_codice, strutture_df, personale_df)
+        total_employees = tree.subtree_employee_count(parent_codice)
         st.metric("👥 Dipendenti Totali", total_employees)
 
     # === OPZIONI ===
@@ -128,8 +130,7 @@ def render_child_level(parent_codice: str, strutture_df: pd.DataFrame, personale
         for idx, (_, struct) in enumerate(children_structs.iterrows()):
             render_structure_card(
                 struct,
-                strutture_df,
-                personale_df,
+                tree,
                 show_counts=show_counts,
                 show_empty=show_empty,
                 key_prefix=f"child_{parent_codice}_{idx}"
@@ -146,8 +147,7 @@ def render_child_level(parent_codice: str, strutture_df: pd.DataFrame, personale
 
 def render_structure_card(
     struct: pd.Series,
-    strutture_df: pd.DataFrame,
-    personale_df: pd.DataFrame,
+    tree: StructureTree,
     show_counts: bool = True,
     show_empty: bool = True,
     key_prefix: str = ""
@@ -158,8 +158,8 @@ def render_structure_card(
     nome = struct['DESCRIZIONE']
 
     # Conta dipendenti e figli
-    employees_count = count_employees_recursive(codice, strutture_df, personale_df)
-    children_count = len(strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == codice])
+    employees_count = tree.subtree_employee_count(codice)
+    children_count = tree.child_count(codice)
 
     # Skip se vuota e filtro attivo
     if not show_empty and employees_count == 0:
@@ -272,15 +272,5 @@ def render_employee_detail(emp: pd.Series):
 
 def count_employees_recursive(codice: str, strutture_df: pd.DataFrame, personale_df: pd.DataFrame) -> int:
     """Conta dipendenti ricorsivamente (diretti + in sotto-strutture)"""
-
-    # Dipendenti diretti
-    direct_count = len(personale_df[personale_df['Unità Organizzativa'] == codice])
-
-    # Dipendenti in sotto-strutture
-    children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == codice]
-
-    children_count = 0
-    for _, child in children.iterrows():
-        children_count += count_employees_recursive(child['Codice'], strutture_df, personale_df)
-
-    return direct_count + children_count
+    tree = get_structure_tree(strutture_df, personale_df, 'Unità Organizzativa')
+    return tree.subtree_employee_count(codice)
@@ -7,6 +7,8 @@ import pandas as pd
 import plotly.graph_objects as go
 from typing import Dict, List, Tuple
 
+from services.structure_tree import StructureTree, get_structure_tree
+
 def show_organigramma_view():
     """Vista dedicata all'organigramma aziendale"""
 
@@ -24,6 +26,9 @@ def show_organigramma_view():
         st.warning("⚠️ Nessun dato disponibile. Importa un file Excel per iniziare.")
         return
 
+    # Indice gerarchia condiviso (ricostruito solo al cambio dati)
+    tree = get_structure_tree(strutture_df, personale_df, 'Unità Organizzativa')
+
     # === STATISTICHE RAPIDE ===
     col1, col2, col3, col4 = st.columns(4)
 
@@ -31,8 +36,7 @@ def show_organigramma_view():
         st.metric("📊 Totale Strutture", len(strutture_df))
 
     with col2:
-        roots = strutture_df['UNITA\' OPERATIVA PADRE '].isna().sum()
-        st.metric("🌳 Strutture Root", roots)
+        st.metric("🌳 Strutture Root", len(tree.roots))
 
     with col3:
         # Conta dipendenti per struttura
@@ -44,8 +48,7 @@ def show_organigramma_view():
 
     with col4:
         # Profondità massima albero
-        max_depth = calculate_max_depth(strutture_df)
-        st.metric("📏 Livelli Gerarchia", max_depth)
+        st.metric("📏 Livelli Gerarchia", tree.max_depth)
 
     # === TAB: VISTA ALBERO VS DRILL-DOWN VS YFILES-STYLE ===
     tab1, tab2, tab3 = st.tabs([
@@ -93,7 +96,8 @@ def show_tree_view(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
     )
 
     # === COSTRUISCI ALBERO ===
-    root_structures = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]
+    tree = get_structure_tree(strutture_df, personale_df, 'Unità Organizzativa')
+    root_structures = tree.roots_df()
 
     if len(root_structures) == 0:
         st.warning("⚠️ Nessuna struttura root trovata nel database")
@@ -110,13 +114,12 @@ def show_tree_view(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
                     continue
 
             # Filtra se hide_empty e nessun dipendente (ricorsivo)
-            if hide_empty and not has_employees_recursive(root['Codice'], strutture_df, personale_df):
+            if hide_empty and not tree.has_employees(root['Codice']):
                 continue
 
             render_tree_node(
                 root,
-                strutture_df,
-                personale_df,
+                tree,
                 level=0,
                 show_counts=show_counts,
                 show_codes=show_codes,
@@ -191,31 +194,6 @@ def show_chart_view(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
 
 # === FUNZIONI HELPER ===
 
-def calculate_max_depth(strutture_df: pd.DataFrame) -> int:
-    """Calcola profondità massima albero gerarchico"""
-    max_depth = 0
-    root_structures = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]
-
-    for _, root in root_structures.iterrows():
-        depth = get_depth_recursive(root['Codice'], strutture_df, 0)
-        max_depth = max(max_depth, depth)
-
-    return max_depth
-
-def get_depth_recursive(codice: str, strutture_df: pd.DataFrame, current_depth: int) -> int:
-    """Calcola profondità ricorsiva di un nodo"""
-    children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == codice]
-
-    if len(children) == 0:
-        return current_depth
-
-    max_child_depth = current_depth
-    for _, child in children.iterrows():
-        child_depth = get_depth_recursive(child['Codice'], strutture_df, current_depth + 1)
-        max_child_depth = max(max_child_depth, child_depth)
-
-    return max_child_depth
-
 def matches_search(structure: pd.Series, search_text: str) -> bool:
     """Verifica se struttura matcha ricerca"""
     search_lower = search_text.lower()
@@ -224,34 +202,17 @@ def matches_search(structure: pd.Series, search_text: str) -> bool:
 
     return search_lower in descrizione or search_lower in codice
 
-def count_employees(struttura_codice: str, personale_df: pd.DataFrame) -> int:
-    """Conta dipendenti in una struttura"""
-    if 'Unità Organizzativa' not in personale_df.columns:
-        return 0
-
-    return len(personale_df[personale_df['Unità Organizzativa'] == struttura_codice])
-
 def has_employees_recursive(struttura_codice: str, strutture_df: pd.DataFrame, personale_df: pd.DataFrame) -> bool:
     """
     Verifica se una struttura ha dipendenti (direttamente o nei figli).
-    Ricorsivo per includere tutta la gerarchia sotto.
+    Usa i conteggi del sotto-albero precalcolati da StructureTree.
     """
-    # Check diretto
-    if count_employees(struttura_codice, personale_df) > 0:
-        return True
-
-    # Check figli ricorsivamente
-    children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == struttura_codice]
-    for _, child in children.iterrows():
-        if has_employees_recursive(child['Codice'], strutture_df, personale_df):
-            return True
-
-    return False
+    tree = get_structure_tree(strutture_df, personale_df, 'Unità Organizzativa')
+    return tree.has_employees(struttura_codice)
 
 def render_tree_node(
     structure: pd.Series,
-    strutture_df: pd.DataFrame,
-    personale_df: pd.DataFrame,
+    tree: StructureTree,
     level: int = 0,
     show_counts: bool = True,
     show_codes: bool = False,
@@ -270,7 +231,7 @@ def render_tree_node(
     codice = structure.get('Codice', 'N/A')
 
     # Contatore dipendenti
-    emp_count = count_employees(codice, personale_df) if show_counts else 0
+    emp_count = tree.direct_employee_count(codice) if show_counts else 0
 
     # Costruisci label
     label_parts = [f"{icon} **{nome}**"]
@@ -296,17 +257,16 @@ def render_tree_node(
             st.markdown(f"{indent}{label}")
 
     # Figli ricorsivi
-    children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == codice]
+    children = tree.children_df(codice)
 
     for _, child in children.iterrows():
         # Filtra figli senza dipendenti se hide_empty attivo
-        if hide_empty and not has_employees_recursive(child['Codice'], strutture_df, personale_df):
+        if hide_empty and not tree.has_employees(child['Codice']):
             continue
 
         render_tree_node(
             child,
-            strutture_df,
-            personale_df,
+            tree,
             level=level + 1,
             show_counts=show_counts,
             show_codes=show_codes,
@@ -363,7 +323,8 @@ def build_graph_data(
     """Costruisce dati grafo con posizioni e attributi"""
 
     nodes_data = []
-    root_structures = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]
+    tree = get_structure_tree(strutture_df, personale_df, 'Unità Organizzativa')
+    root_structures = tree.roots_df()
 
     # Posizionamento: layout ad albero semplificato
     x_spacing = 1.5
@@ -371,14 +332,13 @@ def build_graph_data(
 
     for root_idx, root in root_structures.iterrows():
         # Filtra root senza dipendenti se hide_empty
-        if hide_empty and not has_employees_recursive(root['Codice'], strutture_df, personale_df):
+        if hide_empty and not tree.has_employees(root['Codice']):
             continue
 
         x_offset = root_idx * x_spacing * 3
         build_graph_recursive(
             root,
-            strutture_df,
-            personale_df,
+            tree,
             nodes_data,
             x=x_offset,
             y=0,
@@ -393,8 +353,7 @@ def build_graph_data(
 
 def build_graph_recursive(
     structure: pd.Series,
-    strutture_df: pd.DataFrame,
-    personale_df: pd.DataFrame,
+    tree: StructureTree,
     nodes_data: List[Dict],
     x: float,
     y: float,
@@ -408,7 +367,7 @@ def build_graph_recursive(
 
     codice = structure['Codice']
     nome = structure.get('DESCRIZIONE', 'N/A')
-    emp_count = count_employees(codice, personale_df)
+    emp_count = tree.direct_employee_count(codice)
 
     # Determina colore
     if color_by == "Livello":
@@ -432,15 +391,14 @@ def build_graph_recursive(
     nodes_data.append(node)
 
     # Figli (filtra se hide_empty)
-    children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == codice]
+    children = tree.children_df(codice)
 
     # Filtra figli senza dipendenti se hide_empty
     if hide_empty:
-        children_filtered = []
-        for _, child in children.iterrows():
-            if has_employees_recursive(child['Codice'], strutture_df, personale_df):
-                children_filtered.append(child)
-        children = pd.DataFrame(children_filtered)
+        children = children.iloc[[
+            i for i, child_codice in enumerate(children['Codice'])
+            if tree.has_employees(child_codice)
+        ]]
 
     num_children = len(children)
 
@@ -456,8 +414,7 @@ def build_graph_recursive(
 
         build_graph_recursive(
             child,
-            strutture_df,
-            personale_df,
+            tree,
             nodes_data,
             x=child_x,
             y=child_y,
@@ -15,8 +15,10 @@ import streamlit.components.v1 as components
 import json
 from typing import Optional
 
+import config
 from services.orgchart_data_service import get_orgchart_data_service
 from services.lookup_service import get_lookup_service
+from ui.orgchart_lazy import LAZY_EXPAND_JS, get_expanded_ids, build_lazy_config
 
 
 def render_orgchart_hr_view():
@@ -100,39 +102,8 @@ def render_orgchart_hr_view():
                 st.info("Verifica che siano state importate strutture nel database.")
                 return
 
-            # Enrich nodes with additional info for tooltips
-            for node in nodes:
-                # Get full employee details for this node
-                emp_details = orgchart_service._query("""
-                    SELECT
-                        titolare, tx_cod_fiscale, area, sede, qualifica,
-                        societa, email, data_assunzione, contratto
-                    FROM employees
-                    WHERE tx_cod_fiscale = ?
-                """, (node['id'],))
-
-                if emp_details:
-                    emp = emp_details[0]
-                    node['full_name'] = emp['titolare'] or node['name']
-                    node['cf'] = emp['tx_cod_fiscale'] or ''
-                    node['area'] = emp['area'] or 'N/D'
-                    node['sede'] = emp['sede'] or 'N/D'
-                    node['qualifica'] = emp['qualifica'] or 'N/D'
-                    node['societa'] = emp['societa'] or 'N/D'
-                    node['email'] = emp['email'] or 'N/D'
-                    node['data_assunzione'] = emp['data_assunzione'] or 'N/D'
-                    node['contratto'] = emp['contratto'] or 'N/D'
-                else:
-                    # Virtual ROOT or no details
-                    node['full_name'] = node['name']
-                    node['cf'] = node['id'] if node['id'] != 'ROOT' else ''
-                    node['area'] = 'N/D'
-                    node['sede'] = 'N/D'
-                    node['qualifica'] = 'N/D'
-                    node['societa'] = 'N/D'
-                    node['email'] = 'N/D'
-                    node['data_assunzione'] = 'N/D'
-                    node['contratto'] = 'N/D'
+            # Tooltip details (full_name, cf, societa, email, ...) are
+            # already part of the cached payload: no per-node queries here.
 
             # Count orphans (nodes with parentId='ROOT' but not ROOT itself)
             orphans = [n for n in nodes if n.get('parentId') == 'ROOT' and n['id'] != 'ROOT']
@@ -153,7 +124,27 @@ def render_orgchart_hr_view():
             if min_employees > 0:
                 filtered_nodes = [n for n in filtered_nodes if n.get('employee_count', 0) >= min_employees]
 
-            hierarchy_json = json.dumps(filtered_nodes if show_orphans_only or min_employees > 0 or has_responsible_filter != "Tutti" else nodes, ensure_ascii=False)
+            filters_active = show_orphans_only or min_employees > 0 or has_responsible_filter != "Tutti"
+            lazy_mode = not filters_active and len(nodes) > config.ORGCHART_LAZY_THRESHOLD
+
+            if filters_active:
+                hierarchy_json = json.dumps(filtered_nodes, ensure_ascii=False)
+            elif lazy_mode:
+                # Large tree: ship only the top levels, deeper subtrees on expand
+                lazy_data = orgchart_service.get_tree_levels(
+                    'HR',
+                    max_depth=config.ORGCHART_LAZY_DEPTH,
+                    expanded=get_expanded_ids('org_hr_expand'),
+                    company_id=None,
+                    area_filter=None if area_filter == "Tutte" else area_filter
+                )
+                hierarchy_json = json.dumps(lazy_data['nodes'], ensure_ascii=False)
+                st.caption(f"⚡ Caricamento progressivo: {len(lazy_data['nodes'])} di "
+                           f"{lazy_data['total_nodes']} nodi, espandi un nodo per caricarne i figli")
+            else:
+                # Unfiltered: reuse JSON serialized once per data version
+                hierarchy_json = hierarchy_data['nodes_json']
+            lazy_json = build_lazy_config(lazy_mode, 'org_hr_expand')
 
             # Create filters config for JavaScript
             filters_config = {
@@ -186,25 +177,27 @@ def render_orgchart_hr_view():
                         if orphans_count > 20:
                             st.caption(f"Mostrati primi 20 di {orphans_count} orfani totali")
 
+            # Largest teams (server-side aggregates, pre-sorted index)
+            with st.expander("🏆 Team più grandi", expanded=False):
+                largest = orgchart_service.get_largest_teams(
+                    'HR', limit=15,
+                    company_id=None,
+                    area_filter=None if area_filter == "Tutte" else area_filter
+                )
+                if largest:
+                    import pandas as pd
+                    teams_df = pd.DataFrame([{
+                        'Nome': t['name'],
+                        'Area': t.get('area', 'N/D'),
+                        'Diretti': t['direct_reports'],
+                        'Totale team': t['total_descendants'],
+                        'Livello': t['depth'],
+                        'Span of control': t['span_of_control']
+                    } for t in largest])
+                    st.dataframe(teams_df, use_container_width=True, hide_index=True)
+
             # Employees grouped by manager (for modal detail popup)
-            # Group employees by their reports_to_cf (manager CF)
-            emp_rows = orgchart_service._query("""
-                SELECT tx_cod_fiscale, titolare, reports_to_cf
-                FROM employees
-                WHERE reports_to_cf IS NOT NULL AND reports_to_cf != ''
-                ORDER BY titolare
-            """)
-            emp_by_struttura = {}
-            for e in emp_rows:
-                manager_cf = e['reports_to_cf']
-                if manager_cf not in emp_by_struttura:
-                    emp_by_struttura[manager_cf] = []
-                emp_by_struttura[manager_cf].append({
-                    'cf':    e['tx_cod_fiscale'],
-                    'name':  e['titolare'] or e['tx_cod_fiscale'],
-                    'roles': []  # Roles not imported yet
-                })
-            emp_json = json.dumps(emp_by_struttura, ensure_ascii=False)
+            emp_json = orgchart_service.get_hr_direct_reports_json()
             node_count = len(nodes)
 
             # ── HTML Template ──────────────────────────────────────────
@@ -386,6 +379,8 @@ svg{{width:100%;height:100%}}
 const RAW  = {hierarchy_json};
 const EMP  = {emp_json};
 const FILTERS = {filters_json};
+const LAZY = {lazy_json};
+{LAZY_EXPAND_JS}
 
 // ── Stratify flat data ──────────────────────────────────────────────────
 const stratify = d3.stratify().id(d=>d.id).parentId(d=>d.parentId);
@@ -531,7 +526,7 @@ function setLayout(type) {{
 }}
 
 // ── Helpers ──────────────────────────────────────────────────────────────
-function cc(d) {{ return d._ch?d._ch.length:(d.children?d.children.length:0)||''; }}
+function cc(d) {{ return d._ch?d._ch.length:(d.children?d.children.length:(d.data.has_more?d.data.direct_reports:0))||''; }}
 function cut(s,m) {{ if(!s)return''; s=String(s); return s.length>m?s.slice(0,m-1)+'…':s; }}
 
 // Global variable to track selected/focused node
@@ -581,6 +576,8 @@ function shouldShowNode(node) {{
 }}
 
 function toggle(d) {{
+  // Lazy mode: children not shipped yet -> request subtree from server
+  if(!d.children&&!d._ch&&d.data.has_more&&requestSubtree(d.data.id)) return;
   if(d.children){{
     // Collapsing - collapse this node
     d._ch=d.children;
@@ -660,7 +657,7 @@ function drawHorizontal() {{
   nu.select('.nd-name').text(d=>cut(d.data.name,24));
   nu.select('.nd-resp').text(d=>cut(d.data.title||'',28));
   nu.select('.nd-cnt') .text(d=>d.data.employee_count>0?d.data.employee_count+' dip.':'');
-  nu.select('.bg').style('display',d=>(d.children||d._ch)?'block':'none');
+  nu.select('.bg').style('display',d=>(d.children||d._ch||d.data.has_more)?'block':'none');
   nu.select('.tog-t').text(d=>cc(d));
   nd.exit().remove();
 }}
@@ -752,7 +749,7 @@ function drawVertical() {{
   nu.select('.nd-name').text(d=>cut(d.data.name,19));
   nu.select('.nd-resp').text(d=>cut(d.data.title||'',21));
   nu.select('.nd-cnt') .text(d=>d.data.employee_count>0?d.data.employee_count+' dip.':'');
-  nu.select('.bg').style('display',d=>(d.children||d._ch)?'block':'none');
+  nu.select('.bg').style('display',d=>(d.children||d._ch||d.data.has_more)?'block':'none');
   nu.select('.tog-t').text(d=>cc(d));
   nd.exit().remove();
 }}
@@ -765,7 +762,7 @@ function drawSunburst() {{
 
   // Build fresh fully-expanded hierarchy
   const sroot=stratify(RAW.map(d=>Object.assign({{}},d)));
-  sroot.sum(d=>d.data.employee_count||1);
+  sroot.sum(d=>1);
   d3.partition().size([2*Math.PI, radius])(sroot);
 
   const arc=d3.arc()
@@ -815,7 +812,7 @@ function drawTreemap() {{
   const W=el.clientWidth||800, H=el.clientHeight||700;
 
   const troot=stratify(RAW.map(d=>Object.assign({{}},d)));
-  troot.sum(d=>d.data.employee_count||1).sort((a,b)=>b.value-a.value);
+  troot.sum(d=>1).sort((a,b)=>b.value-a.value);
   d3.treemap().size([W,H]).padding(2).paddingTop(20).round(true)(troot);
 
   // Clear existing and reset transform
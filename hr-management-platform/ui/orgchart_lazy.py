@@ -0,0 +1,48 @@
+"""
+Orgchart Lazy Expansion - helper condivisi dalle view organigramma
+
+Per alberi grandi le view inviano al browser solo i primi livelli
+(OrgChartDataService.get_tree_levels). Quando l'utente espande un nodo
+con has_more=True, il JavaScript aggiunge il suo id al query param della
+view e ricarica la pagina: la view legge gli id espansi e richiede anche
+i figli di quei nodi.
+"""
+import json
+from typing import List
+
+import streamlit as st
+
+# JavaScript iniettato nell'iframe (stringa normale, non f-string)
+LAZY_EXPAND_JS = """
+// ── Lazy subtree expansion ───────────────────────────────────────────────
+function requestSubtree(id) {
+  if (!LAZY.enabled) return false;
+  try {
+    const url = new URL(window.parent.location.href);
+    const ids = (url.searchParams.get(LAZY.param) || '').split(',').filter(Boolean);
+    if (!ids.includes(id)) ids.push(id);
+    url.searchParams.set(LAZY.param, ids.join(','));
+    if (LAZY.page) url.searchParams.set('current_page', LAZY.page);
+    window.parent.location.href = url.toString();
+    return true;
+  } catch (e) {
+    console.error('Lazy expand error:', e);
+    return false;
+  }
+}
+"""
+
+
+def get_expanded_ids(param: str) -> List[str]:
+    """Legge dal query param la lista di nodi espansi (id separati da virgola)."""
+    raw = st.query_params.get(param, '')
+    return [node_id for node_id in raw.split(',') if node_id]
+
+
+def build_lazy_config(enabled: bool, param: str) -> str:
+    """JSON di configurazione lazy per il JavaScript della view."""
+    return json.dumps({
+        'enabled': enabled,
+        'param': param,
+        'page': st.session_state.get('current_page', ''),
+    }, ensure_ascii=False)
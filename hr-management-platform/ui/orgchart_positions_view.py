@@ -21,7 +21,9 @@ import streamlit.components.v1 as components
 import json
 from typing import Optional
 
+import config
 from services.orgchart_data_service import get_orgchart_data_service
+from ui.orgchart_lazy import LAZY_EXPAND_JS, get_expanded_ids, build_lazy_config
 from services.lookup_service import get_lookup_service
 
 
@@ -87,7 +89,24 @@ def render_orgchart_positions_view():
             vacant_count = sum(1 for n in nodes if n['node_type']=='struttura' and not n['has_employees'])
             filled_count = strutture_count - vacant_count
 
-            hierarchy_json = json.dumps(nodes, ensure_ascii=False)
+            lazy_mode = not show_vacant_only and len(nodes) > config.ORGCHART_LAZY_THRESHOLD
+
+            if show_vacant_only:
+                hierarchy_json = json.dumps(nodes, ensure_ascii=False)
+            elif lazy_mode:
+                # Large tree: ship only the top levels, deeper subtrees on expand
+                lazy_data = orgchart_service.get_tree_levels(
+                    'POSITIONS',
+                    max_depth=config.ORGCHART_LAZY_DEPTH,
+                    expanded=get_expanded_ids('org_pos_expand')
+                )
+                hierarchy_json = json.dumps(lazy_data['nodes'], ensure_ascii=False)
+                st.caption(f"⚡ Caricamento progressivo: {len(lazy_data['nodes'])} di "
+                           f"{lazy_data['total_nodes']} nodi, espandi un nodo per caricarne i figli")
+            else:
+                # Unfiltered: reuse JSON serialized once per data version
+                hierarchy_json = data['nodes_json']
+            lazy_json = build_lazy_config(lazy_mode, 'org_pos_expand')
 
             # ── HTML Template ──────────────────────────────────────────
             html_content = f"""<!DOCTYPE html>
@@ -292,6 +311,8 @@ svg{{width:100%;height:100%}}
 
 <script>
 const RAW = {hierarchy_json};
+const LAZY = {lazy_json};
+{LAZY_EXPAND_JS}
 
 // ── Stratify ──────────────────────────────────────────────────────────────
 const stratify = d3.stratify().id(d=>d.id).parentId(d=>d.parentId);
@@ -374,7 +395,7 @@ function setLayout(type) {{
 }}
 
 // ── Helpers ───────────────────────────────────────────────────────────────
-function cc(d) {{ return d._ch?d._ch.length:(d.children?d.children.length:0)||''; }}
+function cc(d) {{ return d._ch?d._ch.length:(d.children?d.children.length:(d.data.has_more?d.data.direct_reports:0))||''; }}
 function cut(s,m) {{ if(!s)return''; s=String(s); return s.length>m?s.slice(0,m-1)+'…':s; }}
 
 // Global variable to track selected/focused node
@@ -425,6 +446,8 @@ function shouldShowNode(node) {{
 }}
 
 function toggle(d) {{
+  // Lazy mode: children not shipped yet -> request subtree from server
+  if(!d.children&&!d._ch&&d.data.has_more&&requestSubtree(d.data.id)) return;
   if(d.children){{
     // Collapsing - set as focused to hide other branches
     focusedNode = d;
@@ -522,7 +545,7 @@ function drawHorizontal() {{
   nu.transition().duration(200).attr('transform',d=>`translate(${{d.y}},${{d.x}})`);
   nu.select('.node-box').attr('class',nodeClass);
   nu.select('.nd-name').text(d=>cut(d.data.name, d.data.node_type==='person'?18:24));
-  nu.select('.bg').style('display',d=>(d.children||d._ch)?'block':'none');
+  nu.select('.bg').style('display',d=>(d.children||d._ch||d.data.has_more)?'block':'none');
   nu.select('.tog-t').text(d=>cc(d));
   nd.exit().remove();
 }}
@@ -614,7 +637,7 @@ function drawVertical() {{
   nu.transition().duration(200).attr('transform',d=>`translate(${{d.x-nodeW(d)/2}},${{d.y}})`);
   nu.select('.node-box').attr('class',nodeClass);
   nu.select('.nd-name').text(d=>cut(d.data.name, d.data.node_type==='person'?16:21));
-  nu.select('.bg').style('display',d=>(d.children||d._ch)?'block':'none');
+  nu.select('.bg').style('display',d=>(d.children||d._ch||d.data.has_more)?'block':'none');
   nu.select('.tog-t').text(d=>cc(d));
   nd.exit().remove();
 }}
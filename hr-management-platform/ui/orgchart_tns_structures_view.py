@@ -15,7 +15,9 @@ import streamlit.components.v1 as components
 import json
 from typing import Optional
 
+import config
 from services.orgchart_data_service import get_orgchart_data_service
+from ui.orgchart_lazy import LAZY_EXPAND_JS, get_expanded_ids, build_lazy_config
 from services.lookup_service import get_lookup_service
 
 
@@ -93,46 +95,12 @@ def render_orgchart_tns_structures_view():
                 st.info("Verifica che siano state importate strutture nel database.")
                 return
 
-            # ========== ENRICH NODES WITH TNS STRUCTURE DETAILS ==========
-            all_nodes = nodes.copy()
-            for node in all_nodes:
-                if node.get('id') == 'ROOT':
-                    node['full_name'] = 'ROOT'
-                    node['tns_code'] = 'ROOT'
-                    node['area'] = 'N/D'
-                    node['societa'] = 'N/D'
-                    node['has_padre'] = False
-                    continue
-
-                # Query employee details from TNS structure (cod_tns)
-                tns_details = orgchart_service._query("""
-                    SELECT DISTINCT
-                        cod_tns,
-                        padre_tns,
-                        area,
-                        societa,
-                        titolare
-                    FROM employees
-                    WHERE cod_tns = ?
-                    LIMIT 1
-                """, (node['id'],))
-
-                if tns_details:
-                    emp = tns_details[0]
-                    node['full_name'] = node.get('name', 'N/D')
-                    node['tns_code'] = emp.get('cod_tns') or 'N/D'
-                    node['area'] = emp.get('area') or 'N/D'
-                    node['societa'] = emp.get('societa') or 'N/D'
-                    node['has_padre'] = bool(emp.get('padre_tns') and emp.get('padre_tns') != 'ROOT')
-                else:
-                    node['full_name'] = node.get('name', 'N/D')
-                    node['tns_code'] = node.get('id', 'N/D')
-                    node['area'] = 'N/D'
-                    node['societa'] = 'N/D'
-                    node['has_padre'] = node.get('parentId') != 'ROOT'
+            # TNS details (full_name, tns_code, societa, has_padre) are
+            # already part of the cached payload: no per-node queries here.
+            all_nodes = nodes
 
             # ========== APPLY FILTERS ==========
-            filtered_nodes = all_nodes.copy()
+            filtered_nodes = all_nodes
 
             # Filter 1: Orphans only (structures without padre_tns or padre_tns = ROOT)
             orphans = [n for n in all_nodes if n.get('parentId') == 'ROOT' and n['id'] != 'ROOT']
@@ -183,27 +151,30 @@ def render_orgchart_tns_structures_view():
                         st.dataframe(df_orphans, use_container_width=True, hide_index=True)
 
             # Use filtered nodes for rendering
+            lazy_mode = filtered_nodes is all_nodes and len(all_nodes) > config.ORGCHART_LAZY_THRESHOLD
+
+            if lazy_mode:
+                # Large tree: ship only the top levels, deeper subtrees on expand
+                lazy_data = orgchart_service.get_tree_levels(
+                    'TNS',
+                    max_depth=config.ORGCHART_LAZY_DEPTH,
+                    expanded=get_expanded_ids('org_tns_expand'),
+                    company_id=None,
+                    area_filter=None if area_filter == "Tutte" else area_filter
+                )
+                hierarchy_json = json.dumps(lazy_data['nodes'], ensure_ascii=False)
+                st.caption(f"⚡ Caricamento progressivo: {len(lazy_data['nodes'])} di "
+                           f"{lazy_data['total_nodes']} nodi, espandi un nodo per caricarne i figli")
+            elif filtered_nodes is all_nodes:
+                # Unfiltered: reuse JSON serialized once per data version
+                hierarchy_json = hierarchy_data['nodes_json']
+            else:
+                hierarchy_json = json.dumps(filtered_nodes, ensure_ascii=False)
+            lazy_json = build_lazy_config(lazy_mode, 'org_tns_expand')
             nodes = filtered_nodes
-            hierarchy_json = json.dumps(nodes, ensure_ascii=False)
 
             # Employees grouped by TNS code (for modal detail popup)
-            emp_rows = orgchart_service._query("""
-                SELECT tx_cod_fiscale, titolare, cod_tns, padre_tns
-                FROM employees
-                WHERE cod_tns IS NOT NULL AND cod_tns != ''
-                ORDER BY titolare
-            """)
-            emp_by_struttura = {}
-            for e in emp_rows:
-                tns_code = e['cod_tns']
-                if tns_code not in emp_by_struttura:
-                    emp_by_struttura[tns_code] = []
-                emp_by_struttura[tns_code].append({
-                    'cf':    e['tx_cod_fiscale'],
-                    'name':  e['titolare'] or e['tx_cod_fiscale'],
-                    'roles': []  # Roles not imported yet
-                })
-            emp_json = json.dumps(emp_by_struttura, ensure_ascii=False)
+            emp_json = orgchart_service.get_tns_members_json()
             node_count = len(nodes)
 
             # ── HTML Template ──────────────────────────────────────────
@@ -362,6 +333,8 @@ svg{{width:100%;height:100%}}
 <script>
 const RAW  = {hierarchy_json};
 const EMP  = {emp_json};
+const LAZY = {lazy_json};
+{LAZY_EXPAND_JS}
 
 // Build approver index from node data
 const APPR = {{}};
@@ -431,7 +404,7 @@ function setLayout(type) {{
 }}
 
 // ── Helpers ──────────────────────────────────────────────────────────────
-function cc(d) {{ return d._ch?d._ch.length:(d.children?d.children.length:0)||''; }}
+function cc(d) {{ return d._ch?d._ch.length:(d.children?d.children.length:(d.data.has_more?d.data.direct_reports:0))||''; }}
 function cut(s,m) {{ if(!s)return''; s=String(s); return s.length>m?s.slice(0,m-1)+'…':s; }}
 
 // Enhanced tooltip functions
@@ -513,6 +486,8 @@ function shouldShowNode(node) {{
 }}
 
 function toggle(d) {{
+  // Lazy mode: children not shipped yet -> request subtree from server
+  if(!d.children&&!d._ch&&d.data.has_more&&requestSubtree(d.data.id)) return;
   if(d.children){{
     // Collapsing - collapse this node
     d._ch=d.children;
@@ -608,7 +583,7 @@ function drawHorizontal() {{
   nu.select('.nd-appr').text(d=>cut(apprBadge(d),28))
     .attr('fill',d=>d.data.has_approver?'#22c55e':'#f59e0b');
   nu.select('.nd-cnt') .text(d=>d.data.employee_count>0?d.data.employee_count+' dip.':'');
-  nu.select('.bg').style('display',d=>(d.children||d._ch)?'block':'none');
+  nu.select('.bg').style('display',d=>(d.children||d._ch||d.data.has_more)?'block':'none');
   nu.select('.tog-t').text(d=>cc(d));
   nd.exit().remove();
 }}
@@ -695,7 +670,7 @@ function drawVertical() {{
   nu.select('.nd-appr').text(d=>cut(apprBadge(d),22))
     .attr('fill',d=>d.data.has_approver?'#22c55e':'#f59e0b');
   nu.select('.nd-cnt') .text(d=>d.data.employee_count>0?d.data.employee_count+' dip.':'');
-  nu.select('.bg').style('display',d=>(d.children||d._ch)?'block':'none');
+  nu.select('.bg').style('display',d=>(d.children||d._ch||d.data.has_more)?'block':'none');
   nu.select('.tog-t').text(d=>cc(d));
   nd.exit().remove();
 }}
@@ -708,7 +683,7 @@ function drawSunburst() {{
 
   // Build fresh fully-expanded hierarchy
   const sroot=stratify(RAW.map(d=>Object.assign({{}},d)));
-  sroot.sum(d=>d.data.employee_count||1);
+  sroot.sum(d=>1);
   d3.partition().size([2*Math.PI, radius])(sroot);
 
   const arc=d3.arc()
@@ -765,7 +740,7 @@ function drawTreemap() {{
   const W=el.clientWidth||800, H=el.clientHeight||700;
 
   const troot=stratify(RAW.map(d=>Object.assign({{}},d)));
-  troot.sum(d=>d.data.employee_count||1).sort((a,b)=>b.value-a.value);
+  troot.sum(d=>1).sort((a,b)=>b.value-a.value);
   d3.treemap().size([W,H]).padding(2).paddingTop(20).round(true)(troot);
 
   // Clear existing and reset transform
@@ -0,0 +1,225 @@
+"""
+Pagina "Performance" (nascosta): span più lenti, tempi di rendering per
+pagina e hit rate delle cache, dai dati di services/perf_trace.py;
+query SQLite lente con piano di esecuzione da services/query_trace.py.
+
+Visibile nel ribbon (Impostazioni → Sistema) con config.PERF_PANEL_VISIBLE
+o aprendo l'app con ?perf=1.
+"""
+import pandas as pd
+import streamlit as st
+
+import config
+from services.perf_trace import get_perf_tracer
+from services.query_trace import get_query_log
+
+
+def perf_panel_enabled() -> bool:
+    """True se la pagina Performance va mostrata nel ribbon."""
+    return config.PERF_PANEL_VISIBLE or st.session_state.get('show_perf_panel', False)
+
+
+def _cache_stats() -> pd.DataFrame:
+    """Hit rate delle cache applicative (payload organigrammi, parsing Excel, lookup)."""
+    from services.excel_handler import get_excel_parse_cache
+    from services.lookup_service import LookupService
+    from services.orgchart_data_service import OrgChartDataService
+
+    rows = []
+    payload = OrgChartDataService().get_cache_stats()
+    excel = get_excel_parse_cache().stats()
+    for name, stats in (('Organigrammi (payload)', payload), ('Parsing Excel', excel)):
+        total = stats['hits'] + stats['misses']
+        rows.append({
+            'Cache': name,
+            'Voci': stats['entries'],
+            'Hit': stats['hits'],
+            'Miss': stats['misses'],
+            'Hit rate': f"{stats['hits'] / total:.0%}" if total else '-',
+            'Memoria (MB)': round(stats['total_bytes'] / 1024 / 1024, 1) if 'total_bytes' in stats else None,
+        })
+
+    hits = misses = entries = 0
+    for attr in vars(LookupService).values():
+        if hasattr(attr, 'cache_info'):
+            info = attr.cache_info()
+            hits, misses, entries = hits + info.hits, misses + info.misses, entries + info.currsize
+    total = hits + misses
+    rows.append({
+        'Cache': 'Lookup (anagrafiche)',
+        'Voci': entries,
+        'Hit': hits,
+        'Miss': misses,
+        'Hit rate': f"{hits / total:.0%}" if total else '-',
+        'Memoria (MB)': None,
+    })
+    return pd.DataFrame(rows)
+
+
+def _show_query_log():
+    """Query lente, scansioni complete, indici suggeriti e statistiche per statement."""
+    if not config.QUERY_TRACE_ENABLED:
+        st.info("ℹ️ Tracing query disattivato (config.QUERY_TRACE_ENABLED = False)")
+        return
+
+    query_log = get_query_log()
+    slow = query_log.slow_queries()
+    report = query_log.report()
+    st.caption(f"Soglia {config.SLOW_QUERY_MS} ms · ultime {config.SLOW_QUERY_LOG_MAX} query lente")
+
+    if report['index_suggestions']:
+        st.markdown("**💡 Indici suggeriti**")
+        st.code("\n".join(f"{s['create_index']};" for s in report['index_suggestions']), language="sql")
+
+    if report['full_scans']:
+        st.markdown("**🔍 Scansioni complete di tabella**")
+        st.dataframe(pd.DataFrame([{
+            'Tabella': s['table'],
+            'Query lente': s['occurrences'],
+            'Statement distinte': s['statements'],
+            'Totale (ms)': round(s['total_s'] * 1000, 1),
+        } for s in report['full_scans']]), use_container_width=True, hide_index=True)
+
+    if report['findings']:
+        st.markdown("**⚠️ Problemi rilevati**")
+        st.dataframe(pd.DataFrame([{
+            'Tipo': f['kind'],
+            'Dettaglio': f['detail'],
+            'Suggerimento': f['suggestion'],
+            'Occorrenze': f['occurrences'],
+            'Totale (ms)': round(f['total_s'] * 1000, 1),
+            'Esempio': f['sql'][:200],
+        } for f in report['findings']]), use_container_width=True, hide_index=True)
+
+    st.markdown("**🐌 Query lente**")
+    if slow:
+        for q in reversed(slow[-50:]):
+            with st.expander(f"{q.duration_s * 1000:,.0f} ms · {q.rows:,} righe · "
+                             f"{q.started_at.strftime('%H:%M:%S')} · {q.sql[:80]}"):
+                st.code(q.sql, language="sql")
+                if q.params_shape:
+                    st.caption(f"Parametri: {q.params_shape}")
+                if q.plan:
+                    st.code("\n".join(q.plan), language="text")
+                for f in q.findings:
+                    st.markdown(f"- **{f['kind']}** · {f['detail']} → {f['suggestion']}")
+    else:
+        st.caption("Nessuna query oltre soglia")
+
+    stats = query_log.statement_stats()
+    if stats:
+        st.markdown("**📊 Statement per tempo totale**")
+        st.dataframe(pd.DataFrame([{
+            'Statement': e['sql'][:200],
+            'Esecuzioni': e['calls'],
+            'Totale (ms)': round(e['total_s'] * 1000, 1),
+            'Media (ms)': round(e['mean_s'] * 1000, 2),
+            'Max (ms)': round(e['max_s'] * 1000, 1),
+            'Righe': e['rows'],
+        } for e in stats]), use_container_width=True, hide_index=True)
+
+
+def show_performance_view():
+    """Vista principale pagina Performance."""
+    st.markdown("### ⏱️ Performance")
+    tracer = get_perf_tracer()
+
+    if not tracer.enabled:
+        st.info("ℹ️ Strumentazione disattivata (config.PERF_TRACE_ENABLED = False)")
+        return
+
+    spans = tracer.spans()
+    reruns = [r for r in tracer.reruns() if r.duration_s is not None]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Span registrati", f"{len(spans):,}", help=f"Ultimi {config.PERF_MAX_SPANS}")
+    col2.metric("Rerun registrati", f"{len(reruns):,}", help=f"Ultimi {config.PERF_MAX_RERUNS}")
+    if reruns:
+        col3.metric("Ultimo rerun", f"{reruns[-1].duration_s * 1000:,.0f} ms", help=reruns[-1].page)
+        col4.metric("Tempo medio rerun", f"{sum(r.duration_s for r in reruns) / len(reruns) * 1000:,.0f} ms")
+
+    tab_slow, tab_ops, tab_pages, tab_rerun, tab_queries, tab_cache = st.tabs([
+        "🐢 Span più lenti", "📊 Per operazione", "📄 Pagine", "🔁 Ultimo rerun", "🐌 Query lente", "💾 Cache"
+    ])
+
+    with tab_slow:
+        categories = sorted({s.category for s in spans})
+        col_cat, col_limit = st.columns([3, 1])
+        selected = col_cat.multiselect("Categorie", categories, default=categories, key="perf_categories")
+        limit = col_limit.number_input("Righe", min_value=10, max_value=500, value=50, step=10, key="perf_limit")
+        slowest = [s for s in tracer.slowest_spans(len(spans)) if s.category in selected][:int(limit)]
+        if slowest:
+            st.dataframe(pd.DataFrame([{
+                'Operazione': s.name,
+                'Categoria': s.category,
+                'Durata (ms)': round(s.duration_s * 1000, 1),
+                'Righe': s.rows,
+                'Chiamata da': s.parent or '',
+                'Pagina': s.page or '(background)',
+                'Ora': s.started_at.strftime('%H:%M:%S'),
+                'Errore': s.error or '',
+            } for s in slowest]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nessuno span registrato")
+
+    with tab_ops:
+        summary = tracer.span_summary()
+        if summary:
+            st.dataframe(pd.DataFrame([{
+                'Operazione': e['name'],
+                'Categoria': e['category'],
+                'Chiamate': e['calls'],
+                'Totale (ms)': round(e['total_s'] * 1000, 1),
+                'Media (ms)': round(e['mean_s'] * 1000, 1),
+                'Max (ms)': round(e['max_s'] * 1000, 1),
+                'Righe': e['rows'],
+                'Errori': e['errors'],
+            } for e in summary]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nessuno span registrato")
+
+    with tab_pages:
+        pages = tracer.page_summary()
+        if pages:
+            st.dataframe(pd.DataFrame([{
+                'Pagina': p['page'],
+                'Render': p['renders'],
+                'Media (ms)': round(p['mean_s'] * 1000, 1),
+                'P95 (ms)': round(p['p95_s'] * 1000, 1),
+                'Max (ms)': round(p['max_s'] * 1000, 1),
+                'Ultimo (ms)': round(p['last_s'] * 1000, 1),
+                'Span per render': round(p['spans_per_render'], 1),
+            } for p in pages]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nessun rerun completato")
+
+    with tab_rerun:
+        # Il rerun in corso (questa pagina) si chiude dopo il rendering
+        if reruns:
+            last = reruns[-1]
+            st.caption(f"Pagina **{last.page}** · {last.started_at.strftime('%H:%M:%S')} · "
+                       f"{last.duration_s * 1000:,.0f} ms")
+            if last.calls:
+                st.dataframe(pd.DataFrame([{
+                    'Operazione': name,
+                    'Chiamate': int(calls),
+                    'Totale (ms)': round(total * 1000, 1),
+                    'Righe': int(rows),
+                } for name, (calls, total, rows) in sorted(
+                    last.calls.items(), key=lambda item: item[1][1], reverse=True
+                )]), use_container_width=True, hide_index=True)
+            else:
+                st.caption("Nessuna operazione strumentata nel rerun")
+        else:
+            st.caption("Nessun rerun completato")
+
+    with tab_queries:
+        _show_query_log()
+
+    with tab_cache:
+        st.dataframe(_cache_stats(), use_container_width=True, hide_index=True)
+
+    if st.button("🗑️ Svuota dati performance", key="perf_clear"):
+        tracer.clear()
+        get_query_log().clear()
+        st.rerun()
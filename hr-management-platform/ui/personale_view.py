@@ -77,6 +77,34 @@ def save_changes_to_db(original_df, edited_df, full_df):
         return 0
 
 
+def validate_saved_rows(personale_df, filtered_df, display_df, edited_df):
+    """
+    Validazione incrementale delle righe salvate dal data editor.
+
+    Riporta i valori modificati su personale_df (il reload dal DB produrrà
+    gli stessi valori) e valida solo quelle righe; l'esito viene mostrato
+    dopo il rerun.
+    """
+    changed_rows = []
+    for pos in range(min(len(display_df), len(edited_df))):
+        original_row = display_df.iloc[pos]
+        edited_row = edited_df.iloc[pos]
+        if original_row.equals(edited_row):
+            continue
+        label = filtered_df.index[pos]
+        for col in edited_df.columns:
+            if col in personale_df.columns and str(original_row[col]) != str(edited_row[col]):
+                personale_df.at[label, col] = edited_row[col]
+        changed_rows.append(label)
+
+    if not changed_rows:
+        return
+
+    result = DataValidator.validate_changes(personale_df, 'personale', changed_rows=changed_rows)
+    if not result.is_valid():
+        st.session_state.personale_validation_warning = result.get_summary()
+
+
 def show_personale_view():
     """UI per gestione dipendenti con master-detail pattern"""
 
@@ -200,6 +228,11 @@ def show_personale_view():
     # === FULL-WIDTH TABLE ===
     st.markdown("### 📋 Lista Dipendenti")
 
+    # Esito validazione dell'ultimo salvataggio (solo righe modificate)
+    validation_warning = st.session_state.pop('personale_validation_warning', None)
+    if validation_warning:
+        st.warning(f"⚠️ Righe salvate con errori di validazione - {validation_warning}")
+
     if len(filtered_df) > 0:
         # Create dynamic dataframe with selected columns
         display_df = filtered_df[columns_to_show].copy()
@@ -298,6 +331,7 @@ def show_personale_view():
                     with st.spinner("Salvataggio in corso..."):
                         changes_count = save_changes_to_db(display_df, edited_df, personale_df)
                         if changes_count > 0:
+                            validate_saved_rows(personale_df, filtered_df, display_df, edited_df)
                             st.success(f"✅ {changes_count} record aggiornati nel database!")
                             # Force reload data from DB
                             st.session_state.data_loaded = False
@@ -5,6 +5,7 @@ Gestisce le posizioni organizzative (ID) con associazione opzionale a dipendente
 import streamlit as st
 import pandas as pd
 from services.database import DatabaseHandler
+from services.validator import DataValidator
 
 
 def show_posizioni_view():
@@ -328,6 +329,11 @@ def show_posizioni_view():
             width="medium"
         )
 
+    # Esito validazione dell'ultimo salvataggio (solo righe modificate)
+    validation_warning = st.session_state.pop('posizioni_validation_warning', None)
+    if validation_warning:
+        st.warning(f"⚠️ Posizioni salvate con errori di validazione - {validation_warning}")
+
     # Data editor
     edited_df = st.data_editor(
         filtered_df[display_cols],
@@ -465,6 +471,8 @@ def save_positions_changes(edited_df, original_filtered_df, full_personale_df):
 
         # Trova le righe modificate confrontando i dataframe
         # Aggiorna solo i campi modificabili (non ID)
+        baseline_df = st.session_state.get('personale_df')
+        changed_rows = []
 
         for idx in edited_df.index:
             if idx in original_filtered_df.index:
@@ -482,6 +490,8 @@ def save_positions_changes(edited_df, original_filtered_df, full_personale_df):
                             changes[field] = edited_row[field]
 
                 if changes:
+                    changed_rows.append(idx)
+
                     # Aggiorna nel dataframe principale
                     for field, value in changes.items():
                         if field in full_personale_df.columns:
@@ -493,6 +503,15 @@ def save_positions_changes(edited_df, original_filtered_df, full_personale_df):
                     # Per ora aggiorniamo il session state
                     st.session_state.personale_df = full_personale_df
 
+        # Validazione incrementale delle sole posizioni modificate
+        if changed_rows:
+            result = DataValidator.validate_changes(
+                full_personale_df, 'personale', changed_rows=changed_rows, baseline=baseline_df
+            )
+            if not result.is_valid():
+                # Mostrato dopo il rerun (vedi show_posizioni_view)
+                st.session_state.posizioni_validation_warning = result.get_summary()
+
         return True
 
     except Exception as e:
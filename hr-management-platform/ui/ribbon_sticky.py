@@ -530,6 +530,10 @@ def _render_versioni_submenu():
                                 st.session_state.db_tns_df = None
                                 st.session_state.show_clear_db_confirm = False
 
+                                # Cache parsing Excel: contiene i dati personali dei file letti
+                                from services.excel_handler import get_excel_parse_cache
+                                get_excel_parse_cache().clear()
+
                                 st.rerun()
                             else:
                                 st.error(f"❌ {result['message']}")
@@ -565,6 +569,11 @@ def _render_impostazioni_submenu():
             st.info("Impostazioni database in sviluppo")
         if st.button("🔐 Permessi", key="cmd_permissions", use_container_width=True):
             st.info("Gestione permessi in sviluppo")
+        from ui.performance_view import perf_panel_enabled
+        if perf_panel_enabled():
+            if st.button("⏱️ Performance", key="cmd_performance", use_container_width=True):
+                st.session_state.current_page = "Performance"
+                st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col3:
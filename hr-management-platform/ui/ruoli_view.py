@@ -6,6 +6,7 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from ui.styles import render_filter_badge
+from services.validator import DataValidator
 import config
 
 # Costanti
@@ -226,6 +227,11 @@ def show_role_detail_panel(personale_df: pd.DataFrame, filtered_df: pd.DataFrame
                         except Exception as e:
                             st.warning(f"⚠️ Errore persistenza database: {str(e)}")
 
+                        # Validazione incrementale: solo il record modificato
+                        result = DataValidator.validate_changes(personale_df, 'personale', changed_rows=[idx])
+                        if not result.is_valid():
+                            st.warning(f"⚠️ {result.errors[0]['field']}: {result.errors[0]['message']}")
+
     # === BOTTONI AZIONE ===
     col1, col2 = st.columns(2)
 
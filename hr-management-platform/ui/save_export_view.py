@@ -4,6 +4,7 @@ UI per salvataggio ed export dei dati
 import streamlit as st
 from pathlib import Path
 import config
+from services.tabular_io import available_export_formats, EXPORT_MIME_TYPES
 
 def show_save_export_view():
     """UI per salvare ed esportare dati"""
@@ -87,17 +88,42 @@ def show_save_export_view():
             if db_tns_df is None:
                 st.warning("⚠️ DB_TNS non ancora generato")
         
+        export_formats = available_export_formats()
+        export_format = st.selectbox(
+            "Formato",
+            list(export_formats),
+            format_func=export_formats.get,
+            help="CSV/Parquet: archivio .zip con un file per foglio, per job payroll/BI"
+        )
+        
+        database_handler = st.session_state.get('database_handler')
+        from_database = st.checkbox(
+            "Esporta direttamente dal database",
+            value=False,
+            disabled=database_handler is None,
+            help="Legge le tabelle a blocchi e scrive in streaming: consigliato per l'intero gruppo"
+        )
+        
         if st.button("📤 Esporta", type="primary", use_container_width=True):
             with st.spinner("Export in corso..."):
                 try:
-                    db_to_export = db_tns_df if include_db_tns else None
-                    
-                    export_path = excel_handler.export_to_output(
-                        personale_df,
-                        strutture_df,
-                        db_to_export,
-                        prefix=export_prefix
-                    )
+                    if from_database:
+                        export_path = excel_handler.export_from_database(
+                            database_handler,
+                            include_db_tns=include_db_tns,
+                            prefix=export_prefix,
+                            export_format=export_format
+                        )
+                    else:
+                        db_to_export = db_tns_df if include_db_tns else None
+                        
+                        export_path = excel_handler.export_to_output(
+                            personale_df,
+                            strutture_df,
+                            db_to_export,
+                            prefix=export_prefix,
+                            export_format=export_format
+                        )
                     
                     st.success(f"✅ File esportato con successo!")
                     st.info(f"📁 Path: {export_path}")
@@ -108,7 +134,7 @@ def show_save_export_view():
                             label="⬇️ Scarica file esportato",
                             data=f,
                             file_name=export_path.name,
-                            mime="application/vnd.ms-excel"
+                            mime=EXPORT_MIME_TYPES.get(export_path.suffix.lstrip('.'), "application/vnd.ms-excel")
                         )
                 
                 except Exception as e:
@@ -142,8 +142,8 @@ def show_search_view():
 
     elif query_type == "cicli":
         # Rileva cicli nelle strutture
-        from models.strutture import detect_cycles
-        cycles = detect_cycles(strutture_df)
+        from services.hierarchy_integrity import get_hierarchy_integrity
+        cycles = get_hierarchy_integrity(strutture_df).report.cycles
         if cycles:
             cicli_codici = [item for cycle in cycles for item in cycle]
             results_strutture = strutture_df[strutture_df['Codice'].isin(cicli_codici)]
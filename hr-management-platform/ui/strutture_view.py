@@ -7,6 +7,9 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from services.validator import DataValidator
+from services.structure_tree import StructureTree, get_structure_tree
+from services.data_quality import get_data_quality_engine
+from services.hierarchy_integrity import get_hierarchy_integrity, invalidate_hierarchy_integrity
 from ui.styles import render_filter_badge
 
 def show_strutture_view():
@@ -26,13 +29,14 @@ def show_strutture_view():
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Totale strutture", len(strutture_df))
+    quality_counts = get_data_quality_engine(
+        st.session_state.get('database_handler'), st.session_state
+    ).get_counts(personale_df, strutture_df)
     with col2:
-        complete = DataValidator.find_incomplete_records_strutture(strutture_df)
-        complete_count = len(strutture_df) - len(complete)
+        complete_count = len(strutture_df) - quality_counts['incomplete_strutture']
         st.metric("Record completi", complete_count)
     with col3:
-        orphans = DataValidator.find_orphan_structures(strutture_df, personale_df)
-        st.metric("Strutture orfane", len(orphans), delta_color="inverse")
+        st.metric("Strutture orfane", quality_counts['orphan_strutture'], delta_color="inverse")
     with col4:
         roots = strutture_df['UNITA\' OPERATIVA PADRE '].isna().sum()
         st.metric("Root", roots)
@@ -172,8 +176,9 @@ def show_structure_detail_panel(strutture_df: pd.DataFrame, personale_df: pd.Dat
     st.caption(f"Codice: `{record['Codice']}`")
 
     # Conta dipendenti associati
-    num_dipendenti = len(personale_df[personale_df['UNITA\' OPERATIVA PADRE '] == selected_codice])
-    num_sotto_strutture = len(strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == selected_codice])
+    tree = get_structure_tree(strutture_df, personale_df)
+    num_dipendenti = tree.direct_employee_count(selected_codice)
+    num_sotto_strutture = tree.child_count(selected_codice)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -192,6 +197,14 @@ def show_structure_detail_panel(strutture_df: pd.DataFrame, personale_df: pd.Dat
 
     with col2:
         new_padre = st.text_input("Unità Operativa Padre", value=record['UNITA\' OPERATIVA PADRE '] or "", key="edit_padre_strut")
+
+        # Controllo immediato del nuovo padre (O(profondità), ad ogni modifica)
+        if new_padre and new_padre != record['UNITA\' OPERATIVA PADRE ']:
+            integrity = _hierarchy_integrity(strutture_df)
+            if not integrity.parent_exists(new_padre):
+                st.warning(f"⚠️ Il padre '{new_padre}' non esiste nelle strutture")
+            elif integrity.would_create_cycle(selected_codice, new_padre):
+                st.error("❌ Questo padre creerebbe un ciclo gerarchico")
         new_livello = st.text_input("Livello", value=record['LIVELLO'] or "", key="edit_livello_strut")
 
     # === SEZIONE 2: ORGANIZZAZIONE (expander) ===
@@ -279,6 +292,7 @@ def show_structure_detail_panel(strutture_df: pd.DataFrame, personale_df: pd.Dat
                 strutture_df.at[idx, 'Campo20'] = new_campo20 if new_campo20 else None
                 strutture_df.at[idx, 'Campo21'] = new_campo21 if new_campo21 else None
                 strutture_df.at[idx, 'Campo22'] = new_campo22 if new_campo22 else None
+                invalidate_hierarchy_integrity()
 
                 # === PERSISTI NEL DATABASE ===
                 try:
@@ -372,30 +386,13 @@ def would_create_cycle(strutture_df: pd.DataFrame, codice: str, new_padre: str)
     Returns:
         True se creerebbe un ciclo, False altrimenti
     """
-    if not new_padre:
-        return False
-
-    visited = set()
-    current = new_padre
-
-    # Risali la catena dal nuovo padre fino a root
-    while current and current not in visited:
-        if current == codice:
-            # Ciclo trovato!
-            return True
-
-        visited.add(current)
+    return _hierarchy_integrity(strutture_df).would_create_cycle(codice, new_padre)
 
-        # Trova il padre di current
-        parent_row = strutture_df[strutture_df['Codice'] == current]
-        if len(parent_row) == 0:
-            break
-
-        current = parent_row.iloc[0]['UNITA\' OPERATIVA PADRE ']
-        if pd.isna(current):
-            break
-
-    return False
+def _hierarchy_integrity(strutture_df: pd.DataFrame):
+    """Motore di integrità riusato per versione dati (niente impronta del frame ad ogni modifica)."""
+    db_handler = st.session_state.get('database_handler')
+    data_version = db_handler.get_data_version() if db_handler is not None else None
+    return get_hierarchy_integrity(strutture_df, data_version)
 
 def show_add_tab(strutture_df: pd.DataFrame):
     """Tab per aggiungere nuova struttura"""
@@ -475,6 +472,9 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
         horizontal=True
     )
 
+    # Indice gerarchia condiviso (ricostruito solo al cambio dati)
+    tree = get_structure_tree(strutture_df, personale_df)
+
     if view_mode == "Vista Accordion":
         st.markdown("#### Vista Accordion")
 
@@ -493,7 +493,7 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
             )
 
         # Root structures
-        root_structures = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '].isna()]
+        root_structures = tree.roots_df()
 
         if len(root_structures) == 0:
             st.warning("Nessuna struttura root trovata")
@@ -510,8 +510,7 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
             for idx, root in filtered_roots.iterrows():
                 show_accordion_compact(
                     root,
-                    strutture_df,
-                    personale_df,
+                    tree,
                     level=0,
                     unique_key=f"root_{idx}",
                     hide_empty=hide_empty,
@@ -524,11 +523,11 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
         selected_code = st.selectbox(
             "Struttura",
             options=strutture_df['Codice'].tolist(),
-            format_func=lambda c: f"{c} - {strutture_df[strutture_df['Codice']==c]['DESCRIZIONE'].iloc[0]}"
+            format_func=lambda c: f"{c} - {tree.description(c)}"
         )
 
         if selected_code:
-            path = get_hierarchy_path(strutture_df, selected_code)
+            path = tree.path(selected_code)
 
             st.markdown("#### Percorso gerarchico (da root):")
             for i, (code, desc) in enumerate(path):
@@ -536,7 +535,7 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
                 st.text(f"{indent}{'└─' if i > 0 else '▪'} [{code}] {desc}")
 
             # Figli diretti
-            children = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == selected_code]
+            children = tree.children_df(selected_code)
             if len(children) > 0:
                 st.markdown("#### Figli diretti:")
                 st.dataframe(
@@ -546,7 +545,7 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
                 )
 
             # Dipendenti associati
-            dipendenti = personale_df[personale_df['UNITA\' OPERATIVA PADRE '] == selected_code]
+            dipendenti = tree.employees_df(selected_code)
             if len(dipendenti) > 0:
                 st.markdown(f"#### 👥 Dipendenti ({len(dipendenti)}):")
                 st.dataframe(
@@ -557,34 +556,9 @@ def show_hierarchy_tab(strutture_df: pd.DataFrame, personale_df: pd.DataFrame):
 
 # === FUNZIONI HELPER PER GERARCHIA (mantenute dall'originale) ===
 
-def get_hierarchy_path(strutture_df: pd.DataFrame, codice: str) -> list:
-    """Costruisce percorso gerarchico da root a codice dato"""
-    path = []
-    current = codice
-    visited = set()
-
-    while current and current not in visited:
-        visited.add(current)
-
-        row = strutture_df[strutture_df['Codice'] == current]
-        if len(row) == 0:
-            break
-
-        desc = row.iloc[0]['DESCRIZIONE']
-        path.insert(0, (current, desc))
-
-        padre = row.iloc[0]['UNITA\' OPERATIVA PADRE ']
-        if pd.isna(padre):
-            break
-
-        current = padre
-
-    return path
-
 def show_accordion_compact(
     structure_row,
-    strutture_df: pd.DataFrame,
-    personale_df: pd.DataFrame,
+    tree: StructureTree,
     level: int = 0,
     unique_key: str = "",
     hide_empty: bool = False,
@@ -594,8 +568,8 @@ def show_accordion_compact(
     code = structure_row['Codice']
     desc = structure_row['DESCRIZIONE']
 
-    children_structs = strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == code]
-    dipendenti = personale_df[personale_df['UNITA\' OPERATIVA PADRE '] == code]
+    children_structs = tree.children_df(code)
+    dipendenti = tree.employees_df(code)
 
     if hide_empty and len(dipendenti) == 0:
         return
@@ -611,13 +585,13 @@ def show_accordion_compact(
         ):
             render_compact_content(
                 code, desc, children_structs, dipendenti,
-                strutture_df, personale_df, level, unique_key,
+                tree, level, unique_key,
                 hide_empty
             )
     else:
         render_compact_content(
             code, desc, children_structs, dipendenti,
-            strutture_df, personale_df, level, unique_key,
+            tree, level, unique_key,
             hide_empty
         )
 
@@ -626,8 +600,7 @@ def render_compact_content(
     desc: str,
     children_structs: pd.DataFrame,
     dipendenti: pd.DataFrame,
-    strutture_df: pd.DataFrame,
-    personale_df: pd.DataFrame,
+    tree: StructureTree,
     level: int,
     unique_key: str,
     hide_empty: bool = False
@@ -666,8 +639,8 @@ def render_compact_content(
                 child_code = child['Codice']
                 child_desc = child['DESCRIZIONE']
 
-                child_children = len(strutture_df[strutture_df['UNITA\' OPERATIVA PADRE '] == child_code])
-                child_deps = len(personale_df[personale_df['UNITA\' OPERATIVA PADRE '] == child_code])
+                child_children = tree.child_count(child_code)
+                child_deps = tree.direct_employee_count(child_code)
 
                 if hide_empty and child_deps == 0:
                     continue
@@ -698,8 +671,7 @@ def render_compact_content(
                     with st.container():
                         show_accordion_compact(
                             child,
-                            strutture_df,
-                            personale_df,
+                            tree,
                             level + 1,
                             unique_key=f"{unique_key}_c{idx}",
                             hide_empty=hide_empty
@@ -4,13 +4,16 @@ Vista Streamlit per la verifica di consistenza DB-Excel.
 import streamlit as st
 import pandas as pd
 from pathlib import Path
-from typing import List
+from typing import List, Union
 import io
 
-from models.sync_models import PersonMismatch, SyncCheckResult
+from models.sync_models import MISMATCH_COLUMNS, MismatchSet, PersonMismatch, SyncCheckResult
 from services.sync_checker import SyncChecker
 import config
 
+# Righe per pagina nelle tabelle delle inconsistenze
+MISMATCH_PAGE_SIZE = 100
+
 def show_sync_check_view():
     """Vista principale per la verifica di consistenza DB-Excel."""
 
@@ -238,7 +241,7 @@ def _show_results(result: SyncCheckResult):
         st.success("✅ Nessun problema da visualizzare.")
 
 def _show_mismatch_table(
-    mismatches: List[PersonMismatch],
+    mismatches: Union[MismatchSet, List[PersonMismatch]],
     title: str,
     show_responsabile: bool = False,
     show_flag: bool = False
@@ -246,8 +249,11 @@ def _show_mismatch_table(
     """
     Mostra una tabella con i dettagli delle inconsistenze.
 
+    Ricerca e download CSV lavorano sul frame del MismatchSet; gli oggetti
+    PersonMismatch sono costruiti solo per la pagina visualizzata.
+
     Args:
-        mismatches: Lista di PersonMismatch da visualizzare
+        mismatches: MismatchSet (o lista di PersonMismatch) da visualizzare
         title: Titolo della tabella
         show_responsabile: Se True, mostra colonne responsabile
         show_flag: Se True, mostra colonna flag Approvatore
@@ -255,11 +261,43 @@ def _show_mismatch_table(
     if not mismatches:
         return
 
+    if not isinstance(mismatches, MismatchSet):
+        mismatches = MismatchSet(pd.DataFrame(
+            [m.model_dump(by_alias=True) for m in mismatches], columns=MISMATCH_COLUMNS
+        ))
+
     st.markdown(f"**{title}**")
 
-    # Costruisci DataFrame per visualizzazione
+    # Filtro ricerca (solo se >10 righe)
+    if len(mismatches) > 10:
+        search = st.text_input(
+            "🔎 Cerca (Nome o CF)",
+            key=f"search_{title[:20]}",
+            help="Filtra la tabella per nome o codice fiscale"
+        )
+
+        if search:
+            frame = mismatches.frame
+            mask = (
+                frame['titolare'].astype(str).str.contains(search, case=False, na=False, regex=False) |
+                frame['TxCodFiscale'].astype(str).str.contains(search, case=False, na=False, regex=False)
+            )
+            mismatches = mismatches.subset(mask)
+
+    # Paginazione: solo la pagina corrente diventa PersonMismatch
+    total_pages = max(1, -(-len(mismatches) // MISMATCH_PAGE_SIZE))
+    page = 1
+    if total_pages > 1:
+        page = st.number_input(
+            f"Pagina (di {total_pages})",
+            min_value=1,
+            max_value=total_pages,
+            value=1,
+            key=f"page_{title[:20]}"
+        )
+
     data = []
-    for m in mismatches:
+    for m in mismatches.page(int(page) - 1, MISMATCH_PAGE_SIZE):
         row = {
             'Codice Fiscale': m.codice_fiscale,
             'Codice': m.codice or 'N/D',
@@ -277,39 +315,44 @@ def _show_mismatch_table(
 
         data.append(row)
 
-    df = pd.DataFrame(data)
-
-    # Filtro ricerca (solo se >10 righe)
-    if len(df) > 10:
-        search = st.text_input(
-            "🔎 Cerca (Nome o CF)",
-            key=f"search_{title[:20]}",
-            help="Filtra la tabella per nome o codice fiscale"
-        )
-
-        if search:
-            mask = (
-                df['Nome'].str.contains(search, case=False, na=False) |
-                df['Codice Fiscale'].str.contains(search, case=False, na=False)
-            )
-            df = df[mask]
-
     # Mostra tabella
     st.dataframe(
-        df,
+        pd.DataFrame(data),
         use_container_width=True,
         hide_index=True
     )
+    st.caption(f"{len(mismatches)} righe")
 
-    # Download CSV
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
-    csv_data = csv_buffer.getvalue()
-
+    # Download CSV (tutte le righe filtrate, direttamente dal frame)
     st.download_button(
         label="📥 Scarica CSV",
-        data=csv_data,
+        data=_mismatch_csv(mismatches, show_responsabile, show_flag),
         file_name=f"inconsistenze_{title[:30].replace(' ', '_')}.csv",
         mime="text/csv",
         help="Scarica questa tabella in formato CSV"
     )
+
+
+def _mismatch_csv(mismatches: MismatchSet, show_responsabile: bool, show_flag: bool) -> str:
+    """CSV con le stesse colonne della tabella, costruito in modo vettoriale."""
+    frame = mismatches.frame
+    columns = {
+        'TxCodFiscale': 'Codice Fiscale',
+        'codice': 'Codice',
+        'titolare': 'Nome',
+        'unita_organizzativa': 'Unità Organizzativa',
+        'details': 'Dettagli',
+    }
+    if show_responsabile:
+        columns['responsabile_codice'] = 'Resp. Codice'
+        columns['responsabile_nome'] = 'Resp. Nome'
+    if show_flag:
+        columns['responsabile_approvatore_flag'] = 'Flag Approvatore'
+
+    df = frame[list(columns)].rename(columns=columns)
+    na_columns = [c for c in df.columns if c not in ('Codice Fiscale', 'Nome', 'Dettagli')]
+    df[na_columns] = df[na_columns].fillna('N/D')
+
+    csv_buffer = io.StringIO()
+    df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
+    return csv_buffer.getvalue()
@@ -7,6 +7,10 @@ from datetime import datetime
 from pathlib import Path
 import config
 from services.version_manager import VersionManager
+from services.background_jobs import restore_snapshot_job
+from services.job_runner import SUCCEEDED, JobQueueFull, get_job_runner
+from services.tabular_io import available_export_formats, EXPORT_MIME_TYPES
+from ui.job_status_view import render_job_status, render_recent_jobs
 
 def show_version_management_view():
     """
@@ -46,6 +50,10 @@ def show_version_management_view():
         current_version = versions[0]['id'] if versions else 0
         st.metric("🔢 Versione Corrente", f"#{current_version}")
 
+    # Job in background (import, snapshot, ripristini, merge)
+    with st.expander("⚙️ Job in background"):
+        render_recent_jobs()
+
     # === LISTA SNAPSHOT ===
     st.markdown("### 📋 Snapshot Disponibili")
 
@@ -147,15 +155,15 @@ def show_version_management_view():
                 help="ATTENZIONE: Questa operazione sovrascriverà tutti i dati attuali nel database!"
             )
 
-            if st.button("🔄 Ripristina Questa Versione", type="primary", disabled=not confirm, use_container_width=True):
-                with st.spinner("Ripristino in corso..."):
-                    success, message = vm.restore_snapshot(
-                        selected_snapshot['file_path'],
-                        create_backup=create_backup
-                    )
-
-                    if success:
-                        st.success(message)
+            # Ripristino in corso/terminato in background
+            restore_job_id = st.session_state.get('restore_snapshot_job')
+            if restore_job_id:
+                job = render_job_status(restore_job_id, key="restore_snapshot")
+                del st.session_state.restore_snapshot_job
+                if job is not None and job.status == SUCCEEDED:
+                    outcome = get_job_runner().get_result(restore_job_id)
+                    if outcome['success']:
+                        st.success(outcome['message'])
                         st.balloons()
 
                         # Ricarica dati in session state
@@ -163,9 +171,53 @@ def show_version_management_view():
                         load_data_from_db()
 
                         st.info("🔄 Aggiorna la pagina per vedere i dati ripristinati")
-                        st.rerun()
                     else:
-                        st.error(message)
+                        st.error(outcome['message'])
+
+            if st.button("🔄 Ripristina Questa Versione", type="primary", disabled=not confirm, use_container_width=True):
+                try:
+                    st.session_state.restore_snapshot_job = get_job_runner().submit(
+                        'restore_snapshot',
+                        restore_snapshot_job,
+                        db,
+                        selected_snapshot['file_path'],
+                        create_backup,
+                        label=f"Ripristino versione #{selected_snapshot_row['import_version_id']}"
+                    )
+                    st.rerun()
+                except JobQueueFull as e:
+                    st.error(f"❌ {e}")
+
+        # Export snapshot per job esterni (payroll, BI)
+        st.markdown("#### 📤 Esporta Versione")
+        export_formats = available_export_formats()
+        snapshot_format = st.selectbox(
+            "Formato export",
+            list(export_formats),
+            format_func=export_formats.get,
+            key="snapshot_export_format",
+            help="CSV/Parquet: archivio .zip con personale e strutture"
+        )
+
+        if st.button("📤 Esporta Snapshot", use_container_width=True):
+            with st.spinner("Export in corso..."):
+                try:
+                    export_name = Path(selected_snapshot['file_path']).stem
+                    export_path = vm.export_snapshot(
+                        selected_snapshot['file_path'],
+                        config.OUTPUT_DIR / export_name,
+                        snapshot_format
+                    )
+                    with open(export_path, 'rb') as f:
+                        st.download_button(
+                            label="⬇️ Scarica Snapshot",
+                            data=f,
+                            file_name=export_path.name,
+                            mime=EXPORT_MIME_TYPES.get(export_path.suffix.lstrip('.'), 'application/octet-stream'),
+                            use_container_width=True
+                        )
+                except Exception as e:
+                    st.error(f"❌ Errore export snapshot: {str(e)}")
 
     with col2:
         st.markdown("#### 🗑️ Gestione Spazio")
@@ -17,6 +17,7 @@ import json
 from pathlib import Path
 from typing import Dict, Tuple, Optional
 from ui.wizard_state_manager import get_import_wizard
+from services.tabular_io import read_table, write_table, interchange_suffix, UPLOAD_TYPES
 
 
 def auto_detect_columns(df: pd.DataFrame) -> Tuple[Dict[str, str], float]:
@@ -135,9 +136,9 @@ def render_step_1_upload(wizard):
 
     uploaded_file = st.file_uploader(
         "Scegli un file",
-        type=['xls', 'xlsx', 'xlsm'],
+        type=UPLOAD_TYPES,
         key="wizard_file_uploader",
-        help="File Excel con foglio 'DB_ORG'"
+        help="File Excel con foglio 'DB_ORG' (oppure CSV/Parquet con le stesse colonne)"
     )
 
     if uploaded_file:
@@ -147,7 +148,8 @@ def render_step_1_upload(wizard):
 
         try:
             # Read Excel file
-            df = pd.read_excel(uploaded_file, sheet_name='DB_ORG')
+            # Cache di parsing: i rerun dello step non rileggono il file
+            df = read_table(uploaded_file, 'DB_ORG')
             wizard.set_data('uploaded_file', uploaded_file)
             wizard.set_data('file_df', df)
             wizard.set_data('filename', uploaded_file.name)
@@ -542,6 +544,9 @@ def render_step_4_execution(wizard):
     # Execution
     st.markdown("---")
 
+    if wizard.get_data('import_job_id'):
+        render_import_job(wizard)
+
     if not wizard.get_data('import_executed', False):
         col1, col2, col3 = st.columns([1, 1, 1])
 
@@ -587,45 +592,62 @@ def execute_import(wizard):
         st.warning(f"⚠️ Colonna 'CF Responsabile Diretto' NON trovata! Colonne presenti: {list(df_renamed.columns[:10])}")
 
     # Create temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx', mode='wb') as tmp:
-        df_renamed.to_excel(tmp.name, sheet_name='DB_ORG', index=False)
+    # Create temp file (Parquet se disponibile: scrittura/rilettura molto più veloci)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=interchange_suffix(), mode='wb') as tmp:
         tmp_path = Path(tmp.name)
+    write_table(df_renamed, tmp_path, sheet_name='DB_ORG')
 
-    try:
-        with st.spinner("⏳ Import in corso... Attendere..."):
-            # REAL IMPORT using db_org_import_service
-            from services.db_org_import_service import DBOrgImportService
-            import config
-
-            service = DBOrgImportService(config.DB_PATH)
-            results = service.import_db_org_file(tmp_path, 'DB_ORG', user_note)
-
-            if results['success']:
-                wizard.set_data('import_results', results)
-                wizard.set_data('import_executed', True)
-                st.success("✅ Import completato con successo!")
+    # Import in background (il file temporaneo è rimosso dal job)
+    from services.background_jobs import import_db_org_job
+    from services.job_runner import get_job_runner
 
-                # Reload data to session state
-                st.session_state.data_loaded = False  # Force reload
-                st.rerun()
-            else:
-                st.error(f"❌ Import fallito: {results.get('message', 'Errore sconosciuto')}")
-                if results.get('errors'):
-                    for error in results['errors'][:5]:
-                        st.error(f"  • {error}")
-                wizard.set_data('import_results', results)
-                wizard.set_data('import_executed', False)
+    try:
+        job_id = get_job_runner().submit(
+            'import_db_org',
+            import_db_org_job,
+            tmp_path,
+            'DB_ORG',
+            user_note,
+            label="Import DB_ORG (wizard)"
+        )
+        wizard.set_data('import_job_id', job_id)
 
     except Exception as e:
         st.error(f"❌ Errore durante l'import: {str(e)}")
         wizard.set_data('import_results', {'success': False, 'error': str(e)})
-
-    finally:
-        # Cleanup temp file
         if tmp_path.exists():
             tmp_path.unlink()
 
 
+def render_import_job(wizard):
+    """Avanzamento dell'import avviato da execute_import; salva l'esito a job terminato."""
+    from services.job_runner import SUCCEEDED, get_job_runner
+    from ui.job_status_view import render_job_status
+
+    job_id = wizard.get_data('import_job_id')
+    job = render_job_status(job_id, key="wizard_import")
+    wizard.set_data('import_job_id', None)
+    if job is None or job.status != SUCCEEDED:
+        wizard.set_data('import_results', {'success': False, 'error': job.message if job else 'Job non trovato'})
+        return
+
+    results = get_job_runner().get_result(job_id)
+    wizard.set_data('import_results', results)
+    if results['success']:
+        wizard.set_data('import_executed', True)
+        st.success("✅ Import completato con successo!")
+
+        # Reload data to session state
+        st.session_state.data_loaded = False  # Force reload
+        st.rerun()
+    else:
+        st.error(f"❌ Import fallito: {results.get('message', 'Errore sconosciuto')}")
+        if results.get('errors'):
+            for error in results['errors'][:5]:
+                st.error(f"  • {error}")
+        wizard.set_data('import_executed', False)
+
+
 def render_step_5_results(wizard):
     """Step 5: Results & Transition"""
     st.markdown("### ✅ Import Completato!")
@@ -23,10 +23,15 @@ from typing import Dict, Optional, List, Any
 from datetime import datetime
 
 from models.merge_models import ImportType, MergeStrategy
+from services.tabular_io import read_table, UPLOAD_TYPES
 from services.merge_engine import MergeEngine
 from services.database import DatabaseHandler
 
 
+# Righe della tabella preview (step 5): i MergeRecord sono costruiti solo per queste
+MERGE_PREVIEW_ROWS = 200
+
+
 # ==================== MAIN WIZARD ====================
 
 @st.dialog("🔄 Import Arricchimento/Merge", width="large")
@@ -114,8 +119,8 @@ def _step_1_upload_file(state: Dict[str, Any]):
 
     uploaded_file = st.file_uploader(
         "📂 Seleziona file Excel",
-        type=['xlsx', 'xls'],
-        help="File con dati parziali da mergiare con database",
+        type=UPLOAD_TYPES,
+        help="File (Excel, CSV o Parquet) con dati parziali da mergiare con database",
         key="merge_file_uploader"
     )
 
@@ -123,7 +128,7 @@ def _step_1_upload_file(state: Dict[str, Any]):
         try:
             # Load file
             with st.spinner("📖 Caricamento file..."):
-                df = pd.read_excel(uploaded_file)
+                df = read_table(uploaded_file)
 
             state['file_df'] = df
             state['file_name'] = uploaded_file.name
@@ -791,12 +796,10 @@ def _step_5_merge_preview(state: Dict[str, Any]):
     # Preview modifiche
     st.markdown("#### 🔍 Preview Modifiche")
 
-    # Build preview data
+    # Build preview data (MergeRecord costruiti solo per le righe mostrate)
+    changed_records = merge_preview.merge_records.with_changes()
     preview_data = []
-    for rec in merge_preview.merge_records:
-        if not rec.changed_fields:
-            continue
-
+    for rec in changed_records[:MERGE_PREVIEW_ROWS]:
         row = {
             'ID': rec.record_id,
             'Campi Modificati': ', '.join(rec.changed_fields),
@@ -814,22 +817,23 @@ def _step_5_merge_preview(state: Dict[str, Any]):
         preview_df = pd.DataFrame(preview_data)
         st.dataframe(preview_df, use_container_width=True, hide_index=True)
 
-        st.caption(f"*Mostra top {len(preview_data)} record con modifiche*")
+        if len(changed_records) > len(preview_data):
+            st.caption(f"*Mostrati primi {len(preview_data)} di {len(changed_records)} record con modifiche*")
+        else:
+            st.caption(f"*Mostra top {len(preview_data)} record con modifiche*")
 
     # Conflict resolution UI
     if merge_preview.total_conflicts > 0:
         st.markdown("---")
         st.markdown("#### ⚙️ Risoluzione Conflitti")
 
-        conflicts_by_record = {}
-        for rec in merge_preview.merge_records:
-            if rec.conflicts:
-                conflicts_by_record[rec.record_id] = rec.conflicts
+        conflicted_records = merge_preview.merge_records.with_conflicts()
 
         # Limit to first 10 records with conflicts
-        for idx, (record_id, conflicts) in enumerate(list(conflicts_by_record.items())[:10]):
-            with st.expander(f"🔧 {record_id} - {len(conflicts)} conflitti"):
-                for conflict in conflicts:
+        for idx, rec in enumerate(conflicted_records[:10]):
+            record_id = rec.record_id
+            with st.expander(f"🔧 {record_id} - {len(rec.conflicts)} conflitti"):
+                for conflict in rec.conflicts:
                     col1, col2, col3 = st.columns([2, 2, 1])
 
                     with col1:
@@ -854,8 +858,8 @@ def _step_5_merge_preview(state: Dict[str, Any]):
                         else:
                             conflict.user_resolution = conflict.db_value
 
-        if len(conflicts_by_record) > 10:
-            st.info(f"ℹ️ Mostrati primi 10 record. Altri {len(conflicts_by_record) - 10} con conflitti da risolvere.")
+        if len(conflicted_records) > 10:
+            st.info(f"ℹ️ Mostrati primi 10 record. Altri {len(conflicted_records) - 10} con conflitti da risolvere.")
 
     # Navigation
     st.markdown("---")
@@ -999,67 +1003,120 @@ def _step_6_confirmation_apply(state: Dict[str, Any]):
             st.rerun()
 
     with col_apply:
-        if st.button("✅ APPLICA MERGE", type="primary", use_container_width=True, key="apply_merge_btn"):
+        # Un merge avviato (in corso o con esito da mostrare) blocca un nuovo avvio
+        # finché il wizard non viene chiuso o il merge rilanciato
+        if st.button("✅ APPLICA MERGE", type="primary", use_container_width=True, key="apply_merge_btn",
+                     disabled=bool(state.get('merge_job_id'))):
             _apply_merge(state, create_snapshot, validate_after)
 
+    if state.get('merge_job_id'):
+        _render_merge_job(state)
+
 
 def _apply_merge(state: Dict[str, Any], create_snapshot: bool, validate_after: bool):
-    """Esegue merge finale."""
+    """Avvia il merge finale in background (snapshot + apply_merge a blocchi)."""
     try:
-        with st.spinner("🔄 Applicando merge..."):
-            # Snapshot
-            snapshot_path = None
-            if create_snapshot:
-                from services.version_manager import VersionManager
-                vm = VersionManager()
-                snapshot_path = vm.create_snapshot(
-                    note=f"Pre-merge {state['import_type']} - {state.get('file_name', 'unknown')}",
-                    version_type="merge"
-                )
-                st.info(f"📸 Snapshot creato: {snapshot_path}")
-
-            # Apply merge
-            merge_engine = MergeEngine()
-
-            # Get selected record IDs (tutti per ora)
-            selected_ids = [rec.record_id for rec in state['merge_preview'].merge_records]
-
-            result = merge_engine.apply_merge(
-                preview=state['merge_preview'],
-                selected_record_ids=selected_ids,
-                validate=validate_after,
-                record_type="personale"  # TODO: dynamic based on import_type
-            )
+        from services.background_jobs import merge_job
+        from services.job_runner import get_job_runner
 
-            # Log to audit
-            _log_merge_to_audit(state, result, snapshot_path)
+        # Get selected record IDs (tutti per ora)
+        selected_ids = state['merge_preview'].merge_records.record_ids
 
-            if result.success:
-                st.success(f"""
-                    ✅ **Merge completato con successo!**
+        snapshot_note = (
+            f"Pre-merge {state['import_type']} - {state.get('file_name', 'unknown')}"
+            if create_snapshot else None
+        )
+        state['merge_job_id'] = get_job_runner().submit(
+            'merge',
+            merge_job,
+            state['merge_preview'],
+            selected_ids,
+            validate_after,
+            "personale",  # TODO: dynamic based on import_type
+            snapshot_note,
+            label=f"Merge {state.get('file_name', 'unknown')}"
+        )
+        st.rerun()
 
-                    - ✅ **{result.applied_count}** record aggiornati
-                    - ⏭️ **{result.skipped_count}** record saltati
-                    - ❌ **{result.error_count}** errori
+    except Exception as e:
+        st.error(f"❌ Errore durante applicazione merge: {e}")
 
-                    {f'📸 Snapshot: `{snapshot_path}`' if snapshot_path else ''}
-                """)
 
-                # Reset wizard
-                if st.button("🏁 Chiudi Wizard"):
-                    if 'merge_state' in st.session_state:
-                        del st.session_state.merge_state
-                    st.rerun()
+def _render_merge_job(state: Dict[str, Any]):
+    """
+    Avanzamento del merge in background ed esito a job terminato.
 
-            else:
-                st.error(f"""
-                    ❌ **Merge fallito**
+    job id ed esito restano in state fino a "Chiudi Wizard" (o "Rilancia
+    merge"): l'esito sopravvive ai rerun e il log di audit è scritto una
+    sola volta.
+    """
+    from services.job_runner import SUCCEEDED, get_job_runner
+    from ui.job_status_view import render_job_status
+    from models.merge_models import MergeResult
+
+    job_id = state['merge_job_id']
+    job = render_job_status(job_id, key="merge_apply")
+    if job is None or job.status != SUCCEEDED:
+        st.info("ℹ️ I blocchi già salvati restano applicati: rilanciando il merge si riprende dal blocco interrotto.")
+        _render_merge_retry(state)
+        return
+
+    if state.get('merge_result') is None:
+        outcome = get_job_runner().get_result(job_id)
+        if outcome is None:
+            st.warning("⚠️ Esito del merge non più disponibile: verifica i dati nel database.")
+            _render_merge_close()
+            return
+        state['merge_result'] = outcome
+        # Log to audit (solo al primo rendering dell'esito)
+        result = MergeResult(**outcome)
+        _log_merge_to_audit(state, result, result.snapshot_path)
+
+    result = MergeResult(**state['merge_result'])
+    snapshot_path = result.snapshot_path
+
+    if result.success:
+        st.success(f"""
+            ✅ **Merge completato con successo!**
+
+            - ✅ **{result.applied_count}** record aggiornati
+            - ⏭️ **{result.skipped_count}** record saltati
+            - ❌ **{result.error_count}** errori
+            {f'- 🔁 **{result.chunks_resumed}** blocchi già applicati ripresi' if result.chunks_resumed else ''}
+
+            {f'📸 Snapshot: `{snapshot_path}`' if snapshot_path else ''}
+        """)
 
-                    Errori: {', '.join(result.errors)}
-                """)
+        _render_merge_close()
 
-    except Exception as e:
-        st.error(f"❌ Errore durante applicazione merge: {e}")
+    else:
+        st.error(f"""
+            ❌ **Merge fallito**
+
+            Errori: {', '.join(result.errors)}
+        """)
+        if result.chunks_completed:
+            st.warning(
+                f"⚠️ {result.chunks_completed}/{result.chunks_total} blocchi già salvati: "
+                "rilanciando il merge si riprende dal blocco interrotto."
+            )
+        _render_merge_retry(state)
+
+
+def _render_merge_retry(state: Dict[str, Any]):
+    """Rilancio del merge dopo un esito negativo (riprende dai checkpoint)."""
+    if st.button("🔁 Rilancia merge", key="retry_merge_btn"):
+        state['merge_job_id'] = None
+        state['merge_result'] = None
+        st.rerun()
+
+
+def _render_merge_close():
+    """Chiusura del wizard: elimina lo stato del merge (job id ed esito compresi)."""
+    if st.button("🏁 Chiudi Wizard", key="close_merge_wizard_btn"):
+        if 'merge_state' in st.session_state:
+            del st.session_state.merge_state
+        st.rerun()
 
 
 def _log_merge_to_audit(state: Dict[str, Any], result: Any, snapshot_path: Optional[str]):
@@ -1099,7 +1156,7 @@ def _log_merge_to_audit(state: Dict[str, Any], result: Any, snapshot_path: Optio
             state['gap_analysis'].critical_gaps if state.get('gap_analysis') else 0,
             coverage,
             snapshot_path,
-            result.success
+            result.validation_passed
         ))
 
         db.get_connection().commit()
@@ -13,6 +13,9 @@ import pandas as pd
 import tempfile
 from pathlib import Path
 from ui.wizard_state_manager import WizardStateManager, get_import_wizard
+from services.excel_handler import read_excel_sheet, excel_sheet_names
+from services.tabular_io import read_table, table_format, UPLOAD_TYPES
+from services.db_org_import_service import DB_ORG_COLUMNS
 
 
 class OnboardingWizard(WizardStateManager):
@@ -129,8 +132,8 @@ def render_step_2_upload(wizard: OnboardingWizard):
     # File uploader
     uploaded_file = st.file_uploader(
         "Trascina qui il file Excel o clicca per selezionare",
-        type=['xls', 'xlsx'],
-        help="Formati supportati: DB_ORG (consigliato), TNS (legacy)",
+        type=UPLOAD_TYPES,
+        help="Formati supportati: DB_ORG (consigliato, anche CSV/Parquet), TNS (legacy)",
         key="onboarding_file_upload"
     )
 
@@ -211,18 +214,21 @@ def render_step_3_preview(wizard: OnboardingWizard):
         with st.spinner("Analisi file in corso..."):
             try:
                 # Save temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
+                suffix = Path(uploaded_file.name).suffix or '.xlsx'
+                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
                     tmp.write(uploaded_file.getvalue())
                     tmp_path = Path(tmp.name)
 
-                # Detect file format
-                xls = pd.ExcelFile(tmp_path)
-                available_sheets = xls.sheet_names
+                # Detect file format (CSV/Parquet: una sola tabella, trattata come DB_ORG)
+                if table_format(tmp_path) == 'xlsx':
+                    available_sheets = excel_sheet_names(tmp_path)
+                else:
+                    available_sheets = ['DB_ORG']
 
                 # Check for DB_ORG format
                 if 'DB_ORG' in available_sheets:
-                    # DB_ORG format detected
-                    df = pd.read_excel(tmp_path, sheet_name='DB_ORG')
+                    # DB_ORG format detected (solo le colonne usate dall'import)
+                    df = read_table(tmp_path, 'DB_ORG', usecols=DB_ORG_COLUMNS)
 
                     st.session_state.excel_staging = {
                         'format': 'DB_ORG',
@@ -237,8 +243,8 @@ def render_step_3_preview(wizard: OnboardingWizard):
 
                 # Check for TNS format
                 elif 'TNS Personale' in available_sheets and 'TNS Strutture' in available_sheets:
-                    personale_df = pd.read_excel(tmp_path, sheet_name='TNS Personale')
-                    strutture_df = pd.read_excel(tmp_path, sheet_name='TNS Strutture')
+                    personale_df = read_excel_sheet(tmp_path, 'TNS Personale')
+                    strutture_df = read_excel_sheet(tmp_path, 'TNS Strutture')
 
                     st.session_state.excel_staging = {
                         'format': 'TNS',
@@ -313,7 +319,7 @@ def render_step_3_preview(wizard: OnboardingWizard):
                 st.metric("🏢 Strutture", f"{structures:,}")
 
             with col3:
-                st.metric("📊 Colonne", f"{columns}")
+                st.metric("📊 Colonne importate", f"{columns}")
 
             st.success("✅ File validato con successo!")
 